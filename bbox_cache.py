@@ -0,0 +1,143 @@
+from history_manager import IGNORED_TAGS
+
+EXTENT_BACKLOG = 4096  # Most items created or changed before the extent is dropped instead of grown by their boxes
+
+
+class BoundingBoxCache:
+    """
+    Bounding boxes of canvas items, queried from Tk once and kept until the items change.
+
+    The drawing canvas keeps the cache in sync: moving items translates their cached boxes, and any other change
+    (coordinates, scaling, options, deletion) invalidates them. Helper items (IGNORED_TAGS) are never cached. The
+    shapes of the items (their type, coordinates and style), which the region fill reads for every item around the
+    point, are kept the same way, and so is the extent of the drawing, which the region fill rasterizes at most.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the BoundingBoxCache.
+
+        Parameters:
+            canvas (tk.Canvas): The canvas of the items.
+        """
+        self.canvas = canvas
+        self.queries = 0  # Boxes queried from Tk, for profiling
+        self._boxes = {}  # Item -> (x1, y1, x2, y2)
+        self._shapes = {}  # Item -> (type, flat list of coordinates, style index or None)
+        self._extent = None  # Box containing the boxes of all the items (or None if they have none)
+        self._grown = None  # Items created or changed since the extent was computed, or None if it wasn't
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def get(self, item):
+        """Get the (x1, y1, x2, y2) box of an item, or None if it has none (or doesn't exist)."""
+        box = self._boxes.get(item)
+        if box is None:
+            box = self.canvas.bbox(item)
+            self.queries += 1
+            if box:
+                self._boxes[item] = box
+        return box
+
+    def shape(self, item):
+        """Get the type, coordinates and style index (None for items without a style) of an item."""
+        shape = self._shapes.get(item)
+        if shape is None:
+            canvas = self.canvas
+            shape = self._shapes[item] = (canvas.type(item), canvas.coords(item), canvas.styles.style_of(item))
+        return shape
+
+    def missing(self, items):
+        """Count the items whose box isn't cached."""
+        boxes = self._boxes
+        return sum(1 for item in items if item not in boxes)
+
+    def union(self, items):
+        """Get the box containing the boxes of several items, or None if none has a box."""
+        return _union(map(self.get, items))
+
+    def extent(self):
+        """
+        Get a box containing the boxes of all the items, or None if there are none.
+
+        It's computed once, then grown by the boxes of the items created or changed since: it may stay larger than the
+        drawing after items were deleted or moved away, until the cache is cleared.
+        """
+        if self._grown is None:
+            self._extent, self._grown = self.canvas.bbox("all"), []  # Tk joins the boxes of all the items at once
+            self.queries += 1
+        elif self._grown:
+            self._extent = _union((self._extent, self.union(self._grown)))
+            self._grown.clear()
+        return self._extent
+
+    def created(self, items):
+        """Grow the extent by the boxes of new items."""
+        self._grow(items)
+
+    def _grow(self, items):
+        if self._grown is not None:
+            self._grown.extend(items)
+            if len(self._grown) > EXTENT_BACKLOG:
+                self._extent = self._grown = None  # Computed again from all the items
+
+    def translate(self, tag_or_id, dx, dy):
+        """Translate the cached boxes and shapes of moved items."""
+        if self._is_empty():
+            return
+        if dx != int(dx) or dy != int(dy):
+            self.invalidate(tag_or_id)  # Tk rounds the boxes of items moved by fractions of pixels
+            return
+        items = self._resolve(tag_or_id)
+        self._grow(items)
+        for item in items:
+            box = self._boxes.get(item)
+            if box is not None:
+                self._boxes[item] = (box[0] + dx, box[1] + dy, box[2] + dx, box[3] + dy)
+            shape = self._shapes.get(item)
+            if shape is not None:
+                coords = shape[1]
+                self._shapes[item] = (shape[0], [value + dy if index % 2 else value + dx
+                                                 for index, value in enumerate(coords)], shape[2])
+
+    def invalidate(self, tag_or_id):
+        """Forget the cached boxes and shapes of changed items."""
+        if self._is_empty():
+            return
+        if tag_or_id == "all":
+            self.clear()
+            return
+        items = self._resolve(tag_or_id)
+        for item in items:
+            self._boxes.pop(item, None)
+            self._shapes.pop(item, None)
+        self._grow(items)
+
+    def clear(self):
+        self._boxes.clear()
+        self._shapes.clear()
+        self._extent = self._grown = None
+
+    def _is_empty(self):
+        return not self._boxes and not self._shapes and self._grown is None
+
+    def _resolve(self, tag_or_id):
+        """Get the item ids of a tag or id, without asking Tk for ids and helper tags."""
+        if isinstance(tag_or_id, int):
+            return (tag_or_id,)
+        if isinstance(tag_or_id, str):
+            if tag_or_id.isdigit():
+                return (int(tag_or_id),)
+            if tag_or_id in IGNORED_TAGS:
+                return ()
+        return self.canvas.find_withtag(tag_or_id)
+
+
+def _union(boxes):
+    """Get the box containing several boxes (None ones left out), or None if there are none."""
+    boxes = [box for box in boxes if box]
+    if not boxes:
+        return None
+    x1s, y1s, x2s, y2s = zip(*boxes)
+    return min(x1s), min(y1s), max(x2s), max(y2s)
@@ -0,0 +1,482 @@
+"""
+Performance benchmarks for drawing workloads.
+
+Run from the repository root:
+
+    python -m benchmarks [--scale N] [--output results.json] [--display]
+
+The suite builds a synthetic scene (pen strokes, shapes, gradient fills, text boxes and images) through the real tool
+handlers and measures the event handler latency of every tool, get_drawing_data/load_drawing_data, saving and opening
+the drawing file, memory growth over open/clear cycles, marquee selection, dragging the selection handles, nested
+groups, transforming a large selection, array clones, the throughput of creating canvas items one call at a time and
+in batches, snapping, the frames of the offscreen render mode, and panning and zooming a large drawing. By default it
+runs against the headless canvas model; --display uses a real Tk display instead (for example under xvfb-run). The
+results are printed (or written) as JSON for comparison across commits. The run fails (exit status 1) if the resident
+memory grows by more than OPEN_CLEAR_RSS_LIMIT over the open/clear cycles.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.harness import EventDriver, build_app, resident_memory, summarize, timed
+from benchmarks.scenes import CANVAS_HEIGHT, CANVAS_WIDTH, SceneBuilder
+from drawing_canvas import CREATE_CHUNK
+from selection_overlay import ROTATE_HANDLE
+
+RESULTS_VERSION = 1
+
+# Scene size for --scale 1
+BASE_SCENE = {"pen_strokes": 200, "shapes": 200, "gradient_fills": 2, "text_boxes": 20, "images": 10}
+TOOL_GESTURES = 20  # Gestures per tool in the tool latency pass
+OPEN_CLEAR_CYCLES = 100  # Open/clear cycles of the memory lifecycle pass
+OPEN_CLEAR_TRACED_CYCLES = 10  # Open/clear cycles of the lifecycle pass traced by tracemalloc, after the others
+OPEN_CLEAR_RSS_LIMIT = 16 * 1024 * 1024  # Largest growth in bytes of the resident memory over the open/clear cycles
+GROUP_SIZE = 100  # Objects per inner group of the grouping pass (ten inner groups per outer group)
+TRANSFORM_POINTS = 50000  # Pen stroke points selected in the transform pass
+TRANSFORM_SHAPES = 2000  # Rectangles and ovals selected with the pen strokes (the rotation replaces them by polygons)
+CLONES = 10000  # Copies made by the array clone pass
+CREATED_ITEMS = 20000  # Rectangles created by each method of the item creation pass
+SNAP_VERTICES = 200000  # Vertices of the polylines indexed by the snapping pass
+SNAP_QUERIES = 1000  # Snapped pointer positions of the snapping pass
+VIEWPORT_OBJECTS = 200000  # Pen segments of the drawing panned and zoomed by the viewport pass
+VIEWPORT_FRAMES = 200  # Pan steps of the viewport pass
+OFFSCREEN_EDITS = 100  # Objects moved one frame at a time by the offscreen rendering pass
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _measure_tools(driver, app):
+    """Run gestures of the tools that the scene doesn't use, on the full scene."""
+    rng = random.Random(1)
+    for _ in range(TOOL_GESTURES):
+        x, y = rng.randint(100, CANVAS_WIDTH - 100), rng.randint(100, CANVAS_HEIGHT - 100)
+        driver.gesture("Eraser", [(x, y), (x + 3, y), (x + 6, y)])
+        driver.gesture("Move", [(x, y), (x + 5, y + 5), (x + 10, y + 10)])
+        driver.gesture("Move", [(x + 10, y + 10), (x + 5, y + 5), (x, y)])
+        driver.gesture("Select", [(x, y)])
+        driver.gesture("Fill", [(x, y)])
+        driver.gesture("Bucket fill", [(x, y)])
+        driver.gesture("Forward", [(x, y)])
+        driver.gesture("Backward", [(x, y)])
+        driver.gesture("Start polygon", [(x, y), (x + 20, y)])
+        driver.gesture("Start polygon", [(x + 20, y + 20)])
+        driver.gesture("Close Polygon", [(x, y)])
+    for _ in range(TOOL_GESTURES):
+        x, y = rng.randint(100, CANVAS_WIDTH - 100), rng.randint(100, CANVAS_HEIGHT - 100)
+        driver.gesture("Delete", [(x, y)])
+        app.canvas.history.undo()
+
+
+def _measure_groups(app, items, group_size=GROUP_SIZE):
+    """Group the items in nested groups, then select all of them with the marquee and move one outer group."""
+    canvas = app.canvas
+    canvas.select_tool.overlay.clear()
+
+    def group_nested():
+        inner = [canvas.groups.group(items[start:start + group_size]) for start in range(0, len(items), group_size)]
+        return [canvas.groups.group(inner[start:start + 10]) for start in range(0, len(inner), 10)]
+
+    outer, group_seconds = timed(group_nested)
+    driver = EventDriver(app)
+    for _ in range(5):
+        driver.gesture("select objects", [(CANVAS_WIDTH + 20, CANVAS_HEIGHT + 20), (-20, -20)])
+    x1, y1, x2, y2 = canvas.groups.box(outer[0])
+    x, y = (x1 + x2) // 2, (y1 + y2) // 2
+    driver.gesture("Move", [(x, y)] + [(x + step, y + step) for step in range(1, 31)])
+    return {
+        "groups": len(canvas.groups),
+        "grouped_objects": len(items),
+        "group_seconds": group_seconds,
+        "marquee_release_seconds": summarize(driver.latencies[("select objects", "release")]),
+        "move_motion_seconds": summarize(driver.latencies[("Move", "motion")]),
+    }
+
+
+def _measure_transforms(app, points=TRANSFORM_POINTS, stroke_points=500, shapes=TRANSFORM_SHAPES):
+    """
+    Draw pen strokes with the given number of points in total, and rectangles and ovals, select them and rotate,
+    scale and skew them.
+    """
+    canvas = app.canvas
+    canvas.clear_canvas()
+    driver = EventDriver(app)
+    for stroke in range(points // stroke_points):
+        y = 20 + stroke * (CANVAS_HEIGHT - 40) // (points // stroke_points)
+        driver.gesture("Pen", [(20 + index * 3, y + index % 7) for index in range(stroke_points // 2 + 1)])
+    rng = random.Random(6)
+    for index in range(shapes):
+        x, y = rng.uniform(20, CANVAS_WIDTH - 40), rng.uniform(20, CANVAS_HEIGHT - 40)
+        create = canvas.create_rectangle if index % 2 else canvas.create_oval
+        create(x, y, x + rng.uniform(4, 20), y + rng.uniform(4, 20), fill="#%06x" % rng.randrange(1 << 24))
+    select_tool = canvas.select_tool
+    select_tool.overlay.select_enclosed(-20, -20, CANVAS_WIDTH + 20, CANVAS_HEIGHT + 20)
+    selected = list(select_tool.overlay.selection)
+    selected_points = sum(len(canvas.coords(item)) // 2 for item in selected)
+    _, rotate_seconds = timed(select_tool.rotate_selection, 30)
+    _, scale_seconds = timed(select_tool.scale_selection, 1.2, 0.8)
+    _, skew_seconds = timed(select_tool.skew_selection, 15, 0)
+    _, undo_seconds = timed(canvas.history.undo)
+    return {
+        "points": selected_points,
+        "items": len(selected),
+        "shapes": shapes,
+        "rotate_seconds": rotate_seconds,
+        "scale_seconds": scale_seconds,
+        "skew_seconds": skew_seconds,
+        "undo_seconds": undo_seconds,
+    }
+
+
+def _measure_clones(app, clones=CLONES):
+    """Clone a line in a grid, then a group of three shapes around a circle, making about as many items each time."""
+    canvas = app.canvas
+    canvas.clear_canvas()
+    canvas.create_line(20, 20, 24, 22, 28, 20, 32, 22, fill="blue", width=2)
+    select_tool = canvas.select_tool
+    clone_tool = canvas.clone_tool
+    select_tool.overlay.select_enclosed(0, 0, 40, 40)
+    side = round(clones ** 0.5)
+    _, grid_seconds = timed(clone_tool.grid_array, side, side, 12, 6)
+    grid_items = len(select_tool.overlay.selection)
+    _, undo_seconds = timed(canvas.history.undo)
+
+    shapes = [canvas.create_rectangle(300, 20, 320, 40, fill="red"), canvas.create_oval(325, 20, 345, 40),
+              canvas.create_line(300, 45, 345, 45, width=2)]
+    select_tool.overlay.select(shapes)
+    select_tool.group_selection()
+    _, radial_seconds = timed(clone_tool.radial_array, clones // len(shapes) + 1, 300)
+    return {
+        "grid_items": grid_items,
+        "grid_seconds": grid_seconds,
+        "grid_undo_seconds": undo_seconds,
+        "radial_items": len(select_tool.overlay.selection),
+        "radial_seconds": radial_seconds,
+    }
+
+
+def _measure_item_creation(app, items=CREATED_ITEMS):
+    """
+    Create the same rectangles with one create_rectangle call per item, with create_items_batch (a direct Tcl call per
+    item, in chunks created in time slices) and by loading them as a drawing, and compare the throughput of the three.
+
+    The batch still makes one Tcl call per item: it only saves the option conversion of tkinter and the per-item
+    updates of the caches, so batch_speedup is modest (about 1.4x to 1.9x on the headless canvas model).
+    """
+    canvas = app.canvas
+    rng = random.Random(5)
+    rectangles = []
+    for _ in range(items):
+        x, y = rng.uniform(0, CANVAS_WIDTH - 20), rng.uniform(0, CANVAS_HEIGHT - 20)
+        rectangles.append(("rectangle", [x, y, x + rng.uniform(2, 20), y + rng.uniform(2, 20)],
+                           {"fill": "#%06x" % rng.randrange(1 << 24), "outline": "", "width": "1.0"}))
+    drawing_data = {"objects": [{"type": item_type, "coords": coords, "color": options["fill"],
+                                 "outline": options["outline"], "width": options["width"]}
+                                for item_type, coords, options in rectangles], "images": []}
+
+    def one_call_per_item():
+        return [canvas.create_rectangle(*coords, **options) for _, coords, options in rectangles]
+
+    results = {"items": items, "chunk_items": CREATE_CHUNK}
+    for name, create in (("calls", one_call_per_item), ("batch", lambda: canvas.create_items_batch(rectangles)),
+                         ("load", lambda: canvas.load_drawing_data(drawing_data))):
+        canvas.clear_canvas()
+        canvas.history.clear()
+        _, seconds = timed(create)
+        results[name] = {"seconds": seconds, "items_per_second": round(items / seconds)}
+    canvas.clear_canvas()
+    canvas.history.clear()
+    results["batch_speedup"] = round(results["calls"]["seconds"] / results["batch"]["seconds"], 2)  # About 1.4-1.9
+    return results
+
+
+def _measure_snapping(app, vertices=SNAP_VERTICES, queries=SNAP_QUERIES, polyline_vertices=10):
+    """
+    Index the vertices and midpoints of polylines with the given number of vertices in total, then snap pointer
+    positions to them, while moving one polyline between the queries (an incremental update of the index).
+    """
+    canvas = app.canvas
+    canvas.clear_canvas()
+    rng = random.Random(2)
+    polylines = []
+    for _ in range(vertices // polyline_vertices):
+        x, y = rng.uniform(0, CANVAS_WIDTH), rng.uniform(0, CANVAS_HEIGHT)
+        coords = []
+        for _ in range(polyline_vertices):
+            x, y = x + rng.uniform(-20, 20), y + rng.uniform(-20, 20)
+            coords.extend((x, y))
+        polylines.append(("line", coords, {}))
+    lines = canvas.create_items_batch(polylines)
+
+    snapping = canvas.snapping
+    snapping.to_objects = True
+    points, build_seconds = timed(len, snapping.index)
+    snap_times = []
+    for _ in range(queries):
+        canvas.move(rng.choice(lines), 1, 1)
+        _, seconds = timed(snapping.snap, rng.uniform(0, CANVAS_WIDTH), rng.uniform(0, CANVAS_HEIGHT))
+        snap_times.append(seconds)
+    snapping.to_objects = False
+    return {
+        "snap_points": points,
+        "build_seconds": build_seconds,
+        "snap_us": summarize(snap_times, 1e6),
+    }
+
+
+def _measure_viewport(app, objects=VIEWPORT_OBJECTS, frames=VIEWPORT_FRAMES, density=0.002):
+    """
+    Load a drawing of pen segments spread far beyond the view (density segments per square pixel), pan across it one
+    step at a time, then zoom out and back in, letting the view settle (culling and level of detail) after each.
+    """
+    def zoom_and_settle(factor):
+        viewport.zoom_at(factor, 0, 0)
+        viewport.settle()
+
+    canvas = app.canvas
+    canvas.clear_canvas()
+    viewport = canvas.viewport
+    rng = random.Random(3)
+    side = (objects / density) ** 0.5
+    drawing_data = {"objects": [], "images": []}
+    for _ in range(objects):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        drawing_data["objects"].append({"type": "line", "coords": [x, y, x + 6, y + 4], "width": "2.0",
+                                        "color": "black"})
+    _, load_seconds = timed(canvas.load_drawing_data, drawing_data)
+    canvas_items = len(canvas.find_all())
+
+    pan_times = []
+    for _ in range(frames):
+        _, seconds = timed(viewport.pan_by, -40, -25)
+        pan_times.append(seconds)
+    _, settle_seconds = timed(viewport.settle)
+    _, zoom_out_seconds = timed(zoom_and_settle, 0.25)
+    _, zoom_in_seconds = timed(zoom_and_settle, 4)
+    saved, save_seconds = timed(canvas.get_drawing_data)
+    viewport.reset()
+    canvas.clear_canvas()
+    canvas.history.clear()
+    return {
+        "objects": len(saved["objects"]),
+        "load_seconds": load_seconds,
+        "canvas_items": canvas_items,
+        "pan_ms": summarize(pan_times, 1e3),
+        "settle_seconds": settle_seconds,
+        "zoom_out_seconds": zoom_out_seconds,
+        "zoom_in_seconds": zoom_in_seconds,
+        "get_drawing_data_seconds": save_seconds,
+    }
+
+
+def _measure_offscreen(app, edits=OFFSCREEN_EDITS):
+    """
+    Render the scene in the offscreen render mode, then move single objects one frame at a time: each frame only
+    renders the tiles under the old and new boxes of the moved object.
+    """
+    canvas = app.canvas
+    offscreen = canvas.offscreen
+    offscreen.enable()
+    offscreen.render_frame()
+    full_frame = offscreen.frames[-1]
+    rng = random.Random(4)
+    items = [item for item in canvas.find_all() if canvas.type(item) in ("line", "rectangle", "oval", "polygon")]
+    for _ in range(edits):
+        canvas.move(rng.choice(items), rng.randint(-20, 20), rng.randint(-20, 20))
+        offscreen.render_frame()
+    frames = list(offscreen.frames)[-edits:]
+    offscreen.disable()
+    return {
+        "full_frame_ms": full_frame["render_ms"],
+        "full_frame_area": full_frame["dirty_area"],
+        "edit_frame_ms": summarize([frame["render_ms"] for frame in frames]),
+        "edit_frame_area": summarize([frame["dirty_area"] for frame in frames]),
+    }
+
+
+def _measure_open_clear(canvas, drawing_data, cycles=OPEN_CLEAR_CYCLES, traced_cycles=OPEN_CLEAR_TRACED_CYCLES,
+                        rss_limit=OPEN_CLEAR_RSS_LIMIT):
+    """
+    Open and clear the drawing repeatedly and measure how much the resident memory of the process grew (which also
+    counts the memory of Tk and of the images), then how much Python memory stays allocated over more cycles traced
+    by tracemalloc.
+
+    Both passes start from a baseline taken after a warm-up cycle and a garbage collection. The resident memory is
+    measured first, without tracemalloc: its traces would count as growth of the resident memory.
+
+    A leak-free lifecycle keeps the growth flat, whatever the number of cycles: rss_within_limit is false if the
+    resident memory grew by more than rss_limit bytes (it's None where the resident memory can't be read).
+    """
+    def cycle():
+        canvas.load_drawing_data(drawing_data)
+        canvas.clear_canvas()
+        canvas.history.clear()
+
+    cycle()  # Warm up the caches before taking the baseline
+    gc.collect()
+    rss_baseline = resident_memory()
+    for _ in range(cycles):
+        cycle()
+    gc.collect()
+    rss = resident_memory()
+    rss_growth = None if rss is None or rss_baseline is None else rss - rss_baseline
+
+    tracemalloc.start()
+    try:
+        cycle()
+        gc.collect()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for _ in range(traced_cycles):
+            cycle()
+        gc.collect()
+        growth = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    return {
+        "cycles": cycles,
+        "traced_cycles": traced_cycles,
+        "memory_growth_bytes": growth,
+        "rss_growth_bytes": rss_growth,
+        "rss_limit_bytes": rss_limit,
+        "rss_within_limit": None if rss_growth is None else rss_growth <= rss_limit,
+        "registered_objects": len(canvas.registry),
+        "canvas_children": len(canvas.children),
+    }
+
+
+def run(scale=1, display=False, seed=0):
+    """
+    Run the benchmark suite.
+
+    Parameters:
+        scale (int): Multiplier of the scene size.
+        display (bool): Use a real Tk display instead of the headless canvas model.
+        seed (int): Seed of the synthetic scene.
+
+    Returns:
+        dict: The benchmark results.
+    """
+    from menu_manager import read_drawing_file, write_drawing_file
+
+    app = build_app(display=display)
+    canvas = app.canvas
+    driver = EventDriver(app)
+    scene = SceneBuilder(driver, seed=seed)
+    scene_size = {name: count * scale for name, count in BASE_SCENE.items()}
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        build_times = {}
+        _, build_times["pen_strokes"] = timed(scene.add_pen_strokes, scene_size["pen_strokes"])
+        _, build_times["shapes"] = timed(scene.add_shapes, scene_size["shapes"])
+        _, build_times["gradient_fills"] = timed(scene.add_gradient_fills, scene_size["gradient_fills"])
+        _, build_times["text_boxes"] = timed(scene.add_text_boxes, scene_size["text_boxes"])
+        images_created, build_times["images"] = timed(scene.add_images, scene_size["images"], directory)
+        if not images_created:
+            scene_size["images"] = 0
+            build_times["images"] = None
+        results["scene_build_seconds"] = build_times
+        results["canvas_items"] = len(canvas.find_all())
+
+        _measure_tools(driver, app)
+        results["event_latency_us"] = driver.latency_report()
+
+        drawing_data, results["get_drawing_data_seconds"] = timed(canvas.get_drawing_data)
+        _, results["load_drawing_data_seconds"] = timed(canvas.load_drawing_data, drawing_data)
+
+        path = os.path.join(directory, "drawing.json")
+        _, save_seconds = timed(write_drawing_file, path, canvas.get_drawing_data())
+        file_size = os.path.getsize(path)
+        loaded_data, read_seconds = timed(read_drawing_file, path)
+        _, open_load_seconds = timed(canvas.load_drawing_data, loaded_data)
+        results["file"] = {
+            "save_seconds": save_seconds,
+            "open_seconds": read_seconds + open_load_seconds,
+            "size_bytes": file_size,
+        }
+
+        results["open_clear_cycles"] = _measure_open_clear(canvas, drawing_data)
+        canvas.load_drawing_data(drawing_data)
+
+        marquee = EventDriver(app)
+        for _ in range(5):
+            marquee.gesture("select objects", [(0, 0), (CANVAS_WIDTH // 2, CANVAS_HEIGHT // 2),
+                                               (CANVAS_WIDTH, CANVAS_HEIGHT)])
+        results["marquee_selection"] = {
+            "selected_objects": len(canvas.select_tool.marquee_objects),
+            "release_seconds": summarize(marquee.latencies[("select objects", "release")]),
+        }
+
+        # Drag the bottom-right handle of the selection, then its rotate handle
+        overlay = canvas.select_tool.overlay
+        handles = EventDriver(app)
+        x1, y1, x2, y2 = overlay.box
+        handles.gesture("select objects", [(x2, y2)] + [(x2 - 4 * step, y2 - 3 * step) for step in range(1, 31)])
+        rotate_x, rotate_y = overlay.handle_positions()[ROTATE_HANDLE]
+        handles.gesture("select objects", [(rotate_x, rotate_y)] + [(rotate_x + 10 * step, rotate_y + 5 * step)
+                                                                     for step in range(1, 31)])
+        results["selection_handles"] = {
+            "selected_objects": len(overlay.selection),
+            "motion_seconds": summarize(handles.latencies[("select objects", "motion")]),
+            "release_seconds": summarize(handles.latencies[("select objects", "release")]),
+        }
+
+        results["groups"] = _measure_groups(app, list(overlay.selection))
+        results["transforms"] = _measure_transforms(app)
+        results["clones"] = _measure_clones(app)
+        results["item_creation"] = _measure_item_creation(app)
+        results["snapping"] = _measure_snapping(app)
+        results["offscreen"] = _measure_offscreen(app)
+        results["viewport"] = _measure_viewport(app)
+
+    return {
+        "version": RESULTS_VERSION,
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "canvas": "tk" if display else "headless",
+        },
+        "parameters": {"scale": scale, "seed": seed, "scene": scene_size},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark drawing workloads.")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier of the synthetic scene size")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic scene")
+    parser.add_argument("--display", action="store_true",
+                        help="use a real Tk display (e.g. under xvfb-run) instead of the headless canvas model")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = run(scale=args.scale, display=args.display, seed=args.seed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    open_clear = report["results"]["open_clear_cycles"]
+    if open_clear["rss_within_limit"] is False:
+        print(f"The resident memory grew by {open_clear['rss_growth_bytes']} bytes over {open_clear['cycles']} "
+              f"open/clear cycles (limit: {open_clear['rss_limit_bytes']} bytes)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+# Canvas handler of every event phase fed by EventDriver.dispatch
+_PHASE_HANDLERS = {"press": "_start_draw", "motion": "_draw", "release": "_end_draw", "double": "_double_click"}
+
+
+def build_app(display=False):
+    """
+    Create the application windows the same way main.py does.
+
+    Parameters:
+        display (bool): Use a real Tk display (for example a virtual X display) instead of the headless model.
+
+    Returns:
+        SimpleNamespace: The root, toolbar, canvas and menu of the application.
+    """
+    import tkinter as tk
+    from headless_tk import HeadlessTk
+    from toolbar import Toolbar
+    from drawing_canvas import DrawingCanvas
+    from menu_manager import Menu
+    from benchmarks.scenes import CANVAS_HEIGHT, CANVAS_WIDTH
+
+    root = tk.Tk() if display else HeadlessTk()
+    toolbar = Toolbar(root)
+    toolbar.pack()
+    canvas = DrawingCanvas(root, toolbar)
+    canvas.configure(width=CANVAS_WIDTH, height=CANVAS_HEIGHT)  # The size of the view of the synthetic scenes
+    canvas.pack(fill=tk.BOTH, expand=True)
+    menu = Menu(root, canvas=canvas)
+    return SimpleNamespace(root=root, toolbar=toolbar, canvas=canvas, menu=menu)
+
+
+def resident_memory():
+    """
+    Get the resident memory of the process in bytes: its current size from /proc where there is one, its peak size
+    from getrusage elsewhere (a leak raises the peak as well), or None if neither is available.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Bytes on macOS, kilobytes elsewhere
+
+
+def make_event(x, y):
+    """Create a mouse event with the attributes the tool handlers read."""
+    return SimpleNamespace(x=x, y=y, x_root=x, y_root=y, widget=None, state=0, num=1, delta=0)
+
+
+class EventDriver:
+    """
+    Feeds mouse gestures to the canvas event handlers and records the latency of every handler call.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.latencies = {}  # (tool, phase) -> list of durations in seconds
+
+    def gesture(self, tool, points):
+        """
+        Press at the first point, move through the others and release at the last one.
+
+        Parameters:
+            tool (str): The tool name, as selected by the toolbar.
+            points (list): The (x, y) points of the gesture.
+        """
+        self.app.toolbar._select_tool(tool)
+
+        self.dispatch(tool, "press", points[0])
+        for point in points[1:]:
+            self.dispatch(tool, "motion", point)
+        self.dispatch(tool, "release", points[-1])
+
+    def dispatch(self, tool, phase, point):
+        """
+        Feed one mouse event to the canvas handler of its phase and record its latency.
+
+        Parameters:
+            tool (str): The tool name the latency is recorded for (the tool selected by the toolbar).
+            phase (str): "press", "motion", "release" or "double" (a double-click).
+            point (tuple): The (x, y) point of the event.
+        """
+        handler = getattr(self.app.canvas, _PHASE_HANDLERS[phase])
+        event = make_event(*point)
+        start = time.perf_counter()
+        handler(event)
+        self.latencies.setdefault((tool, phase), []).append(time.perf_counter() - start)
+
+    def latency_report(self):
+        """Get the latency statistics of every tool and event phase, in microseconds."""
+        report = {}
+        for (tool, phase), durations in sorted(self.latencies.items()):
+            report.setdefault(tool, {})[phase] = summarize(durations, scale=1e6)
+        return report
+
+
+def summarize(durations, scale=1.0):
+    """
+    Summarize a list of durations.
+
+    Parameters:
+        durations (list): Durations in seconds.
+        scale (float): Factor applied to every statistic (1e6 for microseconds).
+
+    Returns:
+        dict: Count, mean, median, 95th percentile and maximum.
+    """
+    ordered = sorted(durations)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * scale, 3),
+        "p50": round(statistics.median(ordered) * scale, 3),
+        "p95": round(ordered[p95_index] * scale, 3),
+        "max": round(ordered[-1] * scale, 3),
+    }
+
+
+def timed(func, *args, **kwargs):
+    """
+    Call a function once and measure it.
+
+    Returns:
+        tuple: The result of the call and its duration in seconds.
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
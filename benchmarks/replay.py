@@ -0,0 +1,118 @@
+"""
+Replays a recording of the drawing tool events (Performance > Record Input, see input_recorder) on the canvas.
+
+Run from the repository root:
+
+    python -m benchmarks.replay session.json [--realtime [--speed N]] [--display] [--check] [--output report.json]
+
+The drawing the recording started from is loaded, then every event is fed to the DrawingCanvas handlers with the
+toolbar state and the view it was recorded with: as fast as possible by default, or at the recorded pace with
+--realtime. The report gives the latency of every tool and event phase, how late the events were dispatched in real
+time, and the hash of the final drawing compared to the recorded one (--check exits with an error if they differ).
+"""
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.harness import EventDriver, build_app, summarize
+from input_recorder import PHASE_CODES, STATE_CODE, drawing_hash, read_recording
+
+_PHASES = {code: phase for phase, code in PHASE_CODES.items()}
+
+
+def replay(app, recording, realtime=False, speed=1.0):
+    """
+    Replay a recording on the canvas of an application.
+
+    Parameters:
+        app (SimpleNamespace): The application, as created by build_app.
+        recording (dict): The recording, as read by read_recording.
+        realtime (bool): Dispatch the events at the recorded pace instead of as fast as possible.
+        speed (float): Factor applied to the recorded pace in real time (2 replays twice as fast).
+
+    Returns:
+        dict: The replay report.
+    """
+    canvas, toolbar = app.canvas, app.toolbar
+    width, height = recording.get("size") or (0, 0)
+    if width > 1 and height > 1:
+        canvas.configure(width=width, height=height)
+    drawing = recording.get("drawing") or {}
+    if any(drawing.get(key) for key in ("objects", "images", "layers")):
+        canvas.load_drawing_data(drawing)
+    app.root.update()
+
+    driver = EventDriver(app)
+    tool = toolbar.state.tool or "None"
+    lags = []  # Seconds each event was dispatched after its recorded time, in real time
+    events = 0
+    start = time.perf_counter()
+    for entry in recording["events"]:
+        if realtime:
+            delay = start + entry[0] / 1000 / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lags.append(max(-delay, 0.0))
+        if entry[1] == STATE_CODE:
+            state = entry[2]
+            toolbar.set_state(state)
+            if "view" in state:
+                canvas.viewport.set_view(*state["view"])
+            tool = toolbar.state.tool or "None"
+            continue
+        phase = _PHASES[entry[1]]
+        driver.dispatch(tool, phase, (entry[2], entry[3]))
+        events += 1
+        if realtime or phase == "release":
+            app.root.update()  # Let Tk redraw (and run the idle jobs) like it does between real gestures
+    app.root.update()
+    elapsed = time.perf_counter() - start
+
+    final_hash = drawing_hash(canvas.get_drawing_data())
+    report = {
+        "events": events,
+        "recorded_ms": recording.get("duration_ms"),
+        "replay_ms": round(elapsed * 1000, 1),
+        "realtime": realtime,
+        "latency_us": driver.latency_report(),
+        "canvas_items": len(canvas.find_all()),
+        "hash": final_hash,
+        "recorded_hash": recording.get("hash"),
+        "hash_matches": final_hash == recording.get("hash"),
+    }
+    if realtime:
+        report["speed"] = speed
+        report["lag_ms"] = summarize(lags, scale=1e3) if lags else None
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.replay",
+                                     description="Replay a recording of the drawing tool events.")
+    parser.add_argument("recording", help="recording file (saved by Performance > Record Input)")
+    parser.add_argument("--realtime", action="store_true", help="replay at the recorded pace")
+    parser.add_argument("--speed", type=float, default=1.0, help="pace factor of --realtime (default: %(default)s)")
+    parser.add_argument("--display", action="store_true",
+                        help="use a real Tk display (e.g. under xvfb-run) instead of the headless canvas model")
+    parser.add_argument("--check", action="store_true",
+                        help="exit with an error if the final drawing differs from the recorded one")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = replay(build_app(display=args.display), read_recording(args.recording), realtime=args.realtime,
+                    speed=args.speed)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.check and not report["hash_matches"]:
+        print("The final drawing differs from the recorded one", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
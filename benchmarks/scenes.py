@@ -0,0 +1,86 @@
+import os
+import random
+
+CANVAS_WIDTH = 1920
+CANVAS_HEIGHT = 1080
+STROKE_POINTS = 20  # Motion events per pen stroke
+SHAPE_TOOLS = ["Line", "Square", "Triangle", "Oval"]
+GRADIENT_COLORS = ((255, 0, 0), (0, 0, 255))
+
+
+class SceneBuilder:
+    """
+    Builds a synthetic drawing through the real tool handlers, so building the scene also measures them.
+
+    The random generator is seeded, so the same parameters always produce the same drawing.
+    """
+
+    def __init__(self, driver, seed=0):
+        """
+        Initialize the SceneBuilder.
+
+        Parameters:
+            driver (EventDriver): Feeds the gestures to the canvas.
+            seed (int): Seed of the random generator.
+        """
+        self.driver = driver
+        self.random = random.Random(seed)
+
+    def _point(self, margin=0):
+        return (self.random.randint(margin, CANVAS_WIDTH - margin - 1),
+                self.random.randint(margin, CANVAS_HEIGHT - margin - 1))
+
+    def add_pen_strokes(self, count):
+        """Draw pen strokes of STROKE_POINTS points each."""
+        for _ in range(count):
+            x, y = self._point(margin=50)
+            points = [(x, y)]
+            for _ in range(STROKE_POINTS):
+                x = min(max(x + self.random.randint(-5, 5), 0), CANVAS_WIDTH - 1)
+                y = min(max(y + self.random.randint(-5, 5), 0), CANVAS_HEIGHT - 1)
+                points.append((x, y))
+            self.driver.gesture("Pen", points)
+
+    def add_shapes(self, count):
+        """Draw lines, squares, triangles and ovals."""
+        for index in range(count):
+            x1, y1 = self._point(margin=100)
+            x2, y2 = x1 + self.random.randint(10, 90), y1 + self.random.randint(10, 90)
+            self.driver.gesture(SHAPE_TOOLS[index % len(SHAPE_TOOLS)], [(x1, y1), ((x1 + x2) // 2, (y1 + y2) // 2),
+                                                                        (x2, y2)])
+
+    def add_gradient_fills(self, count):
+        """Draw squares and fill each of them with a gradient."""
+        self.driver.app.toolbar.state.gradual_colors = GRADIENT_COLORS
+        for _ in range(count):
+            x1, y1 = self._point(margin=100)
+            x2, y2 = x1 + 80, y1 + 80
+            self.driver.gesture("Square", [(x1, y1), (x2, y2)])
+            self.driver.gesture("Gradual fill", [(x2, y2)])
+
+    def add_text_boxes(self, count):
+        """Draw text boxes and type text into them."""
+        text_box_builder = self.driver.app.canvas.text_box_builder
+        for index in range(count):
+            x1, y1 = self._point(margin=150)
+            self.driver.gesture("Text", [(x1, y1), (x1 + 60, y1 + 20), (x1 + 120, y1 + 40)])
+            text_box_builder.get_text_boxes[-1]["text_obj"].insert("1.0", "Text box %d" % index)
+
+    def add_images(self, count, directory):
+        """
+        Upload pictures onto the canvas.
+
+        Returns:
+            bool: False if the pictures couldn't be created because PIL is not installed.
+        """
+        try:
+            from PIL import Image
+        except ImportError:
+            return False
+
+        canvas = self.driver.app.canvas
+        for index in range(count):
+            path = os.path.join(directory, "image_%d.png" % index)
+            Image.new("RGB", (64, 64), color=(index * 37 % 256, 128, 200)).save(path)
+            canvas.upload_single_picture(path, *self._point(margin=100))
+        return True
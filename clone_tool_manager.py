@@ -0,0 +1,219 @@
+import math
+
+from group_tree import GROUP_TAG_PREFIX, GROUPED_TAG
+from history_manager import SELECTED_TAG
+from layers import LAYER_TAG_PREFIX
+
+PASTE_OFFSET = 10  # Distance (in pixels without zoom) between a pasted or duplicated copy and the previous one
+_OBJECT_TYPES = ("text_box", "image")  # Types of captured items that are widgets or pictures, not Tk canvas items
+
+
+class CloneTool:
+    """
+    A tool for copying, pasting, duplicating and cloning the selected objects in arrays.
+
+    The selected objects (the motif) are captured once, then the coordinates of all the copies are computed in a
+    single NumPy batch, one affine matrix per copy, and the canvas items are created by create_items_batch. The
+    copies of grouped objects are grouped like the originals, and every paste, duplicate or array is undone in one
+    step.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the CloneTool.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the copied objects.
+        """
+        self.canvas = canvas
+        self.clipboard = None  # The motif copied last
+        self._pastes = 0  # Number of pastes of the clipboard, to offset every paste from the previous one
+
+    def copy(self):
+        """Copy the selected objects to the clipboard."""
+        motif = self._capture()
+        if motif is None:
+            self.canvas.bell()
+            return
+        self.clipboard = motif
+        self._pastes = 0
+
+    def paste(self):
+        """Paste the objects of the clipboard, offset from where they were copied, and select them."""
+        if self.clipboard is None:
+            self.canvas.bell()
+            return
+        from transforms import translation_matrix  # Imported on first use, like NumPy, to keep the startup fast
+
+        self._pastes += 1
+        offset = PASTE_OFFSET * self._pastes
+        self._place(self.clipboard, [translation_matrix(offset, offset)])
+
+    def duplicate(self):
+        """Copy the selected objects next to themselves, without changing the clipboard, and select the copies."""
+        motif = self._capture()
+        if motif is None:
+            self.canvas.bell()
+            return
+        from transforms import translation_matrix
+
+        self._place(motif, [translation_matrix(PASTE_OFFSET, PASTE_OFFSET)])
+
+    def grid_array(self, rows, columns, x_spacing, y_spacing):
+        """
+        Clone the selected objects in a grid, the originals being its top-left cell.
+
+        Parameters:
+            rows (int): Number of rows of the grid.
+            columns (int): Number of columns of the grid.
+            x_spacing (float): Distance in pixels between two columns.
+            y_spacing (float): Distance in pixels between two rows.
+        """
+        import numpy as np
+
+        motif = self._capture()
+        if motif is None or rows < 1 or columns < 1 or rows * columns < 2:
+            self.canvas.bell()
+            return
+        row, column = np.divmod(np.arange(1, rows * columns), columns)  # Every cell but the top-left one
+        matrices = np.tile(np.eye(3), (len(row), 1, 1))
+        matrices[:, 0, 2] = column * x_spacing
+        matrices[:, 1, 2] = row * y_spacing
+        self._place(motif, matrices)
+
+    def radial_array(self, count, radius):
+        """
+        Clone the selected objects around a circle, rotating every copy, the originals being at the top of the circle.
+
+        Parameters:
+            count (int): Number of objects around the circle, the originals included.
+            radius (float): Distance in pixels from the center of the circle to the center of the selection.
+        """
+        import numpy as np
+
+        motif = self._capture()
+        if motif is None or count < 2:
+            self.canvas.bell()
+            return
+        x1, y1, x2, y2 = motif["box"]
+        center_x, center_y = (x1 + x2) / 2, (y1 + y2) / 2 + radius
+        angles = np.arange(1, count) * (2 * math.pi / count)
+        cos, sin = np.cos(angles), np.sin(angles)
+        matrices = np.tile(np.eye(3), (len(angles), 1, 1))
+        matrices[:, 0, 0], matrices[:, 0, 1] = cos, -sin
+        matrices[:, 1, 0], matrices[:, 1, 1] = sin, cos
+        matrices[:, 0, 2] = center_x - cos * center_x + sin * center_y  # Rotations around the center of the circle
+        matrices[:, 1, 2] = center_y - sin * center_x - cos * center_y
+        self._place(motif, matrices)
+
+    def _capture(self):
+        """
+        Capture the selected objects and the nesting of the selected groups, in document coordinates.
+
+        Returns:
+            dict: The data of the objects in drawing order ("items"), their groups as positions in "items"
+                  ("groups"), the positions of the objects outside the groups ("loose") and the box of the selection,
+                  or None if nothing is selected.
+        """
+        overlay = self.canvas.select_tool.overlay
+        if not overlay.units or overlay.box is None:
+            return None
+        snapshots = self.canvas.history.capture(overlay.selection)
+        positions = {snapshot["id"]: index for index, snapshot in enumerate(snapshots)}
+        roots = [unit for unit in overlay.units if isinstance(unit, str) and unit in self.canvas.groups]
+        items = []
+        for snapshot in snapshots:
+            data = snapshot["data"]
+            if "options" in data:  # The copies get groups of their own, and go to the active layer
+                options = dict(data["options"])
+                tags = [tag for tag in options.pop("tags", ()) if tag != GROUPED_TAG
+                        and not tag.startswith(GROUP_TAG_PREFIX) and not tag.startswith(LAYER_TAG_PREFIX)]
+                if tags:
+                    options["tags"] = tags
+                data = dict(data, options=options)
+            elif "tags" in data:  # Text boxes and pictures only have group and layer tags
+                data = {name: value for name, value in data.items() if name != "tags"}
+            items.append(data)
+        return {
+            "items": items,
+            "groups": self.canvas.groups.get_data(positions, roots),
+            "loose": [positions[unit] for unit in overlay.units if unit in positions],
+            "box": tuple(self.canvas.viewport.to_document(overlay.box)),
+        }
+
+    def _place(self, motif, matrices):
+        """
+        Create one copy of a motif per affine matrix, record them as one undo step and select them.
+
+        Parameters:
+            motif (dict): The objects to copy, as captured by _capture.
+            matrices (list): The 3x3 affine matrix of every copy (translations and rotations).
+        """
+        import numpy as np
+        from transforms import POLYGON_OPTIONS, polygon_coords, transform_points_batch
+
+        matrices = np.asarray(matrices, dtype=float)
+        axis_aligned = not (matrices[:, 0, 1].any() or matrices[:, 1, 0].any())
+
+        # Points of every object of the motif: rectangles and ovals that can't stay axis-aligned become polygons,
+        # and text boxes and pictures only move their anchor point
+        shapes = []  # (type, start, end, options) of every object (the options are the data of text boxes and images)
+        flat = []
+        for data in motif["items"]:
+            item_type = data["type"]
+            if item_type == "text_box":
+                coords, options = [data["coord_x"], data["coord_y"]], data
+            elif item_type == "image":
+                coords, options = data["coords"][:2], data
+            elif item_type in ("rectangle", "oval") and not axis_aligned:
+                coords = polygon_coords(item_type, data["coords"])
+                options = {name: value for name, value in data["options"].items()
+                           if name in POLYGON_OPTIONS or name == "tags"}
+                item_type = "polygon"
+            else:
+                coords, options = data["coords"], data["options"]
+            shapes.append((item_type, len(flat), len(flat) + len(coords), options))
+            flat.extend(coords)
+        if not shapes:
+            return
+
+        # The coordinates of all the copies at once
+        points = np.array(flat, dtype=float).reshape(-1, 2)
+        copies = transform_points_batch(points, matrices).reshape(len(matrices), -1).tolist()
+
+        # The copies are created with their group tags and selected, so no Tk call is made per copy or per group
+        canvas = self.canvas
+        overlay = canvas.select_tool.overlay
+        overlay.clear()
+        units = []
+        created = []
+        batch = []  # Canvas items waiting to be created by the next create_items_batch
+        tagged = []  # (item, tags) of the text boxes and pictures, which are tagged after their creation
+        for copy in copies:
+            roots, group_tags = canvas.groups.create_tags(motif["groups"])
+            units.extend(roots)
+            first = len(created) + len(batch)
+            for position, (item_type, start, end, options) in enumerate(shapes):
+                coords = copy[start:end]
+                tags = [SELECTED_TAG] if position not in group_tags else group_tags[position] + [GROUPED_TAG, SELECTED_TAG]
+                if item_type not in _OBJECT_TYPES:
+                    batch.append((item_type, coords, dict(options, tags=options.get("tags", []) + tags)))
+                    continue
+                created.extend(canvas.create_items_batch(batch))  # Keep the drawing order
+                batch = []
+                if item_type == "text_box":
+                    created.append(canvas.create_object(dict(options, coord_x=coords[0], coord_y=coords[1])))
+                else:
+                    created.append(canvas.create_object(dict(options, coords=coords)))
+                tagged.append((created[-1], tags))
+            units.extend(first + position for position in motif["loose"])  # Positions in created, for now
+        created.extend(canvas.create_items_batch(batch))
+
+        for item, tags in tagged:
+            if item:
+                for tag in tags:
+                    canvas.addtag_withtag(tag, item)
+        units = [unit if isinstance(unit, str) else created[unit] for unit in units]
+        created = [item for item in created if item]
+        canvas.history.record_create(created)
+        overlay.select_tagged(units, created)
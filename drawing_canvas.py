@@ -1,11 +1,58 @@
+import heapq
+import time
 import tkinter as tk
+from contextlib import contextmanager
+from operator import itemgetter
 from tkinter import messagebox, filedialog
 from shape_drawer import ShapeDrawer
 from text_box_builder import TextBoxBuilder
 from object_operations_manager import ObjectOperationsTools
 from select_tool_manager import ObjectSelectTool
 from fill_tool_manager import FillTool
-from PIL import Image, ImageTk
+from clone_tool_manager import CloneTool
+from history_manager import HistoryManager, IGNORED_TAGS
+from bbox_cache import BoundingBoxCache
+from group_tree import GroupTree, grouped_positions
+from layers import LayerManager
+from style_table import StyleTable, expand_drawing
+from snapping import Snapping
+from viewport import Viewport
+from offscreen_renderer import OffscreenRenderer
+from object_registry import ObjectRegistry
+from tool_handlers import ToolHandler, build_tool_handlers
+from performance_profiler import PerformanceProfiler
+from input_recorder import InputRecorder
+from task_executor import TaskExecutor
+
+CREATE_CHUNK = 1000  # Items created by create_items_batch between two updates of the caches
+SLICE_MS = 50  # Longest time create_items_batch creates items before letting Tk redraw the window
+
+
+def decode_pictures(task, file_paths):
+    """
+    Decode picture files in a background task, so only the PhotoImages are left to create on the Tk main loop.
+
+    Parameters:
+        task (Task): The background task, used to report progress and to stop once cancelled.
+        file_paths (list): Paths of the picture files.
+
+    Returns:
+        dict: The decoded PIL image of every path, or the exception raised while decoding it.
+    """
+    from PIL import Image
+
+    pictures = {}
+    for index, file_path in enumerate(file_paths):
+        task.check_cancelled()
+        if file_path not in pictures:
+            try:
+                image = Image.open(file_path)
+                image.load()  # Decode the pixels now, instead of when the PhotoImage is created
+                pictures[file_path] = image
+            except Exception as e:
+                pictures[file_path] = e
+        task.progress((index + 1) / len(file_paths), file_path)
+    return pictures
 
 
 class DrawingCanvas(tk.Canvas):
@@ -24,159 +71,343 @@ class DrawingCanvas(tk.Canvas):
         """
         super().__init__(master, bg="white")
         self.toolbar = toolbar
+        self.registry = ObjectRegistry()  # Widgets and images of the text boxes and pictures on the canvas
+        self.layers = LayerManager(self)  # Layers of the objects, which new items are added to
+        self.styles = StyleTable(self)  # Shared styles of the shapes, kept in sync by the methods below
+        self.bboxes = BoundingBoxCache(self)  # Bounding boxes of the items, kept in sync by the methods below
+        self.groups = GroupTree(self)  # Groups of items, with their boxes kept in sync by the methods below
+        self.snapping = Snapping(self)  # Snapping to the grid and to the objects, kept in sync by the methods below
+        self.viewport = Viewport(self)  # Zoom, pan and culling of the objects far from the view
+        self.offscreen = OffscreenRenderer(self)  # Optional render mode of the objects into one image
+        self.tasks = TaskExecutor(self)  # Runs saving, exporting, opening and uploading off the Tk main loop
+        self.history = HistoryManager(self)
         self.shape_drawer = ShapeDrawer(self, toolbar)
         self.text_box_builder = TextBoxBuilder(self, self.toolbar)
         self.fill_tool = FillTool(self, self.toolbar)
         self.operation = ObjectOperationsTools(self)
         self.select_tool = ObjectSelectTool(self, self.toolbar)
+        self.clone_tool = CloneTool(self)
+        self.history.on_change = self._history_changed
+
+        # Dispatch table of the tool handlers, by tool name
+        self._tool_handlers = build_tool_handlers(self)
+        self._no_tool = ToolHandler(self)  # Handler used when no tool is selected
+        self._active_tool = self._no_tool  # Handler of the tool pressed
 
-        # Variables for drawing operations
-        self._start_x = None
-        self._start_y = None
         self.text_box = None
-        self.images = []
 
         self._bind_events()
+        self.profiler = PerformanceProfiler(self)  # Disabled until turned on from the Performance menu
+        self.recorder = InputRecorder(self)  # Records the tool events while turned on from the Performance menu
 
     def _bind_events(self):
         """Bind mouse events for drawing operations."""
         self.bind("<Button-1>", self._start_draw)
         self.bind("<B1-Motion>", self._draw)
         self.bind("<ButtonRelease-1>", self._end_draw)
-        self.bind("<Double-Button-1>", self.shape_drawer.close_polygon)
-        self.toolbar.clear_button.config(command=self._clear_canvas)
+        self.bind("<Double-Button-1>", self._double_click)
+        self.bind("<Motion>", self.shape_drawer.update_rubber_band)
+        # Zoom with the mouse wheel and pan by dragging with the middle button
+        self.bind("<MouseWheel>", self.viewport.wheel)
+        self.bind("<Button-4>", self.viewport.wheel)
+        self.bind("<Button-5>", self.viewport.wheel)
+        self.bind("<Button-2>", self.viewport.start_pan)
+        self.bind("<B2-Motion>", self.viewport.pan)
+        self.bind("<ButtonRelease-2>", self.viewport.end_pan)
+        self.bind("<Configure>", self.offscreen.resized)
+        self.toolbar.clear_button.config(command=self.clear_canvas)
+        self.master.bind("<Control-z>", self.history.undo)
+        self.master.bind("<Control-y>", self.history.redo)
+        self.master.bind("<Control-equal>", lambda event: self.viewport.zoom_in())
+        self.master.bind("<Control-minus>", lambda event: self.viewport.zoom_out())
+        self.master.bind("<Control-0>", lambda event: self.viewport.reset())
+        self.master.bind("<Control-g>", lambda event: self.select_tool.group_selection())
+        self.master.bind("<Control-G>", lambda event: self.select_tool.ungroup_selection())
+        # Copy, paste and duplicate objects, unless the keys are typed in a text box
+        for key, command in (("c", self.clone_tool.copy), ("v", self.clone_tool.paste),
+                             ("d", self.clone_tool.duplicate)):
+            self.master.bind(f"<Control-{key}>",
+                             lambda event, command=command: None if isinstance(event.widget, tk.Text) else command())
 
     def _start_draw(self, event):
-        """Start drawing based on the selected tool."""
-        self._start_x = event.x
-        self._start_y = event.y
-        tool = self.toolbar.get_selected_tool()
-        if tool == "Select":
-            self.select_tool.select_object(event)
-            self.select_tool.activate_features()
-        else:
-            self.delete("highlight")
-        if tool == "Pen_and_Eraser":
-            self._draw_pen_or_eraser(event)
-        elif tool == "Start polygon":
-            self.shape_drawer.start_polygon(event, self._start_x, self._start_y)
-        elif tool == "Close Polygon":
-            self._end_draw(event)
-        elif tool in ["Line", "Oval", "Square", "Triangle"]:
-            self.shape_drawer.draw(event, self._start_x, self._start_y)
-        elif tool == "Text":
-            self.text_box_builder.start_building(event)
-        elif tool == "Move":
-            self.operation.select_object(event)
-        elif tool == "Delete":
-            self.operation.select_object(event)
-            self.operation.delete_object()
-        elif tool == "Fill":
-            self.fill_tool.fill_shape(event)
-        elif tool == "Gradual fill":
-            self.fill_tool.shapes_gradual_fill(event)
-        elif tool == "Forward":
-            self.operation.select_object(event)
-            self.operation.move_forward()
-        elif tool == "Backward":
-            self.operation.select_object(event)
-            self.operation.move_backward()
-        elif tool == "select objects":
-            self.select_tool.start_selection(event)
+        """Start drawing with the handler of the selected tool."""
+        if self.recorder.recording:
+            self.recorder.record("press", event)
+        self._active_tool = self._tool_handlers.get(self.toolbar.state.tool, self._no_tool)
+        if not self._active_tool.keeps_highlight:
+            self.select_tool.hide_highlight()
+        self._active_tool.press(event)
 
     def _draw(self, event):
-        """Continue drawing based on the selected tool."""
-        tool = self.toolbar.get_selected_tool()
-        if tool == "Start polygon":
-            self.shape_drawer.start_polygon(event, self._start_x, self._start_y)
-        elif tool in ["Pen", "Eraser"]:
-            self._draw_pen_or_eraser(event)
-        elif tool in ["Line", "Oval", "Square", "Triangle"]:
-            self.shape_drawer.draw(event, self._start_x, self._start_y)
-        elif tool == "Text":
-            self.text_box_builder.adjust_size(event)
-        elif tool == "Move":
-            self.operation.move_object(event)
-        elif tool == "select objects":
-            self.select_tool.update_selection(event)
-        elif tool == "Move objects":
-            self.select_tool.move_square_objects(event)
+        """Continue drawing with the handler of the tool pressed."""
+        if self.recorder.recording:
+            self.recorder.record("motion", event)
+        self._active_tool.motion(event)
 
     def _end_draw(self, event):
-        """Finish drawing."""
-        tool = self.toolbar.get_selected_tool()
-        if tool in ["Line", "Oval", "Square", "Triangle"]:
-            self.shape_drawer.current_shape_item = None  # Reset current shape item
-        if tool == "Close Polygon":
-            self.shape_drawer.close_polygon(event)
-        elif tool == "Text":
-            self.text_box_builder.finish_building(event)
-        elif tool == "Move":
-            self.operation.release_object()
-        elif tool == "Delete":
-            self.operation.release_object()
-        elif tool == "select objects":
-            self.select_tool.end_selection(event)
-        elif tool == "Move objects":
-            self.select_tool.end_move(event)
-
-    def _draw_pen_or_eraser(self, event):
-        """Draw with pen or eraser tool."""
-        tool = self.toolbar.get_selected_tool()
-        if tool == "Pen":
-            self._draw_pen(event)
-        elif tool == "Eraser":
-            self._erase(event)
-
-    def _draw_pen(self, event):
-        """Draw with a pen tool."""
-        color = self.toolbar.get_color()
-
-        line_width_str = self.toolbar.get_line_width().replace("px", "")
-        line_width = int(line_width_str) if line_width_str else 1  # Use default thickness if line width is empty
-
-        # Check if it's the first point
-        if self._start_x is None and self._start_y is None:
-            self._start_x = event.x
-            self._start_y = event.y
-            return
-
-        # Draw a line from previous point to current point
-        self.create_line(self._start_x, self._start_y, event.x, event.y, fill=color, width=line_width,
-                         capstyle=tk.ROUND, smooth=True)
+        """Finish drawing with the handler of the tool pressed."""
+        if self.recorder.recording:
+            self.recorder.record("release", event)
+        self._active_tool.release(event)
+        self._active_tool = self._no_tool
+
+    def _double_click(self, event):
+        """Close the polygon drawn with the polygon tool."""
+        if self.recorder.recording:
+            self.recorder.record("double", event)
+        self.shape_drawer.close_polygon(event)
+
+    def _history_changed(self):
+        """Items may have been restored with their group tags by an undo or a redo."""
+        self.groups.invalidate_all()
+        self.layers.history_changed()
+        self.select_tool.refresh_selection()
+
+    # The hit tests find the objects hidden by the offscreen render mode, and Tk computes their boxes first
+    def find_closest(self, x, y, halo=None, start=None):
+        """
+        Find the item closest to a point, leaving out the helper items (IGNORED_TAGS) and the objects of the hidden
+        and locked layers.
+        """
+        with self.offscreen.live(), self._helpers_hidden():
+            if not self.layers.has_locked:
+                return super().find_closest(x, y, halo, start)
+            with self.layers.locked_hidden():
+                return super().find_closest(x, y, halo, start)
+
+    @contextmanager
+    def _helpers_hidden(self):
+        """
+        Hide the helper items shown on the canvas (the selection overlay, the previews, the performance overlay...)
+        while the block looks for items, so the tools can't pick them. Tk doesn't redraw in between, and the states
+        are changed without the hooks of itemconfigure, so nothing flickers and no cache changes.
+        """
+        call = self.tk.call
+        shown = []  # (item, state) of the helper items hidden by the block
+        for tag in IGNORED_TAGS:
+            for item in self.find_withtag(tag):
+                state = call(self._w, "itemcget", item, "-state")
+                if state != "hidden":
+                    shown.append((item, state))
+        for item, _ in shown:
+            call(self._w, "itemconfigure", item, "-state", "hidden")
+        try:
+            yield
+        finally:
+            for item, state in shown:
+                call(self._w, "itemconfigure", item, "-state", state)
+
+    def find_overlapping(self, x1, y1, x2, y2):
+        with self.offscreen.live():
+            return super().find_overlapping(x1, y1, x2, y2)
+
+    def addtag_enclosed(self, newtag, x1, y1, x2, y2):
+        with self.offscreen.live():
+            super().addtag_enclosed(newtag, x1, y1, x2, y2)
+
+    def bbox(self, *args):
+        self.offscreen.update_boxes()
+        return super().bbox(*args)
+
+    # The methods changing items keep the bounding box cache, the boxes of the groups, the snap points, the
+    # strokes drawn with fewer points by the viewport and the offscreen buffer in sync, add the new items to the
+    # active layer, and give the shapes the tag of their style
+    def _create(self, itemType, args, kw):
+        tags = self.layers.tags_for(kw.get("tags"))
+        if tags is not None:
+            kw = dict(kw, tags=tags)
+        styled = self.styles.tags_for(itemType, kw, kw.get("tags"))
+        if styled is not kw.get("tags"):
+            kw = dict(kw, tags=styled)
+        kw = self.offscreen.creating(itemType, kw)
+        item = super()._create(itemType, args, kw)
+        self.bboxes.created((item,))
+        self.snapping.created((item,))
+        if tags is not None:
+            self.layers.created((item,))
+        self.offscreen.created((item,))
+        return item
+
+    def move(self, *args):
+        super().move(*args)
+        self.bboxes.translate(args[0], float(args[1]), float(args[2]))
+        self.groups.translate(args[0], float(args[1]), float(args[2]))
+        self.snapping.moved(args[0], float(args[1]), float(args[2]))
+        self.viewport.moved(args[0], float(args[1]), float(args[2]))
+        self.offscreen.moved(args[0], float(args[1]), float(args[2]))
+
+    def coords(self, *args):
+        if len(args) == 1:
+            full = self.viewport.full_coords(args[0])  # A stroke drawn with fewer points is read in full
+            if full is not None:
+                return full
+        result = super().coords(*args)
+        if len(args) > 1:
+            self.viewport.changed((args[0],))
+            self.bboxes.invalidate(args[0])
+            self.groups.invalidate(args[0])
+            self.snapping.changed(args[0])
+            self.offscreen.changed(args[0])
+        return result
+
+    def scale(self, *args):
+        self.viewport.scaling(args[0])
+        super().scale(*args)
+        self.bboxes.invalidate(args[0])
+        self.groups.invalidate(args[0])
+        self.snapping.changed(args[0])
+        self.offscreen.changed(args[0])
+
+    def itemconfigure(self, tagOrId, cnf=None, **kw):
+        result = super().itemconfigure(tagOrId, cnf, **kw)
+        if cnf or kw:
+            self.styles.configured(tagOrId, dict(cnf or {}, **kw))
+            self.viewport.configured(tagOrId)
+            self.bboxes.invalidate(tagOrId)
+            self.groups.invalidate(tagOrId)
+            self.snapping.changed(tagOrId)
+            self.offscreen.changed(tagOrId)
+        return result
+
+    itemconfig = itemconfigure
+
+    def tag_raise(self, *args):
+        super().tag_raise(*args)
+        self.offscreen.restacked(args[0])
+
+    def tag_lower(self, *args):
+        super().tag_lower(*args)
+        self.offscreen.restacked(args[0])
+
+    def set_coords_batch(self, coords):
+        """
+        Set the coordinates of many items with a single Tcl script instead of one call per item.
 
-        # Update the starting point for the next line segment
-        self._start_x = event.x
-        self._start_y = event.y
+        Parameters:
+            coords (dict): Item id -> its new flat list of coordinates.
+        """
+        if not coords:
+            return
+        self.tk.eval("\n".join(f"{self._w} coords {item} {' '.join(map(repr, values))}"
+                                for item, values in coords.items()))
+        self.viewport.changed(coords)
+        for item in coords:
+            self.bboxes.invalidate(item)
+        self.groups.invalidate_all()
+        self.snapping.created(coords)
+        self.offscreen.changed_items(coords)
+
+    def create_items_batch(self, items, screen=False):
+        """
+        Create many canvas items at once, in chunks of CREATE_CHUNK items.
 
-    def _erase(self, event):
-        """Erase using an eraser tool."""
-        color = "white"
-        line_width_str = self.toolbar.get_line_width().replace("px", "")
-        line_width = int(line_width_str) if line_width_str else 1  # Use default eraser thickness if line width is empty
+        Every item is a direct call of the Tcl command of the canvas, with the options passed as they are: the options
+        aren't converted by tkinter one item at a time, and the caches kept in sync by _create are updated once per
+        chunk. Items without a layer tag are added to the active layer and put at its top, like _create does; the
+        others are created on top of the canvas, and putting them in place is left to the caller.
 
-        x1, y1 = (event.x - 1), (event.y - 1)
-        x2, y2 = (event.x + 1), (event.y + 1)
+        The chunks are created in time slices of SLICE_MS: after each slice Tk redraws the window, so loading a large
+        drawing shows its progress. Only the idle tasks run in between, not the events, so nothing else changes the
+        drawing until all the items are created.
 
-        self.create_rectangle(x1, y1, x2, y2, fill=color, outline=color, width=line_width)
+        Parameters:
+            items (list): (type, flat list of coordinates, options dictionary) of every item, in drawing order.
+            screen (bool): Whether the coordinates are canvas coordinates, like those of the events, instead of
+                           document coordinates.
 
-    def _clear_canvas(self):
-        """Clear the content of the canvas."""
+        Returns:
+            list: The ids of the created items.
+        """
+        call, getint, widget = self.tk.call, self.tk.getint, self._w
+        to_screen, tags_for, styled = self.viewport.to_screen, self.layers.tags_for, self.styles.tags_for
+        item_tags = {}  # Tags of the items -> the tags they're created with, usually shared by many items
+        ids = []
+        slice_start = time.perf_counter()
+        for start in range(0, len(items), CREATE_CHUNK):
+            chunk = []
+            layered = []  # Items of the chunk added to the active layer
+            for item_type, coords, options in items[start:start + CREATE_CHUNK]:
+                args = [widget, "create", item_type, *(coords if screen else to_screen(coords))]
+                for name, value in options.items():
+                    if name != "tags" and value is not None:
+                        args += ("-" + name, value)
+                tags = options.get("tags")
+                key = tuple(tags) if isinstance(tags, list) else tags
+                if key not in item_tags:
+                    layer_tags = tags_for(tags)
+                    item_tags[key] = (layer_tags or tags or (), layer_tags is not None)
+                tags, in_active_layer = item_tags[key]
+                args += ("-tags", styled(item_type, options, tags))
+                chunk.append(getint(call(*args)))
+                if in_active_layer:
+                    layered.append(chunk[-1])
+            self.bboxes.created(chunk)
+            self.snapping.created(chunk)
+            if layered:
+                self.layers.created(layered)
+            self.offscreen.created(chunk)
+            ids += chunk
+            if len(ids) < len(items) and time.perf_counter() - slice_start >= SLICE_MS / 1000:
+                self.update_idletasks()
+                slice_start = time.perf_counter()
+        return ids
+
+    def delete(self, *args):
+        # Before deleting, the groups of an item are found from its tags (but not one by one for many items)
+        if len(args) == 1:
+            self.groups.invalidate(args[0])
+        elif args:
+            self.groups.invalidate_all()
+        self.snapping.deleting(args)
+        self.viewport.deleting(args)
+        self.offscreen.deleting(args)
+        super().delete(*args)
+        for tag_or_id in args:
+            self.bboxes.invalidate(tag_or_id)
+
+    def clear_canvas(self):
+        """Clear the content of the canvas (the whole clear is undone in one step)."""
+        self.history.record_delete(list(self.find_all()) + list(self.viewport.culled))
+        self.viewport.clear()
         self.delete("all")
+        self.layers.clear()
+        self.text_box_builder.forget(self.registry.release_all())
+
+    def remove_items(self, ids):
+        """Remove items from the canvas, and release the widgets and images they displayed."""
+        ids = self.viewport.discard(ids)  # The culled objects aren't on the canvas
+        if ids:
+            self.delete(*ids)
+            self.text_box_builder.forget(self.registry.release(ids))
+
+    @property
+    def images(self):
+        """Get the attributes of the pictures on the canvas."""
+        return self.registry.records("image")
+
+    def upload_single_picture(self, file_path, x=0, y=0, image=None, tags=None):
+        """
+        Upload a single picture onto the canvas (image is the picture already decoded by decode_pictures, and tags
+        those of its group and layer, if any).
+        """
+        from PIL import Image, ImageTk  # Imported on first use to keep the startup fast
 
-    def upload_single_picture(self, file_path, x=0, y=0):
-        """Upload a single picture onto the canvas."""
         try:
+            if isinstance(image, Exception):
+                raise image  # The picture couldn't be decoded in the background
+
             # Open the selected image file using PIL
-            image = Image.open(file_path)
+            if image is None:
+                image = Image.open(file_path)
 
             # Convert the Image object to a PhotoImage object usable in Tkinter
             photo_image = ImageTk.PhotoImage(image)
 
-            image_id = self.create_image(x, y, anchor=tk.NW, image=photo_image)
+            image_id = self.create_image(x, y, anchor=tk.NW, image=photo_image, tags=tags)
 
-            # Append the image with its path to the list
-            self.images.append({"id": image_id, "image": photo_image, "path": file_path})
+            # Register the image with its path, so it's kept alive as long as the item exists
+            self.registry.register(image_id, "image", {"id": image_id, "image": photo_image, "path": file_path})
+            return image_id
 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to open the image file: {e}")
@@ -187,8 +418,12 @@ class DrawingCanvas(tk.Canvas):
         file_paths = filedialog.askopenfilenames(filetypes=[("Image files", "*.jpg;*.jpeg;*.png;*.gif")])
 
         if file_paths:
-            for file_path in file_paths:
-                self.upload_single_picture(file_path)
+            def upload(pictures):
+                self.history.record_create([self.upload_single_picture(file_path, image=pictures[file_path])
+                                            for file_path in file_paths])
+
+            self.tasks.submit("Uploading pictures", decode_pictures, file_paths, on_done=upload,
+                              on_error=lambda e: messagebox.showerror("Error", f"Failed to open the image file: {e}"))
 
     def get_drawing_data(self):
         """
@@ -202,148 +437,237 @@ class DrawingCanvas(tk.Canvas):
             "images": []
         }
 
-        # Iterate through all items on the canvas and extract relevant data
+        # Iterate through all items on the canvas and extract relevant data, leaving the helper items out
+        ignored = {item for tag in IGNORED_TAGS for item in self.find_withtag(tag)}
+        layer_indexes = self.layers.item_indexes()  # Objects of the bottom layer have no index
+        saved_objects, saved_images = [], []  # Ids of the saved items
+        objects = []
         for item in self.find_all():
-            item_type = self.type(item)
-            if item_type == "window":  # Handle window (text box) items
-                for text_box_attrs in self.text_box_builder.get_text_boxes:
-                    text_window = text_box_attrs["text_window"]
-                    if text_window == item:  # Check if the current text box item matches the item on the canvas
-                        text_obj = text_box_attrs["text_obj"]
-                        frame = text_box_attrs["frame"]
-                        coord_x = text_box_attrs["coord_x"]
-                        coord_y = text_box_attrs["coord_y"]
-                        text_width = text_box_attrs["text_width"]
-                        text_height = text_box_attrs["text_height"]
-                        text_content = text_obj.get("1.0", "end-1c").strip()
-
-                        font_info = text_obj.cget("font")
-                        font = font_info.split()
-
-                        font_style = font[-1]
-                        font_size = font[-2]
-                        font_type = font[0].replace('{', '').replace("}", "")
-
-                        text_color = text_obj.cget("foreground")
-                        text_bg_color = text_obj.cget("background")  # Text background color
-                        frame_color = frame.cget("bg")  # Frame color
-
-                        drawing_data["objects"].append({
-                            "type": "text_box",
-                            "text_content": text_content,
-                            "font_size": font_size,
-                            "font_type": font_type,
-                            "font_style": font_style,
-                            "text_color": text_color,
-                            "text_bg_color": text_bg_color,
-                            "frame_color": frame_color,
-                            "coord_x": coord_x,
-                            "coord_y": coord_y,
-                            "text_width": text_width,
-                            "text_height": text_height,
-                        })
-
-            elif item_type == "image":  # Handle image items
-                for image_attrs in self.images:
-                    image_id = image_attrs["id"]
-                    if image_id == item:
-                        image_path = image_attrs["path"]
-                        image_data = {"path": image_path, "coords": self.coords(item)}
-                        drawing_data["images"].append(image_data)
-
-            elif item_type in ["line", "rectangle", "oval", "polygon"]:
-                item_data = {
-                    "type": item_type,
-                    "coords": self.coords(item),
-                    "width": self.itemcget(item, "width"),
-
-                }
-                if item_type == "line":
-                    item_data["color"] = self.itemcget(item, "fill")
-                elif item_type in ["rectangle", "oval", "polygon"]:
-                    item_data["color"] = self.itemcget(item, "fill")
-                    item_data["outline"] = self.itemcget(item, "outline")
-                drawing_data["objects"].append(item_data)
+            if item in ignored:
+                continue
+            item_data = self.serialize_item(item)
+            if item_data is None:
+                continue
+            if item in layer_indexes:
+                item_data["layer"] = layer_indexes[item]
+            if item_data["type"] == "image":
+                image_data = {"path": item_data["path"], "coords": item_data["coords"]}
+                if item in layer_indexes:
+                    image_data["layer"] = layer_indexes[item]
+                drawing_data["images"].append(image_data)
+                saved_images.append(item)
+            else:
+                objects.append((item, item_data))
+
+        # The objects culled by the viewport are merged in at their place in the drawing order
+        culled = self.viewport.culled_data()
+        if culled:
+            keys = self.viewport.keys()
+            indexes = self.layers.tag_indexes()
+            for _, item_data, tags in culled:
+                for tag in tags:
+                    if tag in indexes:
+                        item_data["layer"] = indexes[tag]  # A copy, made to leave the tags out
+                        break
+            objects = [(item, item_data) for _, item, item_data in heapq.merge(
+                ((keys[item], item, item_data) for item, item_data in objects),
+                ((key, None, item_data) for key, item_data, _ in culled), key=itemgetter(0))]
+        for item, item_data in objects:
+            drawing_data["objects"].append(item_data)
+            saved_objects.append(item)
+
+        layers = self.layers.get_data()
+        if layers is not None:
+            drawing_data["layers"] = layers
+
+        # The groups refer to the objects by position, the images counting after the other objects
+        if self.groups:
+            positions = {item: position for position, item in enumerate(saved_objects + saved_images)}
+            groups = self.groups.get_data(positions)
+            if groups:
+                drawing_data["groups"] = groups
 
         return drawing_data
 
-    def load_drawing_data(self, drawing_data):
+    def serialize_item(self, item):
         """
-        Load drawing data onto the canvas.
+        Get the data of a single canvas item.
 
         Parameters:
-            drawing_data (dict): Dictionary containing the drawing data.
+            item (int): The ID of the item on the canvas.
+
+        Returns:
+            dict: Dictionary containing the item data, or None if the item can't be saved.
         """
-        self.delete("all")  # Clear the canvas before loading new data
-
-        # Iterate through the objects in the drawing data and draw them on the canvas
-        for obj in drawing_data.get("objects", []):
-            obj_type = obj.get("type")
-            coords = obj.get("coords")
-            color = obj.get("color")
-            outline = obj.get("outline")
-            width = obj.get("width")
-
-            if obj_type == "text_box":  # Handling for text boxes
-                text_content = obj.get("text_content")
-                font_size = obj.get("font_size")
-                font_type = obj.get("font_type")
-                text_color = obj.get("text_color")
-                text_bg_color = obj.get("text_bg_color")
-                frame_color = obj.get("frame_color")
-                coord_x = obj.get("coord_x")
-                coord_y = obj.get("coord_y")
-                text_width = obj.get("text_width")
-                text_height = obj.get("text_height")
-                font_style = obj.get("font_style")
-
-                # Create text box on the canvas
-                text_window = self.create_window(coord_x, coord_y, width=text_width, height=text_height)
-                text_frame = tk.Frame(self, bd=2)
-                self.itemconfigure(text_window, window=text_frame)
-                text_widget = tk.Text(text_frame, wrap=tk.WORD)
-                text_widget.pack(expand=True, fill='both')
-                text_widget.insert("1.0", text_content)  # Set the text content
-
-                text_attributes = {
-                    "text_window": text_window,
-                    "text_obj": text_widget,
-                    "frame": text_frame,
+        item_type = self.type(item)
+        if item_type == "window":  # Handle window (text box) items
+            text_box_attrs = self.registry.get(item, "text_box")
+            if text_box_attrs is not None:
+                text_obj = text_box_attrs["text_obj"]
+                frame = text_box_attrs["frame"]
+                text_content = text_obj.get("1.0", "end-1c").strip()
+
+                font_info = text_obj.cget("font")
+                font = self.tk.splitlist(font_info)  # Font family, size and style as a Tcl list
+
+                font_style = font[-1]
+                font_size = font[-2]
+                font_type = font[0]
+
+                coord_x, coord_y = self.viewport.to_document(self.coords(item))
+
+                return {
+                    "type": "text_box",
+                    "text_content": text_content,
+                    "font_size": font_size,
+                    "font_type": font_type,
+                    "font_style": font_style,
+                    "text_color": text_obj.cget("foreground"),
+                    "text_bg_color": text_obj.cget("background"),  # Text background color
+                    "frame_color": frame.cget("bg"),  # Frame color
                     "coord_x": coord_x,
                     "coord_y": coord_y,
-                    "text_width": text_width,
-                    "text_height": text_height
+                    "text_width": text_box_attrs["text_width"],
+                    "text_height": text_box_attrs["text_height"],
                 }
 
-                self.text_box_builder.get_text_boxes.append(text_attributes)
-                try:
-                    font_size = int(font_size)  # Convert font size to integer
-                except ValueError:
-                    font_size = 10  # Default font size if conversion fails
-
-                text_widget.config(foreground=text_color)
-                text_widget.config(background=text_bg_color)  # Set text background color
-                text_widget.config(font=(font_type, font_size, font_style))
-                text_frame.config(bg=frame_color)  # Set frame color
-
-            elif obj_type in ["line", "rectangle", "oval", "polygon"]:
-                # Handling for shapes
-                if coords is None:
-                    continue  # Skip this object if coordinates are missing
-
-                if obj_type == "line":
-                    self.create_line(*coords, fill=color, width=width)
-                elif obj_type == "rectangle":
-                    self.create_rectangle(*coords, fill=color, outline=outline, width=width)
-                elif obj_type == "oval":
-                    self.create_oval(*coords, fill=color, outline=outline, width=width)
-                elif obj_type == "polygon":
-                    self.create_polygon(*coords, fill=color, outline=outline, width=width)
-
-        # Load image data onto the canvas
-        for img_data in drawing_data.get("images", []):
-            image_path = img_data.get("path")
-            coords = img_data.get("coords")
+        elif item_type == "image":  # Handle image items
+            image_attrs = self.registry.get(item, "image")
+            if image_attrs is not None:
+                return {"type": "image", "path": image_attrs["path"],
+                        "coords": self.viewport.to_document(self.coords(item))}
+
+        elif item_type in ["line", "rectangle", "oval", "polygon"]:
+            item_data = {
+                "type": item_type,
+                "coords": self.viewport.to_document(self.coords(item)),
+                "width": self.itemcget(item, "width"),
+            }
+            if item_type == "line":
+                item_data["color"] = self.itemcget(item, "fill")
+            elif item_type in ["rectangle", "oval", "polygon"]:
+                item_data["color"] = self.itemcget(item, "fill")
+                item_data["outline"] = self.itemcget(item, "outline")
+            return item_data
+
+        return None
+
+    def load_drawing_data(self, drawing_data, pictures=None):
+        """
+        Load drawing data onto the canvas.
+
+        Parameters:
+            drawing_data (dict): Dictionary containing the drawing data, inline or compact (see style_table).
+            pictures (dict): The pictures of the drawing already decoded by decode_pictures, if any.
+        """
+        drawing_data = expand_drawing(drawing_data)  # The colors of a compact file, as saved, are shared by index
+        with self.history.group():
+            self.clear_canvas()  # Clear the canvas before loading new data
+
+            # Draw the objects in the drawing data on the canvas (in a large drawing, the viewport culls those far
+            # from the view) layer by layer, then the images on top of them, in their layer
+            groups = drawing_data.get("groups", [])
+            objects, positions = self.layers.load_data(drawing_data.get("layers"), drawing_data.get("objects", []))
+            pinned = grouped_positions(groups)
+            if pinned:
+                pinned = {index for index, position in enumerate(positions) if position in pinned}
+            loaded = self.viewport.load(objects, pinned=pinned)
+            created = [None] * len(loaded)
+            for position, item in zip(positions, loaded):
+                created[position] = item  # Back at the position of the object in the file
+            images = [self.create_object(dict(img_data, type="image", tags=self.layers.tags_of(img_data)), pictures)
+                      for img_data in drawing_data.get("images", [])]
+            self.layers.place([item for item in images if item])
+            created.extend(images)
+
+            self.groups.load_data(groups, created)
+            self.layers.refresh()
+            self.history.record_create(created)
+
+    def create_object(self, obj, pictures=None):
+        """
+        Create a single object on the canvas from its data.
+
+        Parameters:
+            obj (dict): Dictionary containing the object data, as returned by serialize_item (in document
+                        coordinates).
+            pictures (dict): Pictures already decoded by decode_pictures, by path.
 
+        Returns:
+            int: The ID of the created item, or None if the object was skipped.
+        """
+        obj_type = obj.get("type")
+        coords = obj.get("coords")
+        if coords is not None and not self.viewport.identity:
+            coords = self.viewport.to_screen(coords)
+        color = obj.get("color")
+        outline = obj.get("outline")
+        width = obj.get("width")
+
+        if obj_type == "text_box":  # Handling for text boxes
+            text_content = obj.get("text_content")
+            font_size = obj.get("font_size")
+            font_type = obj.get("font_type")
+            text_color = obj.get("text_color")
+            text_bg_color = obj.get("text_bg_color")
+            frame_color = obj.get("frame_color")
+            coord_x = obj.get("coord_x")
+            coord_y = obj.get("coord_y")
+            text_width = obj.get("text_width")
+            text_height = obj.get("text_height")
+            font_style = obj.get("font_style")
+
+            # Create text box on the canvas
+            text_window = self.create_window(*self.viewport.to_screen([coord_x, coord_y]), width=text_width,
+                                             height=text_height, tags=obj.get("tags"))
+            text_frame = tk.Frame(self, bd=2)
+            self.itemconfigure(text_window, window=text_frame)
+            text_widget = tk.Text(text_frame, wrap=tk.WORD)
+            text_widget.pack(expand=True, fill='both')
+            text_widget.insert("1.0", text_content)  # Set the text content
+
+            text_attributes = {
+                "text_window": text_window,
+                "text_obj": text_widget,
+                "frame": text_frame,
+                "coord_x": coord_x,
+                "coord_y": coord_y,
+                "text_width": text_width,
+                "text_height": text_height
+            }
+
+            self.registry.register(text_window, "text_box", text_attributes)
+            try:
+                font_size = int(font_size)  # Convert font size to integer
+            except ValueError:
+                font_size = 10  # Default font size if conversion fails
+
+            text_widget.config(foreground=text_color)
+            text_widget.config(background=text_bg_color)  # Set text background color
+            text_widget.config(font=(font_type, font_size, font_style))
+            text_frame.config(bg=frame_color)  # Set frame color
+            return text_window
+
+        elif obj_type == "image":  # Handling for images
+            image_path = obj.get("path")
             if image_path and coords:
-                self.upload_single_picture(image_path, coords[0], coords[1])
+                return self.upload_single_picture(image_path, coords[0], coords[1],
+                                                  image=(pictures or {}).get(image_path), tags=obj.get("tags"))
+
+        elif coords is None:
+            return None  # Skip this object if coordinates are missing
+
+        elif "options" in obj:  # Items captured with all their options (undo history)
+            return getattr(self, "create_" + obj_type)(*coords, **obj["options"])
+
+        elif obj_type == "line":
+            return self.create_line(*coords, fill=color, width=width, tags=obj.get("tags"))
+        elif obj_type == "rectangle":
+            return self.create_rectangle(*coords, fill=color, outline=outline, width=width, tags=obj.get("tags"))
+        elif obj_type == "oval":
+            return self.create_oval(*coords, fill=color, outline=outline, width=width, tags=obj.get("tags"))
+        elif obj_type == "polygon":
+            return self.create_polygon(*coords, fill=color, outline=outline, width=width, tags=obj.get("tags"))
+
+        return None
+
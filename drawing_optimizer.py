@@ -0,0 +1,353 @@
+"""
+Optimizes drawing data (as saved by DrawingCanvas.get_drawing_data) without Tk: removes the objects that can't be
+seen and merges the segments of the pen strokes, leaving the rendered drawing pixel-identical.
+
+Optimize a saved drawing from the command line with:
+
+    python main.py optimize drawing.json --output optimized.json
+
+The objects removed are the transparent ones (no color at all, or fewer than two points), the ones painted again by
+a later object with the same shape (the duplicates left by repeated gradient fills), the ones hidden under a later
+opaque rectangle of their layer, and the ones painted with the background color over nothing (eraser strokes
+covering nothing). Grouped objects, text boxes and pictures are always kept as they are.
+"""
+import argparse
+import json
+import sys
+
+from drawing_renderer import DEFAULT_BACKGROUND, _box, _rgb, _text_box_rect, _width, drawing_size, render_image
+from group_tree import grouped_positions
+from style_table import compact_drawing, expand_drawing
+
+CELL_SIZE = 64  # Side of the cells of the spatial hash of the painted boxes
+MAX_ENTRY_CELLS = 256  # Boxes spreading over more cells are kept in a list checked by every query
+REMOVED_KINDS = ("transparent", "duplicate", "covered", "occluded", "background")  # Reasons of the removals
+
+
+class _BoxIndex:
+    """Spatial hash of the boxes of some objects (by their position in the drawing), with their layer."""
+
+    def __init__(self):
+        self._cells = {}
+        self._large = []
+        self._entries = {}  # Position -> (box, layer)
+
+    def add(self, position, box, layer):
+        self._entries[position] = (box, layer)
+        columns, rows = _cell_ranges(box)
+        if len(columns) * len(rows) > MAX_ENTRY_CELLS:
+            self._large.append(position)
+            return
+        cells = self._cells
+        for column in columns:
+            for row in rows:
+                cells.setdefault((column, row), []).append(position)
+
+    def overlapping(self, box):
+        """Get the (box, layer) of the indexed objects whose box overlaps a box."""
+        x1, y1, x2, y2 = box
+        columns, rows = _cell_ranges(box)
+        cells = self._cells
+        candidates = set(self._large)
+        for column in columns:
+            for row in rows:
+                candidates.update(cells.get((column, row), ()))
+        entries = self._entries
+        found = []
+        for position in candidates:
+            entry = entries[position]
+            bx1, by1, bx2, by2 = entry[0]
+            if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                found.append(entry)
+        return found
+
+
+def _cell_ranges(box):
+    x1, y1, x2, y2 = box
+    return (range(int(x1 // CELL_SIZE), int(x2 // CELL_SIZE) + 1),
+            range(int(y1 // CELL_SIZE), int(y2 // CELL_SIZE) + 1))
+
+
+def _colors(obj):
+    """Get the colors an object paints with (its line color, or the fill and outline colors of a shape)."""
+    if obj.get("type") == "line":
+        return [obj.get("color")] if obj.get("color") else []
+    return [color for color in (obj.get("color"), obj.get("outline")) if color]
+
+
+def _paint_box(obj):
+    """Get a box containing every pixel an object may paint (a pixel wider than needed), or None if it paints none."""
+    if obj.get("type") == "text_box":
+        x1, y1, x2, y2 = _text_box_rect(obj)
+        return x1 - 1, y1 - 1, x2 + 1, y2 + 1
+    coords = obj.get("coords")
+    if not coords or len(coords) < 4 or not _colors(obj):
+        return None
+    # Lines spread half their width around their points, and the outlines of the shapes up to their whole width
+    margin = _width(obj) / 2 + 1 if obj.get("type") == "line" else _width(obj) + 1
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs) - margin, min(ys) - margin, max(xs) + margin, max(ys) + margin
+
+
+def _opaque_box(obj):
+    """Get a box every pixel of which an object paints (a pixel narrower than needed), or None if there is none."""
+    if obj.get("type") != "rectangle" or not obj.get("color") or len(obj.get("coords") or ()) != 4:
+        return None
+    x1, y1, x2, y2 = _box(obj["coords"])
+    if x2 - x1 <= 2 or y2 - y1 <= 2:
+        return None
+    return x1 + 1, y1 + 1, x2 - 1, y2 - 1
+
+
+def _shape_key(obj):
+    """Get the key of the pixels an object may paint: objects with the same key paint the same fill and outline."""
+    coords = obj.get("coords")
+    if obj.get("type") == "text_box" or not coords:
+        return None
+    return obj.get("type"), tuple(coords), _width(obj), obj.get("layer", 0)
+
+
+def _painted_parts(obj):
+    """Get which parts of the shape of an object are painted: its line, or the fill and the outline of a shape."""
+    if obj.get("type") == "line":
+        return bool(obj.get("color")), False
+    return bool(obj.get("color")), bool(obj.get("outline"))
+
+
+def _remove_transparent(objects, alive, removable):
+    count = 0
+    for position, obj in enumerate(objects):
+        if removable(position) and _paint_box(obj) is None:
+            alive[position] = False
+            count += 1
+    return count
+
+
+def _remove_covered(objects, alive, removable):
+    """
+    Remove the objects painted again by later objects of the same shape and layer (scanning from the top down).
+
+    Returns:
+        tuple: The numbers of exact duplicates and of the other objects removed.
+    """
+    parts = {}  # Shape key -> painted parts of the later objects with the shape
+    later = set()  # Exact copies of the later objects
+    duplicates = covered = 0
+    for position in range(len(objects) - 1, -1, -1):
+        if not alive[position]:
+            continue
+        obj = objects[position]
+        key = _shape_key(obj)
+        if key is None:
+            continue
+        copy = json.dumps(obj, sort_keys=True)
+        fill, outline = _painted_parts(obj)
+        painted = parts.get(key, (False, False))
+        if removable(position):
+            if copy in later:
+                alive[position] = False
+                duplicates += 1
+                continue
+            if (painted[0] or not fill) and (painted[1] or not outline):
+                alive[position] = False
+                covered += 1
+                continue
+        later.add(copy)
+        parts[key] = (painted[0] or fill, painted[1] or outline)
+    return duplicates, covered
+
+
+def _remove_occluded(objects, alive, removable):
+    """Remove the objects hidden under a later opaque object of their layer (scanning from the top down)."""
+    index = _BoxIndex()
+    count = 0
+    for position in range(len(objects) - 1, -1, -1):
+        if not alive[position]:
+            continue
+        obj = objects[position]
+        if removable(position):
+            box = _paint_box(obj)
+            layer = obj.get("layer", 0)
+            if box is not None and any(
+                    other_layer == layer and ox1 <= box[0] and oy1 <= box[1] and ox2 >= box[2] and oy2 >= box[3]
+                    for (ox1, oy1, ox2, oy2), other_layer in index.overlapping(box)):
+                alive[position] = False
+                count += 1
+                continue
+        opaque = _opaque_box(obj)
+        if opaque is not None:
+            index.add(position, opaque, obj.get("layer", 0))
+    return count
+
+
+def _remove_background(objects, alive, removable, background):
+    """Remove the objects painted with the background color over nothing (scanning from the bottom up)."""
+    background = _rgb(background) if background else None
+    if background is None:
+        return 0
+    index = _BoxIndex()
+    count = 0
+    for position, obj in enumerate(objects):
+        if not alive[position]:
+            continue
+        box = _paint_box(obj)
+        if box is None:
+            continue
+        if removable(position) and all(_rgb(color) == background for color in _colors(obj)) \
+                and not index.overlapping(box):
+            alive[position] = False
+            count += 1
+            continue
+        index.add(position, box, obj.get("layer", 0))
+    return count
+
+
+def _merge_segments(objects, alive, removable):
+    """
+    Merge the consecutive lines continuing each other with the same style into polylines (the pen strokes).
+
+    Returns:
+        tuple: The merged objects (a copy of the list) and the numbers of segments and zero-length segments merged.
+    """
+    objects = list(objects)
+    merged = zero_length = 0
+    stroke, stroke_coords, stroke_style = None, None, None  # Position, coordinates and style of the current stroke
+    for position, obj in enumerate(objects):
+        if not alive[position]:
+            continue
+        if obj.get("type") != "line" or not removable(position):
+            stroke = None
+            continue
+        coords = obj["coords"]
+        style = {key: value for key, value in obj.items() if key != "coords"}
+        if stroke is not None and style == stroke_style and stroke_coords[-2:] == coords[:2]:
+            stroke_coords.extend(coords[2:])
+            objects[stroke] = dict(objects[stroke], coords=stroke_coords)
+            alive[position] = False
+            merged += 1
+            if len(coords) == 4 and coords[:2] == coords[2:]:
+                zero_length += 1
+            continue
+        stroke, stroke_coords, stroke_style = position, list(coords), style
+    return objects, merged, zero_length
+
+
+def _remap_groups(groups_data, positions):
+    return [dict(data, members=[positions[member] for member in data.get("members", [])],
+                 groups=_remap_groups(data.get("groups", []), positions)) for data in groups_data]
+
+
+def drawing_bytes(drawing_data):
+    """Get the size in bytes of a drawing file (as written by the File menu, in the compact form)."""
+    return len(json.dumps(compact_drawing(drawing_data)).encode("utf-8"))
+
+
+def optimize(drawing_data, background=DEFAULT_BACKGROUND):
+    """
+    Optimize a drawing: remove the objects that can't be seen and merge the pen strokes.
+
+    Parameters:
+        drawing_data (dict): The drawing data.
+        background (str): Background color the drawing is rendered on (None for a transparent one, then nothing
+            is removed for being painted with the background color).
+
+    Returns:
+        tuple: The optimized drawing data and the report of the optimization (see format_report).
+    """
+    objects = drawing_data.get("objects", [])
+    images = drawing_data.get("images", [])
+    grouped = grouped_positions(drawing_data.get("groups", []))
+
+    def removable(position):
+        return position not in grouped and objects[position].get("type") != "text_box"
+
+    alive = [True] * len(objects)
+    removed = dict.fromkeys(REMOVED_KINDS, 0)
+    removed["transparent"] = _remove_transparent(objects, alive, removable)
+    removed["duplicate"], removed["covered"] = _remove_covered(objects, alive, removable)
+    removed["occluded"] = _remove_occluded(objects, alive, removable)
+    removed["background"] = _remove_background(objects, alive, removable, background)
+    merged_objects, merged, zero_length = _merge_segments(objects, alive, removable)
+
+    # The groups refer to the objects by position, the images counting after the other objects
+    kept = [position for position, keep in enumerate(alive) if keep]
+    optimized = dict(drawing_data, objects=[merged_objects[position] for position in kept])
+    if drawing_data.get("groups"):
+        positions = {position: new for new, position in enumerate(kept)}
+        positions.update((len(objects) + i, len(kept) + i) for i in range(len(images)))
+        optimized["groups"] = _remap_groups(drawing_data["groups"], positions)
+
+    report = {
+        "items_before": len(objects) + len(images),
+        "items_after": len(kept) + len(images),
+        "bytes_before": drawing_bytes(drawing_data),
+        "bytes_after": drawing_bytes(optimized),
+        "removed": removed,
+        "merged_segments": merged,
+        "zero_length_segments": zero_length,
+    }
+    return optimized, report
+
+
+def verify(drawing_data, optimized_data, background=DEFAULT_BACKGROUND):
+    """
+    Check that an optimized drawing renders pixel-identical to the original one, every layer shown.
+
+    Returns:
+        bool: Whether the renderings are identical.
+    """
+    from PIL import ImageChops
+
+    def all_layers_shown(data):
+        return {key: value for key, value in data.items() if key != "layers"}
+
+    width, height = drawing_size(all_layers_shown(drawing_data))
+    before = render_image(all_layers_shown(drawing_data), width, height, background)
+    after = render_image(all_layers_shown(optimized_data), width, height, background)
+    return ImageChops.difference(before, after).getbbox() is None
+
+
+def format_report(report):
+    """Get the report of an optimization as text."""
+    items_before, items_after = report["items_before"], report["items_after"]
+    bytes_before, bytes_after = report["bytes_before"], report["bytes_after"]
+    removed = report["removed"]
+    lines = [
+        "Items: %d -> %d (%.1f%% fewer)" % (items_before, items_after,
+                                           100 * (items_before - items_after) / max(items_before, 1)),
+        "File size: %d -> %d bytes (%.1f%% smaller)" % (bytes_before, bytes_after,
+                                                        100 * (bytes_before - bytes_after) / max(bytes_before, 1)),
+        "Removed: %d transparent, %d duplicate, %d painted over by the same shape, %d hidden under opaque fills, "
+        "%d painted with the background over nothing" % tuple(removed[kind] for kind in REMOVED_KINDS),
+        "Merged: %d pen segments into the strokes (%d of zero length)" % (report["merged_segments"],
+                                                                          report["zero_length_segments"]),
+    ]
+    return "\n".join(lines)
+
+
+def optimize_command(argv=None):
+    """Optimize a drawing file from the command line (python main.py optimize --help)."""
+    parser = argparse.ArgumentParser(prog="python main.py optimize",
+                                     description="Remove the objects of a drawing that can't be seen and merge its "
+                                                 "pen strokes, keeping the rendered drawing pixel-identical.")
+    parser.add_argument("drawing", help="drawing file (JSON, as saved by the application)")
+    parser.add_argument("-o", "--output",
+                        help="file to write the optimized drawing to (only the report is printed if not given)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="don't render the drawing before and after to check they are identical")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    with open(args.drawing, "r") as file:
+        drawing_data = expand_drawing(json.load(file))
+    optimized_data, report = optimize(drawing_data)
+    if not args.no_verify:
+        report["verified"] = verify(drawing_data, optimized_data)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    if not report.get("verified", True):
+        print("The optimized drawing doesn't render the same, it wasn't written", file=sys.stderr)
+        return 1
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(compact_drawing(optimized_data), file)
+    return 0
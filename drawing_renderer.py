@@ -0,0 +1,280 @@
+"""
+Renders drawing data (as saved by DrawingCanvas.get_drawing_data, or compact as written to drawing files) without Tk:
+to PNG with PIL, or to SVG.
+
+Nothing here touches Tk, so the functions can run in worker processes, servers and command line tools.
+"""
+import base64
+import io
+from xml.sax.saxutils import escape, quoteattr
+
+from style_table import expand_drawing
+
+DEFAULT_BACKGROUND = "white"
+MARGIN = 10  # Margin around the drawing extent when no size is given
+TEXT_BOX_BORDER = 2  # Border width of the text box frames, as created by TextBoxBuilder
+DEFAULT_FONT_SIZE = 10
+IMAGE_TYPES = {"png": "image/png", "gif": "image/gif", "jpg": "image/jpeg", "jpeg": "image/jpeg"}  # Picture types
+
+
+def _width(obj):
+    try:
+        return max(float(obj.get("width") or 1), 1.0)
+    except ValueError:
+        return 1.0
+
+
+def _points(coords):
+    return [(coords[i], coords[i + 1]) for i in range(0, len(coords) - 1, 2)]
+
+
+def _box(coords):
+    """Get the normalized (x1, y1, x2, y2) box of two corner points."""
+    x1, y1, x2, y2 = coords[:4]
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+def _text_box_rect(obj):
+    half_width, half_height = obj["text_width"] / 2, obj["text_height"] / 2
+    return _box([obj["coord_x"] - half_width, obj["coord_y"] - half_height,
+                 obj["coord_x"] + half_width, obj["coord_y"] + half_height])
+
+
+def drawing_extent(drawing_data):
+    """
+    Get the extent of a drawing.
+
+    Returns:
+        tuple: (x1, y1, x2, y2) of the box containing every object, or None if the drawing is empty.
+    """
+    xs, ys = [], []
+    for obj in drawing_data.get("objects", []):
+        if obj.get("type") == "text_box":
+            x1, y1, x2, y2 = _text_box_rect(obj)
+            xs += [x1, x2]
+            ys += [y1, y2]
+        elif obj.get("coords"):
+            coords = obj["coords"]
+            xs += coords[0::2]
+            ys += coords[1::2]
+    for image_data in drawing_data.get("images", []):
+        if image_data.get("coords"):
+            xs.append(image_data["coords"][0])
+            ys.append(image_data["coords"][1])
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def drawing_size(drawing_data, width=None, height=None):
+    """Get the rendered size: the given one, or the drawing extent from the origin plus a margin."""
+    extent = drawing_extent(drawing_data) or (0, 0, 0, 0)
+    return (int(width or max(extent[2], 0) + MARGIN), int(height or max(extent[3], 0) + MARGIN))
+
+
+def visible_data(drawing_data):
+    """
+    Get the drawing data without the objects and pictures of its hidden layers (the drawing itself if none is), with
+    the colors of a compact file expanded.
+    """
+    drawing_data = expand_drawing(drawing_data)
+    hidden = {index for index, layer in enumerate(drawing_data.get("layers") or ()) if not layer.get("visible", True)}
+    if not hidden:
+        return drawing_data
+    return dict(drawing_data,
+                objects=[obj for obj in drawing_data.get("objects", []) if obj.get("layer", 0) not in hidden],
+                images=[image_data for image_data in drawing_data.get("images", [])
+                        if image_data.get("layer", 0) not in hidden])
+
+
+def _rgb(color):
+    """Convert a Tk color to RGB, or None for an empty (transparent) or unknown color."""
+    from PIL import ImageColor
+
+    if not color:
+        return None
+    try:
+        return ImageColor.getrgb(color)
+    except ValueError:
+        return None
+
+
+def _font(obj):
+    from PIL import ImageFont
+
+    try:
+        size = int(obj.get("font_size") or DEFAULT_FONT_SIZE)
+    except ValueError:
+        size = DEFAULT_FONT_SIZE
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow before 10.1 has a single default font size
+        return ImageFont.load_default()
+
+
+def draw_object(draw, obj):
+    """Draw an object of a drawing (a text box, a line or a shape, not a picture) with a PIL ImageDraw."""
+    obj_type = obj.get("type")
+    if obj_type == "text_box":
+        x1, y1, x2, y2 = _text_box_rect(obj)
+        draw.rectangle((x1, y1, x2, y2), fill=_rgb(obj.get("frame_color")))
+        if x2 - x1 > 2 * TEXT_BOX_BORDER and y2 - y1 > 2 * TEXT_BOX_BORDER:
+            draw.rectangle((x1 + TEXT_BOX_BORDER, y1 + TEXT_BOX_BORDER, x2 - TEXT_BOX_BORDER,
+                            y2 - TEXT_BOX_BORDER), fill=_rgb(obj.get("text_bg_color")))
+        draw.multiline_text((x1 + TEXT_BOX_BORDER + 1, y1 + TEXT_BOX_BORDER + 1), obj.get("text_content", ""),
+                            fill=_rgb(obj.get("text_color")) or (0, 0, 0), font=_font(obj))
+        return
+
+    coords = obj.get("coords")
+    if not coords or len(coords) < 4:
+        return
+    width = int(round(_width(obj)))
+    fill, outline = _rgb(obj.get("color")), _rgb(obj.get("outline"))
+    if obj_type == "line":
+        if fill is not None:
+            draw.line(_points(coords), fill=fill, width=width)
+    elif obj_type == "rectangle":
+        draw.rectangle(_box(coords), fill=fill, outline=outline, width=width)
+    elif obj_type == "oval":
+        draw.ellipse(_box(coords), fill=fill, outline=outline, width=width)
+    elif obj_type == "polygon":
+        draw.polygon(_points(coords), fill=fill, outline=outline, width=width)
+
+
+def render_image(drawing_data, width=None, height=None, background=DEFAULT_BACKGROUND):
+    """
+    Render a drawing to a PIL image.
+
+    Parameters:
+        drawing_data (dict): The drawing data.
+        width (int): Width of the image, the drawing extent by default.
+        height (int): Height of the image, the drawing extent by default.
+        background (str): Background color, or None for a transparent background.
+
+    Returns:
+        PIL.Image.Image: The rendered RGB image (RGBA with a transparent background).
+    """
+    from PIL import Image, ImageDraw
+
+    drawing_data = visible_data(drawing_data)
+    size = drawing_size(drawing_data, width, height)
+    image = Image.new("RGBA", size, (0, 0, 0, 0)) if background is None else Image.new("RGB", size, background)
+    draw = ImageDraw.Draw(image)
+    for obj in drawing_data.get("objects", []):
+        draw_object(draw, obj)
+
+    # The pictures are drawn on top of the objects, as when the drawing is loaded
+    for image_data in drawing_data.get("images", []):
+        try:
+            with Image.open(image_data["path"]) as picture:
+                picture = picture.convert("RGBA")
+                x, y = (int(round(value)) for value in image_data["coords"][:2])
+                image.paste(picture, (x, y), picture)
+        except (OSError, KeyError, ValueError):
+            continue  # Missing pictures are left out, like the canvas does when it can't open them
+    return image
+
+
+def render_png(drawing_data, width=None, height=None, background=DEFAULT_BACKGROUND):
+    """Render a drawing to PNG bytes (see render_image)."""
+    output = io.BytesIO()
+    render_image(drawing_data, width, height, background).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _svg_color(color):
+    return quoteattr(color) if color else '"none"'
+
+
+def _svg_object(obj):
+    obj_type = obj.get("type")
+    if obj_type == "text_box":
+        x1, y1, x2, y2 = _text_box_rect(obj)
+        style = str(obj.get("font_style") or "")
+        font_size = obj.get("font_size") or DEFAULT_FONT_SIZE
+        lines = obj.get("text_content", "").split("\n")
+        spans = "".join('<tspan x="%g" dy="%s">%s</tspan>' % (x1 + TEXT_BOX_BORDER + 1, "0" if i == 0 else "1.2em",
+                                                               escape(line)) for i, line in enumerate(lines))
+        return ('<rect x="%g" y="%g" width="%g" height="%g" fill=%s/>'
+                '<rect x="%g" y="%g" width="%g" height="%g" fill=%s/>'
+                '<text x="%g" y="%g" dominant-baseline="hanging" font-family=%s font-size="%s" fill=%s%s%s%s>'
+                '%s</text>'
+                % (x1, y1, x2 - x1, y2 - y1, _svg_color(obj.get("frame_color")),
+                   x1 + TEXT_BOX_BORDER, y1 + TEXT_BOX_BORDER, max(x2 - x1 - 2 * TEXT_BOX_BORDER, 0),
+                   max(y2 - y1 - 2 * TEXT_BOX_BORDER, 0), _svg_color(obj.get("text_bg_color")),
+                   x1 + TEXT_BOX_BORDER + 1, y1 + TEXT_BOX_BORDER + 1, quoteattr(str(obj.get("font_type", ""))),
+                   font_size, _svg_color(obj.get("text_color") or "black"),
+                   ' font-weight="bold"' if "bold" in style else "",
+                   ' font-style="italic"' if "italic" in style else "",
+                   ' text-decoration="underline"' if "underline" in style else "", spans))
+
+    coords = obj.get("coords")
+    if not coords or len(coords) < 4:
+        return ""
+    width = _width(obj)
+    fill, outline = obj.get("color"), obj.get("outline")
+    if obj_type == "line":
+        points = " ".join("%g,%g" % point for point in _points(coords))
+        return '<polyline points="%s" fill="none" stroke=%s stroke-width="%g" stroke-linecap="round"/>' % (
+            points, _svg_color(fill), width)
+    if obj_type == "rectangle":
+        x1, y1, x2, y2 = _box(coords)
+        return '<rect x="%g" y="%g" width="%g" height="%g" fill=%s stroke=%s stroke-width="%g"/>' % (
+            x1, y1, x2 - x1, y2 - y1, _svg_color(fill), _svg_color(outline), width)
+    if obj_type == "oval":
+        x1, y1, x2, y2 = _box(coords)
+        return '<ellipse cx="%g" cy="%g" rx="%g" ry="%g" fill=%s stroke=%s stroke-width="%g"/>' % (
+            (x1 + x2) / 2, (y1 + y2) / 2, (x2 - x1) / 2, (y2 - y1) / 2, _svg_color(fill), _svg_color(outline), width)
+    if obj_type == "polygon":
+        points = " ".join("%g,%g" % point for point in _points(coords))
+        return '<polygon points="%s" fill=%s stroke=%s stroke-width="%g"/>' % (
+            points, _svg_color(fill), _svg_color(outline), width)
+    return ""
+
+
+def _svg_image(image_data):
+    try:
+        mime = IMAGE_TYPES.get(image_data["path"].rsplit(".", 1)[-1].lower())
+        if mime is None:
+            return ""  # Not a picture the application uploads
+        with open(image_data["path"], "rb") as file:
+            encoded = base64.b64encode(file.read()).decode("ascii")
+        x, y = image_data["coords"][:2]
+    except (OSError, KeyError, ValueError, AttributeError):
+        return ""
+    return '<image x="%g" y="%g" href="data:%s;base64,%s"/>' % (x, y, mime, encoded)
+
+
+def render_svg(drawing_data, width=None, height=None, background=DEFAULT_BACKGROUND):
+    """
+    Render a drawing to an SVG document (see render_image for the parameters).
+
+    Returns:
+        str: The SVG document.
+    """
+    drawing_data = visible_data(drawing_data)
+    width, height = drawing_size(drawing_data, width, height)
+    parts = ['<svg xmlns="http://www.w3.org/2000/svg" width="%d" height="%d" viewBox="0 0 %d %d">'
+             % (width, height, width, height),
+             '<rect width="100%%" height="100%%" fill=%s/>' % _svg_color(background)]
+    parts += [_svg_object(obj) for obj in drawing_data.get("objects", [])]
+    parts += [_svg_image(image_data) for image_data in drawing_data.get("images", [])]
+    parts.append("</svg>")
+    return "\n".join(part for part in parts if part)
+
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}  # Supported output formats
+
+
+def render(drawing_data, image_format="png", width=None, height=None):
+    """
+    Render a drawing in one of the CONTENT_TYPES formats.
+
+    Returns:
+        bytes: The rendered PNG or SVG document.
+    """
+    if image_format == "svg":
+        return render_svg(drawing_data, width, height).encode("utf-8")
+    if image_format == "png":
+        return render_png(drawing_data, width, height)
+    raise ValueError("Unsupported format: %s" % image_format)
@@ -0,0 +1,329 @@
+"""
+Statistics of drawing files (as saved by the application), read as a stream without Tk.
+
+Inspect files from the command line with:
+
+    python main.py stats drawing.json [other.json ...] [--json] [--top N]
+
+The objects and pictures of a file are decoded one at a time, so even very large files are inspected in little
+memory. The report gives the objects by type, their coordinate points, the gradient fills (runs of borderless strips),
+the distinct colors and styles, the pictures and their bytes, the extent of the drawing, the largest objects, and
+estimates of the time taken to open the drawing in the application and to render it.
+"""
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+
+from style_table import PALETTE_KEYS, SHAPE_DEFAULTS, expand_object
+
+CHUNK_SIZE = 64 * 1024  # Characters read from the file at once (more while an object doesn't fit)
+STREAMED_KEYS = ("objects", "images")  # Lists of a drawing file decoded one element at a time
+MIN_GRADIENT_STRIPS = 16  # Consecutive borderless rectangles or ovals counted as a gradient fill
+DEFAULT_TOP = 10  # Number of largest objects reported
+
+# Rough costs in microseconds measured on the headless canvas model (see the benchmarks), to compare drawings. Opening
+# a drawing creates a canvas item per object and decodes the pictures; rendering draws the objects with PIL.
+LOAD_COST_US = {"item": 25.0, "point": 4.0, "text_box": 115.0, "picture_pixel": 0.016}
+RENDER_COST_US = {"item": 6.0, "point": 0.9, "text_box": 835.0, "picture_pixel": 0.016}
+
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _JsonStream:
+    """Reads the JSON values of a file one at a time, keeping only the values not consumed yet in memory."""
+
+    def __init__(self, file):
+        self._file = file
+        self._buffer = ""
+        self._position = 0
+        self._end_of_file = False
+        self._decoder = json.JSONDecoder()
+
+    def _read(self, size=CHUNK_SIZE):
+        """Read more of the file into the buffer, dropping what was consumed (False at the end of the file)."""
+        chunk = "" if self._end_of_file else self._file.read(size)
+        if not chunk:
+            self._end_of_file = True
+            return False
+        self._buffer = self._buffer[self._position:] + chunk
+        self._position = 0
+        return True
+
+    def peek(self):
+        """Skip the whitespace and get the next character ("" at the end of the file)."""
+        while True:
+            self._position = _WHITESPACE.match(self._buffer, self._position).end()
+            if self._position < len(self._buffer):
+                return self._buffer[self._position]
+            if not self._read():
+                return ""
+
+    def expect(self, characters):
+        """Consume the next character, one of the given characters, and return it."""
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError("invalid drawing file: expected one of %r, found %r" % (characters, character or "EOF"))
+        self._position += 1
+        return character
+
+    def value(self):
+        """Decode the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._position)
+            except json.JSONDecodeError:
+                # The value goes on in the file: read as much again, so a huge value is decoded a few times only
+                if not self._read(max(CHUNK_SIZE, len(self._buffer) - self._position)):
+                    raise
+                continue
+            if end == len(self._buffer) and self._read():
+                continue  # A number may go on in the next chunk
+            self._position = end
+            return value
+
+
+def iter_drawing_file(file):
+    """
+    Read a drawing file one object at a time.
+
+    Parameters:
+        file (file): The drawing file, opened for reading text.
+
+    Yields:
+        tuple: ("objects", object data) and ("images", picture data) for every element of these lists, in order, and
+               (key, value) for the other keys of the file (palette, styles, layers, groups). The objects are given
+               as written: those of a compact file refer to the palette and the styles by index.
+    """
+    stream = _JsonStream(file)
+    stream.expect("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.expect(":")
+        if key in STREAMED_KEYS and stream.peek() == "[":
+            stream.expect("[")
+            if stream.peek() == "]":
+                stream.expect("]")
+            else:
+                while True:
+                    yield key, stream.value()
+                    if stream.expect(",]") == "]":
+                        break
+        else:
+            yield key, stream.value()
+        if stream.expect(",}") == "}":
+            return
+
+
+def _points(obj):
+    if obj.get("type") == "text_box":
+        return 1
+    return len(obj.get("coords") or ()) // 2
+
+
+def _object_box(obj):
+    if obj.get("type") == "text_box":
+        half_width, half_height = obj.get("text_width", 0) / 2, obj.get("text_height", 0) / 2
+        return (obj["coord_x"] - half_width, obj["coord_y"] - half_height,
+                obj["coord_x"] + half_width, obj["coord_y"] + half_height)
+    coords = obj.get("coords")
+    if not coords or len(coords) < 2:
+        return None
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _is_strip(obj):
+    """Whether an object looks like a strip of a gradient fill: a borderless, filled rectangle or oval."""
+    return obj.get("type") in ("rectangle", "oval") and bool(obj.get("color")) and not obj.get("outline")
+
+
+def _picture_size(path):
+    """Get the size in pixels of a picture file from its header, or None if it can't be read."""
+    from PIL import Image  # Imported on first use, the statistics of drawings without pictures don't need it
+
+    try:
+        with Image.open(path) as picture:
+            return picture.size
+    except (OSError, ValueError):
+        return None
+
+
+def _count_groups(groups_data):
+    return sum(1 + _count_groups(data.get("groups", [])) for data in groups_data)
+
+
+def drawing_stats(filename, top=DEFAULT_TOP):
+    """
+    Get the statistics of a drawing file.
+
+    Parameters:
+        filename (str): Path of the drawing file.
+        top (int): Number of largest objects to report.
+
+    Returns:
+        dict: The statistics (JSON serializable).
+    """
+    start = time.perf_counter()
+    types = {}
+    points_by_type = {}
+    largest = []  # Heap of (points, -position, summary) of the largest objects
+    extent = None
+    strips_run = gradient_fills = gradient_strips = 0
+    first_strip = None  # Coordinates of the first strip of the current run
+    objects = text_boxes = 0
+    images = image_bytes = image_pixels = missing_images = 0
+    layers = groups = 0
+    palette = styles = None  # Tables of a compact file, before its objects
+    colors, shape_styles = set(), set()
+
+    def extend(box):
+        nonlocal extent
+        if box is not None:
+            extent = box if extent is None else (min(extent[0], box[0]), min(extent[1], box[1]),
+                                                 max(extent[2], box[2]), max(extent[3], box[3]))
+
+    def end_strips_run():
+        nonlocal strips_run, gradient_fills, gradient_strips
+        if strips_run >= MIN_GRADIENT_STRIPS:
+            gradient_fills += 1
+            gradient_strips += strips_run
+        strips_run = 0
+
+    with open(filename, "r") as file:
+        for key, value in iter_drawing_file(file):
+            if key == "objects":
+                if palette is not None:
+                    value = expand_object(value, palette, styles or [])
+                obj_type = value.get("type", "unknown")
+                points = _points(value)
+                box = _object_box(value)
+                types[obj_type] = types.get(obj_type, 0) + 1
+                points_by_type[obj_type] = points_by_type.get(obj_type, 0) + points
+                text_boxes += obj_type == "text_box"
+                if obj_type in SHAPE_DEFAULTS:
+                    style = (value.get("color"), value.get("outline"), value.get("width"))
+                    shape_styles.add(style)
+                    colors.update(color for color in style[:2] if color is not None)
+                elif obj_type == "text_box":
+                    colors.update(value[name] for name in PALETTE_KEYS if value.get(name) is not None)
+                extend(box)
+                if _is_strip(value):
+                    if strips_run and value.get("coords") == first_strip:
+                        end_strips_run()  # The same shape filled again
+                    if not strips_run:
+                        first_strip = value.get("coords")
+                    strips_run += 1
+                else:
+                    end_strips_run()
+                entry = (points, -objects, {"position": objects, "type": obj_type, "points": points,
+                                            "box": [round(coord, 2) for coord in box] if box else None})
+                if len(largest) < top:
+                    heapq.heappush(largest, entry)
+                elif top and entry[:2] > largest[0][:2]:
+                    heapq.heapreplace(largest, entry)
+                objects += 1
+            elif key == "images":
+                images += 1
+                path = value.get("path") or ""
+                size = _picture_size(path) if os.path.isfile(path) else None
+                if size is None:
+                    missing_images += 1
+                else:
+                    image_bytes += os.path.getsize(path)
+                    image_pixels += size[0] * size[1]
+                    if len(value.get("coords") or ()) >= 2:
+                        x, y = value["coords"][:2]
+                        extend((x, y, x + size[0], y + size[1]))
+            elif key == "palette":
+                palette = value or []
+            elif key == "styles":
+                styles = value or []
+            elif key == "layers":
+                layers = len(value or ())
+            elif key == "groups":
+                groups = _count_groups(value or ())
+    end_strips_run()
+
+    points = sum(points_by_type.values())
+    shape_items = objects - text_boxes
+    load_us = (LOAD_COST_US["item"] * shape_items + LOAD_COST_US["point"] * points
+               + LOAD_COST_US["text_box"] * text_boxes + LOAD_COST_US["picture_pixel"] * image_pixels)
+    render_us = (RENDER_COST_US["item"] * shape_items + RENDER_COST_US["point"] * points
+                 + RENDER_COST_US["text_box"] * text_boxes + RENDER_COST_US["picture_pixel"] * image_pixels)
+    if images:
+        types["image"] = images
+    return {
+        "file": filename,
+        "file_bytes": os.path.getsize(filename),
+        "objects": objects,
+        "images": images,
+        "types": dict(sorted(types.items())),
+        "points": points,
+        "points_by_type": dict(sorted(points_by_type.items())),
+        "gradient_fills": gradient_fills,
+        "gradient_strips": gradient_strips,
+        "colors": len(colors),
+        "styles": len(shape_styles),
+        "image_bytes": image_bytes,
+        "image_pixels": image_pixels,
+        "missing_images": missing_images,
+        "layers": layers,
+        "groups": groups,
+        "extent": [round(coord, 2) for coord in extent] if extent else None,
+        "largest_objects": [summary for _, _, summary in sorted(largest, key=lambda entry: entry[:2], reverse=True)],
+        "estimated_ms": {"load": round(load_us / 1000, 1), "render": round(render_us / 1000, 1)},
+        "read_seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def format_stats(stats):
+    """Get the statistics of a drawing file as text."""
+    lines = [
+        "%s (%d bytes, read in %.3f s)" % (stats["file"], stats["file_bytes"], stats["read_seconds"]),
+        "  Objects: %d, pictures: %d, layers: %d, groups: %d" % (stats["objects"], stats["images"], stats["layers"],
+                                                               stats["groups"]),
+        "  By type: " + (", ".join("%s %d" % item for item in stats["types"].items()) or "none"),
+        "  Points: %d (%s)" % (stats["points"],
+                               ", ".join("%s %d" % item for item in stats["points_by_type"].items()) or "none"),
+        "  Gradient fills: %d (%d strips)" % (stats["gradient_fills"], stats["gradient_strips"]),
+        "  Colors: %d, styles: %d" % (stats["colors"], stats["styles"]),
+        "  Pictures: %d bytes, %d pixels, %d missing" % (stats["image_bytes"], stats["image_pixels"],
+                                                        stats["missing_images"]),
+        "  Extent: " + ("(%g, %g) - (%g, %g)" % tuple(stats["extent"]) if stats["extent"] else "empty"),
+        "  Estimated cost: open %.1f ms, render %.1f ms" % (stats["estimated_ms"]["load"],
+                                                           stats["estimated_ms"]["render"]),
+    ]
+    if stats["largest_objects"]:
+        lines.append("  Largest objects:")
+        lines += ["    #%d %s, %d points" % (summary["position"], summary["type"], summary["points"])
+                  for summary in stats["largest_objects"]]
+    return "\n".join(lines)
+
+
+def stats_command(argv=None):
+    """Print the statistics of drawing files from the command line (python main.py stats --help)."""
+    parser = argparse.ArgumentParser(prog="python main.py stats",
+                                     description="Report the statistics of drawing files, without Tk.")
+    parser.add_argument("drawings", nargs="+", help="drawing files (JSON, as saved by the application)")
+    parser.add_argument("--json", action="store_true", help="print the statistics of every file as a line of JSON")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP,
+                        help="number of largest objects reported (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    status = 0
+    for filename in args.drawings:
+        try:
+            stats = drawing_stats(filename, top=max(args.top, 0))
+        except (OSError, ValueError) as e:
+            print("%s: %s" % (filename, e), file=sys.stderr)
+            status = 1
+            continue
+        print(json.dumps(stats) if args.json else format_stats(stats))
+    return status
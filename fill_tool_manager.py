@@ -1,4 +1,5 @@
 NUM_GRADIENT_STEPS = 800  # Number of steps for gradient fill
+STRIPS_TAG = "gradient_strips"  # Tag of the strips of a region gradient while they are put in place
 
 
 class FillTool:
@@ -42,50 +43,124 @@ class FillTool:
             # Checks if it can be filled
             if 'fill' in item_config:
                 color = self.toolbar.get_fill_color()
+                before = {"fill": item_config["fill"][-1]}
                 self.canvas.itemconfig(self.selected_object, fill=color)  # Change the fill color of the selected shape
+                self.canvas.history.record_config(self.selected_object, before, {"fill": color})
+
+    def bucket_fill(self, event):
+        """
+        Fill the closed region around the click point with the current color.
+
+        The region may be enclosed by any items (pen strokes, lines, outlines...). It's filled with a polygon placed
+        right above the shape the region lies on (in the layer of that shape), so the strokes around it stay on top.
+        """
+        from region_fill import find_region
+
+        with self.canvas.layers.live():  # The objects of the cached layers bound the region too
+            region = find_region(self.canvas, event.x, event.y)
+        if region is None:
+            self.canvas.bell()  # The point is on a stroke or the region is not closed
+            return
+
+        item = self.canvas.create_polygon(*region.polygon(), fill=self.toolbar.get_fill_color(), outline="")
+        self.canvas.history.place_above(item, region.backdrop)
+        self.canvas.layers.adopt([item], region.backdrop)
+        self.canvas.history.record_create([item])
 
     def shapes_gradual_fill(self, event):
-        """Fill the shape closest to the click point with a gradient."""
+        """
+        Fill the shape closest to the click point with a gradient.
+
+        Rectangles, ovals and polygons are filled through their own outline. Any other item (pen strokes, lines...)
+        gets the closed region around the click point filled instead.
+        """
         color1, color2 = self.toolbar.get_gradual_colors()
 
         self.find_closest_shape(event)
 
         # Get the type of the selected shape
-        item_type = self.canvas.type(self.selected_object)
+        item_type = self.canvas.type(self.selected_object) if self.selected_object else None
 
         # Get the method to create gradient based on shape type
         fill_method = getattr(self, f'create_gradient_{item_type}', None)
 
         if fill_method:
             # Call the appropriate method to fill the shape with gradient
-            fill_method(self.selected_object, color1, color2)
+            items = fill_method(self.selected_object, color1, color2)
+        else:
+            from region_fill import find_region
+
+            with self.canvas.layers.live():
+                region = find_region(self.canvas, event.x, event.y)
+            if region is None:
+                self.canvas.bell()  # The point is on a stroke or the region is not closed
+                return
+            items = self.create_gradient_region(region, color1, color2)
+
+        # Undo removes all the new gradient items in one step
+        self.canvas.history.record_create(items)
 
     def create_gradient(self, color1, color2, num_steps):
         """
         Calculates gradient colors between two given colors.
 
         Args:
-            color1 (tuple): RGB tuple for the starting color.
-            color2 (tuple): RGB tuple for the ending color.
+            color1 (tuple | str): RGB tuple or Tk color name for the starting color.
+            color2 (tuple | str): RGB tuple or Tk color name for the ending color.
             num_steps (int): Number of steps for gradient calculation.
 
         Returns:
             list: List of gradient colors.
         """
-        gradient = []
+        import numpy as np
 
-        # Calculate gradient color at each step
-        for i in range(num_steps):
-            r = int(color1[0] + (color2[0] - color1[0]) * i / num_steps)
-            g = int(color1[1] + (color2[1] - color1[1]) * i / num_steps)
-            b = int(color1[2] + (color2[2] - color1[2]) * i / num_steps)
-            gradient.append("#%02x%02x%02x" % (r, g, b))
+        start, end = np.array(self._rgb(color1)), np.array(self._rgb(color2))
 
-        return gradient
+        # Calculate the gradient color of every step at once
+        steps = (start + (end - start) * np.arange(num_steps)[:, None] / num_steps).astype(int)
+        return ["#%02x%02x%02x" % rgb for rgb in map(tuple, steps.tolist())]
+
+    def _rgb(self, color):
+        """Get the 8-bit RGB tuple of a color, given as a tuple or as a Tk color name."""
+        if isinstance(color, str):
+            return tuple(value // 257 for value in self.canvas.winfo_rgb(color))
+        return tuple(int(value) for value in color[:3])
+
+    def _create_items(self, items):
+        """
+        Create the items of a gradient at the top of the active layer with DrawingCanvas.create_items_batch: a direct
+        Tcl call per item, without the option conversion of tkinter, in chunks created in time slices.
+
+        Returns:
+            list: The ids of the created items.
+        """
+        return self.canvas.create_items_batch(items, screen=True)
+
+    def create_gradient_region(self, region, color1, color2):
+        """
+        Fills a region (see region_fill) with a vertical gradient.
+
+        The region serves as a clip mask: it's covered with horizontal strips computed in one pass over its runs, so
+        the cost doesn't depend on the number of vertices of its outline. The strips are placed right above the item
+        the region lies on (in the layer of that item), under the strokes around it.
+        """
+        gradient = self.create_gradient(color1, color2, NUM_GRADIENT_STEPS)
+        items = self._create_items([("rectangle", (x1, y1, x2, y2), {"fill": gradient[step], "outline": "",
+                                                                      "tags": STRIPS_TAG})
+                                    for x1, y1, x2, y2, step in region.strips(NUM_GRADIENT_STEPS)])
+
+        # Move all the strips at once, keeping their order
+        if region.backdrop is not None:
+            self.canvas.tag_raise(STRIPS_TAG, region.backdrop)
+        else:
+            self.canvas.tag_lower(STRIPS_TAG)
+        self.canvas.dtag(STRIPS_TAG, STRIPS_TAG)
+        self.canvas.layers.adopt(items, region.backdrop)
+        return items
 
     def create_gradient_rectangle(self, rectangle, color1, color2):
         """
-        Fills a rectangle shape with a gradient.
+        Fills a rectangle shape with a gradient, and returns the ids of the created items.
         """
         coords = self.canvas.coords(rectangle)
         x1, y1 = coords[0] + 1, coords[1] + 1
@@ -94,34 +169,28 @@ class FillTool:
         gradient = self.create_gradient(color1, color2, NUM_GRADIENT_STEPS)
 
         # Create gradient fill for each step
-        for i, color in enumerate(gradient):
-            self.canvas.create_rectangle(x1, y1 + i * (y2 - y1) / NUM_GRADIENT_STEPS,
-                                         x2, y1 + (i + 1) * (y2 - y1) / NUM_GRADIENT_STEPS,
-                                         fill=color, outline="")
+        return self._create_items([("rectangle", (x1, y1 + i * (y2 - y1) / NUM_GRADIENT_STEPS,
+                                                  x2, y1 + (i + 1) * (y2 - y1) / NUM_GRADIENT_STEPS),
+                                    {"fill": color, "outline": ""})
+                                   for i, color in enumerate(gradient)])
 
     def create_gradient_polygon(self, polygon, color1, color2):
         """
-        Fills a polygon shape with a gradient.
+        Fills a polygon shape, with any number of vertices, with a gradient, and returns the ids of the created items.
         """
-        coords = self.canvas.coords(polygon)
-        x1, y1, x2, y2, x3, y3 = coords
-
-        gradient = self.create_gradient(color1, color2, NUM_GRADIENT_STEPS)
+        from region_fill import polygon_region
 
-        # Create gradient fill for each step
-        for i, color in enumerate(gradient):
-            x_fill = x1 + (x2 - x1) * i / NUM_GRADIENT_STEPS
-            y_fill = y1 + (y2 - y1) * i / NUM_GRADIENT_STEPS
-            self.canvas.create_line(x1, y1, x_fill, y_fill, fill=color)
-            self.canvas.create_line(x1, y1, x3 + (x2 - x3) * i / NUM_GRADIENT_STEPS,
-                                    y3 + (y2 - y3) * i / NUM_GRADIENT_STEPS, fill=color)
-            self.canvas.create_line(x_fill, y_fill, x3 + (x2 - x3) * i / NUM_GRADIENT_STEPS,
-                                    y3 + (y2 - y3) * i / NUM_GRADIENT_STEPS,
-                                    fill=color)
+        width = int(round(float(self.canvas.itemcget(polygon, "width") or 0)))
+        outline = self.canvas.itemcget(polygon, "outline")
+        region = polygon_region(self.canvas.coords(polygon), width if outline else 0)
+        if region is None:
+            return []
+        region.backdrop = polygon
+        return self.create_gradient_region(region, color1, color2)
 
     def create_gradient_oval(self, oval, color1, color2):
         """
-        Fills an oval shape with a gradient.
+        Fills an oval shape with a gradient, and returns the ids of the created items.
         """
         coords = self.canvas.coords(oval)
         x1, y1, x2, y2 = coords
@@ -135,6 +204,7 @@ class FillTool:
         radius_y = abs(y2 - y1) / 2
 
         # Create gradient fill for each step
+        strips = []
         for i, color in enumerate(gradient):
             # Calculate the width and height of the filled oval at this step
             width = radius_x * 2 * (1 - i / NUM_GRADIENT_STEPS)
@@ -147,6 +217,8 @@ class FillTool:
             y_fill2 = center_y + height / 2
 
             # Create the filled oval using the calculated coordinates
-            self.canvas.create_oval(x_fill1, y_fill1, x_fill2, y_fill2, fill=color, outline="")
+            strips.append(("oval", (x_fill1, y_fill1, x_fill2, y_fill2), {"fill": color, "outline": ""}))
+        items = self._create_items(strips)
 
-        self.canvas.create_oval(x1, y1, x2, y2, outline=self.toolbar.get_color())
+        items.append(self.canvas.create_oval(x1, y1, x2, y2, outline=self.toolbar.get_color()))
+        return items
@@ -0,0 +1,298 @@
+from history_manager import IGNORED_TAGS
+
+GROUPED_TAG = "grouped"  # Tag of every item that belongs to a group
+GROUP_TAG_PREFIX = "group:"  # Prefix of the tag of each group (every item of a group has the tags of all its groups)
+BVH_LEAF_SIZE = 4  # Largest number of groups in a leaf node of the bounding volume hierarchy
+_EMPTY = ()  # Cached box of a group without items (all its items were deleted)
+
+
+def grouped_positions(groups_data):
+    """Get the positions of all the items of the groups of a drawing file, as returned by GroupTree.get_data."""
+    positions = set()
+    for data in groups_data:
+        positions.update(data.get("members", []))
+        positions.update(grouped_positions(data.get("groups", [])))
+    return positions
+
+
+class _Group:
+    """A group: its tag, the group containing it (None for an outermost group) and the groups it contains."""
+
+    __slots__ = ("tag", "parent", "children", "box")
+
+    def __init__(self, tag, parent=None):
+        self.tag = tag
+        self.parent = parent
+        self.children = []
+        self.box = None  # (x1, y1, x2, y2), _EMPTY, or None until computed
+
+
+class GroupTree:
+    """
+    Groups of canvas items, nested in a tree, with a bounding volume hierarchy over the outermost groups.
+
+    The membership of the items is kept by Tk itself: every item of a group has the tag of the group and of all the
+    groups containing it, plus GROUPED_TAG. So moving or deleting a whole group (however deep) is a single Tk call,
+    and the undo history restores the membership of deleted items with their tags. The tree only keeps the nesting of
+    the groups and their boxes, which are computed by Tk (bbox of the group tag) on demand and kept until the items
+    of the group change.
+
+    Queries never look at the items of the groups: selecting with a rectangle descends the hierarchy of the boxes of
+    the outermost groups, taking whole subtrees enclosed in the rectangle and skipping the ones outside it, and the
+    group of a clicked item is found by walking up from its innermost group.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the GroupTree.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the grouped items.
+        """
+        self.canvas = canvas
+        self._groups = {}  # Tag -> _Group
+        self._roots = {}  # Tag -> _Group of the outermost groups, in creation order
+        self._next_id = 1
+        self._index = None  # Bounding volume hierarchy over the boxes of the outermost groups, built on demand
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __contains__(self, tag):
+        return tag in self._groups
+
+    @property
+    def roots(self):
+        """Get the tags of the outermost groups."""
+        return list(self._roots)
+
+    def group(self, units, tag=None):
+        """
+        Group items and outermost groups into a new outermost group.
+
+        Parameters:
+            units (list): Item ids and tags of outermost groups.
+            tag (str): Tag of the new group (to recreate a group with its former tag), or None for a new tag.
+
+        Returns:
+            str: The tag of the new group.
+        """
+        if tag is None:
+            tag = f"{GROUP_TAG_PREFIX}{self._next_id}"
+            self._next_id += 1
+        node = _Group(tag)
+        for unit in units:
+            child = self._roots.pop(unit, None) if isinstance(unit, str) else None
+            if child is not None:
+                child.parent = node
+                node.children.append(child)
+            self.canvas.addtag_withtag(tag, unit)
+        self.canvas.addtag_withtag(GROUPED_TAG, tag)
+        self._groups[tag] = node
+        self._roots[tag] = node
+        self._index = None
+        return tag
+
+    def ungroup(self, tag):
+        """
+        Dissolve an outermost group; the items and groups it contained become outermost ones.
+
+        Returns:
+            list: The item ids and the tags of the groups the group contained.
+        """
+        node = self._roots.pop(tag)
+        del self._groups[tag]
+        items = set(self.canvas.find_withtag(tag))
+        for child in node.children:
+            child.parent = None
+            self._roots[child.tag] = child
+            items.difference_update(self.canvas.find_withtag(child.tag))
+        self.canvas.dtag(tag, tag)
+        for item in items:
+            self.canvas.dtag(item, GROUPED_TAG)
+        self._index = None
+        return sorted(items) + [child.tag for child in node.children]
+
+    def unit_of(self, item):
+        """Get the tag of the outermost group of an item, or the item itself if it isn't grouped."""
+        for tag in self.canvas.gettags(item):
+            node = self._groups.get(tag)
+            if node is not None:
+                while node.parent is not None:
+                    node = node.parent
+                return node.tag
+        return item
+
+    def box(self, tag):
+        """Get the (x1, y1, x2, y2) box of a group, or None if it has no items."""
+        node = self._groups[tag]
+        if node.box is None:
+            node.box = self.canvas.bbox(tag) or _EMPTY
+        return node.box or None
+
+    def find_enclosed(self, x1, y1, x2, y2):
+        """Get the tags of the outermost groups enclosed in a rectangle, descending the bounding volume hierarchy."""
+        if not self._roots:
+            return []
+        if self._index is None:
+            self._index = self._build_index()
+        rectangle = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        found = []
+        if self._index is not None:
+            _collect_enclosed(self._index, rectangle, found)
+        return found
+
+    def translate(self, tag_or_id, dx, dy):
+        """Follow items moved by (dx, dy): a moved group translates its box and the boxes of its subgroups."""
+        node = self._groups.get(tag_or_id)
+        if node is None or dx != int(dx) or dy != int(dy):
+            self.invalidate(tag_or_id)
+            return
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.box:
+                x1, y1, x2, y2 = current.box
+                current.box = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+            stack.extend(current.children)
+        self._invalidate_ancestors(node.parent)
+
+    def invalidate(self, tag_or_id):
+        """Forget the boxes of the groups of changed items."""
+        if not self._groups or tag_or_id in IGNORED_TAGS:
+            return
+        node = self._groups.get(tag_or_id)
+        if node is not None:
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                current.box = None
+                stack.extend(current.children)
+            self._invalidate_ancestors(node.parent)
+        elif isinstance(tag_or_id, int) or (isinstance(tag_or_id, str) and tag_or_id.isdigit()):
+            # The tags of an item are exactly its group and the groups containing it
+            for tag in self.canvas.gettags(tag_or_id):
+                if tag in self._groups:
+                    self._groups[tag].box = None
+                    self._index = None
+        else:
+            self.invalidate_all()
+
+    def invalidate_all(self):
+        for node in self._groups.values():
+            node.box = None
+        self._index = None
+
+    def get_data(self, positions, roots=None):
+        """
+        Get the nesting of the groups for a drawing file.
+
+        Parameters:
+            positions (dict): Item id -> position of the item in the saved drawing.
+            roots (list): Tags of the outermost groups to include, or None for all of them.
+
+        Returns:
+            list: One dictionary per outermost group with the positions of its own items ("members") and its groups.
+        """
+        def node_data(node):
+            items = set(self.canvas.find_withtag(node.tag))
+            for child in node.children:
+                items.difference_update(self.canvas.find_withtag(child.tag))
+            members = sorted(positions[item] for item in items if item in positions)
+            return {"members": members, "groups": [node_data(child) for child in node.children]}
+
+        nodes = self._roots.values() if roots is None else [self._roots[tag] for tag in roots]
+        return [data for data in map(node_data, nodes) if data["members"] or data["groups"]]
+
+    def load_data(self, groups_data, items):
+        """
+        Recreate the groups of a drawing file.
+
+        Parameters:
+            groups_data (list): The groups, as returned by get_data.
+            items (list): The ids of the loaded items, by position in the drawing file.
+        """
+        def load(data):
+            units = [items[position] for position in data.get("members", [])
+                     if 0 <= position < len(items) and items[position]]
+            units.extend(tag for tag in map(load, data.get("groups", [])) if tag)
+            return self.group(units) if units else None
+
+        for group_data in groups_data:
+            load(group_data)
+
+    def create_tags(self, groups_data):
+        """
+        Create new groups for items that aren't created yet, so they can be created with their group tags instead of
+        being tagged one group at a time.
+
+        Parameters:
+            groups_data (list): The groups, as returned by get_data.
+
+        Returns:
+            tuple: The tags of the new outermost groups, and the tags of the groups of the items by their position
+                   (the items also need GROUPED_TAG).
+        """
+        item_tags = {}
+
+        def create(data, parent, tags):
+            tag = f"{GROUP_TAG_PREFIX}{self._next_id}"
+            self._next_id += 1
+            node = self._groups[tag] = _Group(tag, parent)
+            tags = [tag] + tags  # Like group(), the innermost group comes first
+            for position in data.get("members", []):
+                item_tags[position] = tags
+            for child_data in data.get("groups", []):
+                node.children.append(create(child_data, node, tags))
+            return node
+
+        roots = [create(data, None, []) for data in groups_data]
+        for node in roots:
+            self._roots[node.tag] = node
+        self._index = None
+        return [node.tag for node in roots], item_tags
+
+    def _invalidate_ancestors(self, node):
+        while node is not None:
+            node.box = None
+            node = node.parent
+        self._index = None
+
+    def _build_index(self):
+        """Build the bounding volume hierarchy of the outermost groups that have items."""
+        entries = [(box, tag) for tag, box in ((tag, self.box(tag)) for tag in self._roots) if box]
+        return _build_node(entries) if entries else None
+
+
+def _union(boxes):
+    x1s, y1s, x2s, y2s = zip(*boxes)
+    return min(x1s), min(y1s), max(x2s), max(y2s)
+
+
+def _build_node(entries):
+    """
+    Build a node of the bounding volume hierarchy: (box, children, entries), where a leaf has the (box, tag) entries
+    of its groups and an inner node two children, split at the median of the longer side of its box.
+    """
+    box = _union([entry[0] for entry in entries])
+    if len(entries) <= BVH_LEAF_SIZE:
+        return box, None, entries
+    axis = 0 if box[2] - box[0] >= box[3] - box[1] else 1
+    entries.sort(key=lambda entry: entry[0][axis] + entry[0][axis + 2])
+    middle = len(entries) // 2
+    return box, (_build_node(entries[:middle]), _build_node(entries[middle:])), entries
+
+
+def _collect_enclosed(node, rectangle, found):
+    box, children, entries = node
+    x1, y1, x2, y2 = rectangle
+    if box[0] > x2 or box[2] < x1 or box[1] > y2 or box[3] < y1:
+        return  # Nothing in the node is even overlapping the rectangle
+    if box[0] >= x1 and box[1] >= y1 and box[2] <= x2 and box[3] <= y2:
+        found.extend(tag for _, tag in entries)  # The whole node is enclosed
+    elif children is None:
+        found.extend(tag for entry_box, tag in entries if entry_box[0] >= x1 and entry_box[1] >= y1
+                     and entry_box[2] <= x2 and entry_box[3] <= y2)
+    else:
+        for child in children:
+            _collect_enclosed(child, rectangle, found)
@@ -0,0 +1,703 @@
+import heapq
+import itertools
+import math
+import re
+import time
+import tkinter as tk
+
+# Options reported by itemconfigure for every canvas item type, with their default values
+_COMMON_ITEM_OPTIONS = {"state": "", "tags": ""}
+_OUTLINED_ITEM_OPTIONS = {"dash": "", "dashoffset": "0", "fill": "", "outline": "black", "stipple": "",
+                          "outlinestipple": "", "width": "1.0", "activefill": "", "activeoutline": "",
+                          "activewidth": "0.0", "disabledfill": "", "disabledoutline": "", "disabledwidth": "0.0"}
+ITEM_DEFAULTS = {
+    "line": {"arrow": "none", "arrowshape": "8 10 3", "capstyle": "butt", "dash": "", "dashoffset": "0",
+             "fill": "black", "joinstyle": "round", "smooth": "0", "splinesteps": "12", "stipple": "",
+             "width": "1.0", "activefill": "", "activewidth": "0.0", "disabledfill": "", "disabledwidth": "0.0"},
+    "rectangle": _OUTLINED_ITEM_OPTIONS,
+    "oval": _OUTLINED_ITEM_OPTIONS,
+    "arc": dict(_OUTLINED_ITEM_OPTIONS, extent="90.0", start="0.0", style="pieslice"),
+    "polygon": dict(_OUTLINED_ITEM_OPTIONS, fill="black", outline="", joinstyle="round", smooth="0",
+                    splinesteps="12"),
+    "text": {"anchor": "center", "fill": "black", "font": "TkDefaultFont", "justify": "left", "text": "",
+             "width": "0", "angle": "0.0", "activefill": "", "disabledfill": ""},
+    "window": {"anchor": "center", "height": "0", "width": "0", "window": ""},
+    "image": {"anchor": "center", "image": "", "activeimage": "", "disabledimage": ""},
+}
+_NUMERIC_ITEM_OPTIONS = ("width", "activewidth", "disabledwidth", "extent", "start", "angle")
+
+# Scanning of Tcl lists
+_NON_SPACE = re.compile(r"\S")
+_SPACE = re.compile(r"\s")
+_BRACE = re.compile(r"[{}]")
+_BRACED = re.compile(r"\{([^{}]*)\}")
+
+# Tcl commands that take a widget path but don't create a widget
+_NON_WIDGET_COMMANDS = {"bind", "bindtags", "destroy", "focus", "grab", "grid", "pack", "place", "raise", "lower",
+                        "winfo", "wm", "event", "tk_focusNext", "tk_focusPrev", "option", "tkwait", "update"}
+
+
+def split_tcl_list(value):
+    """
+    Split a Tcl list into its elements.
+
+    Parameters:
+        value (str | tuple | list): The Tcl list, or an already split sequence.
+
+    Returns:
+        tuple: The list elements.
+    """
+    if isinstance(value, (tuple, list)):
+        return tuple(value)
+    if not isinstance(value, str):
+        return (value,)
+    if "{" not in value and '"' not in value:
+        return tuple(value.split())  # Plain words, like coordinates
+
+    if '"' not in value:  # Words and braced elements without nested braces, like options and tags
+        parts = _BRACED.split(value)
+        if not any("{" in part or "}" in part for part in parts[::2]):
+            elements = []
+            for index, part in enumerate(parts):
+                if index % 2:
+                    elements.append(part)
+                else:
+                    elements.extend(part.split())
+            return tuple(elements)
+
+    elements = []
+    index, length = 0, len(value)
+    while True:
+        match = _NON_SPACE.search(value, index)
+        if match is None:
+            break
+        index = match.start()
+        if value[index] == "{":
+            depth, start = 1, index + 1
+            index = start
+            while depth:
+                brace = _BRACE.search(value, index)
+                if brace is None:
+                    index = length + 1
+                    break
+                depth += 1 if brace.group() == "{" else -1
+                index = brace.end()
+            elements.append(value[start:index - 1])
+        elif value[index] == '"':
+            end = value.index('"', index + 1)
+            elements.append(value[index + 1:end])
+            index = end + 1
+        else:
+            end = _SPACE.search(value, index)
+            end = end.start() if end else length
+            elements.append(value[index:end])
+            index = end
+    return tuple(elements)
+
+
+def _to_tcl_string(value):
+    """Convert an option value the way Tk reports it back."""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (tuple, list)):
+        return " ".join(_to_tcl_string(item) for item in value)
+    return str(value)
+
+
+# 8-bit RGB of the color names the application uses, for winfo rgb
+_NAMED_COLORS = {"black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0), "green": (0, 128, 0),
+                 "blue": (0, 0, 255), "yellow": (255, 255, 0), "gray": (190, 190, 190), "grey": (190, 190, 190)}
+
+
+def _rgb16(color):
+    """Convert a #rgb, #rrggbb or named color to the 16-bit RGB triplet Tk reports."""
+    color = str(color)
+    if color.startswith("#") and len(color) in (4, 7):
+        digits = (len(color) - 1) // 3
+        return tuple(int(color[1 + i * digits:1 + (i + 1) * digits] * (4 // digits), 16) for i in range(3))
+    if color.lower() not in _NAMED_COLORS:
+        raise tk.TclError('unknown color name "%s"' % color)
+    return tuple(value * 257 for value in _NAMED_COLORS[color.lower()])
+
+
+def _split_options(args):
+    """Split the arguments of a Tcl command into positional arguments and an option dictionary."""
+    positional = []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if isinstance(arg, str) and len(arg) > 1 and arg[0] == "-" and arg[1].isalpha():
+            break
+        positional.append(arg)
+        index += 1
+    options = {}
+    for name, value in zip(args[index::2], args[index + 1::2]):
+        options[name[1:]] = value
+    return positional, options
+
+
+class _CanvasItem:
+    """A single item of a headless canvas, which keeps its bounding box like Tk keeps it in the item header."""
+
+    __slots__ = ("id", "type", "coords", "options", "tags", "box")
+
+    def __init__(self, item_id, item_type, coords, options, tags):
+        self.id = item_id
+        self.type = item_type
+        self.coords = coords
+        self.options = options
+        self.tags = tags
+        self.box = None  # Bounding box, computed again after the coordinates or options change
+
+    def bbox(self):
+        """Get the bounding box of the item as (x1, y1, x2, y2) floats."""
+        if self.box is None:
+            self.box = self._measure()
+        return self.box
+
+    def _measure(self):
+        coords = self.coords
+        if self.type in ("window", "image", "text"):
+            x, y = coords[0], coords[1]
+            width = float(self.options.get("width", 0) or 0) if self.type == "window" else 0.0
+            height = float(self.options.get("height", 0) or 0) if self.type == "window" else 0.0
+            if self.options.get("anchor", "center") == "nw":
+                return x, y, x + width, y + height
+            return x - width / 2, y - height / 2, x + width / 2, y + height / 2
+
+        xs = coords[0::2]
+        ys = coords[1::2]
+        half_width = float(self.options.get("width", 1.0)) / 2
+        return min(xs) - half_width, min(ys) - half_width, max(xs) + half_width, max(ys) + half_width
+
+
+class _WidgetModel:
+    """A generic headless widget that keeps its options and accepts every widget command."""
+
+    def __init__(self, interpreter, path, widget_class, options):
+        self.interpreter = interpreter
+        self.path = path
+        self.widget_class = widget_class
+        self.options = {name: _to_tcl_string(value) for name, value in options.items()}
+
+    def handle(self, args):
+        if not args:
+            return ""
+        command = args[0]
+        if command == "configure":
+            positional, options = _split_options(args[1:])
+            if positional and not options:
+                name = positional[0][1:]
+                return ("-" + name, name, name.capitalize(), "", self.options.get(name, ""))
+            self.options.update((name, _to_tcl_string(value)) for name, value in options.items())
+            return ""
+        if command == "cget":
+            return self.options.get(args[1][1:], "")
+        return self.handle_command(command, args[1:])
+
+    def handle_command(self, command, args):
+        return ""
+
+
+class _TextModel(_WidgetModel):
+    """A headless text widget that keeps its content as one string."""
+
+    def __init__(self, interpreter, path, widget_class, options):
+        super().__init__(interpreter, path, widget_class, options)
+        self.content = ""
+
+    def handle_command(self, command, args):
+        if command == "insert":
+            text = str(args[1]) if len(args) > 1 else ""
+            self.content = text + self.content if str(args[0]) == "1.0" else self.content + text
+        elif command == "get":
+            return self.content
+        elif command == "delete":
+            self.content = ""
+        return ""
+
+
+class _CanvasModel(_WidgetModel):
+    """
+    A headless canvas widget.
+
+    It keeps the items, their coordinates, options, tags and drawing order, and answers the canvas commands used by
+    the application (create, coords, itemconfigure, itemcget, find, bbox, move, delete, raise, lower and tags).
+    """
+
+    def __init__(self, interpreter, path, widget_class, options):
+        super().__init__(interpreter, path, widget_class, options)
+        self.items = {}  # Item id -> _CanvasItem, in drawing order
+        self._tagged = {}  # Tag -> set of item ids
+        self._next_id = itertools.count(1)
+
+    def handle_command(self, command, args):
+        handler = getattr(self, "_cmd_" + command, None)
+        return handler(*args) if handler else ""
+
+    def _find(self, tag_or_id):
+        """Get the items matching a tag or id, in drawing order."""
+        if isinstance(tag_or_id, int) or (isinstance(tag_or_id, str) and tag_or_id.isdigit()):
+            item = self.items.get(int(tag_or_id))
+            return [item] if item else []
+        if tag_or_id == "all":
+            return list(self.items.values())
+        ids = self._tagged.get(tag_or_id)
+        if not ids:
+            return []
+        if len(ids) == 1:
+            return [self.items[next(iter(ids))]]
+        return [item for item in self.items.values() if item.id in ids]
+
+    def _first(self, tag_or_id):
+        items = self._find(tag_or_id)
+        return items[0] if items else None
+
+    def _set_tags(self, item, tags):
+        for tag in item.tags:
+            self._tagged[tag].discard(item.id)
+        item.tags = list(dict.fromkeys(tags))
+        for tag in item.tags:
+            self._tagged.setdefault(tag, set()).add(item.id)
+
+    def _configure_item(self, item, options):
+        for name, value in options.items():
+            if name == "tags":
+                self._set_tags(item, split_tcl_list(value))
+            elif name in _NUMERIC_ITEM_OPTIONS and value != "":
+                item.options[name] = str(float(value))
+            else:
+                item.options[name] = _to_tcl_string(value)
+        item.box = None
+
+    def _cmd_create(self, item_type, *args):
+        positional, options = _split_options(args)
+        try:
+            coords = [float(value) for value in positional]  # One coordinate per argument, like in a script
+        except (TypeError, ValueError):
+            coords = [float(value) for value in itertools.chain.from_iterable(
+                split_tcl_list(arg) if isinstance(arg, (str, tuple, list)) else (arg,) for arg in positional)]
+        item = _CanvasItem(next(self._next_id), item_type, coords, {}, [])
+        self._configure_item(item, options)
+        self.items[item.id] = item
+        return item.id
+
+    def _cmd_coords(self, tag_or_id, *coords):
+        item = self._first(tag_or_id)
+        if item is None:
+            return ()
+        if coords:
+            item.coords = [float(value) for value in itertools.chain.from_iterable(
+                split_tcl_list(arg) if isinstance(arg, (str, tuple, list)) else (arg,) for arg in coords)]
+            item.box = None
+            return ""
+        return tuple(item.coords)
+
+    def _cmd_itemconfigure(self, tag_or_id, *args):
+        positional, options = _split_options(args)
+        if options:
+            for item in self._find(tag_or_id):
+                self._configure_item(item, options)
+            return ""
+
+        item = self._first(tag_or_id)
+        if item is None:
+            return ()
+        defaults = dict(ITEM_DEFAULTS.get(item.type, {}), **_COMMON_ITEM_OPTIONS)
+        values = dict(defaults, **item.options, tags=" ".join(item.tags))
+        entries = tuple(("-" + name, "", "", defaults.get(name, ""), value) for name, value in values.items())
+        if positional:
+            name = positional[0][1:]
+            return next((entry for entry in entries if entry[0][1:] == name), ())
+        return entries
+
+    def _cmd_itemcget(self, tag_or_id, option):
+        item = self._first(tag_or_id)
+        if item is None:
+            return ""
+        name = option[1:]
+        if name == "tags":
+            return " ".join(item.tags)
+        if name in item.options:
+            return item.options[name]
+        return ITEM_DEFAULTS.get(item.type, {}).get(name, _COMMON_ITEM_OPTIONS.get(name, ""))
+
+    def _cmd_type(self, tag_or_id):
+        item = self._first(tag_or_id)
+        return item.type if item else ""
+
+    def _cmd_gettags(self, tag_or_id):
+        item = self._first(tag_or_id)
+        return tuple(item.tags) if item else ()
+
+    def _cmd_addtag(self, new_tag, search, *args):
+        tagged = self._tagged.setdefault(new_tag, set())
+        for item in self._search(search, args):
+            if item.id not in tagged:
+                item.tags.append(new_tag)
+                tagged.add(item.id)
+        return ""
+
+    def _cmd_dtag(self, tag_or_id, tag_to_delete=None):
+        tag_to_delete = tag_to_delete or tag_or_id
+        tagged = self._tagged.get(tag_to_delete, set())
+        for item in self._find(tag_or_id):
+            if item.id in tagged:
+                item.tags.remove(tag_to_delete)
+                tagged.discard(item.id)
+        return ""
+
+    def _cmd_find(self, search, *args):
+        return tuple(item.id for item in self._search(search, args))
+
+    def _search(self, search, args):
+        if search == "withtag":
+            return self._find(args[0])
+        items = list(self.items.values())
+        if search == "all":
+            return items
+        if search in ("above", "below"):
+            target = self._find(args[0])
+            if not target:
+                return []
+            ids = list(self.items)
+            if search == "above":
+                index = ids.index(target[-1].id) + 1
+                return [self.items[ids[index]]] if index < len(ids) else []
+            index = ids.index(target[0].id) - 1
+            return [self.items[ids[index]]] if index >= 0 else []
+        # Like Tk, the hidden items are never found (nor the items without a state of a hidden canvas)
+        hidden = ("hidden", "") if self.options.get("state") == "hidden" else ("hidden",)
+        if search == "closest":
+            x, y = float(args[0]), float(args[1])
+            halo = float(args[2]) if len(args) > 2 else 0.0
+            best, best_distance = None, math.inf
+            for item in items:
+                if item.options.get("state", "") in hidden:
+                    continue
+                x1, y1, x2, y2 = item.bbox()
+                distance = math.hypot(max(x1 - x, 0, x - x2), max(y1 - y, 0, y - y2))
+                if distance <= max(best_distance, halo):  # Later (upper) items win ties
+                    best, best_distance = item, distance
+            return [best] if best else []
+        if search in ("enclosed", "overlapping"):
+            x1, y1, x2, y2 = (float(value) for value in args[:4])
+            x1, x2 = min(x1, x2), max(x1, x2)
+            y1, y2 = min(y1, y2), max(y1, y2)
+            found = []
+            for item in items:
+                if item.options.get("state", "") in hidden:
+                    continue
+                bx1, by1, bx2, by2 = item.bbox()
+                if search == "enclosed":
+                    if bx1 >= x1 and by1 >= y1 and bx2 <= x2 and by2 <= y2:
+                        found.append(item)
+                elif bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                    found.append(item)
+            return found
+        return []
+
+    def _cmd_bbox(self, *tags):
+        boxes = [item.bbox() for tag in tags for item in self._find(tag)]
+        if not boxes:
+            return ""
+        return (int(math.floor(min(box[0] for box in boxes))), int(math.floor(min(box[1] for box in boxes))),
+                int(math.ceil(max(box[2] for box in boxes))), int(math.ceil(max(box[3] for box in boxes))))
+
+    def _cmd_move(self, tag_or_id, dx, dy):
+        dx, dy = float(dx), float(dy)
+        for item in self._find(tag_or_id):
+            coords = item.coords
+            coords[0::2] = [value + dx for value in coords[0::2]]
+            coords[1::2] = [value + dy for value in coords[1::2]]
+            item.box = None
+        return ""
+
+    def _cmd_scale(self, tag_or_id, x_origin, y_origin, x_scale, y_scale):
+        x_origin, y_origin, x_scale, y_scale = (float(value) for value in (x_origin, y_origin, x_scale, y_scale))
+        for item in self._find(tag_or_id):
+            coords = item.coords
+            coords[0::2] = [x_origin + (value - x_origin) * x_scale for value in coords[0::2]]
+            coords[1::2] = [y_origin + (value - y_origin) * y_scale for value in coords[1::2]]
+            item.box = None
+        return ""
+
+    def _cmd_delete(self, *tags):
+        for tag in tags:
+            if tag == "all":
+                self.items.clear()
+                self._tagged.clear()
+                continue
+            for item in self._find(tag):
+                self._set_tags(item, [])
+                del self.items[item.id]
+        return ""
+
+    def _restack(self, moved, anchor, above):
+        if len(moved) == 1 and anchor is None and above:  # Raised to the top
+            self.items[moved[0].id] = self.items.pop(moved[0].id)
+            return
+        moved_ids = {item.id for item in moved}
+        if not moved or (anchor is not None and anchor.id in moved_ids):
+            return
+        others = [item for item in self.items.values() if item.id not in moved_ids]
+        if anchor is None:
+            ordered = others + moved if above else moved + others
+        else:
+            index = others.index(anchor) + (1 if above else 0)
+            ordered = others[:index] + moved + others[index:]
+        self.items = {item.id: item for item in ordered}
+
+    def _cmd_raise(self, tag_or_id, above_this=None):
+        anchor = self._find(above_this)[-1:] if above_this is not None else []
+        if above_this is not None and not anchor:
+            return ""
+        self._restack(self._find(tag_or_id), anchor[0] if anchor else None, above=True)
+        return ""
+
+    def _cmd_lower(self, tag_or_id, below_this=None):
+        anchor = self._find(below_this)[:1] if below_this is not None else []
+        if below_this is not None and not anchor:
+            return ""
+        self._restack(self._find(tag_or_id), anchor[0] if anchor else None, above=False)
+        return ""
+
+    def _cmd_canvasx(self, screen_x, *args):
+        return float(screen_x)
+
+    def _cmd_canvasy(self, screen_y, *args):
+        return float(screen_y)
+
+
+class HeadlessInterpreter:
+    """
+    A minimal stand-in for the Tcl/Tk interpreter used by tkinter.
+
+    Widgets, variables, traces, registered commands and the 'after' queue are modeled in Python, so the application
+    classes run unchanged without a display. Every command is counted in call_count.
+    """
+
+    def __init__(self):
+        self.widgets = {".": _WidgetModel(self, ".", "Tk", {})}
+        self.commands = {}
+        self.variables = {}
+        self.traces = {}  # Variable name -> list of (modes, command name)
+        self.call_count = 0
+        self._timers = []  # Heap of (due time, order, after id, command name, whether it's an idle callback)
+        self._timer_order = itertools.count(1)
+        self._quit = False
+
+    # Tcl commands
+
+    def call(self, *args):
+        if len(args) == 1 and isinstance(args[0], tuple):
+            args = args[0]
+        if None in args:
+            args = args[:args.index(None)]  # Like _tkinter, the arguments end at the first None
+        self.call_count += 1
+        command = args[0]
+
+        widget = self.widgets.get(command)
+        if widget is not None:
+            return widget.handle(args[1:])
+        if command in self.commands:
+            return self.commands[command](*args[1:])
+        if (command not in _NON_WIDGET_COMMANDS and len(args) > 1 and isinstance(args[1], str)
+                and args[1].startswith(".")):
+            return self._create_widget(command, args[1], args[2:])
+
+        handler = getattr(self, "_cmd_" + command.replace("::", "_"), None)
+        return handler(*args[1:]) if handler else ""
+
+    def eval(self, script):
+        """Evaluate a script of one command per line, returning the result of the last one."""
+        result = ""
+        for line in script.splitlines():
+            if line.strip():
+                result = self.call(split_tcl_list(line))
+        return result
+
+    def _create_widget(self, widget_class, path, args):
+        positional, options = _split_options(args)
+        model_class = {"canvas": _CanvasModel, "text": _TextModel}.get(widget_class, _WidgetModel)
+        self.widgets[path] = model_class(self, path, widget_class, options)
+        return path
+
+    def _cmd_destroy(self, *paths):
+        for path in paths:
+            for widget_path in [name for name in self.widgets if name == path or name.startswith(path + ".")]:
+                if widget_path != ".":
+                    del self.widgets[widget_path]
+        return ""
+
+    def _cmd_winfo(self, command, *args):
+        widget = self.widgets.get(args[0]) if args else None
+        if command == "exists":
+            return 1 if widget is not None else 0
+        if command in ("width", "height", "reqwidth", "reqheight"):
+            # Like an unmapped widget, unless the size was configured
+            return widget.options.get(command.replace("req", ""), 1) if widget is not None else 1
+        if command == "ismapped":
+            return 0
+        if command == "rgb":
+            return "%d %d %d" % _rgb16(args[1])
+        return ""
+
+    def _cmd_image(self, command, *args):
+        if command == "create":
+            name = args[1] if len(args) > 1 and not str(args[1]).startswith("-") else "image%d" % len(self.widgets)
+            self.widgets[name] = _WidgetModel(self, name, "image", _split_options(args[2:])[1])
+            return name
+        if command == "delete":
+            for name in args:
+                self.widgets.pop(name, None)
+        return ""
+
+    def _cmd_info(self, command, *args):
+        if command == "exists":
+            return args[0] in self.variables
+        if command == "patchlevel":
+            return "8.6.0"
+        return ""
+
+    def _cmd_trace(self, command, kind, name, *args):
+        if kind != "variable":
+            return ""
+        if command == "add":
+            self.traces.setdefault(name, []).append((split_tcl_list(args[0]), split_tcl_list(args[1])[0]))
+        elif command == "remove":
+            callback = split_tcl_list(args[1])[0]
+            self.traces[name] = [trace for trace in self.traces.get(name, []) if trace[1] != callback]
+        elif command == "info":
+            return tuple((modes, callback) for modes, callback in self.traces.get(name, []))
+        return ""
+
+    def _cmd_after(self, delay, *args):
+        if delay == "cancel":
+            self._timers = [timer for timer in self._timers if timer[2] != args[0] and timer[3] != args[0]]
+            heapq.heapify(self._timers)
+            return ""
+        if delay == "info":
+            return tuple(timer[2] for timer in self._timers)
+        if not args:
+            return ""
+        due = time.monotonic() + (0 if delay == "idle" else int(delay) / 1000)
+        order = next(self._timer_order)
+        after_id = "after#%d" % order
+        heapq.heappush(self._timers, (due, order, after_id, args[0], delay == "idle"))
+        return after_id
+
+    def _cmd_update(self, *args):
+        if args == ("idletasks",):
+            self.run_idle()
+        else:
+            self.run_pending()
+        return ""
+
+    # Interpreter API used by tkinter
+
+    def createcommand(self, name, func):
+        self.commands[name] = func
+
+    def deletecommand(self, name):
+        self.commands.pop(name, None)
+
+    def globalsetvar(self, name, value):
+        self.variables[name] = value
+        for modes, callback in list(self.traces.get(name, [])):
+            if "write" in modes and callback in self.commands:
+                self.commands[callback](name, "", "write")
+
+    def globalgetvar(self, name):
+        if name not in self.variables:
+            raise tk.TclError('can\'t read "%s": no such variable' % name)
+        return self.variables[name]
+
+    def globalunsetvar(self, name):
+        self.variables.pop(name, None)
+
+    setvar = globalsetvar
+    getvar = globalgetvar
+    unsetvar = globalunsetvar
+
+    @staticmethod
+    def getint(value):
+        return int(float(value)) if isinstance(value, str) else int(value)
+
+    @staticmethod
+    def getdouble(value):
+        return float(value)
+
+    @staticmethod
+    def getboolean(value):
+        if isinstance(value, str):
+            return value.lower() in ("1", "true", "yes", "on")
+        return bool(value)
+
+    @staticmethod
+    def splitlist(value):
+        return split_tcl_list(value)
+
+    split = splitlist
+
+    @staticmethod
+    def wantobjects():
+        return 1
+
+    def run_pending(self, wait=False):
+        """Run the 'after' callbacks that are due (or all of them when wait is true)."""
+        while self._timers and not self._quit:
+            due, _, _, command, _ = self._timers[0]
+            if not wait and due > time.monotonic():
+                break
+            heapq.heappop(self._timers)
+            if wait:
+                time.sleep(max(0.0, due - time.monotonic()))
+            if command in self.commands:
+                self.commands[command]()
+
+    def run_idle(self):
+        """Run the idle callbacks scheduled so far, like 'update idletasks' (the timers keep waiting)."""
+        idle = sorted(timer for timer in self._timers if timer[4])
+        if not idle:
+            return
+        self._timers = [timer for timer in self._timers if not timer[4]]
+        heapq.heapify(self._timers)
+        for _, _, _, command, _ in idle:
+            if command in self.commands:
+                self.commands[command]()
+
+    def mainloop(self, threshold=0):
+        self._quit = False
+        self.run_pending(wait=True)
+
+    def quit(self):
+        self._quit = True
+
+    def dooneevent(self, flags=0):
+        self.run_pending()
+        return 0
+
+
+class HeadlessTk(tk.Tk):
+    """
+    A tkinter root window backed by a HeadlessInterpreter instead of Tcl/Tk.
+
+    The application classes (Toolbar, DrawingCanvas, Menu) can be created on it without a display, for benchmarks,
+    replays and tests. Exceptions raised in callbacks propagate instead of being printed.
+    """
+
+    def __init__(self):
+        self.master = None
+        self.children = {}
+        self._tkloaded = True
+        self.tk = HeadlessInterpreter()
+        if tk._support_default_root and tk._default_root is None:
+            tk._default_root = self
+
+    def report_callback_exception(self, exc, val, tb):
+        raise val
+
+    def canvas_model(self, canvas):
+        """Get the headless model behind a canvas widget, to inspect its items directly."""
+        return self.tk.widgets[canvas._w]
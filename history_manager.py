@@ -0,0 +1,633 @@
+import heapq
+from collections import deque
+from contextlib import contextmanager
+from itertools import chain
+from operator import itemgetter
+
+DEFAULT_HISTORY_BUDGET = 16 * 1024 * 1024  # Memory budget of the undo/redo history in bytes
+OFFSCREEN_TAG = "offscreen_view"  # Tag of the image of the offscreen render mode (the lowest helper item)
+# Tags of helper items, never recorded (they're raised above the drawing in this order)
+IGNORED_TAGS = (OFFSCREEN_TAG, "highlight", "selection_overlay", "preview", "perf_overlay")
+SELECTED_TAG = "selected"  # Tag of the selected items
+TRANSIENT_TAGS = ("current", SELECTED_TAG)  # Tags that are not part of the recorded data of an item
+CACHE_TAG = "layer_cache"  # Tag of the bitmaps of the cached layers, never recorded (but kept in their layer)
+_ITEM_OVERHEAD = 64  # Approximate size in bytes of a recorded item without its coordinates
+_COORD_SIZE = 8  # Approximate size in bytes of one recorded coordinate
+_ALIAS_SIZE = 96  # Approximate size in bytes of the alias of a restored item
+_NEIGHBOR_LOOKUPS = 64  # Most items captured by looking up the item below each, instead of reading the drawing order
+_ORDER_TAG = "capturing"  # Temporary tag of the captured items, to read their drawing order
+_RUN_TAG_PREFIX = "restoring:"  # Temporary tag of the restored items of each run of items next to each other
+
+
+class _ItemsDelta:
+    """
+    Delta for items created or removed by an operation.
+
+    While the items are on the canvas only their ids are kept. When they are removed (by the operation itself or by
+    undoing a creation) they are captured as snapshots, so the delta always holds just enough to toggle back.
+    """
+
+    def __init__(self, ids=None, snapshots=None):
+        self.ids = list(ids) if ids is not None else None
+        self.snapshots = snapshots
+
+    def undo(self, history):
+        self._toggle(history)
+
+    def redo(self, history):
+        self._toggle(history)
+
+    def _toggle(self, history):
+        """Remove the items if they are on the canvas, otherwise restore them in one batch."""
+        if self.snapshots is None:
+            self.snapshots = history.capture(self.ids)
+            history.canvas.remove_items(history.resolve_all(self.ids, uncull=False))
+            self.ids = None
+        else:
+            self.ids = history.restore(self.snapshots)
+            self.snapshots = None
+
+    def size(self):
+        if self.snapshots is None:
+            return len(self.ids) * _COORD_SIZE
+        return sum(_snapshot_size(snapshot) for snapshot in self.snapshots)
+
+    def references(self):
+        if self.snapshots is None:
+            return self.ids
+        return [item for snapshot in self.snapshots for item in (snapshot["id"], snapshot["below"])]
+
+
+class _MoveDelta:
+    """Delta for items translated by (dx, dy), in document coordinates like all the recorded coordinates."""
+
+    def __init__(self, ids, dx, dy):
+        self.ids = list(ids)
+        self.dx = dx
+        self.dy = dy
+
+    def undo(self, history):
+        zoom = history.canvas.viewport.zoom
+        for item in history.resolve_all(self.ids):
+            history.canvas.move(item, -self.dx * zoom, -self.dy * zoom)
+
+    def redo(self, history):
+        zoom = history.canvas.viewport.zoom
+        for item in history.resolve_all(self.ids):
+            history.canvas.move(item, self.dx * zoom, self.dy * zoom)
+
+    def size(self):
+        return _ITEM_OVERHEAD + len(self.ids) * _COORD_SIZE
+
+    def references(self):
+        return self.ids
+
+
+class _ScaleDelta:
+    """Delta for items scaled from an origin."""
+
+    def __init__(self, ids, x_origin, y_origin, x_scale, y_scale):
+        self.ids = list(ids)
+        self.origin = (x_origin, y_origin)
+        self.factors = (x_scale, y_scale)
+
+    def undo(self, history):
+        origin = history.canvas.viewport.to_screen(self.origin)
+        for item in history.resolve_all(self.ids):
+            history.canvas.scale(item, *origin, 1 / self.factors[0], 1 / self.factors[1])
+
+    def redo(self, history):
+        origin = history.canvas.viewport.to_screen(self.origin)
+        for item in history.resolve_all(self.ids):
+            history.canvas.scale(item, *origin, *self.factors)
+
+    def size(self):
+        return _ITEM_OVERHEAD + len(self.ids) * _COORD_SIZE
+
+    def references(self):
+        return self.ids
+
+
+class _CoordsDelta:
+    """Delta for items whose coordinates changed (resized, rotated...)."""
+
+    def __init__(self, before, after):
+        self.before = before  # Item -> coordinates
+        self.after = after
+
+    def undo(self, history):
+        self._apply(history, self.before)
+
+    def redo(self, history):
+        self._apply(history, self.after)
+
+    def _apply(self, history, coords):
+        to_screen = history.canvas.viewport.to_screen
+        history.canvas.set_coords_batch({item: to_screen(values) for item, values in
+                                         zip(history.resolve_all(coords), coords.values())})
+
+    def size(self):
+        return sum(2 * _ITEM_OVERHEAD + (len(self.before[item]) + len(self.after[item])) * _COORD_SIZE
+                   for item in self.before)
+
+    def references(self):
+        return self.before.keys()
+
+
+class _ConfigDelta:
+    """Delta for item options that changed (only the changed options are kept)."""
+
+    def __init__(self, item, before, after):
+        self.item = item
+        self.before = before
+        self.after = after
+
+    def undo(self, history):
+        history.canvas.itemconfigure(history.resolve(self.item), **self.before)
+
+    def redo(self, history):
+        history.canvas.itemconfigure(history.resolve(self.item), **self.after)
+
+    def size(self):
+        return _ITEM_OVERHEAD + _options_size(self.before) + _options_size(self.after)
+
+    def references(self):
+        return (self.item,)
+
+
+class _GroupDelta:
+    """Delta for items and groups gathered into a group, or for a group that was dissolved."""
+
+    def __init__(self, tag, units, grouped):
+        self.tag = tag
+        self.units = list(units)  # Item ids and tags of the groups in the group
+        self.grouped = grouped
+
+    def undo(self, history):
+        self._apply(history, not self.grouped)
+
+    def redo(self, history):
+        self._apply(history, self.grouped)
+
+    def _apply(self, history, group):
+        groups = history.canvas.groups
+        if group:
+            groups.group(history.resolve_all(self.units), tag=self.tag)
+        elif self.tag in groups:
+            groups.ungroup(self.tag)
+
+    def size(self):
+        return _ITEM_OVERHEAD + len(self.units) * _COORD_SIZE
+
+    def references(self):
+        return self.units
+
+
+class _OrderDelta:
+    """Delta for an item that changed its place in the drawing order."""
+
+    def __init__(self, item, below_before, below_after):
+        self.item = item
+        self.below_before = below_before
+        self.below_after = below_after
+
+    def undo(self, history):
+        history.place_above(history.resolve(self.item), self.below_before)
+
+    def redo(self, history):
+        history.place_above(history.resolve(self.item), self.below_after)
+
+    def size(self):
+        return _ITEM_OVERHEAD
+
+    def references(self):
+        return self.item, self.below_before, self.below_after
+
+
+class _LayersDelta:
+    """Delta for layers that were added, removed, renamed, reordered, shown, hidden, locked or cached."""
+
+    def __init__(self, before, after):
+        self.before = before  # Snapshots of LayerManager.state()
+        self.after = after
+
+    def undo(self, history):
+        history.canvas.layers.set_state(self.before)
+
+    def redo(self, history):
+        history.canvas.layers.set_state(self.after)
+
+    def size(self):
+        return _ITEM_OVERHEAD * (len(self.before[1]) + len(self.after[1]))
+
+    def references(self):
+        return ()
+
+
+class _StyleDelta:
+    """Delta for a style whose options changed, with all the shapes of that style."""
+
+    def __init__(self, index, before, after):
+        self.index = index  # Index of the style in the StyleTable of the canvas
+        self.before = before
+        self.after = after
+
+    def undo(self, history):
+        history.canvas.styles.set_style(self.index, self.before)
+
+    def redo(self, history):
+        history.canvas.styles.set_style(self.index, self.after)
+
+    def size(self):
+        return _ITEM_OVERHEAD + _options_size(self.before) + _options_size(self.after)
+
+    def references(self):
+        return ()
+
+
+class HistoryManager:
+    """
+    Undo/redo history of the drawing canvas.
+
+    Every entry is a list of compact inverse deltas (created/removed items, moves, scaling, coordinate changes, option
+    changes, groups, drawing order, layer and style changes) instead of a snapshot of the whole drawing. The history
+    keeps its approximate memory usage under a configurable budget by evicting the oldest entries first.
+
+    Items restored by an undo or a redo get new ids: the history keeps an alias from the recorded id to the new one,
+    counted in its memory usage. The aliases only the evicted entries referred to are dropped once a quarter of the
+    budget has been evicted, so the remaining entries are scanned for references in proportion to what was recorded.
+    """
+
+    def __init__(self, canvas, max_bytes=DEFAULT_HISTORY_BUDGET):
+        """
+        Initialize the HistoryManager.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas whose operations are recorded.
+            max_bytes (int): Memory budget of the history in bytes.
+        """
+        self.canvas = canvas
+        self.max_bytes = max_bytes
+        self._undo_stack = deque()  # Entries as [deltas, size] pairs, oldest first
+        self._redo_stack = []
+        self._aliases = {}  # Old item id -> id of the item that replaced it after a restore
+        self._pending = None  # Deltas collected inside group()
+        self._group_depth = 0
+        self._total_bytes = 0
+        self._dropped_bytes = 0  # Size of the entries dropped since the aliases were last pruned
+        self.on_change = None  # Called without arguments after an undo or a redo
+
+    @property
+    def memory_usage(self):
+        """Get the approximate memory used by the history (its entries and aliases) in bytes."""
+        return self._total_bytes
+
+    def can_undo(self):
+        return bool(self._undo_stack)
+
+    def can_redo(self):
+        return bool(self._redo_stack)
+
+    @contextmanager
+    def group(self):
+        """Collect every delta recorded inside the block into a single history entry."""
+        if self._group_depth == 0:
+            self._pending = []
+        self._group_depth += 1
+        try:
+            yield
+        finally:
+            self._group_depth -= 1
+            if self._group_depth == 0:
+                deltas, self._pending = self._pending, None
+                if deltas:
+                    self._push(deltas)
+
+    def record_create(self, ids):
+        """Record items that were just created on the canvas."""
+        ids = [item for item in ids if item]
+        if ids:
+            self._record(_ItemsDelta(ids=ids))
+
+    def record_delete(self, ids):
+        """Record items that are about to be removed from the canvas. Must be called before deleting them."""
+        snapshots = self.capture(ids)
+        if snapshots:
+            self._record(_ItemsDelta(snapshots=snapshots))
+
+    def record_move(self, ids, dx, dy):
+        """Record items that were moved by (dx, dy) pixels."""
+        ids = [item for item in ids if item]
+        if ids and (dx or dy):
+            zoom = self.canvas.viewport.zoom
+            self._record(_MoveDelta(ids, dx / zoom, dy / zoom))
+
+    def record_scale(self, ids, x_origin, y_origin, x_scale, y_scale):
+        """Record items that were scaled from (x_origin, y_origin) by (x_scale, y_scale)."""
+        ids = [item for item in ids if item]
+        if ids and x_scale and y_scale and (x_scale, y_scale) != (1, 1):
+            x_origin, y_origin = self.canvas.viewport.to_document([x_origin, y_origin])
+            self._record(_ScaleDelta(ids, x_origin, y_origin, x_scale, y_scale))
+
+    def record_coords(self, before, after=None):
+        """
+        Record items whose coordinates changed. before (and after, if known) map every item to its coordinates before
+        (and after) the change.
+        """
+        if after is None:
+            after = {item: list(self.canvas.coords(item)) for item in before}
+        before = {item: list(coords) for item, coords in before.items() if list(coords) != after[item]}
+        if before:
+            to_document = self.canvas.viewport.to_document
+            self._record(_CoordsDelta({item: to_document(coords) for item, coords in before.items()},
+                                      {item: to_document(after[item]) for item in before}))
+
+    def record_config(self, item, before, after):
+        """Record options of an item that changed from before to after."""
+        before = {key: value for key, value in before.items() if after.get(key) != value}
+        after = {key: after[key] for key in before}
+        if item and before:
+            self._record(_ConfigDelta(item, before, after))
+
+    def record_group(self, tag, units):
+        """Record a group that was just created from items and groups."""
+        self._record(_GroupDelta(tag, units, grouped=True))
+
+    def record_ungroup(self, tag, units):
+        """Record a group that was just dissolved into the items and groups it contained."""
+        self._record(_GroupDelta(tag, units, grouped=False))
+
+    def record_order(self, item, below_before):
+        """Record an item that was just raised or lowered. below_before is the item it was above before."""
+        if item:
+            self._record(_OrderDelta(item, below_before, self.item_below(item)))
+
+    def record_layers(self, before, after):
+        """Record a change of the layers, from a LayerManager.state() snapshot to another."""
+        if before != after:
+            self._record(_LayersDelta(before, after))
+
+    def record_style(self, index, before, after):
+        """Record options of a style of the StyleTable that changed from before to after."""
+        if before != after:
+            self._record(_StyleDelta(index, before, after))
+
+    def undo(self, event=None):
+        """Undo the most recent history entry."""
+        if self._undo_stack:
+            entry = self._undo_stack.pop()
+            for delta in reversed(entry[0]):
+                delta.undo(self)
+            self._update_size(entry)
+            self._redo_stack.append(entry)
+            if self.on_change is not None:
+                self.on_change()
+
+    def redo(self, event=None):
+        """Redo the most recently undone history entry."""
+        if self._redo_stack:
+            entry = self._redo_stack.pop()
+            for delta in entry[0]:
+                delta.redo(self)
+            self._update_size(entry)
+            self._undo_stack.append(entry)
+            if self.on_change is not None:
+                self.on_change()
+
+    def clear(self):
+        """Forget the whole history."""
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        self._aliases.clear()
+        self._total_bytes = 0
+        self._dropped_bytes = 0
+
+    def resolve(self, item, uncull=True):
+        """
+        Get the current id of an item that may have been restored under a new id. An item culled by the viewport is
+        created again, unless uncull is False.
+        """
+        while item in self._aliases:
+            item = self._aliases[item]
+        if uncull and item in self.canvas.viewport.culled:
+            item = self.canvas.viewport.uncull([item]).get(item, item)
+        return item
+
+    def resolve_all(self, ids, uncull=True):
+        """Get the current ids of items, creating the culled ones again in one batch unless uncull is False."""
+        ids = [self.resolve(item, uncull=False) for item in ids]
+        viewport = self.canvas.viewport
+        if uncull and viewport.culled:
+            created = viewport.uncull(ids)
+            ids = [created.get(item, item) for item in ids]
+        return ids
+
+    def alias(self, item, new_item):
+        """Record that an item was created again under a new id."""
+        if item not in self._aliases:
+            self._total_bytes += _ALIAS_SIZE
+        self._aliases[item] = new_item
+
+    def capture(self, ids):
+        """
+        Capture snapshots of items in drawing order, in document coordinates. Items culled by the viewport are
+        captured from their data, and every snapshot then has the order key of its item.
+
+        Returns:
+            list: One snapshot dictionary per item with its data and the item it was drawn above.
+        """
+        ids = set(self.resolve_all(ids, uncull=False))
+        snapshots = []
+        for item, below in self._neighbors(ids):
+            data = self.capture_item(item)
+            if data is not None:
+                snapshots.append({"id": item, "below": below, "data": data})
+
+        viewport = self.canvas.viewport
+        if viewport.culled:
+            keys = viewport.keys()
+            for snapshot in snapshots:
+                snapshot["key"] = keys[snapshot["id"]]
+            snapshots = list(heapq.merge(snapshots, viewport.capture(ids), key=itemgetter("key")))
+        return snapshots
+
+    def _neighbors(self, ids):
+        """
+        Get the (item, item below it) of the items on the canvas among ids, in drawing order.
+
+        A few items are looked up one by one (their order is read through a temporary tag), so deleting an object
+        doesn't read the whole drawing order; many items are found with a single pass over the drawing order.
+        """
+        canvas = self.canvas
+        if len(ids) > _NEIGHBOR_LOOKUPS:
+            ignored = set(self._ignored_items())
+            neighbors = []
+            previous = None
+            for item in canvas.find_all():
+                if item not in ignored:
+                    if item in ids:
+                        neighbors.append((item, previous))
+                    previous = item
+            return neighbors
+        if len(ids) == 1:
+            items = [item for item in ids if item > 0 and canvas.type(item)]
+        else:
+            widget = canvas._w
+            canvas.tk.eval("\n".join(f"{widget} addtag {_ORDER_TAG} withtag {item}" for item in ids if item > 0))
+            items = canvas.find_withtag(_ORDER_TAG)
+            canvas.tk.call(widget, "dtag", _ORDER_TAG, _ORDER_TAG)
+        return [(item, self.item_below(item)) for item in items if not self._is_ignored(item)]
+
+    def restore(self, snapshots):
+        """
+        Recreate captured items in a single batch and put them back in their drawing order with a single Tcl script.
+
+        Returns:
+            list: The ids of the recreated items.
+        """
+        if self.canvas.viewport.culls(len(snapshots)):
+            ids = self.canvas.viewport.restore(snapshots)  # Culling the items far from the view again
+            for snapshot, item in zip(snapshots, ids):
+                self.alias(snapshot["id"], item)
+            return ids
+
+        # The shapes are created by create_items_batch, the text boxes and pictures one by one in between
+        canvas = self.canvas
+        ids = []
+        batch = []
+        for snapshot in snapshots:
+            data = snapshot["data"]
+            if "options" in data:
+                batch.append((data["type"], data["coords"], data["options"]))
+                continue
+            ids.extend(canvas.create_items_batch(batch))  # Keep the drawing order
+            batch = []
+            ids.append(canvas.create_object(data))
+        ids.extend(canvas.create_items_batch(batch))
+
+        # The items were created on top of the canvas: every run of items next to each other goes right above the
+        # item below its first item (or to the bottom of the canvas, the runs with their item below gone last)
+        widget = canvas._w
+        tagging, raising, lowering = [], [], []
+        tag = previous = None
+        for snapshot, item in zip(snapshots, ids):
+            self.alias(snapshot["id"], item)
+            if item:
+                if tag is None or snapshot["below"] != previous:
+                    tag = f"{_RUN_TAG_PREFIX}{len(raising) + len(lowering)}"
+                    below = self.resolve(snapshot["below"]) if snapshot["below"] else None
+                    if below and canvas.type(below):
+                        raising.append(f"{widget} raise {tag} {below}")
+                    else:
+                        lowering.append(f"{widget} lower {tag}")
+                tagging.append(f"{widget} addtag {tag} withtag {item}")
+            previous = snapshot["id"]
+        runs = len(raising) + len(lowering)
+        if runs:
+            canvas.tk.eval("\n".join(tagging + raising + lowering[::-1] +
+                                      [f"{widget} dtag {_RUN_TAG_PREFIX}{run}" for run in range(runs)]))
+            canvas.offscreen.created([item for item in ids if item])  # Drawn again in their new place
+            for tag in IGNORED_TAGS:
+                canvas.tag_raise(tag)  # Keep the helper items above the drawing
+        return ids
+
+    def item_below(self, item):
+        """Get the closest recorded item drawn below an item, or None if it is at the bottom."""
+        below = self.canvas.find_below(item)
+        while below and self._is_ignored(below[0]):
+            below = self.canvas.find_below(below[0])
+        return below[0] if below else None
+
+    def place_above(self, item, below):
+        """Put an item directly above another item, or at the bottom if there is none."""
+        below = self.resolve(below) if below else None
+        if below and self.canvas.type(below):
+            self.canvas.tag_raise(item, below)
+        else:
+            self.canvas.tag_lower(item)
+
+    def _record(self, delta):
+        if self._pending is not None:
+            self._pending.append(delta)
+        else:
+            self._push([delta])
+
+    def _push(self, deltas):
+        entry = [deltas, 0]
+        self._update_size(entry)
+        self._undo_stack.append(entry)
+        dropped = sum(redo_entry[1] for redo_entry in self._redo_stack)
+        self._total_bytes -= dropped
+        self._redo_stack.clear()
+        self._evict(dropped)
+
+    def _update_size(self, entry):
+        size = sum(delta.size() for delta in entry[0])
+        self._total_bytes += size - entry[1]
+        entry[1] = size
+
+    def _evict(self, dropped=0):
+        """
+        Drop the oldest entries until the history fits its memory budget (the newest entry is always kept), and the
+        aliases no entry refers to anymore once enough was dropped, or if they don't fit the budget themselves.
+
+        Parameters:
+            dropped (int): Size of the entries just dropped from the redo stack.
+        """
+        while self._total_bytes > self.max_bytes and len(self._undo_stack) > 1:
+            size = self._undo_stack.popleft()[1]
+            self._total_bytes -= size
+            dropped += size
+        self._dropped_bytes += dropped
+        if self._aliases and (4 * self._dropped_bytes >= self.max_bytes or self._total_bytes > self.max_bytes):
+            self._prune_aliases()
+
+    def _prune_aliases(self):
+        """Drop the aliases of the ids no entry refers to, and shorten the chains of aliases of the others."""
+        aliases = self._aliases
+        referenced = {item for entry in chain(self._undo_stack, self._redo_stack) for delta in entry[0]
+                      for item in delta.references() if item in aliases}
+        self._aliases = {item: self.resolve(item, uncull=False) for item in referenced}
+        self._total_bytes -= (len(aliases) - len(self._aliases)) * _ALIAS_SIZE
+        self._dropped_bytes = 0
+
+    def capture_item(self, item):
+        """
+        Get the data needed to recreate an item (in document coordinates), keeping only the options that differ from
+        their defaults.
+        """
+        item_type = self.canvas.type(item)
+        if item_type in ("window", "image"):
+            data = self.canvas.serialize_item(item)
+            if data is not None:
+                tags = [tag for tag in self.canvas.gettags(item) if tag not in TRANSIENT_TAGS]
+                if tags:
+                    data["tags"] = tags  # The group and layer tags
+            return data
+
+        options = {}
+        for name, value in self.canvas.itemconfigure(item).items():
+            if name == "tags":
+                tags = [tag for tag in self.canvas.tk.splitlist(value[-1]) if tag not in TRANSIENT_TAGS]
+                if tags:
+                    options[name] = tags
+            elif value[-1] != value[-2]:
+                options[name] = value[-1]
+        return {"type": item_type, "coords": self.canvas.viewport.to_document(self.canvas.coords(item)),
+                "options": options}
+
+    def _is_ignored(self, item):
+        return any(tag in IGNORED_TAGS or tag == CACHE_TAG for tag in self.canvas.gettags(item))
+
+    def _ignored_items(self):
+        return [item for tag in IGNORED_TAGS + (CACHE_TAG,) for item in self.canvas.find_withtag(tag)]
+
+
+def _options_size(options):
+    return sum(len(str(key)) + len(str(value)) for key, value in options.items())
+
+
+def _snapshot_size(snapshot):
+    data = snapshot["data"]
+    size = _ITEM_OVERHEAD + len(data.get("coords") or ()) * _COORD_SIZE
+    return size + _options_size(data.get("options") or {}) + len(data.get("text_content") or "")
@@ -0,0 +1,136 @@
+"""
+Recording of the mouse events of the drawing tools, to replay real sessions as performance and correctness tests.
+
+The recorder captures the press, motion, release and double-click events of the canvas, with their time, and the
+toolbar state and the view before every press. A recording holds the drawing it started from and the hash of the
+drawing it ended with, so a replay (python -m benchmarks.replay session.json) can check it draws the same.
+"""
+import time
+
+RECORDING_VERSION = 1
+PHASE_CODES = {"press": "p", "motion": "m", "release": "r", "double": "d"}  # Event phase -> code in the recording
+STATE_CODE = "s"  # Code of the toolbar state and view entries
+HASH_DECIMALS = 3  # Decimals of the coordinates hashed by drawing_hash
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, HASH_DECIMALS) + 0.0  # Without the sign of -0.0
+    if isinstance(value, dict):
+        return {key: _rounded(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item) for item in value]
+    return value
+
+
+def drawing_hash(drawing_data):
+    """
+    Get a hash of drawing data, equal for drawings with the same objects, pictures, layers and groups.
+
+    The coordinates are rounded first, so the rounding errors of zooming and panning in a different order don't
+    change the hash.
+    """
+    import hashlib  # Imported on first use, like json and gzip, to keep the startup fast
+    import json
+
+    encoded = json.dumps(_rounded(drawing_data), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def read_recording(filename):
+    """
+    Read a recording file (compressed if its name ends with .gz).
+
+    Returns:
+        dict: The recording, as returned by InputRecorder.stop.
+    """
+    import gzip
+    import json
+
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rt") as file:
+        recording = json.load(file)
+    if recording.get("version") != RECORDING_VERSION:
+        raise ValueError("unsupported recording version: %r" % recording.get("version"))
+    return recording
+
+
+def write_recording(filename, recording):
+    """Write a recording to a file (compressed if its name ends with .gz)."""
+    import gzip
+    import json
+
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "wt") as file:
+        json.dump(recording, file, separators=(",", ":"))
+
+
+class InputRecorder:
+    """
+    Records the mouse events of the drawing tools.
+
+    Every event is kept as [time in ms, phase code, x, y]; before a press or a double-click whose toolbar state or
+    view differ from the previous ones, a [time in ms, "s", state] entry holds the new toolbar state (see
+    Toolbar.get_state) and the view as "view": [zoom, x, y].
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the InputRecorder.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas whose events are recorded.
+        """
+        self.canvas = canvas
+        self.recording = False
+        self._start = None
+        self._drawing = None  # Drawing data when the recording started
+        self._events = []
+        self._state = None  # Latest recorded state
+
+    def __len__(self):
+        """Get the number of events recorded so far."""
+        return sum(1 for entry in self._events if entry[1] != STATE_CODE)
+
+    def start(self):
+        """Start a new recording from the current drawing."""
+        self._drawing = self.canvas.get_drawing_data()
+        self._events = []
+        self._state = None
+        self._start = time.perf_counter()
+        self.recording = True
+
+    def stop(self):
+        """
+        Stop recording.
+
+        Returns:
+            dict: The recording: the canvas size, the drawing it started from, the events and the final drawing hash.
+        """
+        self.recording = False
+        canvas = self.canvas
+        return {
+            "version": RECORDING_VERSION,
+            "size": [canvas.winfo_width(), canvas.winfo_height()],
+            "duration_ms": round((time.perf_counter() - self._start) * 1000, 1),
+            "drawing": self._drawing,
+            "events": self._events,
+            "hash": drawing_hash(canvas.get_drawing_data()),
+        }
+
+    def record(self, phase, event):
+        """
+        Record an event (called by the canvas before handling it, while recording).
+
+        Parameters:
+            phase (str): "press", "motion", "release" or "double".
+            event (tk.Event): The mouse event.
+        """
+        elapsed = round((time.perf_counter() - self._start) * 1000, 1)
+        if phase in ("press", "double"):
+            viewport = self.canvas.viewport
+            state = dict(self.canvas.toolbar.get_state(), view=[viewport.zoom, viewport.x, viewport.y])
+            if state != self._state:
+                self._events.append([elapsed, STATE_CODE, state])
+                self._state = state
+        self._events.append([elapsed, PHASE_CODES[phase], event.x, event.y])
@@ -0,0 +1,504 @@
+from contextlib import contextmanager
+
+from history_manager import CACHE_TAG, IGNORED_TAGS
+
+LAYER_TAG_PREFIX = "layer:"  # Prefix of the tag of each layer (every object has the tag of its layer)
+DEFAULT_LAYER_NAME = "Layer"  # Name of new layers, followed by a number
+CACHE_DELAY_MS = 150  # Delay after the last change before the bitmaps of the cached layers are rendered again
+
+
+class _Layer:
+    """A layer: its tag, its name and its flags, and the canvas image of its bitmap while it's cached."""
+
+    __slots__ = ("tag", "name", "visible", "locked", "cached", "image", "photo", "items_hidden")
+
+    def __init__(self, tag, name, visible=True, locked=False, cached=False):
+        self.tag = tag
+        self.name = name
+        self.visible = visible
+        self.locked = locked  # The objects of a locked layer can't be picked by the tools
+        self.cached = cached  # A locked layer can be drawn as a single bitmap, until it's edited again
+        self.image = None  # Canvas image of the bitmap, while the layer is cached
+        self.photo = None  # PhotoImage of the bitmap, kept alive as long as the canvas image exists
+        self.items_hidden = not visible  # Whether the objects of the layer are hidden on the canvas
+
+
+class LayerManager:
+    """
+    Named layers of the drawing, stacked bottom to top, with show/hide, lock and reorder operations.
+
+    Like the groups, the membership of the objects is kept by Tk itself: every object has the tag of its layer, so
+    hiding a layer is a single itemconfigure, reordering the layers is one raise per layer, and the undo history
+    restores the layer of deleted objects with their tags. The objects of a layer are kept together in the drawing
+    order: new objects go to the top of the active layer. A locked layer can be cached: its objects are then drawn by
+    drawing_renderer into one bitmap, shown as a single canvas image while the items are hidden, until the layer is
+    edited again or the view changes.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the LayerManager with a single layer.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the layers.
+        """
+        self.canvas = canvas
+        self._layers = []  # _Layer objects, bottom to top
+        self._next_id = 1
+        self._cache_job = None
+        self._layers.append(self._new_layer())
+        self.active = self._layers[0].tag  # Tag of the layer the new objects go to
+
+    def __len__(self):
+        return len(self._layers)
+
+    def __iter__(self):
+        """Iterate over the layers, bottom to top (the objects are read only)."""
+        return iter(self._layers)
+
+    def get(self, tag):
+        return self._by_tag(tag)
+
+    # Layer operations, recorded in the undo history
+    def add(self, name=None):
+        """Add a new layer above the active layer, and make it the active one."""
+        before = self.state()
+        layer = self._new_layer(name)
+        self._layers.insert(self._index(self.active) + 1, layer)
+        self.active = layer.tag
+        self._record(before)
+        return layer.tag
+
+    def remove(self, tag):
+        """Delete a layer and its objects (the last layer can't be deleted)."""
+        if len(self._layers) < 2:
+            self.canvas.bell()
+            return
+        layer = self._by_tag(tag)
+        canvas = self.canvas
+        with canvas.history.group():
+            self._drop_image(layer)
+            items = list(canvas.find_withtag(tag)) + canvas.viewport.find_culled(tag)
+            canvas.history.record_delete(items)
+            canvas.remove_items(items)
+            before = self.state()
+            index = self._layers.index(layer)
+            self._layers.remove(layer)
+            if self.active == tag:
+                self.active = self._layers[max(index - 1, 0)].tag
+            self._record(before)
+
+    def rename(self, tag, name):
+        before = self.state()
+        self._by_tag(tag).name = name
+        self._record(before)
+
+    def move(self, tag, offset):
+        """Move a layer up (positive offset) or down in the stack of layers."""
+        index = self._index(tag)
+        new_index = min(max(index + offset, 0), len(self._layers) - 1)
+        if new_index == index:
+            self.canvas.bell()
+            return
+        before = self.state()
+        self._layers.insert(new_index, self._layers.pop(index))
+        self._restack()
+        self._record(before)
+
+    def set_visible(self, tag, visible):
+        before = self.state()
+        layer = self._by_tag(tag)
+        layer.visible = visible
+        if not visible:
+            self._drop_image(layer)
+            self.canvas.select_tool.overlay.clear()  # Hidden objects can't stay selected
+        self._sync(layer)
+        self._schedule_caches()
+        self._record(before)
+
+    def set_locked(self, tag, locked):
+        before = self.state()
+        layer = self._by_tag(tag)
+        layer.locked = locked
+        if locked:
+            self.canvas.select_tool.overlay.clear()  # Locked objects can't stay selected
+        else:
+            self._drop_image(layer)
+            self._sync(layer)
+        self._schedule_caches()
+        self._record(before)
+
+    def set_cached(self, tag, cached):
+        """Draw a locked layer as a single bitmap, or as its objects again."""
+        before = self.state()
+        layer = self._by_tag(tag)
+        layer.cached = cached
+        if not cached:
+            self._drop_image(layer)
+            self._sync(layer)
+        self._schedule_caches()
+        self._record(before)
+
+    def select(self, tag):
+        """Make a layer the active one, which the new objects go to."""
+        self._by_tag(tag)
+        self.active = tag
+
+    def state(self):
+        """Get the layers (and the active one) as a snapshot for the undo history."""
+        return self.active, tuple((layer.tag, layer.name, layer.visible, layer.locked, layer.cached)
+                                  for layer in self._layers)
+
+    def set_state(self, state):
+        """Bring the layers back to a snapshot taken by state(), when a layer operation is undone or redone."""
+        active, snapshot = state
+        old_order = [layer.tag for layer in self._layers]
+        layers = {layer.tag: layer for layer in self._layers}
+        self._layers = []
+        for tag, name, visible, locked, cached in snapshot:
+            layer = layers.pop(tag, None) or _Layer(tag, name, visible=True)
+            layer.name, layer.visible, layer.locked, layer.cached = name, visible, locked, cached
+            if not (visible and locked and cached):
+                self._drop_image(layer)
+            self._layers.append(layer)
+        for layer in layers.values():  # Removed layers (their objects are removed by the history)
+            self._drop_image(layer)
+        if [layer.tag for layer in self._layers] != old_order:
+            self._restack()
+        for layer in self._layers:
+            self._sync(layer)
+        self.active = active
+        self._schedule_caches()
+
+    # New objects
+    def tags_for(self, tags):
+        """
+        Get the tags of a new item with the tag of the active layer, or None if the item needs none (helper items,
+        cache bitmaps and items created again with their layer).
+        """
+        if tags is None:
+            tags = ()
+        elif isinstance(tags, str):
+            tags = self.canvas.tk.splitlist(tags)
+        for tag in tags:
+            if tag in IGNORED_TAGS or tag == CACHE_TAG or tag.startswith(LAYER_TAG_PREFIX):
+                return None
+        return (*tags, self.active)
+
+    def created(self, items):
+        """Put new items of the active layer at the top of the layer (they were created on top of the canvas)."""
+        layer = self._by_tag(self.active)
+        if layer is not self._layers[-1]:
+            self.place(items, layer.tag)
+        if layer.items_hidden:
+            if layer.image is not None:
+                self.invalidate(layer.tag)  # The layer is edited, its bitmap is out of date
+            else:
+                widget = self.canvas._w
+                self.canvas.tk.eval("\n".join(f"{widget} itemconfigure {item} -state hidden" for item in items))
+
+    def place(self, items, tag=None, bottom=False):
+        """
+        Put new items at the top of their layer, when they were created on top of the canvas, or at the bottom of
+        their layer when they were lowered to the bottom of the canvas.
+
+        Parameters:
+            items (list): Ids of the items, in drawing order.
+            tag (str): Tag of the layer of all the items, or None to read the layer of every item.
+            bottom (bool): Whether the items are at the bottom of the canvas instead of the top.
+        """
+        if len(self._layers) < 2 or not items:
+            return
+        by_layer = {}
+        for item in items:
+            by_layer.setdefault(tag or self.layer_of(item), []).append(item)
+
+        # Every item goes below the lowest item of each layer above its own, from the top layer down (a layer without
+        # items is a no-op), or above the highest item of each layer below, from the bottom layer up
+        widget = self.canvas._w
+        script = []
+        for layer_tag, layer_items in by_layer.items():
+            if layer_tag not in self._tags():
+                continue
+            index = self._index(layer_tag)
+            if bottom:
+                for neighbor in self._layers[:index]:
+                    script.extend(f"{widget} raise {item} {neighbor.tag}" for item in reversed(layer_items))
+            else:
+                for neighbor in reversed(self._layers[index + 1:]):
+                    script.extend(f"{widget} lower {item} {neighbor.tag}" for item in layer_items)
+        if script:
+            self.canvas.tk.eval("\n".join(script))
+
+    def adopt(self, items, neighbor):
+        """
+        Move new items placed right above another item (like a fill placed above the shape it fills) into the layer of
+        that item, unless it's locked. Otherwise, or when neighbor is None (the items were lowered to the bottom of
+        the canvas), they go to the bottom of the active layer.
+        """
+        widget = self.canvas._w
+        tag = self.layer_of(neighbor) if neighbor is not None else None
+        if tag is not None and not self._by_tag(tag).locked:
+            if tag != self.active:
+                self.canvas.tk.eval("\n".join(f"{widget} dtag {item} {self.active}\n"
+                                              f"{widget} addtag {tag} withtag {item}" for item in items))
+            return
+        if neighbor is not None:
+            self.canvas.tk.eval("\n".join(f"{widget} lower {item}" for item in reversed(items)))
+        self.place(items, self.active, bottom=True)
+
+    # Hit-testing
+    def layer_of(self, item):
+        """Get the tag of the layer of an item, or None."""
+        return next((tag for tag in self.canvas.gettags(item) if tag.startswith(LAYER_TAG_PREFIX)), None)
+
+    def pickable(self, tag_or_id):
+        """Whether the tools can pick an item (or the first item with a tag): its layer is visible and unlocked."""
+        items = self.canvas.find_withtag(tag_or_id)
+        layer = self._by_tag(self.layer_of(items[0])) if items else None
+        return layer is None or (layer.visible and not layer.locked)
+
+    @property
+    def has_locked(self):
+        return any(layer.locked for layer in self._layers)
+
+    @contextmanager
+    def locked_hidden(self):
+        """
+        Hide the objects of the locked layers while the block looks for items on the canvas, so the tools can't pick
+        them (hidden layers are left out by Tk itself). Tk doesn't redraw in between, so nothing flickers.
+        """
+        hidden = [layer.image if layer.image is not None else layer.tag
+                  for layer in self._layers if layer.image is not None or (layer.locked and not layer.items_hidden)]
+        self._set_state(hidden, "hidden")
+        try:
+            yield
+        finally:
+            self._set_state(hidden, "")
+
+    @contextmanager
+    def live(self, hidden=False):
+        """
+        Show the objects of the cached layers instead of their bitmaps (and the objects of the hidden layers too, if
+        hidden is True) while the block reads the canvas.
+        """
+        shown = [layer for layer in self._layers if layer.image is not None or hidden and layer.items_hidden]
+        images = [layer.image for layer in shown if layer.image is not None]
+        self._set_state([layer.tag for layer in shown], "")
+        self._set_state(images, "hidden")
+        try:
+            yield
+        finally:
+            self._set_state([layer.tag for layer in shown], "hidden")
+            self._set_state(images, "")
+
+    # Drawing files
+    def get_data(self):
+        """Get the layers for a drawing file, bottom to top, or None if the drawing only has a default layer."""
+        data = [{"name": layer.name, "visible": layer.visible, "locked": layer.locked, "cached": layer.cached}
+                for layer in self._layers]
+        if len(data) == 1 and data[0] == {"name": f"{DEFAULT_LAYER_NAME} 1", "visible": True, "locked": False,
+                                          "cached": False}:
+            return None
+        return data
+
+    def item_indexes(self):
+        """Get the index of the layer of every item of the layers above the bottom one (the index saved in files)."""
+        return {item: index for tag, index in self.tag_indexes().items() for item in self.canvas.find_withtag(tag)}
+
+    def tag_indexes(self):
+        """Get the index of every layer above the bottom one, by tag."""
+        return {layer.tag: index for index, layer in enumerate(self._layers) if index}
+
+    def load_data(self, layers_data, objects):
+        """
+        Replace the layers with the layers of a drawing file (recorded in the undo history), and give the objects of
+        the file the tags of their layer.
+
+        Parameters:
+            layers_data (list): The layers of the file, as returned by get_data, or None for a single layer.
+            objects (list): The objects of the file, each with the index of its layer ("layer", 0 by default).
+
+        Returns:
+            tuple: The objects with the tags of their layer, in drawing order (layer by layer), and the position of
+                   every one of them in the file.
+        """
+        before = self.state()
+        for layer in self._layers:
+            self._drop_image(layer)
+        self._layers = [self._new_layer(data.get("name") or f"{DEFAULT_LAYER_NAME} {number}",
+                                        bool(data.get("visible", True)), bool(data.get("locked", False)),
+                                        bool(data.get("cached", False)))
+                        for number, data in enumerate(layers_data or [{}], 1)]
+        self.active = self._layers[-1].tag
+        self._record(before)
+
+        # The objects are sorted by layer (a stable sort keeps their order in each layer), and share the tags of
+        # their layer
+        tags = [[layer.tag] for layer in self._layers]
+        if len(tags) == 1:
+            indexes, positions = None, range(len(objects))
+        else:
+            indexes = [self._layer_index(obj) for obj in objects]
+            positions = sorted(range(len(objects)), key=indexes.__getitem__)
+        tagged = []
+        for position in positions:
+            data = dict(objects[position], tags=tags[indexes[position] if indexes else 0])
+            if "layer" in data:
+                del data["layer"]
+            tagged.append(data)
+        return tagged, list(positions)
+
+    def tags_of(self, data):
+        """Get the tags of the layer of an object or a picture of a drawing file."""
+        return [self._layers[self._layer_index(data)].tag]
+
+    def _layer_index(self, data):
+        return min(max(data.get("layer", 0), 0), len(self._layers) - 1)
+
+    def refresh(self):
+        """Hide the objects of the hidden layers and cache the cached ones, once a drawing was loaded."""
+        for layer in self._layers:
+            layer.items_hidden = False
+            self._sync(layer)
+        self._schedule_caches()
+
+    # Cached layers
+    def invalidate(self, tag=None):
+        """Show the objects of a cached layer (all of them for None) again, and render its bitmap again later."""
+        for layer in self._layers if tag is None else [self._by_tag(tag)]:
+            if layer.image is not None:
+                self._drop_image(layer)
+                self._sync(layer)
+        self._schedule_caches()
+
+    def view_changed(self, zoomed):
+        """Render the cached layers for the new view (the bitmaps only follow a pan, not a zoom)."""
+        if any(layer.image is not None for layer in self._layers):
+            if zoomed:
+                self.invalidate()
+            else:
+                self._schedule_caches()
+
+    def history_changed(self):
+        """
+        Show the objects of the cached layers again after an undo or a redo, which may have changed them (or restored
+        some of them hidden), and render their bitmaps again later.
+        """
+        for layer in self._layers:
+            if layer.cached and layer.visible:
+                self._drop_image(layer)
+                self.canvas.itemconfigure(layer.tag, state="")
+                self.canvas.viewport.set_culled_state(layer.tag, "")
+                layer.items_hidden = False
+        self._schedule_caches()
+
+    def clear(self):
+        """Forget the bitmaps, once the canvas was cleared (with their images)."""
+        for layer in self._layers:
+            layer.image = layer.photo = None
+            layer.items_hidden = not layer.visible
+        self._schedule_caches()
+
+    def _schedule_caches(self):
+        if not any(layer.cached for layer in self._layers):
+            return
+        if self._cache_job is not None:
+            self.canvas.after_cancel(self._cache_job)
+        self._cache_job = self.canvas.after(CACHE_DELAY_MS, self.update_caches)
+
+    def update_caches(self):
+        """Render the bitmap of every visible, locked and cached layer for the current view."""
+        self._cache_job = None
+        if self.canvas.offscreen.enabled:
+            return  # The offscreen buffer has all the objects in one bitmap already
+        for layer in self._layers:
+            if layer.cached and layer.locked and layer.visible:
+                self._cache(layer)
+
+    def _cache(self, layer):
+        """Render the objects of a layer on the canvas into a bitmap, and show it instead of them."""
+        from PIL import ImageTk  # Imported on first use, like PIL, to keep the startup fast
+        from drawing_renderer import render_image
+
+        canvas = self.canvas
+        viewport = canvas.viewport
+        self._drop_image(layer)
+        drawing_data = {"objects": [], "images": []}
+        for item in canvas.find_withtag(layer.tag):
+            data = canvas.serialize_item(item)
+            if data is None:
+                continue
+            if data["type"] == "text_box":  # In screen coordinates, like the rendered view
+                data["coord_x"], data["coord_y"] = viewport.to_screen([data["coord_x"], data["coord_y"]])
+            else:
+                data["coords"] = viewport.to_screen(data["coords"])
+            drawing_data["images" if data["type"] == "image" else "objects"].append(data)
+        if not drawing_data["objects"] and not drawing_data["images"]:
+            self._sync(layer)
+            return
+
+        x1, y1, x2, y2 = viewport.view_box()
+        width, height = round((x2 - x1) * viewport.zoom), round((y2 - y1) * viewport.zoom)
+        layer.photo = ImageTk.PhotoImage(render_image(drawing_data, width, height, background=None),
+                                         master=canvas)
+        layer.image = canvas.create_image(0, 0, anchor="nw", image=layer.photo, tags=CACHE_TAG)
+        canvas.tag_raise(layer.image, layer.tag)  # Right above the objects of the layer
+        canvas.addtag_withtag(layer.tag, layer.image)
+        canvas.itemconfigure(layer.tag, state="hidden")  # Including the objects shown since the last bitmap
+        canvas.itemconfigure(layer.image, state="")
+        if not layer.items_hidden:
+            canvas.viewport.set_culled_state(layer.tag, "hidden")
+            layer.items_hidden = True
+
+    def _drop_image(self, layer):
+        if layer.image is not None:
+            self.canvas.delete(layer.image)
+            layer.image = layer.photo = None
+
+    def _sync(self, layer):
+        """Hide the objects of a layer if it's hidden or cached, and show them otherwise."""
+        hidden = not layer.visible or layer.image is not None
+        if hidden != layer.items_hidden:
+            state = "hidden" if hidden else ""
+            self.canvas.itemconfigure(layer.tag, state=state)
+            self.canvas.viewport.set_culled_state(layer.tag, state)
+            layer.items_hidden = hidden
+        if layer.image is not None:
+            self.canvas.itemconfigure(layer.image, state="" if layer.visible else "hidden")
+
+    # Internals
+    def _new_layer(self, name=None, visible=True, locked=False, cached=False):
+        tag = f"{LAYER_TAG_PREFIX}{self._next_id}"
+        layer = _Layer(tag, name or f"{DEFAULT_LAYER_NAME} {len(self._layers) + 1}", visible, locked, cached)
+        self._next_id += 1
+        return layer
+
+    def _by_tag(self, tag):
+        for layer in self._layers:
+            if layer.tag == tag:
+                return layer
+        raise KeyError(tag)
+
+    def _tags(self):
+        return [layer.tag for layer in self._layers]
+
+    def _index(self, tag):
+        return self._tags().index(tag)
+
+    def _restack(self):
+        """Put the objects of the layers back in the order of the layers (keeping their order in each layer)."""
+        canvas = self.canvas
+        canvas.viewport.reorder({layer.tag: rank for rank, layer in enumerate(self._layers)})
+        for layer in self._layers:
+            canvas.tag_raise(layer.tag)
+        for tag in IGNORED_TAGS:
+            canvas.tag_raise(tag)  # Keep the helper items above the drawing
+
+    def _set_state(self, tags_or_ids, state):
+        call = self.canvas.tk.call
+        for tag_or_id in tags_or_ids:
+            call(self.canvas._w, "itemconfigure", tag_or_id, "-state", state)
+
+    def _record(self, before):
+        self.canvas.history.record_layers(before, self.state())
@@ -1,8 +1,9 @@
+import time
+
+_PROCESS_START = time.perf_counter()
+
 import sys
-import tkinter as tk
-from drawing_canvas import DrawingCanvas
-from toolbar import Toolbar
-from menu_manager import Menu
+from startup_profiler import StartupProfiler
 
 _WINDOW_TITLE = "Vector Drawing App"
 
@@ -10,6 +11,12 @@ _WINDOW_TITLE = "Vector Drawing App"
 def instructions():
     info = """Instructions on how to use "Vector Drawing App":
     First, open the application by running the main file main.py.
+    (run "python main.py --profile-startup" to print how long each startup phase took)
+    (run "python main.py serve --port 8765" to render saved drawings to PNG or SVG over HTTP, without a display)
+    (run "python main.py optimize drawing.json -o optimized.json" to remove the objects of a saved drawing that can't
+     be seen and merge its pen strokes)
+    (run "python main.py stats drawing.json" to report the objects, points, gradient fills, pictures, extent and
+     estimated cost of a saved drawing, "--json" for a line of JSON per file)
     The app allows you to:
     
     1. By using the toolbar:
@@ -17,7 +24,8 @@ def instructions():
     - Change the color of the pen using the "Select color" button, and the thickness of the pen and eraser using the
      thickness buttons of your choice.
     - Create shapes using the shape buttons.
-    - Filling of shapes and gradual filling of shapes using the fill buttons.
+    - Filling of shapes and gradual filling of shapes using the fill buttons, and filling of any closed region using
+     the "Bucket fill" button.
     - perform actions on an object such as move, delete, forward and backward using the appropriate buttons under
      "operations".
     - Create a text box using the "text box" button and type text into it.
@@ -26,6 +34,10 @@ def instructions():
      the appropriate buttons.
     - Several objects can be selected by the "Select objects" button (a square selection button) and initiated by
      pressing the "Move objects" button and dragging the objects on the canvas to the desired location.
+    - The selected objects can be resized by dragging the square handles around them, and rotated by dragging the
+     round handle above them.
+    - The selected objects can be grouped (Ctrl+G) so they are selected, moved and deleted together, and a selected
+     group can be ungrouped (Ctrl+Shift+G).
     - The "Clear canvas" button, cleans the canvas completely from all the objects that were on it.
     
     2. Using the menu (above the toolbar):
@@ -33,35 +45,98 @@ def instructions():
     - The "New drawing" button clears the entire board and allows you to start a new drawing on the canvas.
     - The "save" button allows you to save the drawing in a file of your choice on the computer.
     - The "open" button allows you to open a drawing file that you have already saved and want to continue working on.
+    - The "Open Recent..." button shows the drawings opened or saved last as thumbnails, or those of a folder you
+     choose ("Folder..."): click a thumbnail to open its drawing.
     - The "Export" button allows you to import your drawing into an image file.
     - The "upload picture" button allows you to upload a picture onto the canvas (you can move it and draw on it).
+    - The "Optimize Drawing" button removes the objects that can't be seen (hidden under opaque fills, painted over
+     again, or erased over nothing) and merges the pen strokes, without changing how the drawing looks, then reports
+     how many items and bytes were saved (undone in one step).
     - The "exit" button exits the application completely and closes it.
+    by "Edit":
+    - The "Undo" button (Ctrl+Z) undoes the last operation, including "Clear canvas", "New drawing" and "open".
+    - The "Redo" button (Ctrl+Y) redoes the last undone operation.
+    - The "Copy" (Ctrl+C), "Paste" (Ctrl+V) and "Duplicate" (Ctrl+D) buttons copy the selected objects, and paste or
+     duplicate them next to the originals (the copies are selected).
+    - The "Grid Array..." button clones the selected objects in a grid of rows and columns, and the "Radial Array..."
+     button clones them around a circle below them, rotating every copy.
+    - The "Group" (Ctrl+G) and "Ungroup" (Ctrl+Shift+G) buttons group the selected objects or dissolve the selected
+     groups.
+    - The "Scale Selection...", "Rotate Selection..." and "Skew Selection..." buttons transform the selected objects
+     around their center by the amounts you enter (rotated or skewed rectangles and ovals become polygons).
+    - The "Restyle Similar Objects" button gives the color and thickness of the toolbar to the selected object and to
+     every object that had the same color, outline and thickness, in one step.
+    - The "Snap to Grid" and "Snap to Objects" buttons make the shapes, the polygon points and the moved objects snap
+     to the grid (its spacing is set by "Grid Spacing...") and to the vertices and midpoints of the other objects.
+    by "View":
+    - The "Zoom In" (Ctrl+=), "Zoom Out" (Ctrl+-) and "Reset View" (Ctrl+0) buttons zoom the view of the drawing. The
+     mouse wheel zooms around the pointer, and dragging with the middle button pans the view.
+    - The "Offscreen Rendering" button draws the objects into a single picture, rendering again only the parts changed
+     by each edit (the performance overlay shows the changed area and the render time of every frame).
+    by "Layers":
+    - Pick the active layer: new objects are drawn at the top of it.
+    - The "New Layer", "Rename Layer...", "Delete Layer", "Move Layer Up" and "Move Layer Down" buttons manage the
+     layers (deleting a layer deletes its objects).
+    - The "Visible" and "Locked" buttons show or hide the active layer, and lock it so its objects can't be selected,
+     moved or filled. A locked layer can be drawn as a single picture with "Cache as Bitmap", until it's changed.
+    by "Performance":
+    - The "Profile Events" button times every mouse event per tool, the file operations and the background tasks.
+    - The "Show Overlay" button shows the live event latency, Tcl calls, item count and frame time on the canvas.
+    - The "Dump Profile..." button saves everything recorded so far in a JSON file.
+    - The "Record Input" button records the mouse events of the tools until it's turned off, then saves them in a
+     file that "python -m benchmarks.replay" replays to time the tools and check the drawing is the same.
     """
     print(info)
 
 
-def main():
+def main(profiler=None):
     """
     Main function to initialize and run the vector drawing application.
+
+    Parameters:
+        profiler (StartupProfiler): Times the startup phases, when the startup is profiled.
     """
+    profiler = profiler or StartupProfiler()
+
+    # The modules are imported here so the startup profiler can time them
+    with profiler.phase("import tkinter"):
+        import tkinter as tk
+    with profiler.phase("import toolbar"):
+        from toolbar import Toolbar
+    with profiler.phase("import drawing canvas and tools"):
+        from drawing_canvas import DrawingCanvas
+    with profiler.phase("import menu"):
+        from menu_manager import Menu
 
     # Create a Tkinter root window instance
-    root = tk.Tk()
-    root.title(_WINDOW_TITLE)
+    with profiler.phase("create window"):
+        root = tk.Tk()
+        root.title(_WINDOW_TITLE)
 
-    # Make the window full screen
-    root.attributes('-fullscreen', True)
+        # Make the window full screen
+        root.attributes('-fullscreen', True)
 
     # Create an instance of Toolbar and pack it within the root window
-    toolbar = Toolbar(root)
-    toolbar.pack()
+    with profiler.phase("create toolbar"):
+        toolbar = Toolbar(root)
+        toolbar.pack()
 
     # Create an instance of DrawingCanvas and pass the toolbar to it
-    drawing_canvas = DrawingCanvas(root, toolbar)
-    drawing_canvas.pack(fill=tk.BOTH, expand=True)
+    with profiler.phase("create drawing canvas"):
+        drawing_canvas = DrawingCanvas(root, toolbar)
+        drawing_canvas.pack(fill=tk.BOTH, expand=True)
 
     # Create an instance of Menu
-    Menu(root, canvas=drawing_canvas)
+    with profiler.phase("create menu"):
+        Menu(root, canvas=drawing_canvas)
+
+    if profiler.enabled:
+        def report_first_frame():
+            with profiler.phase("first frame"):
+                root.update_idletasks()
+            profiler.report()
+
+        root.after_idle(report_first_frame)
 
     root.mainloop()
 
@@ -73,4 +148,21 @@ if __name__ == "__main__":
         instructions()
         sys.exit()
 
-    main()
+    # check if python main.py serve has been activated (render server, without Tk)
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from render_server import serve
+        serve(sys.argv[2:])
+        sys.exit()
+
+    # check if python main.py optimize has been activated (drawing optimizer, without Tk)
+    if len(sys.argv) > 1 and sys.argv[1] == "optimize":
+        from drawing_optimizer import optimize_command
+        sys.exit(optimize_command(sys.argv[2:]))
+
+    # check if python main.py stats has been activated (drawing file statistics, without Tk)
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        from drawing_stats import stats_command
+        sys.exit(stats_command(sys.argv[2:]))
+
+    # check if python main.py --profile-startup has been activated
+    main(StartupProfiler(enabled="--profile-startup" in sys.argv[1:], start_time=_PROCESS_START))
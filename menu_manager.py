@@ -1,8 +1,73 @@
 import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import ImageGrab
-import json
+from tkinter import filedialog, messagebox, simpledialog
 from text_box_builder import TextBoxBuilder
+from drawing_canvas import decode_pictures
+from task_executor import TaskStatusBar
+
+
+def read_drawing_file(filename):
+    """
+    Read drawing data from a JSON file.
+
+    Parameters:
+        filename (str): Path of the drawing file.
+
+    Returns:
+        dict: The drawing data, with the colors of a compact file expanded.
+    """
+    import json
+    from style_table import expand_drawing
+
+    with open(filename, 'r') as file:
+        return expand_drawing(json.load(file))
+
+
+def write_drawing_file(filename, drawing_data):
+    """
+    Write drawing data to a JSON file, in the compact form sharing its colors and styles (see style_table).
+
+    Parameters:
+        filename (str): Path of the drawing file.
+        drawing_data (dict): The drawing data, as returned by DrawingCanvas.get_drawing_data.
+    """
+    import json
+    from style_table import compact_drawing
+
+    with open(filename, 'w') as file:
+        json.dump(compact_drawing(drawing_data), file)  # Write the drawing data to the JSON file
+
+
+def read_drawing(task, filename):
+    """
+    Read a drawing file and decode its pictures, in a background task.
+
+    Returns:
+        tuple: The drawing data and the decoded pictures (see decode_pictures).
+    """
+    task.progress(0, "reading file")
+    drawing_data = read_drawing_file(filename)
+    paths = [image_data["path"] for image_data in drawing_data.get("images", []) if image_data.get("path")]
+    pictures = decode_pictures(task, paths) if paths else {}
+    return drawing_data, pictures
+
+
+def optimize_drawing(task, drawing_data):
+    """
+    Optimize drawing data (see drawing_optimizer) and check it still renders the same, in a background task.
+
+    Returns:
+        tuple: The optimized drawing data, its decoded pictures (see decode_pictures) and the optimization report.
+    """
+    from drawing_optimizer import optimize, verify
+
+    task.progress(0, "optimizing")
+    optimized_data, report = optimize(drawing_data)
+    task.progress(0.5, "comparing the renderings")
+    if not verify(drawing_data, optimized_data):
+        raise ValueError("the optimized drawing doesn't render the same as the drawing")
+    paths = [image_data["path"] for image_data in optimized_data.get("images", []) if image_data.get("path")]
+    pictures = decode_pictures(task, paths) if paths else {}
+    return optimized_data, pictures, report
 
 
 class Menu:
@@ -16,11 +81,22 @@ class Menu:
         """
         self.master = master
         self.canvas = canvas
+        self.profiling = tk.BooleanVar(master, value=False)  # State of the Performance menu check buttons
+        self.overlay = tk.BooleanVar(master, value=False)
+        self.snap_to_grid = tk.BooleanVar(master, value=False)  # State of the snapping check buttons of the Edit menu
+        self.snap_to_objects = tk.BooleanVar(master, value=False)
+        self.active_layer = tk.StringVar(master)  # State of the Layers menu buttons, for the active layer
+        self.layer_visible = tk.BooleanVar(master, value=True)
+        self.layer_locked = tk.BooleanVar(master, value=False)
+        self.layer_cached = tk.BooleanVar(master, value=False)
+        self.offscreen = tk.BooleanVar(master, value=False)  # State of the View menu check button
+        self.recording = tk.BooleanVar(master, value=False)
+        self._thumbnail_index = None  # Index of the recent drawings, opened on first use
         self.create_menu()  # Initialize the menu
+        self.status_bar = TaskStatusBar(master, canvas.tasks)  # Shown while files are saved, opened or exported
+        self.canvas.profiler.watch_menu(self)
         self.text_box = TextBoxBuilder
         self.selected_object = None  # Currently selected object (if any)
-        self.objects = []  # List to store drawing objects
-        self.images = []  # List to store images
 
     def create_menu(self):
         """Creates the menu bar with various options."""
@@ -31,19 +107,74 @@ class Menu:
         file_menu = tk.Menu(menubar, tearoff=0)
         file_menu.add_command(label="New Drawing", command=self.new_drawing)
         file_menu.add_command(label="open", command=self.open_draw)
+        file_menu.add_command(label="Open Recent...", command=self.open_recent)
         file_menu.add_command(label="Save", command=self.save_drawing)
         file_menu.add_command(label="Export", command=self.export_drawing)
         file_menu.add_command(label="Upload Picture", command=self.canvas.upload_pictures)
+        file_menu.add_command(label="Optimize Drawing", command=self.optimize_drawing)
         file_menu.add_separator()
-        file_menu.add_command(label="Exit", command=self.master.quit)  # Use self.master.quit instead of self.root.quit
+        file_menu.add_command(label="Exit", command=self.exit)
         menubar.add_cascade(label="File", menu=file_menu)
 
+        # Edit menu
+        edit_menu = tk.Menu(menubar, tearoff=0)
+        edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.canvas.history.undo)
+        edit_menu.add_command(label="Redo", accelerator="Ctrl+Y", command=self.canvas.history.redo)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Copy", accelerator="Ctrl+C", command=self.canvas.clone_tool.copy)
+        edit_menu.add_command(label="Paste", accelerator="Ctrl+V", command=self.canvas.clone_tool.paste)
+        edit_menu.add_command(label="Duplicate", accelerator="Ctrl+D", command=self.canvas.clone_tool.duplicate)
+        edit_menu.add_command(label="Grid Array...", command=self.grid_array)
+        edit_menu.add_command(label="Radial Array...", command=self.radial_array)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Group", accelerator="Ctrl+G", command=self.canvas.select_tool.group_selection)
+        edit_menu.add_command(label="Ungroup", accelerator="Ctrl+Shift+G",
+                              command=self.canvas.select_tool.ungroup_selection)
+        edit_menu.add_separator()
+        edit_menu.add_command(label="Scale Selection...", command=self.scale_selection)
+        edit_menu.add_command(label="Rotate Selection...", command=self.rotate_selection)
+        edit_menu.add_command(label="Skew Selection...", command=self.skew_selection)
+        edit_menu.add_command(label="Restyle Similar Objects", command=self.canvas.select_tool.restyle_similar)
+        edit_menu.add_separator()
+        edit_menu.add_checkbutton(label="Snap to Grid", variable=self.snap_to_grid, command=self.toggle_snapping)
+        edit_menu.add_checkbutton(label="Snap to Objects", variable=self.snap_to_objects,
+                                  command=self.toggle_snapping)
+        edit_menu.add_command(label="Grid Spacing...", command=self.grid_spacing)
+        menubar.add_cascade(label="Edit", menu=edit_menu)
+
+        # View menu
+        view_menu = tk.Menu(menubar, tearoff=0)
+        view_menu.add_command(label="Zoom In", accelerator="Ctrl+=", command=self.canvas.viewport.zoom_in)
+        view_menu.add_command(label="Zoom Out", accelerator="Ctrl+-", command=self.canvas.viewport.zoom_out)
+        view_menu.add_command(label="Reset View", accelerator="Ctrl+0", command=self.canvas.viewport.reset)
+        view_menu.add_separator()
+        view_menu.add_checkbutton(label="Offscreen Rendering", variable=self.offscreen,
+                                  command=self.toggle_offscreen)
+        menubar.add_cascade(label="View", menu=view_menu)
+
+        # Layers menu, filled with the current layers whenever it's opened
+        layers_menu = tk.Menu(menubar, tearoff=0)
+        layers_menu.config(postcommand=lambda: self.fill_layers_menu(layers_menu))
+        menubar.add_cascade(label="Layers", menu=layers_menu)
+
+        # Performance menu
+        performance_menu = tk.Menu(menubar, tearoff=0)
+        performance_menu.add_checkbutton(label="Profile Events", variable=self.profiling,
+                                         command=self.toggle_profiling)
+        performance_menu.add_checkbutton(label="Show Overlay", variable=self.overlay, command=self.toggle_overlay)
+        performance_menu.add_command(label="Dump Profile...", command=self.dump_profile)
+        performance_menu.add_separator()
+        performance_menu.add_checkbutton(label="Record Input", variable=self.recording, command=self.toggle_recording)
+        menubar.add_cascade(label="Performance", menu=performance_menu)
+
         self.master.config(menu=menubar)  # Attach the menu bar to the root window
+        if getattr(self, "menubar", None) is not None:
+            self.master.after_idle(self.menubar.destroy)  # The menu bar was rebuilt, once its callback has returned
+        self.menubar = menubar
 
     def new_drawing(self):
-        """creates a new drawing by clears the canvas and resets the list of drawing objects."""
-        self.canvas.delete("all")
-        self.objects = []
+        """creates a new drawing by clears the canvas, which releases the widgets and images of its objects."""
+        self.canvas.clear_canvas()
 
     def open_draw(self):
         """Opens a drawing that saves, from a JSON file."""
@@ -52,16 +183,51 @@ class Menu:
         filename = tk.filedialog.askopenfilename(filetypes=[("JSON Files", "*.json")])
 
         if filename:
+            self.open_file(filename)
+
+    def open_file(self, filename):
+        """Opens a drawing file, read in the background."""
+
+        def loaded(result):
             try:
-                with open(filename, 'r') as file:
-                    drawing_data = json.load(file)
-                    self.canvas.load_drawing_data(drawing_data)  # Load the drawing data into the canvas
+                drawing_data, pictures = result
+                self.canvas.load_drawing_data(drawing_data, pictures)  # Load the drawing data into the canvas
+                self.remember_file(filename)
 
                 messagebox.showinfo("Success", "Drawing opened successfully!")
 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to open drawing: {e}")
 
+        self.canvas.tasks.submit("Opening drawing", read_drawing, filename, on_done=loaded,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Failed to open drawing: {e}"))
+
+    def open_recent(self):
+        """Shows the recent drawings, or those of a folder, as thumbnails to open with a click."""
+        from recent_files_panel import RecentFilesPanel
+
+        try:
+            index = self.thumbnail_index()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read the recent drawings: {e}")
+            return
+        RecentFilesPanel(self.master, index, self.canvas.tasks, self.open_file)
+
+    def thumbnail_index(self):
+        """Get the index of the recent drawings and of their thumbnails, opened on first use."""
+        if self._thumbnail_index is None:
+            from thumbnail_cache import ThumbnailIndex
+
+            self._thumbnail_index = ThumbnailIndex()
+        return self._thumbnail_index
+
+    def remember_file(self, filename):
+        """Records a drawing file just opened or saved among the recent drawings."""
+        try:
+            self.thumbnail_index().touch(filename)
+        except Exception:
+            pass  # The recent drawings are only a shortcut, opening and saving work without them
+
     def save_drawing(self):
         """Saves the current drawing as a JSON file."""
 
@@ -71,26 +237,214 @@ class Menu:
         filename = tk.filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
 
         if filename:
-            try:
-                with open(filename, 'w') as file:
-                    json.dump(drawing_data, file)  # Write the drawing data from the JSON file
-
+            # The file is written in the background, the drawing data is not used by the Tk main loop anymore
+            def saved(_):
+                self.remember_file(filename)
                 messagebox.showinfo("Success", "Drawing saved successfully!")
 
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save drawing: {e}")
+            self.canvas.tasks.submit("Saving drawing", lambda task: write_drawing_file(filename, drawing_data),
+                                     on_done=saved,
+                                     on_error=lambda e: messagebox.showerror("Error", f"Failed to save drawing: {e}"))
 
     def export_drawing(self):
         """Exports the current drawing as a PNG image."""
+        from PIL import ImageGrab
+
         file_path = filedialog.asksaveasfilename(defaultextension=".png",
                                                  filetypes=[("PNG files", "*.png"), ("All files", "*.*")])
         if file_path:
             try:
                 image = ImageGrab.grab()  # Capture the content of the canvas as an image
 
-                image.save(file_path)  # Save the image to the specified file path
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export drawing: {e}")
+                return
+
+            # Encoding and saving the image is done in the background
+            self.canvas.tasks.submit("Exporting drawing", lambda task: image.save(file_path),
+                                     on_done=lambda _: messagebox.showinfo("Success", "Drawing export successfully!"),
+                                     on_error=lambda e: messagebox.showerror("Error", f"Failed to export drawing: {e}"))
 
-                messagebox.showinfo("Success", "Drawing export successfully!")
+    def optimize_drawing(self):
+        """Optimizes the drawing (see drawing_optimizer) and reports the items and bytes saved."""
+        from drawing_optimizer import format_report
+
+        def optimized(result):
+            try:
+                optimized_data, pictures, report = result
+                if report["items_after"] < report["items_before"]:
+                    self.canvas.load_drawing_data(optimized_data, pictures)  # Undone in one step, like open
+
+                messagebox.showinfo("Optimize Drawing", format_report(report))
 
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to export drawing: {e}")
+                messagebox.showerror("Error", f"Failed to optimize drawing: {e}")
+
+        self.canvas.tasks.submit("Optimizing drawing", optimize_drawing, self.canvas.get_drawing_data(),
+                                 on_done=optimized,
+                                 on_error=lambda e: messagebox.showerror("Error", f"Failed to optimize drawing: {e}"))
+
+    def scale_selection(self):
+        """Scales the selected objects by factors asked to the user."""
+        values = self._ask_numbers("Scale Selection", "Scale (or horizontal and vertical scales):")
+        if values and len(values) <= 2 and all(values):
+            self.canvas.select_tool.scale_selection(values[0], values[-1])
+        elif values is not None:
+            messagebox.showerror("Error", "Enter one or two scales, different from 0.")
+
+    def rotate_selection(self):
+        """Rotates the selected objects by an angle asked to the user."""
+        values = self._ask_numbers("Rotate Selection", "Clockwise angle in degrees:")
+        if values and len(values) == 1:
+            self.canvas.select_tool.rotate_selection(values[0])
+        elif values is not None:
+            messagebox.showerror("Error", "Enter one angle.")
+
+    def skew_selection(self):
+        """Skews the selected objects by angles asked to the user."""
+        values = self._ask_numbers("Skew Selection", "Horizontal (and vertical) skew angle in degrees:")
+        if values and len(values) <= 2 and all(abs(value) < 90 for value in values):
+            self.canvas.select_tool.skew_selection(values[0], values[1] if len(values) == 2 else 0)
+        elif values is not None:
+            messagebox.showerror("Error", "Enter one or two angles between -90 and 90 degrees.")
+
+    def grid_array(self):
+        """Clones the selected objects in a grid of a size asked to the user."""
+        values = self._ask_numbers("Grid Array", "Rows, columns, horizontal and vertical spacing in pixels:")
+        if values and len(values) == 4 and all(value >= 1 and value == int(value) for value in values[:2]):
+            self.canvas.clone_tool.grid_array(int(values[0]), int(values[1]), values[2], values[3])
+        elif values is not None:
+            messagebox.showerror("Error", "Enter the numbers of rows and columns, and the spacing between them.")
+
+    def radial_array(self):
+        """Clones the selected objects around a circle of a size asked to the user."""
+        values = self._ask_numbers("Radial Array", "Objects around the circle (originals included) and radius:")
+        if values and len(values) == 2 and values[0] >= 2 and values[0] == int(values[0]):
+            self.canvas.clone_tool.radial_array(int(values[0]), values[1])
+        elif values is not None:
+            messagebox.showerror("Error", "Enter a number of copies of at least 2, and a radius.")
+
+    def toggle_snapping(self):
+        """Turns snapping to the grid, and to the vertices and midpoints of the objects, on or off."""
+        snapping = self.canvas.snapping
+        snapping.to_grid = self.snap_to_grid.get()
+        snapping.to_objects = self.snap_to_objects.get()
+
+    def grid_spacing(self):
+        """Sets the spacing of the snapping grid to a distance asked to the user."""
+        values = self._ask_numbers("Grid Spacing", "Distance in pixels between the grid lines:")
+        if values and len(values) == 1 and values[0] > 0:
+            self.canvas.snapping.grid_spacing = values[0]
+        elif values is not None:
+            messagebox.showerror("Error", "Enter one distance greater than 0.")
+
+    def toggle_offscreen(self):
+        """Turns the offscreen render mode on or off (its frames are reported by the performance overlay)."""
+        if self.offscreen.get():
+            self.canvas.offscreen.enable()
+        else:
+            self.canvas.offscreen.disable()
+
+    def fill_layers_menu(self, layers_menu):
+        """Fills the Layers menu with the layers (top first) and the operations on the active layer."""
+        layers = self.canvas.layers
+        active = layers.get(layers.active)
+        self.active_layer.set(active.tag)
+        self.layer_visible.set(active.visible)
+        self.layer_locked.set(active.locked)
+        self.layer_cached.set(active.cached)
+
+        layers_menu.delete(0, tk.END)
+        for layer in reversed(list(layers)):
+            layers_menu.add_radiobutton(label=layer.name, value=layer.tag, variable=self.active_layer,
+                                        command=lambda tag=layer.tag: layers.select(tag))
+        layers_menu.add_separator()
+        layers_menu.add_command(label="New Layer", command=layers.add)
+        layers_menu.add_command(label="Rename Layer...", command=self.rename_layer)
+        layers_menu.add_command(label="Delete Layer", command=lambda: layers.remove(layers.active))
+        layers_menu.add_command(label="Move Layer Up", command=lambda: layers.move(layers.active, 1))
+        layers_menu.add_command(label="Move Layer Down", command=lambda: layers.move(layers.active, -1))
+        layers_menu.add_separator()
+        layers_menu.add_checkbutton(label="Visible", variable=self.layer_visible,
+                                    command=lambda: layers.set_visible(layers.active, self.layer_visible.get()))
+        layers_menu.add_checkbutton(label="Locked", variable=self.layer_locked,
+                                    command=lambda: layers.set_locked(layers.active, self.layer_locked.get()))
+        layers_menu.add_checkbutton(label="Cache as Bitmap", variable=self.layer_cached,
+                                    state=tk.NORMAL if active.locked else tk.DISABLED,  # Only locked layers
+                                    command=lambda: layers.set_cached(layers.active, self.layer_cached.get()))
+
+    def rename_layer(self):
+        """Renames the active layer to a name asked to the user."""
+        layers = self.canvas.layers
+        name = simpledialog.askstring("Rename Layer", "Layer name:", parent=self.master,
+                                      initialvalue=layers.get(layers.active).name)
+        if name and name.strip():
+            layers.rename(layers.active, name.strip())
+        elif name is not None:
+            messagebox.showerror("Error", "Enter a layer name.")
+
+    def _ask_numbers(self, title, prompt):
+        """Asks the user for numbers separated by spaces. Returns None if cancelled, or an empty list if invalid."""
+        answer = simpledialog.askstring(title, prompt, parent=self.master)
+        if answer is None:
+            return None
+        try:
+            return [float(value) for value in answer.replace(",", " ").split()]
+        except ValueError:
+            return []
+
+    def exit(self):
+        """Cancels the background tasks and exits the application."""
+        self.canvas.tasks.shutdown()
+        self.master.quit()
+
+    def toggle_profiling(self):
+        """Turns the event profiler on or off."""
+        profiler = self.canvas.profiler
+        if self.profiling.get():
+            profiler.enable()
+        else:
+            profiler.disable()
+        self.overlay.set(profiler.overlay_visible)
+
+    def toggle_overlay(self):
+        """Shows or hides the live performance overlay on the canvas (showing it turns the profiler on)."""
+        profiler = self.canvas.profiler
+        if self.overlay.get():
+            profiler.show_overlay()
+        else:
+            profiler.hide_overlay()
+        self.profiling.set(profiler.enabled)
+
+    def toggle_recording(self):
+        """Starts recording the tool events, or stops and saves the recording to a file."""
+        recorder = self.canvas.recorder
+        if self.recording.get():
+            recorder.start()
+            return
+
+        recording = recorder.stop()
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json"),
+                                                                                     ("Compressed JSON", "*.gz")])
+
+        if filename:
+            from input_recorder import write_recording
+
+            # The file is written in the background, the recording is not used by the Tk main loop anymore
+            self.canvas.tasks.submit(
+                "Saving recording", lambda task: write_recording(filename, recording),
+                on_done=lambda _: messagebox.showinfo("Success", "Recording saved successfully!"),
+                on_error=lambda e: messagebox.showerror("Error", f"Failed to save recording: {e}"))
+
+    def dump_profile(self):
+        """Writes the recorded event profile to a JSON file."""
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+
+        if filename:
+            try:
+                self.canvas.profiler.dump_profile(filename)
+
+                messagebox.showinfo("Success", "Profile saved successfully!")
+
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save profile: {e}")
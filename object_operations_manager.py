@@ -9,8 +9,14 @@ class ObjectOperationsTools:
         """
         self.canvas = canvas
         self.selected_object = None  # Currently selected object
+        self.selected_unit = None  # The selected object, or the tag of the outermost group containing it
         self.prev_x = None  # Previous x-coordinate (for tracking movement)
         self.prev_y = None  # Previous y-coordinate (for tracking movement)
+        self._moved_x = 0  # Total x-distance of the current move (for the undo history)
+        self._moved_y = 0  # Total y-distance of the current move (for the undo history)
+        self._grab_x = 0  # Offset from the pointer to the point of the object that snaps
+        self._grab_y = 0
+        self._moved_items = ()  # Items of the object (or its group) being moved, while snapping is on
 
     def select_object(self, event):
         """
@@ -24,13 +30,27 @@ class ObjectOperationsTools:
 
         if items:
             self.selected_object = items[0]
-            self.prev_x, self.prev_y = x, y  # Record initial coordinates for movement
+            self.selected_unit = self.canvas.groups.unit_of(self.selected_object)  # Groups move and are deleted whole
+            self._moved_x, self._moved_y = 0, 0
+
+            # With snapping, the vertex of the object closest to the click (or else the clicked point) is the point
+            # that follows the pointer and snaps
+            snapping = self.canvas.snapping
+            self._moved_items = set(self.canvas.find_withtag(self.selected_unit)) if snapping.enabled else ()
+            self.prev_x, self.prev_y = snapping.nearest_vertex(x, y, self._moved_items) or (x, y)
+            self._grab_x, self._grab_y = self.prev_x - x, self.prev_y - y
 
     def release_object(self):
         """
         Release the selected object on the canvas when the user releases the mouse click.
         """
+        if self.selected_object:
+            moved = self.canvas.find_withtag(self.selected_unit)  # The object, or its whole group
+            self.canvas.history.record_move(moved, self._moved_x, self._moved_y)
         self.selected_object = None  # Deselect the object
+        self.selected_unit = None
+        self._moved_items = ()
+        self._moved_x, self._moved_y = 0, 0
 
     def move_object(self, event):
         """
@@ -40,15 +60,18 @@ class ObjectOperationsTools:
             event (tk.Event): The mouse event containing the new coordinates.
         """
         if self.selected_object:
-            new_x, new_y = event.x, event.y
+            new_x, new_y = self.canvas.snapping.snap(event.x + self._grab_x, event.y + self._grab_y,
+                                                     exclude=self._moved_items)
 
             if self.prev_x is not None and self.prev_y is not None:
                 # Calculate the movement distance
                 dx = new_x - self.prev_x
                 dy = new_y - self.prev_y
 
-                # Move the object by the calculated distance
-                self.canvas.move(self.selected_object, dx, dy)
+                # Move the object (or its whole group) by the calculated distance
+                self.canvas.move(self.selected_unit, dx, dy)
+                self._moved_x += dx
+                self._moved_y += dy
 
                 self.prev_x, self.prev_y = new_x, new_y  # Update previous coordinates
 
@@ -57,18 +80,28 @@ class ObjectOperationsTools:
         Delete the selected object on the canvas.
         """
         if self.selected_object:
-            self.canvas.delete(self.selected_object)
+            items = self.canvas.find_withtag(self.selected_unit)  # The object, or its whole group
+            self.canvas.history.record_delete(items)
+            self.canvas.remove_items(items)
+            self.selected_object = None
+            self.selected_unit = None
 
     def move_forward(self):
         """
-        Move the selected object forward by bringing it to the front of the drawing order.
+        Move the selected object forward by bringing it to the front of its layer.
         """
         if self.selected_object:
+            below = self.canvas.history.item_below(self.selected_object)
             self.canvas.tag_raise(self.selected_object)
+            self.canvas.layers.place([self.selected_object])  # Back under the layers above its own
+            self.canvas.history.record_order(self.selected_object, below)
 
     def move_backward(self):
         """
-        Move the selected object backward by sending it to the back of the drawing order.
+        Move the selected object backward by sending it to the back of its layer.
         """
         if self.selected_object:
+            below = self.canvas.history.item_below(self.selected_object)
             self.canvas.tag_lower(self.selected_object)
+            self.canvas.layers.place([self.selected_object], bottom=True)  # Back over the layers below its own
+            self.canvas.history.record_order(self.selected_object, below)
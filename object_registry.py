@@ -0,0 +1,66 @@
+class ObjectRegistry:
+    """
+    Keeps the resources behind canvas items: the Frame and Text widgets of text boxes and the PhotoImages of pictures.
+
+    Deleting a canvas item doesn't free the widget or the image it displays, so every removal of items goes through
+    release, which destroys the widgets and drops the images together with their index entries.
+    """
+
+    def __init__(self):
+        self._records = {}  # Item ID -> attributes of the resources displayed by the item
+
+    def __len__(self):
+        return len(self._records)
+
+    def register(self, item, kind, attributes):
+        """
+        Register the resources of a canvas item.
+
+        Parameters:
+            item (int): The ID of the item on the canvas.
+            kind (str): "text_box" or "image".
+            attributes (dict): The attributes of the item, with its widgets ("frame") or its image ("image").
+        """
+        attributes["kind"] = kind
+        self._records[item] = attributes
+
+    def get(self, item, kind=None):
+        """Get the attributes of an item, or None if it isn't registered (as that kind)."""
+        attributes = self._records.get(item)
+        if attributes is not None and kind is not None and attributes["kind"] != kind:
+            return None
+        return attributes
+
+    def records(self, kind):
+        """Get the attributes of the registered items of a kind, in registration order."""
+        return [attributes for attributes in self._records.values() if attributes["kind"] == kind]
+
+    def release(self, ids):
+        """
+        Release the resources of items removed from the canvas.
+
+        Returns:
+            list: The attributes of the released items.
+        """
+        released = []
+        for item in ids:
+            attributes = self._records.pop(item, None)
+            if attributes is not None:
+                self._free(attributes)
+                released.append(attributes)
+        return released
+
+    def release_all(self):
+        """Release the resources of every item (the canvas was cleared)."""
+        released = list(self._records.values())
+        self._records.clear()
+        for attributes in released:
+            self._free(attributes)
+        return released
+
+    @staticmethod
+    def _free(attributes):
+        frame = attributes.get("frame")
+        if frame is not None:
+            frame.destroy()  # Destroys the Text widget inside it as well
+        attributes.pop("image", None)  # Tk deletes the image once the last reference to it is gone
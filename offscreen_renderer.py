@@ -0,0 +1,572 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import cycle
+
+from history_manager import CACHE_TAG, IGNORED_TAGS, OFFSCREEN_TAG
+
+TILE_SIZE = 128  # Size of the tiles rendered on their own, and of the cells of the spatial hash of the object boxes
+MAX_ENTRY_CELLS = 64  # Objects covering more cells are kept in a list checked by every query
+BLIT_ALL_TILES = 32  # When more tiles are rendered, the whole buffer is copied into the canvas image at once
+FRAME_HISTORY = 240  # Frames kept for the report
+STALE_BOXES_LIMIT = 256  # More stale Tk boxes than this are computed again for all the items at once
+
+_DRAWN_TYPES = ("line", "rectangle", "oval", "polygon", "image")  # Items drawn into the buffer
+
+
+class _Record:
+    """An object of the buffer: its box and what it's drawn with, relative to the offset of the buffer."""
+
+    __slots__ = ("box", "type", "coords", "fill", "outline", "width", "picture")
+
+
+class OffscreenRenderer:
+    """
+    Optional render mode of the drawing canvas: the objects are drawn by PIL into an offscreen buffer, shown as a
+    single canvas image, while Tk only draws the helper items (selection, previews, overlay) and the text boxes.
+
+    The canvas hooks report every edit (created, moved, reshaped, restyled, restacked or deleted objects), and the
+    boxes of the edited objects, before and after the edit, become the dirty rectangles of the next frame. Once Tk
+    is idle, only the tiles under the dirty rectangles are rendered again, from the objects a spatial hash of their
+    boxes finds there, and only those tiles are copied into the canvas image. A pan scrolls the buffer, so only the
+    tiles uncovered by the pan are rendered. Every frame records its dirty area and its render time.
+
+    The objects stay on the canvas, hidden by the state of the canvas itself (the helper items and the text boxes get
+    the normal state, so Tk still shows them). Tk doesn't find hidden items, so the hit tests of the drawing canvas
+    run in live(), which shows the objects for the duration of the test, without a redraw in between.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the OffscreenRenderer, disabled.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas whose objects are rendered.
+        """
+        self.canvas = canvas
+        self.enabled = False
+        self.frames = deque(maxlen=FRAME_HISTORY)  # Tiles, dirty area, objects drawn and time of every frame
+        self._records = {}  # Item -> _Record
+        self._cells = {}  # (column, row) -> set of items
+        self._large = set()  # Items covering more than MAX_ENTRY_CELLS cells
+        self._offset = (0, 0)  # Screen position of the origin of the record coordinates (moved by the pans)
+        self._stale = set()  # Items to read again from the canvas
+        self._skipped = set()  # Helper items, never drawn into the buffer
+        self._tk_boxes = set()  # Items changed while hidden, whose boxes Tk has to compute again
+        self._all_tk_boxes = False  # Whether all the items were
+        self._ranks = None  # Item -> position in the drawing order, read again after a restack
+        self._dirty = []  # Dirty (x1, y1, x2, y2) screen rectangles of the next frame
+        self._full = False  # Whether the whole view is dirty
+        self._rescan = False  # Whether every item has to be read again (after a zoom)
+        self._blit_all = False  # Whether the whole buffer has to be copied into the canvas image (after a pan)
+        self._buffer = None  # PIL image of the view
+        self._photo = None  # PhotoImage shown by the canvas image
+        self._image = None  # Canvas image of the buffer
+        self._background = (255, 255, 255)
+        self._pictures = {}  # Path -> RGBA PIL image of the pictures
+        self._job = None
+
+    def enable(self):
+        """Render the objects offscreen, hiding them on the canvas."""
+        if self.enabled:
+            return
+        self.enabled = True
+        canvas = self.canvas
+        canvas.layers.invalidate()  # The layer bitmaps aren't needed: the objects are rendered into the buffer
+        self._background = tuple(value // 257 for value in canvas.winfo_rgb(canvas.cget("bg")))
+
+        # The helper items and the text boxes stay visible once the canvas hides its objects
+        shown = [item for tag in IGNORED_TAGS for item in canvas.find_withtag(tag)]
+        shown += [attributes["text_window"] for attributes in canvas.registry.records("text_box")]
+        self._set_state([item for item in shown if canvas.itemcget(item, "state") == ""], "normal")
+        canvas.tk.call(canvas._w, "configure", "-state", "hidden")
+        self._rescan = True
+        self._schedule()
+
+    def disable(self):
+        """Let Tk draw the objects again, dropping the buffer."""
+        if not self.enabled:
+            return
+        self.enabled = False
+        canvas = self.canvas
+        if self._job is not None:
+            canvas.after_cancel(self._job)
+            self._job = None
+        canvas.tk.call(canvas._w, "configure", "-state", "normal")
+        if self._image is not None:
+            canvas.delete(self._image)
+        self._buffer = self._photo = self._image = None
+        self._clear_index()
+        self._stale.clear()
+        self._skipped.clear()
+        self._tk_boxes.clear()
+        self._all_tk_boxes = False
+        self._dirty.clear()
+        self._pictures.clear()
+        canvas.layers.invalidate()  # The cached layers are rendered into their bitmaps again
+
+    def toggle(self):
+        """Enable the offscreen rendering if it is disabled, disable it otherwise."""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def summary(self):
+        """Get the numbers of the last frame, as shown by the performance overlay (None before the first frame)."""
+        if not self.frames:
+            return None
+        frame = self.frames[-1]
+        return "offscreen: %d px in %d tiles, %d items, %.2f ms" % (frame["dirty_area"], frame["tiles"],
+                                                                    frame["items"], frame["render_ms"])
+
+    # Hooks of the drawing canvas
+    def creating(self, item_type, options):
+        """Get the options of a new item: while enabled, the helper items and the text boxes are created visible."""
+        if not self.enabled or "state" in options:
+            return options
+        tags = options.get("tags") or ()
+        if isinstance(tags, str):
+            tags = tags.split()
+        if item_type == "window" or any(tag in IGNORED_TAGS for tag in tags):
+            return dict(options, state="normal")
+        return options
+
+    def created(self, items):
+        """Draw new items (in the drawing order, which the new items may have changed)."""
+        if self.enabled:
+            self._ranks = None
+            self.changed_items(items)
+
+    def changed(self, tag_or_id):
+        """Draw changed items again (new coordinates, options or state)."""
+        if self.enabled:
+            self.changed_items(self._resolve(tag_or_id))
+
+    def changed_items(self, items):
+        if not self.enabled:
+            return
+        skipped = self._skipped
+        for item in items:
+            if item not in skipped:
+                self._stale.add(item)
+                self._tk_boxes.add(item)
+        self._schedule()
+
+    def restacked(self, tag_or_id):
+        """Draw items raised or lowered again, in their new place in the drawing order."""
+        if self.enabled:
+            self._ranks = None
+            self.changed(tag_or_id)
+
+    def moved(self, tag_or_id, dx, dy):
+        """Move the records of moved items, making their old and new boxes dirty."""
+        if not self.enabled:
+            return
+        records, skipped, dirty = self._records, self._skipped, self._dirty
+        for item in self._resolve(tag_or_id):
+            self._tk_boxes.add(item)
+            record = records.get(item)
+            if record is None:
+                if item not in skipped:
+                    self._stale.add(item)
+                continue
+            dirty.append(self._to_screen(record.box))
+            self._unindex(item, record)
+            x1, y1, x2, y2 = record.box
+            record.box = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+            record.coords = [value + offset for value, offset in zip(record.coords, cycle((dx, dy)))]
+            self._index(item, record)
+            dirty.append(self._to_screen(record.box))
+        self._schedule()
+
+    def deleting(self, tags_or_ids):
+        """Forget items about to be deleted, making their boxes dirty."""
+        if not self.enabled:
+            return
+        if "all" in tags_or_ids:  # The canvas is cleared, including the canvas image
+            self._clear_index()
+            self._stale.clear()
+            self._skipped.clear()
+            self._tk_boxes.clear()
+            self._buffer = self._photo = self._image = None
+            self._schedule()
+            return
+        for tag_or_id in tags_or_ids:
+            for item in self._resolve(tag_or_id):
+                record = self._records.pop(item, None)
+                if record is not None:
+                    self._unindex(item, record)
+                    self._dirty.append(self._to_screen(record.box))
+                self._stale.discard(item)
+                self._skipped.discard(item)
+                self._tk_boxes.discard(item)
+        self._schedule()
+
+    def view_changed(self, command, *args):
+        """
+        Follow a pan or a zoom of the view, once Tk moved or scaled all the items (command and args are those of the
+        Tk command): a pan by whole pixels scrolls the buffer, anything else renders the whole view again.
+        """
+        if not self.enabled:
+            return
+        canvas = self.canvas
+        self._all_tk_boxes = True
+        if self._image is not None:
+            canvas.tk.call(canvas._w, "coords", self._image, 0, 0)  # Moved or scaled with the other items
+        dx, dy = (float(value) for value in args[:2])
+        if command == "move" and dx == int(dx) and dy == int(dy):
+            self._scroll(int(dx), int(dy))
+        else:
+            self._rescan = True
+        self._schedule()
+
+    def resized(self, event=None):
+        """Render the whole view again, once the canvas was resized."""
+        if self.enabled:
+            self._full = True
+            self._schedule()
+
+    # Hit tests
+    @contextmanager
+    def live(self):
+        """Show the objects on the canvas (and hide the buffer) while the block looks for items."""
+        if not self.enabled:
+            yield
+            return
+        canvas = self.canvas
+        canvas.tk.call(canvas._w, "configure", "-state", "normal")
+        if self._image is not None:
+            canvas.tk.call(canvas._w, "itemconfigure", self._image, "-state", "hidden")
+        self._update_tk_boxes()
+        try:
+            yield
+        finally:
+            canvas.tk.call(canvas._w, "configure", "-state", "hidden")
+            if self._image is not None:
+                canvas.tk.call(canvas._w, "itemconfigure", self._image, "-state", "normal")
+
+    def update_boxes(self):
+        """Let Tk compute the boxes of the items changed while they were hidden, before they're queried."""
+        if self.enabled and (self._tk_boxes or self._all_tk_boxes):
+            with self.live():
+                pass
+
+    def _update_tk_boxes(self):
+        # Tk computes an empty box for an item changed while it's hidden: moving it by nothing computes it again
+        canvas = self.canvas
+        if self._all_tk_boxes or len(self._tk_boxes) > STALE_BOXES_LIMIT:
+            canvas.tk.call(canvas._w, "move", "all", 0, 0)
+        elif self._tk_boxes:
+            canvas.tk.eval("\n".join(f"{canvas._w} move {item} 0 0" for item in self._tk_boxes))
+        self._tk_boxes.clear()
+        self._all_tk_boxes = False
+
+    # Frames
+    def _schedule(self):
+        if self._job is None:
+            self._job = self.canvas.after_idle(self.render_frame)
+
+    def render_frame(self):
+        """Render the dirty tiles into the buffer and copy them into the canvas image."""
+        self._job = None
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        canvas = self.canvas
+        size = (max(canvas.winfo_width(), 1), max(canvas.winfo_height(), 1))
+        if self._buffer is None or self._buffer.size != size:
+            self._create_buffer(size)
+        if self._rescan:
+            self._rescan = False
+            self._full = True
+            self._clear_index()
+            self._stale.update(item for item in canvas.find_all() if item not in self._skipped)
+        if self._stale:
+            self._read_stale()
+
+        view = (0, 0) + size
+        tiles = self._tiles([view] if self._full else self._dirty, view)
+        self._full = False
+        self._dirty = []
+        if not tiles:
+            return
+
+        blit_all = self._blit_all or len(tiles) > BLIT_ALL_TILES
+        items = area = 0
+        for tile in tiles:
+            rect = self._render(tile, view)
+            items += rect[4]
+            area += _area(rect)
+            if not blit_all:
+                self._blit(rect)
+        if blit_all:
+            self._blit(view)
+            self._blit_all = False
+        self.frames.append({"tiles": len(tiles), "dirty_area": area, "items": items,
+                            "render_ms": round((time.perf_counter() - start) * 1000, 3)})
+
+    def _tiles(self, rects, view):
+        """Get the (column, row) tiles of the view overlapped by screen rectangles."""
+        ox, oy = self._offset
+        tiles = set()
+        for rect in rects:
+            x1, y1, x2, y2 = _intersection(rect, view)
+            if x1 < x2 and y1 < y2:
+                tiles.update((column, row)
+                             for column in range(int((x1 - ox) // TILE_SIZE), int((x2 - ox - 1) // TILE_SIZE) + 1)
+                             for row in range(int((y1 - oy) // TILE_SIZE), int((y2 - oy - 1) // TILE_SIZE) + 1))
+        return tiles
+
+    def _create_buffer(self, size):
+        import tkinter as tk
+        from PIL import Image  # Imported on first use to keep the startup fast
+
+        canvas = self.canvas
+        self._buffer = Image.new("RGB", size, self._background)
+        self._photo = tk.PhotoImage(master=canvas, width=size[0], height=size[1])
+        if self._image is None:
+            self._image = canvas.create_image(0, 0, anchor="nw", image=self._photo, tags=OFFSCREEN_TAG,
+                                              state="normal")
+            canvas.tk.call(canvas._w, "lower", self._image)  # Below the helper items
+        else:
+            canvas.itemconfigure(self._image, image=self._photo)
+        self._full = True
+
+    def _scroll(self, dx, dy):
+        """Scroll the buffer with a pan, making the strips it uncovers dirty."""
+        ox, oy = self._offset
+        self._offset = (ox + dx, oy + dy)
+        self._dirty = [(x1 + dx, y1 + dy, x2 + dx, y2 + dy) for x1, y1, x2, y2 in self._dirty]
+        if self._buffer is None or self._full:
+            return
+        width, height = self._buffer.size
+        if abs(dx) >= width or abs(dy) >= height:
+            self._full = True
+            return
+        from PIL import Image
+
+        scrolled = Image.new("RGB", self._buffer.size, self._background)
+        scrolled.paste(self._buffer, (dx, dy))
+        self._buffer = scrolled
+        self._blit_all = True
+        if dx:
+            self._dirty.append((0, 0, dx, height) if dx > 0 else (width + dx, 0, width, height))
+        if dy:
+            self._dirty.append((0, 0, width, dy) if dy > 0 else (0, height + dy, width, height))
+
+    def _render(self, tile, view):
+        """
+        Render the objects of a tile into the buffer.
+
+        The tiles are fixed in record coordinates, and each one is rendered on its own, so a tile always gets the same
+        pixels for the same objects (PIL doesn't clip shapes at the border of an image the same way wherever the
+        border is).
+
+        Returns:
+            tuple: The (x1, y1, x2, y2) screen rectangle of the tile in the view, and the number of objects drawn.
+        """
+        from PIL import Image, ImageDraw
+        from drawing_renderer import draw_object
+
+        column, row = tile
+        x, y = column * TILE_SIZE, row * TILE_SIZE
+        found = self._query((x, y, x + TILE_SIZE, y + TILE_SIZE))
+        ranks = self._drawing_order()
+        found.sort(key=lambda item: ranks.get(item, -1))
+
+        image = Image.new("RGB", (TILE_SIZE, TILE_SIZE), self._background)
+        draw = ImageDraw.Draw(image)
+        shift = (-x, -y)
+        records = self._records
+        for item in found:
+            record = records[item]
+            coords = [value + offset for value, offset in zip(record.coords, cycle(shift))]
+            if record.picture is not None:
+                image.paste(record.picture, (round(coords[0]), round(coords[1])), record.picture)
+            else:
+                draw_object(draw, {"type": record.type, "coords": coords, "color": record.fill,
+                                   "outline": record.outline, "width": record.width})
+        ox, oy = self._offset
+        self._buffer.paste(image, (x + ox, y + oy))
+        return _intersection((x + ox, y + oy, x + ox + TILE_SIZE, y + oy + TILE_SIZE), view) + (len(found),)
+
+    def _blit(self, rect):
+        """Copy a rectangle of the buffer into the canvas image."""
+        x1, y1, x2, y2 = rect[:4]
+        image = self._buffer.crop((x1, y1, x2, y2))
+        data = b"P6 %d %d 255\n" % image.size + image.tobytes()
+        self.canvas.tk.call(self._photo.name, "put", data, "-format", "ppm", "-to", x1, y1)
+
+    def _drawing_order(self):
+        if self._ranks is None:
+            self._ranks = {item: rank for rank, item in enumerate(self.canvas.find_all())}
+        return self._ranks
+
+    # Records
+    def _read_stale(self):
+        records = self._records
+        for item in self._stale:
+            record = records.pop(item, None)
+            if record is not None:
+                self._unindex(item, record)
+                self._dirty.append(self._to_screen(record.box))
+            record = self._read(item)
+            if record is not None:
+                records[item] = record
+                self._index(item, record)
+                self._dirty.append(self._to_screen(record.box))
+        self._stale.clear()
+
+    def _read(self, item):
+        """Read an item from the canvas, or get None if it isn't drawn into the buffer."""
+        canvas = self.canvas
+        item_type = canvas.type(item)
+        if not item_type:
+            return None  # Deleted since
+        options = canvas.itemconfigure(item)
+        if any(tag in IGNORED_TAGS or tag == CACHE_TAG for tag in canvas.tk.splitlist(options["tags"][-1])):
+            self._skipped.add(item)
+            return None
+        state = options["state"][-1]
+        if item_type == "window":
+            if state == "":  # Shown again, by its layer
+                canvas.tk.call(canvas._w, "itemconfigure", item, "-state", "normal")
+            return None
+        if state != "" or item_type not in _DRAWN_TYPES:
+            return None  # Hidden, or drawn by Tk
+
+        ox, oy = self._offset
+        coords = [float(value) - offset
+                  for value, offset in zip(canvas.tk.splitlist(canvas.tk.call(canvas._w, "coords", item)),
+                                           cycle((ox, oy)))]
+        if len(coords) < 2:
+            return None
+        record = _Record()
+        record.type = item_type
+        record.coords = coords
+        record.picture = None
+        if item_type == "image":
+            record.picture = self._picture(item)
+            if record.picture is None:
+                return None
+            x, y = coords[:2]
+            record.box = (x, y, x + record.picture.width, y + record.picture.height)
+            return record
+
+        record.fill = options["fill"][-1]
+        record.outline = options["outline"][-1] if "outline" in options else None
+        record.width = options["width"][-1]
+        try:
+            half_width = float(record.width) / 2 + 1
+        except ValueError:
+            half_width = 1
+        xs, ys = coords[0::2], coords[1::2]
+        record.box = (min(xs) - half_width, min(ys) - half_width, max(xs) + half_width, max(ys) + half_width)
+        return record
+
+    def _picture(self, item):
+        attributes = self.canvas.registry.get(item, "image")
+        if attributes is None:
+            return None
+        path = attributes["path"]
+        picture = self._pictures.get(path)
+        if picture is None:
+            from PIL import Image
+
+            try:
+                with Image.open(path) as image:
+                    picture = image.convert("RGBA")
+            except OSError:
+                return None
+            self._pictures[path] = picture
+        return picture
+
+    def _resolve(self, tag_or_id):
+        """Get the item ids of a tag or id, without asking Tk for ids and helper tags."""
+        if isinstance(tag_or_id, int):
+            return (tag_or_id,)
+        if isinstance(tag_or_id, str):
+            if tag_or_id.isdigit():
+                return (int(tag_or_id),)
+            if tag_or_id in IGNORED_TAGS:
+                return ()
+        return self.canvas.find_withtag(tag_or_id)
+
+    def _to_screen(self, box):
+        ox, oy = self._offset
+        return box[0] + ox, box[1] + oy, box[2] + ox, box[3] + oy
+
+    # Spatial hash of the record boxes
+    def _index(self, item, record):
+        columns, rows = _cell_ranges(record.box)
+        if len(columns) * len(rows) > MAX_ENTRY_CELLS:
+            self._large.add(item)
+            return
+        cells = self._cells
+        for column in columns:
+            for row in rows:
+                cell = cells.get((column, row))
+                if cell is None:
+                    cells[(column, row)] = {item}
+                else:
+                    cell.add(item)
+
+    def _unindex(self, item, record):
+        columns, rows = _cell_ranges(record.box)
+        if len(columns) * len(rows) > MAX_ENTRY_CELLS:
+            self._large.discard(item)
+            return
+        cells = self._cells
+        for column in columns:
+            for row in rows:
+                cell = cells.get((column, row))
+                if cell is not None:
+                    cell.discard(item)
+                    if not cell:
+                        del cells[(column, row)]
+
+    def _query(self, box):
+        """Get the items whose box overlaps a box (in record coordinates)."""
+        x1, y1, x2, y2 = box
+        columns, rows = _cell_ranges(box)
+        cells = self._cells
+        candidates = set(self._large)
+        for column in columns:
+            for row in rows:
+                cell = cells.get((column, row))
+                if cell:
+                    candidates.update(cell)
+        records = self._records
+        found = []
+        for item in candidates:
+            bx1, by1, bx2, by2 = records[item].box
+            if bx1 <= x2 and bx2 >= x1 and by1 <= y2 and by2 >= y1:
+                found.append(item)
+        return found
+
+    def _clear_index(self):
+        self._records.clear()
+        self._cells.clear()
+        self._large.clear()
+        self._offset = (0, 0)
+        self._ranks = None
+
+    def _set_state(self, items, state):
+        if items:
+            canvas = self.canvas
+            canvas.tk.eval("\n".join(f"{canvas._w} itemconfigure {item} -state {state}" for item in items))
+
+
+def _cell_ranges(box):
+    x1, y1, x2, y2 = box
+    return (range(int(x1 // TILE_SIZE), int(x2 // TILE_SIZE) + 1),
+            range(int(y1 // TILE_SIZE), int(y2 // TILE_SIZE) + 1))
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+def _intersection(rect, other):
+    return max(rect[0], other[0]), max(rect[1], other[1]), min(rect[2], other[2]), min(rect[3], other[3])
@@ -0,0 +1,322 @@
+import time
+
+# Upper bounds of the latency histogram buckets in milliseconds
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 133, 250, 500, 1000, float("inf"))
+OVERLAY_TAG = "perf_overlay"
+OVERLAY_REFRESH_MS = 250  # Refresh interval of the overlay
+OVERLAY_POSITION = (10, 10)
+MENU_OPERATIONS = ("new_drawing",)  # Menu operations done on the spot (the others submit background tasks)
+
+# Canvas events instrumented by the profiler, with the event phase they dispatch
+_CANVAS_EVENTS = (("<Button-1>", "press"), ("<B1-Motion>", "motion"), ("<ButtonRelease-1>", "release"))
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed, roughly logarithmic buckets, plus the Tcl calls made per recorded event.
+    """
+
+    def __init__(self):
+        self.counts = [0] * len(HISTOGRAM_BOUNDS_MS)
+        self.count = 0
+        self.total = 0.0  # Seconds
+        self.max = 0.0  # Seconds
+        self.tcl_calls = 0
+
+    def record(self, duration, tcl_calls=0):
+        """
+        Record one event.
+
+        Parameters:
+            duration (float): The event duration in seconds.
+            tcl_calls (int): The number of Tcl calls made by the event.
+        """
+        duration_ms = duration * 1000
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if duration_ms <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.tcl_calls += tcl_calls
+
+    def percentile(self, fraction):
+        """Get the upper bound in milliseconds of the bucket that holds the given fraction of the events."""
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max * 1000)
+        return 0.0
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "p50_ms": round(self.percentile(0.5), 3),
+            "p95_ms": round(self.percentile(0.95), 3),
+            "tcl_calls_per_event": round(self.tcl_calls / self.count, 2) if self.count else 0.0,
+            "histogram_ms": {("<=%g" % bound if bound != float("inf") else ">%g" % HISTOGRAM_BOUNDS_MS[-2]): count
+                             for bound, count in zip(HISTOGRAM_BOUNDS_MS, self.counts) if count},
+        }
+
+
+class _CountingInterpreter:
+    """Wraps the Tcl interpreter of the canvas and counts the commands called through it."""
+
+    def __init__(self, interpreter):
+        self._interpreter = interpreter
+        self.call_count = 0
+
+    def call(self, *args):
+        self.call_count += 1
+        return self._interpreter.call(*args)
+
+    def eval(self, script):
+        self.call_count += 1
+        return self._interpreter.eval(script)
+
+    def __getattr__(self, name):
+        return getattr(self._interpreter, name)
+
+
+class PerformanceProfiler:
+    """
+    Optional instrumentation of the drawing canvas event handlers, of the menu file operations and of the background
+    tasks.
+
+    When enabled, the binding scripts of the canvas mouse events are wrapped between two timing commands, so all the
+    handlers bound to them (whoever bound them) are timed together: the profiler records per-tool latency histograms,
+    the number of Tcl calls per event and the frame time (from the event until Tk is idle again, after redrawing).
+    When disabled, the timing commands are taken out of the scripts again, leaving the handlers as they are, so the
+    profiler costs nothing. An event whose handler breaks out of its binding script isn't recorded.
+
+    The background tasks (opening, saving and exporting drawings...) are timed from their submission until their
+    callbacks ran on the Tk main loop, whatever the user does in between.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the PerformanceProfiler.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas whose events are profiled.
+        """
+        self.canvas = canvas
+        self.enabled = False
+        self.overlay_visible = False
+        self._menu = None
+        self._interpreter = None  # Counting wrapper installed on the canvas while enabled
+        self._bindings = []  # (sequence, begin command, end command) of the wrapped binding scripts
+        self._event = None  # (tool, phase, Tcl calls, start time) of the event being handled
+        self._task_starts = {}  # Running background task -> the time it was submitted
+        self._overlay_job = None
+        self._frame_pending = False
+        self._frame_start = None
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        self.tools = {}  # (tool, phase) -> LatencyHistogram
+        self.operations = {}  # Menu operation name -> LatencyHistogram
+        self.background_tasks = {}  # Background task name -> LatencyHistogram
+        self.frames = LatencyHistogram()
+        self.started = time.time()
+        self._last_event = None  # (tool, phase, duration, Tcl calls) of the latest event
+
+    def watch_menu(self, menu):
+        """Profile the file operations of the menu as well, while the profiler is enabled."""
+        self._menu = menu
+
+    def enable(self):
+        """Install the instrumentation."""
+        if self.enabled:
+            return
+        self.enabled = True
+        self._interpreter = _CountingInterpreter(self.canvas.tk)
+        self.canvas.tk = self._interpreter
+
+        for sequence, phase in _CANVAS_EVENTS:
+            begin = self.canvas.register(lambda phase=phase: self._begin_event(phase))
+            end = self.canvas.register(self._end_event)
+            self._bindings.append((sequence, begin, end))
+            self.canvas.bind(sequence, "%s\n%s\n%s" % (begin, self.canvas.bind(sequence), end))
+        self.canvas.tasks.listeners.append(self._task_changed)
+
+        if self._menu is not None:
+            for name in MENU_OPERATIONS:
+                setattr(self._menu, name, self._instrument_operation(name, getattr(self._menu, name)))
+            self._menu.create_menu()  # Rebuild the menu so its entries call the instrumented operations
+
+    def disable(self):
+        """Remove the instrumentation, leaving the handlers of the canvas events as they are."""
+        if not self.enabled:
+            return
+        self.hide_overlay()
+        self.enabled = False
+
+        for sequence, begin, end in self._bindings:
+            script = self.canvas.bind(sequence)
+            self.canvas.bind(sequence, "\n".join(line for line in script.split("\n") if line not in (begin, end)))
+            self.canvas.deletecommand(begin)
+            self.canvas.deletecommand(end)
+        self._bindings.clear()
+        self._event = None
+        self.canvas.tasks.listeners.remove(self._task_changed)
+        self._task_starts.clear()
+        self._restore_interpreter(self.canvas)
+        self._interpreter = None
+
+        if self._menu is not None:
+            for name in MENU_OPERATIONS:
+                self._menu.__dict__.pop(name, None)
+            self._menu.create_menu()
+
+    def toggle(self):
+        """Enable the profiler if it is disabled, disable it otherwise."""
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def _begin_event(self, phase):
+        """Start timing an event, before the handlers of its binding script."""
+        tool = self.canvas.toolbar.state.tool or "None"
+        self._event = (tool, phase, self._interpreter.call_count, time.perf_counter())
+
+    def _end_event(self):
+        """Record the event being timed, after the handlers of its binding script."""
+        if self._event is None:
+            return
+        (tool, phase, calls_before, start), self._event = self._event, None
+        duration = time.perf_counter() - start
+        tcl_calls = self._interpreter.call_count - calls_before
+        self.tools.setdefault((tool, phase), LatencyHistogram()).record(duration, tcl_calls)
+        self._last_event = (tool, phase, duration, tcl_calls)
+        self._start_frame(start)
+
+    def _restore_interpreter(self, widget):
+        """
+        Give the Tcl interpreter back to a widget and to its children: the widgets created while the profiler was
+        enabled (like the frames of the text boxes) copied the counting wrapper from their master.
+        """
+        if widget.tk is self._interpreter:
+            widget.tk = self._interpreter._interpreter
+        for child in widget.children.values():
+            self._restore_interpreter(child)
+
+    def _task_changed(self, task):
+        """Time a background task, notified by the executor when it starts, progresses and finishes."""
+        if task in self.canvas.tasks.tasks:
+            self._task_starts.setdefault(task, time.perf_counter())
+        elif task in self._task_starts:
+            start = self._task_starts.pop(task)
+            if not task.cancelled:
+                self.background_tasks.setdefault(task.name, LatencyHistogram()).record(time.perf_counter() - start)
+
+    def _instrument_operation(self, name, operation):
+        def instrumented(*args, **kwargs):
+            calls_before = self._interpreter.call_count
+            start = time.perf_counter()
+            try:
+                return operation(*args, **kwargs)
+            finally:
+                self.operations.setdefault(name, LatencyHistogram()).record(
+                    time.perf_counter() - start, self._interpreter.call_count - calls_before)
+
+        return instrumented
+
+    def _start_frame(self, start):
+        """Measure the frame of an event: the time until Tk is idle again, after it has redrawn the canvas."""
+        if not self._frame_pending:
+            self._frame_pending = True
+            self._frame_start = start
+            self.canvas.after_idle(self._end_frame)
+
+    def _end_frame(self):
+        self._frame_pending = False
+        if self.enabled:
+            self.frames.record(time.perf_counter() - self._frame_start)
+
+    def show_overlay(self):
+        """Show the live numbers on the canvas (this enables the profiler)."""
+        self.enable()
+        self.overlay_visible = True
+        self._refresh_overlay()
+
+    def hide_overlay(self):
+        """Remove the overlay from the canvas."""
+        self.overlay_visible = False
+        if self._overlay_job is not None:
+            self.canvas.after_cancel(self._overlay_job)
+            self._overlay_job = None
+        self.canvas.delete(OVERLAY_TAG)
+
+    def toggle_overlay(self):
+        """Show the overlay if it is hidden, hide it otherwise."""
+        if self.overlay_visible:
+            self.hide_overlay()
+        else:
+            self.show_overlay()
+
+    def overlay_text(self):
+        """Get the text shown by the overlay."""
+        lines = ["items: %d" % len(self.canvas.find_all())]
+        if self._last_event:
+            tool, phase, duration, tcl_calls = self._last_event
+            histogram = self.tools[(tool, phase)]
+            lines.append("%s %s: %.2f ms (p95 %.2f ms), %d Tcl calls" % (tool, phase, duration * 1000,
+                                                                         histogram.percentile(0.95), tcl_calls))
+        if self.frames.count:
+            lines.append("frame: mean %.2f ms, p95 %.2f ms" % (self.frames.total / self.frames.count * 1000,
+                                                               self.frames.percentile(0.95)))
+        offscreen = self.canvas.offscreen.summary() if self.canvas.offscreen.enabled else None
+        if offscreen:
+            lines.append(offscreen)
+        return "\n".join(lines)
+
+    def _refresh_overlay(self):
+        self._overlay_job = None
+        if not self.overlay_visible:
+            return
+        overlay = self.canvas.find_withtag(OVERLAY_TAG)
+        if overlay:
+            self.canvas.itemconfigure(overlay[0], text=self.overlay_text())
+            self.canvas.tag_raise(OVERLAY_TAG)
+        else:
+            self.canvas.create_text(*OVERLAY_POSITION, text=self.overlay_text(), anchor="nw", fill="red",
+                                    font=("Courier New", 10), tags=OVERLAY_TAG)
+        self._overlay_job = self.canvas.after(OVERLAY_REFRESH_MS, self._refresh_overlay)
+
+    def get_profile(self):
+        """
+        Get everything recorded so far.
+
+        Returns:
+            dict: Per-tool event latencies, menu operation and background task latencies, frame times, the canvas
+                  item count, and the dirty area and render time of the latest frames of the offscreen render mode.
+        """
+        tools = {}
+        for (tool, phase), histogram in sorted(self.tools.items()):
+            tools.setdefault(tool, {})[phase] = histogram.to_dict()
+        return {
+            "started": self.started,
+            "duration_seconds": round(time.time() - self.started, 3),
+            "canvas_items": len(self.canvas.find_all()),
+            "tools": tools,
+            "file_operations": {name: histogram.to_dict() for name, histogram in sorted(self.operations.items())},
+            "background_tasks": {name: histogram.to_dict()
+                                 for name, histogram in sorted(self.background_tasks.items())},
+            "frames": self.frames.to_dict(),
+            "offscreen_frames": list(self.canvas.offscreen.frames),
+        }
+
+    def dump_profile(self, filename):
+        """Write the recorded profile to a JSON file."""
+        import json
+
+        with open(filename, 'w') as file:
+            json.dump(self.get_profile(), file, indent=2)
@@ -0,0 +1,203 @@
+import base64
+import os
+import time
+import tkinter as tk
+from tkinter import filedialog, messagebox
+
+CELL_WIDTH = 180  # Size of the cell of a drawing: its thumbnail and its name below
+CELL_HEIGHT = 160
+THUMBNAIL_TOP = 8  # Offset of the thumbnail in its cell
+NAME_TOP = 134  # Offset of the name in its cell
+DEFAULT_COLUMNS = 4  # Columns shown before the window is mapped
+REFRESH_MS = 250  # Shortest interval between two refreshes of the thumbnails rendered in the background
+PANEL_SIZE = "780x560"
+
+
+class RecentFilesPanel(tk.Toplevel):
+    """
+    Window showing the recent drawing files, or the drawings of a folder, as thumbnails opened with a click.
+
+    The thumbnails come from a ThumbnailIndex: those missing or out of date are rendered by a background task while
+    the window shows placeholders, and the PhotoImages are only created for the cells scrolled into view, so a folder
+    of a thousand drawings browsed before is listed at once.
+    """
+
+    def __init__(self, master, index, executor, open_file):
+        """
+        Initialize the RecentFilesPanel.
+
+        Parameters:
+            master (tk.Misc): The main window.
+            index (ThumbnailIndex): The index of the files and their thumbnails.
+            executor (TaskExecutor): Runs the rendering of the thumbnails in the background.
+            open_file (callable): Called with the path of the drawing to open.
+        """
+        super().__init__(master)
+        self.title("Open Drawing")
+        self.geometry(PANEL_SIZE)
+        self.index = index
+        self.executor = executor
+        self.open_file = open_file
+        self._files = []  # (path, modification time, size) of the files shown
+        self._entries = {}  # Path -> (number of objects, PNG thumbnail or None, error or None)
+        self._photos = {}  # Path -> PhotoImage of the thumbnails shown so far
+        self._cells = {}  # Path -> canvas image item of its thumbnail
+        self._title = ""  # What the files shown are
+        self._task = None  # Task rendering the missing thumbnails
+        self._refresh_job = None
+        self._laid_out_columns = None
+
+        buttons = tk.Frame(self)
+        buttons.pack(side=tk.TOP, fill=tk.X)
+        tk.Button(buttons, text="Recent", command=self.show_recent).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Folder...", command=self.choose_folder).pack(side=tk.LEFT)
+        tk.Button(buttons, text="Browse...", command=self.browse).pack(side=tk.LEFT)
+        self._status = tk.StringVar(self)
+        tk.Label(buttons, textvariable=self._status, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+
+        self._scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self._scroll)
+        self._scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self._canvas = tk.Canvas(self, bg="white", yscrollcommand=self._scrollbar.set)
+        self._canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._canvas.bind("<Configure>", self._resized)
+        self._canvas.bind("<MouseWheel>", self._wheel)
+        self._canvas.bind("<Button-4>", self._wheel)
+        self._canvas.bind("<Button-5>", self._wheel)
+        self.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.show_recent()
+
+    # Listing
+    def show_recent(self):
+        """Show the files opened or saved last."""
+        self._show(self.index.recent(), "Recent drawings")
+
+    def choose_folder(self):
+        """Show the drawings of a folder chosen by the user."""
+        folder = filedialog.askdirectory(parent=self)
+        if folder:
+            from thumbnail_cache import list_drawings
+
+            try:
+                files = list_drawings(folder)
+            except OSError as e:
+                messagebox.showerror("Error", f"Failed to list the folder: {e}", parent=self)
+                return
+            self._show(files, folder)
+
+    def browse(self):
+        """Open a drawing chosen with the file dialog."""
+        filename = filedialog.askopenfilename(parent=self, filetypes=[("JSON Files", "*.json")])
+        if filename:
+            self._open(filename)
+
+    def _show(self, files, title):
+        self._cancel_task()
+        self._files = files
+        self._entries = self.index.lookup(files)
+        self._photos.clear()
+        self._title = title
+        self._layout()
+
+        stale = [path for path, _, _ in files if path not in self._entries]
+        if stale:
+            from thumbnail_cache import update_thumbnails
+
+            self._task = self.executor.submit("Rendering thumbnails", update_thumbnails, self.index, stale,
+                                              on_done=lambda _: self._refresh(), on_progress=self._rendered)
+        self._update_status()
+
+    def _update_status(self):
+        missing = sum(1 for path, _, _ in self._files if path not in self._entries)
+        self._status.set("%s: %d drawings%s" % (self._title, len(self._files),
+                                                ", %d thumbnails to render" % missing if missing else ""))
+
+    # Cells
+    def _columns(self):
+        width = self._canvas.winfo_width()
+        return max(width // CELL_WIDTH, 1) if width > 1 else DEFAULT_COLUMNS
+
+    def _layout(self):
+        """Create the cells of the files (without their thumbnails, see _show_visible)."""
+        canvas = self._canvas
+        canvas.delete("all")
+        self._cells.clear()
+        columns = self._laid_out_columns = self._columns()
+        for position, (path, mtime, _) in enumerate(self._files):
+            x, y = position % columns * CELL_WIDTH, position // columns * CELL_HEIGHT
+            tag = "cell%d" % position
+            canvas.create_rectangle(x + 4, y + 4, x + CELL_WIDTH - 4, y + CELL_HEIGHT - 4, outline="#dddddd",
+                                    fill="white", tags=tag)
+            self._cells[path] = canvas.create_image(x + CELL_WIDTH / 2, y + THUMBNAIL_TOP, anchor=tk.N, tags=tag,
+                                                    image=self._photos.get(path, ""))
+            canvas.create_text(x + CELL_WIDTH / 2, y + NAME_TOP, text=os.path.basename(path), width=CELL_WIDTH - 12,
+                               anchor=tk.N, tags=tag)
+            canvas.create_text(x + CELL_WIDTH / 2, y + NAME_TOP + 14, fill="#777777", anchor=tk.N, tags=tag,
+                               text=time.strftime("%Y-%m-%d %H:%M", time.localtime(mtime)))
+            canvas.tag_bind(tag, "<Button-1>", lambda event, path=path: self._open(path))
+        rows = -(-len(self._files) // columns)
+        canvas.configure(scrollregion=(0, 0, columns * CELL_WIDTH, rows * CELL_HEIGHT))
+        self._show_visible()
+
+    def _resized(self, event):
+        if self._columns() != self._laid_out_columns:
+            self._layout()
+        else:
+            self._show_visible()
+
+    def _show_visible(self):
+        """Show the thumbnails of the cells in view, creating their PhotoImages on first sight."""
+        canvas = self._canvas
+        top = canvas.canvasy(0)
+        bottom = top + max(canvas.winfo_height(), CELL_HEIGHT)
+        columns = self._columns()
+        first = max(int(top // CELL_HEIGHT), 0) * columns
+        last = (int(bottom // CELL_HEIGHT) + 1) * columns
+        for path, _, _ in self._files[first:last]:
+            if path in self._photos:
+                continue
+            entry = self._entries.get(path)
+            if entry is None or entry[1] is None:
+                continue  # Not rendered yet, or the drawing can't be read
+            self._photos[path] = tk.PhotoImage(master=self, data=base64.b64encode(entry[1]), format="png")
+            canvas.itemconfigure(self._cells[path], image=self._photos[path])
+
+    def _scroll(self, *args):
+        self._canvas.yview(*args)
+        self._show_visible()
+
+    def _wheel(self, event):
+        self._canvas.yview_scroll(-1 if event.num == 4 or event.delta > 0 else 1, "units")
+        self._show_visible()
+
+    # Background rendering
+    def _rendered(self, task):
+        """Show the thumbnails rendered so far, at most every REFRESH_MS."""
+        if self._refresh_job is None:
+            self._refresh_job = self.after(REFRESH_MS, self._refresh)
+
+    def _refresh(self):
+        self._refresh_job = None
+        missing = [file for file in self._files if file[0] not in self._entries]
+        if missing:
+            self._entries.update(self.index.lookup(missing))
+            self._show_visible()
+        self._update_status()
+
+    def _cancel_task(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+
+    # Opening
+    def _open(self, path):
+        self.close()
+        self.open_file(path)
+
+    def close(self):
+        """Close the window, stopping the rendering of the thumbnails."""
+        self._cancel_task()
+        self.destroy()
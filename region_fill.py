@@ -0,0 +1,564 @@
+"""
+Finding the closed region around a point of the canvas, for the bucket fill and the gradient fill.
+
+The items around the point are rasterized in drawing order into a NumPy label image: every filled shape paints its own
+label, strokes, outlines, text boxes and pictures paint the BOUNDARY label, and items painted in the background color
+(the eraser marks) paint the background label. The region is the 4-connected area of the clicked label, found with a
+scanline flood fill over the horizontal runs of the image. Its outline (and the outlines of the enclosed holes) is
+traced along the pixel edges and simplified into a polygon.
+"""
+import numpy as np
+
+from history_manager import IGNORED_TAGS
+
+BACKGROUND = 0  # Label of the canvas background
+BOUNDARY = 1  # Label of strokes, outlines, text boxes and pictures
+LOCAL_WINDOW = 512  # Size of the window rasterized around the point first, before the whole drawing
+SIMPLIFY_TOLERANCE = 0.75  # Maximum distance in pixels between the traced outline and the simplified polygon
+GROW = 1  # Pixels the region grows under the surrounding strokes, so no gap is left along them
+
+
+class Region:
+    """
+    A closed region of the canvas.
+
+    Attributes:
+        mask (numpy.ndarray): Boolean mask of the region pixels, over the rectangle starting at origin.
+        origin (tuple): Canvas coordinates of the top-left pixel of the mask.
+        backdrop (int): The filled item the region lies on, or None if it lies on the canvas background.
+        boundary (numpy.ndarray): Boolean mask of the stroke pixels, over the same rectangle as the region mask.
+    """
+
+    def __init__(self, mask, origin, backdrop=None, boundary=None):
+        self.mask = mask
+        self.origin = origin
+        self.backdrop = backdrop
+        self.boundary = boundary if boundary is not None else np.zeros_like(mask)
+
+    @property
+    def bbox(self):
+        """Get the canvas (x1, y1, x2, y2) box of the region."""
+        height, width = self.mask.shape
+        return self.origin[0], self.origin[1], self.origin[0] + width, self.origin[1] + height
+
+    def polygon(self, tolerance=SIMPLIFY_TOLERANCE):
+        """
+        Get the outline of the region as a flat list of polygon coordinates.
+
+        The holes of the region are joined to the outline with zero-width bridges, so the polygon leaves them empty
+        when it's filled with the even-odd rule, as Tk does.
+        """
+        holes = _holes(self.mask, self.boundary)
+        outlines = _simplify([_trace_outline(np.pad(self.mask, 1))] + [_trace_outline(hole) for hole, _ in holes],
+                             tolerance)
+        outline = outlines[0]
+        points = outline + outline[:1]
+        for hole, (_, (left, top)) in zip(outlines[1:], holes):
+            hole = [(x + left + 1, y + top + 1) for x, y in hole]
+            points += hole + [hole[0], outline[0]]
+
+        # The mask was padded by one pixel on each side
+        ox, oy = self.origin[0] - 1, self.origin[1] - 1
+        return [value for x, y in points for value in (x + ox, y + oy)]
+
+    def strips(self, steps):
+        """
+        Cover the region with horizontal strips, for a vertical gradient of a number of steps.
+
+        Every row of the region is split into its runs, and the runs of consecutive rows with the same span and the
+        same gradient step are merged, so a region with vertical sides needs one strip per step.
+
+        Returns:
+            list: The canvas (x1, y1, x2, y2) box and the gradient step of every strip, from top to bottom.
+        """
+        rows, starts, ends = _runs(self.mask)
+        if not len(rows):
+            return []
+        step = rows * steps // self.mask.shape[0]
+        order = np.lexsort((rows, step, ends, starts))
+        rows, starts, ends, step = rows[order], starts[order], ends[order], step[order]
+        # A strip starts wherever a run doesn't continue the run of the previous row
+        new_strip = np.r_[True, (starts[1:] != starts[:-1]) | (ends[1:] != ends[:-1]) | (step[1:] != step[:-1])
+                          | (rows[1:] != rows[:-1] + 1)]
+        first = np.flatnonzero(new_strip)
+        last = np.r_[first[1:], len(rows)] - 1
+        top, bottom = rows[first], rows[last] + 1
+        by_row = np.lexsort((starts[first], top))
+        x, y = self.origin
+        return [(x + left, y + upper, x + right, y + lower, band) for left, upper, right, lower, band in
+                zip(starts[first][by_row].tolist(), top[by_row].tolist(), ends[first][by_row].tolist(),
+                    bottom[by_row].tolist(), step[first][by_row].tolist())]
+
+
+def polygon_region(coords, outline_width=0):
+    """
+    Get the region inside a polygon, with any number of vertices.
+
+    Parameters:
+        coords (list): Flat list of the canvas coordinates of the vertices.
+        outline_width (int): Width of the outline of the polygon, whose pixels are left out of the region.
+
+    Returns:
+        Region: The region, or None if the polygon is empty.
+    """
+    from PIL import Image, ImageDraw
+
+    xs, ys = coords[0::2], coords[1::2]
+    left, top = int(np.floor(min(xs))) - 1, int(np.floor(min(ys))) - 1
+    size = (int(np.ceil(max(xs))) - left + 2, int(np.ceil(max(ys))) - top + 2)
+    points = [(x - left, y - top) for x, y in zip(xs, ys)]
+    if len(points) < 3:
+        return None
+    image = Image.new("1", size, 0)
+    draw = ImageDraw.Draw(image)
+    draw.polygon(points, fill=1)
+    if outline_width:
+        draw.line(points + points[:1], fill=0, width=outline_width)
+    mask = np.asarray(image)
+    if not mask.any():
+        return None
+    return Region(mask, (left, top))
+
+
+def find_region(canvas, x, y, ignored_tags=IGNORED_TAGS):
+    """
+    Find the closed region of the canvas around a point.
+
+    Parameters:
+        canvas (tk.Canvas): The canvas.
+        x (int): Canvas x coordinate of the point.
+        y (int): Canvas y coordinate of the point.
+        ignored_tags (tuple): Tags of the items left out.
+
+    Returns:
+        Region: The region, or None if the point is on a stroke or the region is not closed.
+    """
+    x, y = int(x), int(y)
+    limit = _drawing_limit(canvas, x, y)
+    half = LOCAL_WINDOW // 2
+    local = (max(x - half, limit[0]), max(y - half, limit[1]), min(x + half, limit[2]), min(y + half, limit[3]))
+    # The local window is only worth a try when it's much smaller than the whole drawing
+    windows = (local, limit) if 2 * _area(local) < _area(limit) else (limit,)
+    ignored = {item for tag in ignored_tags for item in canvas.find_withtag(tag)}
+    for window in windows:
+        # Only the items Tk finds in the window are read and rasterized, the whole drawing only if the region leaks
+        drawn = [item for item in canvas.find_overlapping(*window) if item not in ignored]
+        labels, items = _rasterize(canvas, window, drawn)
+        label = int(labels[y - window[1], x - window[0]])
+        if label == BOUNDARY:
+            return None
+
+        free = labels == label
+        region = _flood_fill(free, x - window[0], y - window[1])
+        if region is not None:
+            mask, (left, top) = region
+            height, width = mask.shape
+            boundary = labels[top - GROW:top + height + GROW, left - GROW:left + width + GROW] == BOUNDARY
+            backdrop = items[label] if label != BACKGROUND else None
+            return Region(_grow(mask, boundary), (window[0] + left - GROW, window[1] + top - GROW), backdrop, boundary)
+        # Otherwise the region reaches the edge of the window: it's open, unless the whole drawing closes it
+    return None
+
+
+def _area(window):
+    return (window[2] - window[0]) * (window[3] - window[1])
+
+
+def _drawing_limit(canvas, x, y):
+    """Get the largest window to rasterize: the visible canvas and the cached extent of the drawing, with a margin."""
+    x1, y1 = int(canvas.canvasx(0)), int(canvas.canvasy(0))
+    x2, y2 = x1 + max(canvas.winfo_width(), 1), y1 + max(canvas.winfo_height(), 1)
+    bbox = canvas.bboxes.extent()
+    if bbox:
+        x1, y1, x2, y2 = min(x1, bbox[0]), min(y1, bbox[1]), max(x2, bbox[2]), max(y2, bbox[3])
+    return min(x1, x) - 1, min(y1, y) - 1, max(x2, x + 1) + 1, max(y2, y + 1) + 1
+
+
+def _rasterize(canvas, window, drawn):
+    """
+    Draw items into a label image of a window.
+
+    Parameters:
+        canvas (tk.Canvas): The canvas.
+        window (tuple): The canvas (x1, y1, x2, y2) box of the image.
+        drawn (list): The items overlapping the window, in drawing order.
+
+    Returns:
+        tuple: The label image (numpy.ndarray) and the item of every label.
+    """
+    from PIL import Image, ImageDraw
+
+    left, top, right, bottom = window
+    background = canvas.cget("bg")
+    items = [None, None]  # Item of every label, BACKGROUND and BOUNDARY have none
+    shapes = []  # (ImageDraw method name, flat canvas coordinates, options) in drawing order
+    styles = {}  # Style index -> (fill, outline, width), shared by many items
+
+    for item in drawn:
+        item_type, coords, fill, outline, width = _describe(canvas, item, styles)
+        if item_type is None:
+            continue
+        if item_type == "box":
+            shapes.append(("rectangle", [coords[0], coords[1], coords[2] - 1, coords[3] - 1], {"fill": BOUNDARY}))
+            continue
+
+        if item_type == "line":
+            label = BACKGROUND if fill == background else BOUNDARY
+            last = shapes[-1] if shapes else None
+            # A pen stroke is a chain of segment items: the segments of a chain are drawn in one call (PIL draws
+            # every segment of a line on its own, so the pixels are the same)
+            if (last and last[0] == "line" and last[1][-2:] == coords[:2] and last[2]["fill"] == label
+                    and last[2]["width"] == width):
+                last[1].extend(coords[2:])
+            else:
+                shapes.append(("line", list(coords), {"fill": label, "width": width}))
+            continue
+
+        if fill == background:
+            fill_label = BACKGROUND  # Eraser marks and shapes filled with the background color
+        elif fill:
+            fill_label = len(items)
+            items.append(item)
+        else:
+            fill_label = None
+        outline_label = (BACKGROUND if outline == background else BOUNDARY) if outline else None
+
+        if item_type == "polygon":
+            if len(coords) >= 6 and fill_label is not None:
+                shapes.append(("polygon", coords, {"fill": fill_label}))
+            if outline_label is not None:
+                shapes.append(("line", coords + coords[:2], {"fill": outline_label, "width": width}))
+            continue
+        box = [min(coords[0], coords[2]), min(coords[1], coords[3]),
+               max(coords[0], coords[2]), max(coords[1], coords[3])]
+        method = "rectangle" if item_type == "rectangle" else "ellipse"
+        if fill_label is not None:
+            shapes.append((method, box, {"fill": fill_label}))
+        if outline_label is not None:
+            shapes.append((method, box, {"outline": outline_label, "width": width}))
+
+    # 8-bit labels are enough unless more than 254 filled shapes overlap the window
+    image = Image.new("L" if len(items) <= 256 else "I", (right - left, bottom - top), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    for method, coords, options in shapes:
+        getattr(draw, method)([(coords[i] - left, coords[i + 1] - top) for i in range(0, len(coords) - 1, 2)],
+                              **options)
+    return np.asarray(image), items
+
+
+def _describe(canvas, item, styles):
+    """
+    Get what the rasterization needs of an item.
+
+    The type and coordinates of the items come from the bounding box cache, read from Tk once and kept until the items
+    change, and the fill, outline and width of the shapes from the style table: only the shapes without a style are
+    asked for their options.
+
+    Parameters:
+        canvas (tk.Canvas): The canvas.
+        item (int): The item.
+        styles (dict): Style index -> the (fill, outline, width) of the style, filled in as the styles are met.
+
+    Returns:
+        tuple: The type ("box" for the items painted as their bounding box), the coordinates, the fill, the outline
+               and the width in pixels of the item, or a type of None for the items left out.
+    """
+    item_type, coords, style = canvas.bboxes.shape(item)
+    if item_type in ("window", "image", "text"):
+        bbox = canvas.bboxes.get(item)
+        if bbox and bbox[2] > bbox[0] and bbox[3] > bbox[1]:
+            return "box", bbox, None, None, None
+        return None, (), None, None, None
+    if len(coords) < 4 or item_type not in ("line", "rectangle", "oval", "polygon"):
+        return None, (), None, None, None
+
+    options = styles.get(style)
+    if options is None:
+        if style is not None:
+            options = canvas.styles.get(style)
+        else:
+            options = {name: canvas.itemcget(item, name) for name in ("fill", "outline", "width")
+                       if name != "outline" or item_type != "line"}
+        options = options["fill"], options.get("outline", ""), max(int(round(float(options["width"] or 1))), 1)
+        if style is not None:
+            styles[style] = options
+    return (item_type, coords) + options
+
+
+def _runs(mask):
+    """
+    Get the horizontal runs of True pixels of a mask.
+
+    Returns:
+        tuple: Arrays of the row, start and end (exclusive) of every run, in row-major order.
+    """
+    height, width = mask.shape
+    # The pixel edges where a row changes, its first and last ones included: starts and ends alternate
+    steps = np.empty((height, width + 1), bool)
+    steps[:, 0], steps[:, -1] = mask[:, 0], mask[:, -1]
+    np.not_equal(mask[:, 1:], mask[:, :-1], out=steps[:, 1:-1])
+    edges = np.flatnonzero(steps)
+    rows = edges[0::2] // (width + 1)
+    return rows, edges[0::2] - rows * (width + 1), edges[1::2] - rows * (width + 1)
+
+
+def _components(rows, starts, ends, width):
+    """
+    Label the 4-connected components of runs, without a per-pixel or per-run Python loop.
+
+    The runs of consecutive rows overlapping each other are linked with two binary searches, and the links are merged
+    by hooking every component onto the smallest run index reachable, until no link joins two components.
+
+    Returns:
+        numpy.ndarray: The component of every run, the index of its first run.
+    """
+    count = len(starts)
+    stride = width + 2
+    start_keys, end_keys = rows * stride + starts, rows * stride + ends
+    below = (rows + 1) * stride
+    # The runs of the next row that end after a run starts and start before it ends
+    first = np.searchsorted(end_keys, below + starts, side="right")
+    links = np.maximum(np.searchsorted(start_keys, below + ends, side="left") - first, 0)
+    upper = np.repeat(np.arange(count), links)
+    lower = first[upper] + np.arange(len(upper)) - np.repeat(np.cumsum(links) - links, links)
+
+    labels = np.arange(count)
+    while True:
+        upper_labels, lower_labels = labels[upper], labels[lower]
+        joined = upper_labels != lower_labels
+        if not joined.any():
+            return labels
+        upper_labels, lower_labels = upper_labels[joined], lower_labels[joined]
+        smallest = np.minimum(upper_labels, lower_labels)
+        np.minimum.at(labels, upper_labels, smallest)
+        np.minimum.at(labels, lower_labels, smallest)
+        while True:
+            parents = labels[labels]
+            if np.array_equal(parents, labels):
+                break
+            labels = parents
+
+
+def _flood_fill(free, x, y):
+    """
+    Scanline flood fill of the free pixels 4-connected to (x, y).
+
+    Returns:
+        tuple: The mask of the filled pixels cropped to their box and the (left, top) of the box, or None if the fill
+            reaches the edge of the image.
+    """
+    height, width = free.shape
+    rows, starts, ends = _runs(free)
+    labels = _components(rows, starts, ends, width)
+    seed = np.searchsorted(rows * (width + 2) + starts, y * (width + 2) + x, side="right") - 1
+    reached = labels == labels[seed]
+    reached_rows = rows[reached]
+    top, bottom = int(reached_rows[0]), int(reached_rows[-1]) + 1
+    left, right = int(starts[reached].min()), int(ends[reached].max())
+    if top == 0 or left == 0 or bottom == height or right == width:
+        return None
+
+    # Paint the fewest runs: the filled ones, or the free ones of the box left out
+    others = ~reached & (rows >= top) & (rows < bottom) & (ends > left) & (starts < right)
+    if others.sum() < reached.sum():
+        mask = free[top:bottom, left:right].copy()
+        _paint_runs(mask, rows[others] - top, starts[others] - left, ends[others] - left, False)
+    else:
+        mask = np.zeros((bottom - top, right - left), bool)
+        _paint_runs(mask, reached_rows - top, starts[reached] - left, ends[reached] - left, True)
+    return mask, (left, top)
+
+
+def _paint_runs(mask, rows, starts, ends, value):
+    """Set the pixels of runs in a mask (the runs may stick out of its sides)."""
+    for row, start, end in zip(rows.tolist(), np.maximum(starts, 0).tolist(), ends.tolist()):
+        mask[row, start:end] = value
+
+
+def _grow(mask, boundary):
+    """Grow a mask by GROW pixels into the boundary pixels around it (the mask is padded by GROW to hold them)."""
+    mask = np.pad(mask, GROW)
+    for _ in range(GROW):
+        grown = mask.copy()
+        grown[1:, :] |= mask[:-1, :]
+        grown[:-1, :] |= mask[1:, :]
+        grown[:, 1:] |= mask[:, :-1]
+        grown[:, :-1] |= mask[:, 1:]
+        mask |= grown & boundary
+    return mask
+
+
+def _holes(mask, boundary):
+    """
+    Get the holes of a region: the areas it encloses, other than the strokes lying inside it.
+
+    The holes are the gaps between the runs of the region that are not connected to its surroundings. Holes made of
+    boundary pixels only are left out: they lie under strokes, which are drawn over the fill anyway.
+
+    Parameters:
+        mask (numpy.ndarray): Boolean mask of the region.
+        boundary (numpy.ndarray): Boolean mask of the boundary pixels, of the same shape.
+
+    Returns:
+        list: The mask of every hole, cropped to its box with an empty border, and the (left, top) of the crop.
+    """
+    width = mask.shape[1]
+    rows, starts, ends = _runs(mask)
+    inner = rows[1:] == rows[:-1]
+    row_first = np.r_[True, ~inner]
+    row_last = np.r_[~inner, True]
+
+    # The gaps between the runs of a row, and the pieces of rows around the region, which are outside
+    gap_rows = np.concatenate((rows[:-1][inner], rows[row_first], rows[row_last]))
+    gap_starts = np.concatenate((ends[:-1][inner], np.zeros(row_first.sum(), int), ends[row_last]))
+    gap_ends = np.concatenate((starts[1:][inner], starts[row_first], np.full(row_last.sum(), width)))
+    outside = np.r_[np.zeros(inner.sum(), bool), np.ones(row_first.sum() + row_last.sum(), bool)]
+    kept = gap_ends > gap_starts
+    order = np.lexsort((gap_starts[kept], gap_rows[kept]))
+    gap_rows, gap_starts, gap_ends = gap_rows[kept][order], gap_starts[kept][order], gap_ends[kept][order]
+    outside = outside[kept][order] | (gap_rows == rows[0]) | (gap_rows == rows[-1])
+
+    labels = _components(gap_rows, gap_starts, gap_ends, width)
+    hole = ~np.isin(labels, labels[outside])
+    if not hole.any():
+        return []
+    gap_rows, gap_starts, gap_ends, labels = gap_rows[hole], gap_starts[hole], gap_ends[hole], labels[hole]
+
+    # Find the holes with pixels that are not boundary pixels
+    open_pixels = np.r_[~boundary.ravel(), False].view(np.uint8)
+    bounds = np.stack((gap_rows * width + gap_starts, gap_rows * width + gap_ends), axis=1).ravel()
+    open_runs = np.maximum.reduceat(open_pixels, bounds)[::2] > 0
+    open_labels = np.unique(labels[open_runs])
+
+    holes = []
+    for label in open_labels:
+        runs = labels == label
+        hole_rows, hole_starts, hole_ends = gap_rows[runs], gap_starts[runs], gap_ends[runs]
+        top, left = int(hole_rows[0]) - 1, int(hole_starts.min()) - 1
+        shape = (int(hole_rows[-1]) - top + 2, int(hole_ends.max()) - left + 1)
+        hole_mask = np.zeros(shape, bool)
+        _paint_runs(hole_mask, hole_rows - top, hole_starts - left, hole_ends - left, True)
+        holes.append((hole_mask, (left, top)))
+    return holes
+
+
+def _trace_outline(mask):
+    """
+    Trace the outer outline of the first region of a mask along the pixel edges, with the region on the right.
+
+    The edges are found from the runs of the mask: the left and right pixel edges of every run, and the horizontal
+    edges between the runs of consecutive rows. Every edge is linked to the edge leaving its end (the one turning
+    right where two leave the same corner, so the regions touching at a corner stay apart), and the edges of the
+    outline are put in order by pointer jumping, without a per-pixel or per-edge Python loop.
+
+    Returns:
+        list: The (x, y) pixel corners where the outline turns.
+    """
+    rows, starts, ends = _runs(mask)
+    count = len(rows)
+    stride = mask.shape[1] + 1  # Corners of a line, the corner (x, y) is y * stride + x
+
+    # Walk every line of corners through the ends of the runs of the rows below and above it, counting the runs
+    # covering each piece: the pieces covered from below only are top edges, from above only bottom edges
+    keys = np.concatenate((rows * stride + starts, rows * stride + ends,
+                           (rows + 1) * stride + starts, (rows + 1) * stride + ends))
+    changes = np.zeros((4 * count, 2), int)
+    changes[:count, 0], changes[count:2 * count, 0] = 1, -1
+    changes[2 * count:3 * count, 1], changes[3 * count:, 1] = 1, -1
+    order = np.argsort(keys, kind="stable")
+    keys, covered = keys[order], np.cumsum(changes[order], axis=0)
+    last_change = np.r_[keys[1:] != keys[:-1], True]
+    keys, covered = keys[last_change], covered[last_change][:-1]
+    top_edges = (covered[:, 0] > 0) & (covered[:, 1] == 0)
+    bottom_edges = (covered[:, 0] == 0) & (covered[:, 1] > 0)
+
+    # Start and end corners and direction (east, south, west, north) of the top, right, bottom and left edges
+    first = np.concatenate((keys[:-1][top_edges], rows * stride + ends, keys[1:][bottom_edges],
+                            (rows + 1) * stride + starts))
+    last = np.concatenate((keys[1:][top_edges], (rows + 1) * stride + ends, keys[:-1][bottom_edges],
+                           rows * stride + starts))
+    direction = np.repeat(np.arange(4), (top_edges.sum(), count, bottom_edges.sum(), count))
+
+    leaving = first * 4 + direction
+    by_leaving = np.argsort(leaving)
+    leaving = leaving[by_leaving]
+    following = np.full(len(first), -1)
+    for turn in (1, 0, 3):
+        wanted = last * 4 + (direction + turn) % 4
+        found = np.minimum(np.searchsorted(leaving, wanted), len(leaving) - 1)
+        linked = (following < 0) & (leaving[found] == wanted)
+        following[linked] = by_leaving[found[linked]]
+
+    # The outline starts east along the top of the first pixel: cut it before, and count the edges left to its end
+    start = by_leaving[np.searchsorted(leaving, (rows[0] * stride + starts[0]) * 4)]
+    end = np.flatnonzero(following == start)[0]
+    following[end] = end
+    remaining = np.ones(len(first), int)
+    remaining[end] = 0
+    for _ in range(len(first).bit_length()):
+        remaining += remaining[following]
+        following = following[following]
+    outline = np.flatnonzero(following == end)
+    outline = outline[np.argsort(-remaining[outline])]
+
+    directions = direction[outline]
+    corners = first[outline[directions != np.roll(directions, 1)]]
+    return list(zip((corners % stride).tolist(), (corners // stride).tolist()))
+
+
+def _simplify(outlines, tolerance):
+    """
+    Simplify closed outlines with the Ramer-Douglas-Peucker algorithm.
+
+    The outlines are simplified together, and every pass splits all the segments still too far from their outline at
+    once, so the number of NumPy operations grows with the depth of the recursion rather than with the number of
+    outlines and vertices.
+
+    Returns:
+        list: The simplified outlines, as lists of (x, y) points.
+    """
+    closed = [outline + outline[:1] for outline in outlines]
+    lengths = np.array([len(outline) for outline in closed])
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    array = np.asarray([point for outline in closed for point in outline], dtype=float)
+    keep = np.zeros(len(array), bool)
+    keep[starts] = keep[ends - 1] = True
+
+    # An outline is closed: split it at the point farthest from its start first
+    outline_of = np.repeat(np.arange(len(closed)), lengths)
+    distances = ((array - array[starts][outline_of]) ** 2).sum(axis=1)
+    keep[_first_of_groups(outline_of, distances)] = True
+
+    while True:
+        candidates = np.flatnonzero(~keep)
+        if not len(candidates):
+            break
+        kept = np.flatnonzero(keep)
+        segment = np.searchsorted(kept, candidates) - 1
+        first, last = array[kept[segment]], array[kept[segment + 1]]
+        direction = last - first
+        offsets = array[candidates] - first
+        norms = np.hypot(direction[:, 0], direction[:, 1])
+        distances = np.where(norms > 0,
+                             np.abs(direction[:, 0] * offsets[:, 1] - direction[:, 1] * offsets[:, 0])
+                             / np.where(norms > 0, norms, 1),
+                             np.hypot(offsets[:, 0], offsets[:, 1]))
+
+        # The farthest point of every segment is kept if it's farther than the tolerance
+        farthest = _first_of_groups(segment, distances)
+        farthest = farthest[distances[farthest] > tolerance]
+        if not len(farthest):
+            break
+        keep[candidates[farthest]] = True
+
+    return [[tuple(point) for point in array[start:end - 1][keep[start:end - 1]].tolist()]
+            for start, end in zip(starts.tolist(), ends.tolist())]
+
+
+def _first_of_groups(groups, values):
+    """Get the index of the (first) largest value of every group (the groups must be sorted)."""
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+    maxima = np.repeat(np.maximum.reduceat(values, starts), np.diff(np.r_[starts, len(values)]))
+    largest = np.flatnonzero(values == maxima)
+    return largest[np.r_[True, groups[largest][1:] != groups[largest][:-1]]]
@@ -0,0 +1,385 @@
+"""
+Local HTTP service rendering drawings to PNG or SVG, without Tk or a display.
+
+Start it with:
+
+    python main.py serve --port 8765
+
+and POST the drawing JSON (as saved by the application) to /render?format=png (or svg), optionally with width and
+height query parameters. Results are cached by content hash, identical requests in flight are rendered once, and
+every response carries its timings in the Server-Timing, X-Render-Time-Ms and X-Cache headers. GET /stats returns the
+cache and concurrency counters as JSON.
+
+Requests are checked before they reach the workers: drawings larger than the pixel limit are rejected with 413, and
+pictures are only read from the image directory given with --image-dir (requests with pictures are rejected with
+400 without one), so a client can't have the server read any other file.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from drawing_renderer import CONTENT_TYPES, drawing_size, render
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = min(os.cpu_count() or 2, 4)
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024  # Budget of the rendered results cache
+DEFAULT_MAX_CONCURRENT = 16  # Requests rendering or waiting for a worker, beyond which requests are rejected
+DEFAULT_TIMEOUT = 30  # Seconds a request waits for its rendering
+MAX_BODY_BYTES = 32 * 1024 * 1024
+DEFAULT_MAX_PIXELS = 5000 * 5000  # Largest rendered drawing, beyond which requests are rejected
+
+
+class RenderError(Exception):
+    """A request that can't be rendered, with the HTTP status to answer."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache of bytes values, bounded by their total size."""
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # Key -> (value, content type)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Get a cached entry and mark it as recently used, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, value, content_type):
+        """Cache an entry, evicting the least recently used ones while over budget."""
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous[0])
+            self._entries[key] = (value, content_type)
+            self.total_bytes += len(value)
+            while self.total_bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+
+def _render_request(drawing_data, image_format, width, height):
+    """Render a checked request in a worker. Returns the rendered bytes and the rendering time."""
+    start = time.perf_counter()
+    return render(drawing_data, image_format, width, height), time.perf_counter() - start
+
+
+class RenderService:
+    """
+    Renders drawing requests in a worker pool, with a result cache and a limit on the concurrent requests.
+
+    The service doesn't depend on HTTP, so it can be used (and tested) directly.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, cache_bytes=DEFAULT_CACHE_BYTES, max_concurrent=DEFAULT_MAX_CONCURRENT,
+                 timeout=DEFAULT_TIMEOUT, processes=True, max_pixels=DEFAULT_MAX_PIXELS, image_dir=None):
+        """
+        Initialize the RenderService.
+
+        Parameters:
+            workers (int): The number of rendering workers.
+            cache_bytes (int): Budget in bytes of the result cache.
+            max_concurrent (int): The number of requests rendering or waiting, beyond which requests are rejected.
+            timeout (float): Seconds a request waits for its rendering.
+            processes (bool): Render in worker processes (threads otherwise).
+            max_pixels (int): The largest rendered size in pixels, beyond which requests are rejected.
+            image_dir (str): The directory the pictures of the drawings are read from, or None to reject the drawings
+                             with pictures.
+        """
+        self.cache = LRUCache(cache_bytes)
+        self.timeout = timeout
+        self.max_concurrent = max_concurrent
+        self.max_pixels = max_pixels
+        self.image_dir = os.path.realpath(image_dir) if image_dir else None
+        self.rendered = 0
+        self.rejected = 0
+        self._workers = workers
+        self._processes = processes
+        self._pool = self._new_pool()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._in_flight = {}  # Key -> future of the rendering, shared by identical requests
+        self._lock = threading.Lock()
+
+    def _new_pool(self):
+        if self._processes:
+            return futures.ProcessPoolExecutor(self._workers)
+        return futures.ThreadPoolExecutor(self._workers)
+
+    @staticmethod
+    def cache_key(body, image_format, width=None, height=None):
+        """Get the content hash of a request."""
+        digest = hashlib.sha256(body)
+        digest.update(("|%s|%s|%s" % (image_format, width, height)).encode("ascii"))
+        return digest.hexdigest()
+
+    def render(self, body, image_format="png", width=None, height=None):
+        """
+        Render a drawing.
+
+        Parameters:
+            body (bytes): The drawing JSON.
+            image_format (str): "png" or "svg".
+            width (int): Width of the result, the drawing extent by default.
+            height (int): Height of the result, the drawing extent by default.
+
+        Returns:
+            tuple: The rendered bytes, their content type, the cache key, "hit" or "miss", and the timings in seconds
+                ({"render": ..., "queue": ...} on a miss).
+
+        Raises:
+            RenderError: If the request is invalid or too large, the service is busy, or the rendering failed or timed
+                         out.
+        """
+        if image_format not in CONTENT_TYPES:
+            raise RenderError(400, "Unsupported format: %s" % image_format)
+        key = self.cache_key(body, image_format, width, height)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached[0], cached[1], key, "hit", {}
+        drawing_data = self.check(body, width, height)
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise RenderError(503, "Too many concurrent requests")
+        try:
+            start = time.perf_counter()
+            pool = self._pool
+            try:
+                with self._lock:
+                    future = self._in_flight.get(key)
+                    submitted = future is None
+                    if submitted:
+                        future = pool.submit(_render_request, drawing_data, image_format, width, height)
+                        self._in_flight[key] = future
+                if submitted:
+                    future.add_done_callback(lambda _: self._forget(key))
+                data, render_seconds = future.result(timeout=self.timeout)
+            except futures.TimeoutError:
+                raise RenderError(504, "Rendering timed out")
+            except (ValueError, KeyError, TypeError) as e:
+                raise RenderError(400, "Invalid drawing: %s" % e)
+            except futures.BrokenExecutor:
+                self._replace_pool(pool)  # A worker died (killed, or out of memory): the next requests get new ones
+                raise RenderError(500, "Rendering failed: a worker stopped")
+            except Exception as e:  # MemoryError, errors of PIL...
+                raise RenderError(500, "Rendering failed: %s" % (str(e) or type(e).__name__))
+            total = time.perf_counter() - start
+        finally:
+            self._slots.release()
+
+        content_type = CONTENT_TYPES[image_format]
+        self.cache.put(key, data, content_type)
+        self.rendered += 1
+        return data, content_type, key, "miss", {"render": render_seconds, "queue": max(total - render_seconds, 0)}
+
+    def check(self, body, width=None, height=None):
+        """
+        Parse and check a request before it's rendered.
+
+        Returns:
+            dict: The drawing data, with the paths of its pictures resolved in the image directory.
+
+        Raises:
+            RenderError: If the drawing is invalid, has pictures outside the image directory, or would be rendered
+                         larger than the pixel limit.
+        """
+        try:
+            drawing_data = json.loads(body)
+        except ValueError as e:
+            raise RenderError(400, "Invalid drawing: %s" % e)
+        if not isinstance(drawing_data, dict):
+            raise RenderError(400, "The drawing must be a JSON object")
+        if (width is not None and width <= 0) or (height is not None and height <= 0):
+            raise RenderError(400, "The width and height must be positive")
+        try:
+            if drawing_data.get("images"):
+                drawing_data = dict(drawing_data, images=[self._picture(image_data)
+                                                          for image_data in drawing_data["images"]])
+            size = drawing_size(drawing_data, width, height)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise RenderError(400, "Invalid drawing: %s" % e)
+        if size[0] * size[1] > self.max_pixels:
+            raise RenderError(413, "The drawing is too large to render: %d x %d pixels, the limit is %d pixels"
+                              % (size[0], size[1], self.max_pixels))
+        return drawing_data
+
+    def _picture(self, image_data):
+        """Get the data of a picture with its path resolved in the image directory."""
+        if self.image_dir is None:
+            raise RenderError(400, "Pictures are not accepted by this server (no image directory)")
+        path = image_data["path"]
+        resolved = os.path.realpath(os.path.join(self.image_dir, path))  # Absolute paths and links are resolved too
+        if os.path.commonpath([self.image_dir, resolved]) != self.image_dir:
+            raise RenderError(400, "Picture outside the image directory: %s" % path)
+        return dict(image_data, path=resolved)
+
+    def _replace_pool(self, broken):
+        with self._lock:
+            if self._pool is broken:
+                self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def stats(self):
+        """Get the cache and concurrency counters."""
+        return {
+            "cache_entries": len(self.cache),
+            "cache_bytes": self.cache.total_bytes,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "rendered": self.rendered,
+            "rejected": self.rejected,
+            "in_flight": len(self._in_flight),
+            "max_concurrent": self.max_concurrent,
+            "max_pixels": self.max_pixels,
+        }
+
+    def close(self):
+        """Stop the workers."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class _RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "DrawingRenderServer/1.0"
+
+    def do_GET(self):
+        if urlparse(self.path).path in ("/stats", "/health"):
+            self._send_json(200, self.server.service.stats())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != "/render":
+            self._send_json(404, {"error": "Not found"})
+            return
+        query = parse_qs(url.query)
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length > MAX_BODY_BYTES:
+                raise RenderError(413, "The drawing is too large")
+            body = self.rfile.read(length)
+            image_format = query.get("format", ["png"])[0].lower()
+            width, height = (int(query[name][0]) if name in query else None for name in ("width", "height"))
+            data, content_type, key, cache_status, timings = self.server.service.render(body, image_format,
+                                                                                        width, height)
+        except RenderError as e:
+            self._send_json(e.status, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": "Internal error: %s" % (str(e) or type(e).__name__)})
+            return
+
+        if self.headers.get("If-None-Match") == '"%s"' % key:
+            self.send_response(304)
+            data = b""
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+        total = time.perf_counter() - start
+        server_timing = ['cache;desc="%s"' % cache_status]
+        server_timing += ["%s;dur=%.3f" % (name, seconds * 1000) for name, seconds in timings.items()]
+        server_timing.append("total;dur=%.3f" % (total * 1000))
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", '"%s"' % key)
+        self.send_header("X-Cache", cache_status.upper())
+        self.send_header("X-Render-Time-Ms", "%.3f" % (timings.get("render", 0) * 1000))
+        self.send_header("Server-Timing", ", ".join(server_timing))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, content):
+        data = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class RenderServer(ThreadingHTTPServer):
+    """HTTP server of a RenderService (port 0 picks a free port, see server_address)."""
+
+    daemon_threads = True
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, service=None, verbose=False):
+        super().__init__((host, port), _RenderRequestHandler)
+        self.service = service or RenderService()
+        self.verbose = verbose
+
+    def server_close(self):
+        super().server_close()
+        self.service.close()
+
+
+def serve(argv=None):
+    """Run the render server from the command line (python main.py serve --help)."""
+    parser = argparse.ArgumentParser(prog="python main.py serve",
+                                     description="Render drawings to PNG or SVG over HTTP, without a display.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="rendering worker processes")
+    parser.add_argument("--cache-mb", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="size of the result cache in megabytes (default: %(default)s)")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="requests rendering or waiting beyond which requests are rejected with 503")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="rendering timeout in seconds")
+    parser.add_argument("--max-pixels", type=int, default=DEFAULT_MAX_PIXELS,
+                        help="largest rendered size in pixels, beyond which requests are rejected with 413 "
+                             "(default: %(default)s)")
+    parser.add_argument("--image-dir",
+                        help="directory the pictures of the drawings are read from (their paths are relative to it); "
+                             "drawings with pictures are rejected without it")
+    parser.add_argument("--threads", action="store_true", help="render in threads instead of processes")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    service = RenderService(workers=args.workers, cache_bytes=args.cache_mb * 1024 * 1024,
+                            max_concurrent=args.max_concurrent, timeout=args.timeout, processes=not args.threads,
+                            max_pixels=args.max_pixels, image_dir=args.image_dir)
+    server = RenderServer(args.host, args.port, service, verbose=args.verbose)
+    print("Render server listening on http://%s:%d/render" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
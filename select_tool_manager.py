@@ -1,3 +1,9 @@
+import math
+
+from history_manager import SELECTED_TAG
+from selection_overlay import SelectionOverlay
+
+
 class ObjectSelectTool:
     """
     A tool for selecting and manipulating objects on a canvas.
@@ -16,13 +22,21 @@ class ObjectSelectTool:
         self.canvas = canvas
         self.toolbar = toolbar
         self.selected_object = None
+        self.picked_style = None  # Style of the selected object when it was picked, before the toolbar changed it
         self.selection_rectangle = None
-        self.marquee_objects = []  # Objects within the selection rectangle
+        self.overlay = SelectionOverlay(canvas)  # Frame and handles around the selected objects
 
         self.start_x = None  # Initial X coordinate of selection rectangle
         self.start_y = None  # Initial Y coordinate of selection rectangle
         self.prev_x = None  # Previous X coordinate of mouse during movement
         self.prev_y = None  # Previous Y coordinate of mouse during movement
+        self._moved_x = 0  # Total X distance of the current move (for the undo history)
+        self._moved_y = 0  # Total Y distance of the current move (for the undo history)
+
+    @property
+    def marquee_objects(self):
+        """Get the selected objects (within the selection rectangle, or the single selected object)."""
+        return self.overlay.selection
 
     def select_object(self, event):
         """
@@ -33,7 +47,8 @@ class ObjectSelectTool:
         """
         x, y = event.x, event.y
 
-        # Find the closest object to the click coordinates
+        # Find the closest object to the click coordinates, leaving out the overlay itself
+        self.overlay.hide()
         items = self.canvas.find_closest(x, y)
 
         if items:
@@ -41,41 +56,127 @@ class ObjectSelectTool:
                 self.deselect_object()
 
             self.selected_object = items[0]
+            self.picked_style = self.canvas.styles.style_of(self.selected_object)
 
             if self.selected_object is not None:
                 self._highlight_selected_object()
+        else:
+            self.overlay.refresh()
 
     def deselect_object(self):
         """Deselect the currently selected object."""
         if self.selected_object is not None:
-            self.canvas.delete("highlight")
+            self.overlay.clear()
 
     def _highlight_selected_object(self):
-        """Highlight the currently selected object."""
-        bbox = self.canvas.bbox(self.selected_object)
-
-        if bbox:
-            x1, y1, x2, y2 = bbox
-
-            # Draw a rectangle around the object to highlight it
-            self.canvas.create_rectangle(x1, y1, x2, y2, outline="red", dash=self.SELECTION_DASH, tags="highlight")
+        """Highlight the currently selected object, with the outermost group containing it."""
+        self.overlay.select([self.canvas.groups.unit_of(self.selected_object)])
+
+    def group_selection(self):
+        """Group the selected objects and groups (undone in one step)."""
+        units = self.overlay.units
+        if len(units) < 2:
+            self.canvas.bell()
+            return
+        tag = self.canvas.groups.group(units)
+        self.canvas.history.record_group(tag, units)
+        self.overlay.select([tag])
+
+    def ungroup_selection(self):
+        """Dissolve the selected groups into the objects and groups they contain (undone in one step)."""
+        groups = self.canvas.groups
+        units = []
+        with self.canvas.history.group():
+            for unit in self.overlay.units:
+                if isinstance(unit, str) and unit in groups:
+                    contents = groups.ungroup(unit)
+                    self.canvas.history.record_ungroup(unit, contents)
+                    units.extend(contents)
+                else:
+                    units.append(unit)
+        self.overlay.select(units)
 
     def activate_features(self):
         """Activate features for the selected object."""
         if self.selected_object is not None:
 
-            # Extract line width from toolbar settings
-            line_width_str = self.toolbar.get_line_width().replace("px", "")
-            line_width = int(line_width_str) if line_width_str else 1
+            object_config = self.canvas.itemconfig(self.selected_object)
+            changes = self._style_changes(self.selected_object, object_config)
+            if changes is None:
+                return
 
-            # Adjust object outline color based on the selected color
-            if self.canvas.type(self.selected_object) == 'line':  # For a line, it's the filling
-                self.canvas.itemconfigure(self.selected_object, fill=self.toolbar.get_color(), width=line_width)
+            before = {option: object_config[option][-1] for option in changes}
+            self.canvas.itemconfigure(self.selected_object, **changes)
+            after = {option: self.canvas.itemcget(self.selected_object, option) for option in changes}
+            self.canvas.history.record_config(self.selected_object, before, after)
+            self.overlay.refresh()  # The width changes the box of the object
 
-            elif hasattr(self.canvas, 'itemconfig'):
-                object_config = self.canvas.itemconfig(self.selected_object)
-                if 'outline' in object_config:
-                    self.canvas.itemconfigure(self.selected_object, outline=self.toolbar.get_color(), width=line_width)
+    def restyle_similar(self):
+        """
+        Apply the color and line width of the toolbar to the selected object and to all the objects that had its
+        style when it was picked, as one step of the undo history.
+        """
+        if self.selected_object is None or self.picked_style is None:
+            return
+        changes = self._style_changes(self.selected_object, self.canvas.itemconfig(self.selected_object))
+        if changes is not None:
+            with self.canvas.history.group():
+                self.canvas.styles.restyle(self.picked_style, changes)  # A single itemconfigure of its tag
+                self.activate_features()  # The selected object, moved to the style of the toolbar when picked
+
+    def _style_changes(self, item, object_config):
+        """Get the options of an item changed by the color and line width of the toolbar, or None for other items."""
+        state = self.toolbar.state
+
+        # Adjust object outline color based on the selected color
+        if self.canvas.type(item) == 'line':  # For a line, it's the filling
+            return {"fill": state.color, "width": state.line_width}
+        if 'outline' in object_config:
+            return {"outline": state.color, "width": state.line_width}
+        return None
+
+    def scale_selection(self, x_scale, y_scale):
+        """Scale the selected objects around the center of the selection."""
+        from transforms import scale_matrix  # Imported on first use, like NumPy, to keep the startup fast
+
+        self._transform_selection(scale_matrix, x_scale, y_scale)
+
+    def rotate_selection(self, degrees):
+        """Rotate the selected objects clockwise around the center of the selection."""
+        from transforms import rotation_matrix
+
+        self._transform_selection(rotation_matrix, math.radians(degrees))
+
+    def skew_selection(self, x_degrees, y_degrees):
+        """Skew the selected objects around the center of the selection, by horizontal and vertical angles."""
+        from transforms import skew_matrix
+
+        self._transform_selection(skew_matrix, math.tan(math.radians(x_degrees)), math.tan(math.radians(y_degrees)))
+
+    def _transform_selection(self, make_matrix, *args):
+        if self.overlay.box is None:
+            self.canvas.bell()
+            return
+        x1, y1, x2, y2 = self.overlay.box
+        self.overlay.transform(make_matrix(*args, center=((x1 + x2) / 2, (y1 + y2) / 2)))
+
+    def refresh_selection(self):
+        """Fit the selection overlay again after an undo or a redo (restored objects come back with new ids)."""
+        visible = self.overlay.visible
+        groups = self.canvas.groups
+        units = self.canvas.history.resolve_all(self.overlay.units)
+        if units == self.overlay.units and len(self.canvas.find_withtag(SELECTED_TAG)) == len(self.overlay.selection):
+            self.overlay.refresh()  # The selected objects were only changed in place
+        else:
+            self.overlay.select([unit for unit in units
+                                 if (unit in groups if isinstance(unit, str) else self.canvas.type(unit))])
+        if not visible:
+            self.overlay.hide()
+
+    def hide_highlight(self):
+        """Hide the selection overlay and the selection rectangle while another tool is used (they're reused)."""
+        self.canvas.itemconfigure("highlight", state="hidden")
+        self.overlay.visible = False
 
     def start_selection(self, event):
         """
@@ -86,11 +187,17 @@ class ObjectSelectTool:
         """
         self.start_x = event.x
         self.start_y = event.y
-
-        # Create a selection rectangle at the starting position
-        self.selection_rectangle = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x, self.start_y,
-                                                                outline="blue", dash=self.SELECTION_DASH,
-                                                                tags="highlight")
+        self.overlay.hide()
+
+        # Show the selection rectangle at the starting position (it's created once and reused)
+        if self.selection_rectangle is None or not self.canvas.type(self.selection_rectangle):
+            self.selection_rectangle = self.canvas.create_rectangle(self.start_x, self.start_y, self.start_x,
+                                                                    self.start_y, outline="blue",
+                                                                    dash=self.SELECTION_DASH, tags="highlight")
+        else:
+            self.canvas.coords(self.selection_rectangle, self.start_x, self.start_y, self.start_x, self.start_y)
+            self.canvas.itemconfigure(self.selection_rectangle, state="normal")
+            self.canvas.tag_raise(self.selection_rectangle)
 
     def update_selection(self, event):
         """
@@ -111,11 +218,11 @@ class ObjectSelectTool:
             event: The mouse event containing coordinates of the mouse release.
         """
         if self.start_x is not None and self.start_y is not None:
-            self.marquee_objects.clear()
+            self.canvas.itemconfigure(self.selection_rectangle, state="hidden")
 
-            # Find objects enclosed by the selection rectangle
-            objects_in_marquee = self.canvas.find_enclosed(self.start_x, self.start_y, event.x, event.y)
-            self.marquee_objects.extend(objects_in_marquee)
+            # Select the objects enclosed by the selection rectangle
+            self.selected_object = None
+            self.overlay.select_enclosed(self.start_x, self.start_y, event.x, event.y)
 
     def move_square_objects(self, event):
         """Move the selected objects within a square selection."""
@@ -125,12 +232,11 @@ class ObjectSelectTool:
             delta_x = event.x - self.prev_x
             delta_y = event.y - self.prev_y
 
-            # Hide the selection rectangle during movement
-            self.canvas.itemconfigure(self.selection_rectangle, state='hidden')
-
-            # Move each selected object by the delta amount
-            for obj in self.marquee_objects:
-                self.canvas.move(obj, delta_x, delta_y)
+            # Move all the selected objects in one call, and the overlay with them
+            self.canvas.move(SELECTED_TAG, delta_x, delta_y)
+            self.overlay.translate(delta_x, delta_y)
+            self._moved_x += delta_x
+            self._moved_y += delta_y
 
             # Move each selected object by the delta amount
             self.start_x += delta_x
@@ -143,7 +249,8 @@ class ObjectSelectTool:
     def end_move(self, event) -> None:
         """End moving the selected objects."""
 
-        # Reset previous mouse coordinates and clear selected objects list
+        # Record the whole move as one step, then reset previous mouse coordinates (the objects stay selected)
+        self.canvas.history.record_move(self.marquee_objects, self._moved_x, self._moved_y)
+        self._moved_x, self._moved_y = 0, 0
         self.prev_x = None
         self.prev_y = None
-        self.marquee_objects.clear()
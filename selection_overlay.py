@@ -0,0 +1,265 @@
+import math
+
+from group_tree import GROUPED_TAG
+from history_manager import SELECTED_TAG
+
+OVERLAY_TAG = "selection_overlay"  # Tag of the frame and handle items (which also have the "highlight" helper tag)
+HANDLE_SIZE = 7  # Side of the handles in pixels
+GRAB_DISTANCE = 6  # Distance in pixels from the center of a handle within which a press grabs it
+ROTATE_HANDLE_OFFSET = 24  # Distance in pixels of the rotate handle above the frame
+MIN_SIZE = 2  # Smallest width or height in pixels the selection can be resized to
+BOX_QUERY_LIMIT = 256  # Above this many uncached boxes (or groups), the box of the selection is asked to Tk at once
+
+# Resize handles as fractions of the frame width and height, clockwise from the top-left corner
+RESIZE_HANDLES = ((0, 0), (0.5, 0), (1, 0), (1, 0.5), (1, 1), (0.5, 1), (0, 1), (0, 0.5))
+ROTATE_HANDLE = len(RESIZE_HANDLES)  # Index of the rotate handle, after the resize handles
+
+
+class SelectionOverlay:
+    """
+    Frame and handles drawn around the selected objects, to resize and rotate them.
+
+    The overlay creates its items (a frame, eight resize handles and a rotate handle) once and then only updates their
+    coordinates and state, so showing it costs the same number of Tk calls whatever the size of the selection. The
+    selected items get the SELECTED_TAG, so moving or resizing the whole selection is a single Tk call, and the box of
+    the selection comes from the bounding box cache of the canvas.
+    """
+
+    def __init__(self, canvas, color="red"):
+        """
+        Initialize the SelectionOverlay.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the selected objects.
+            color (str): Color of the frame and the handles.
+        """
+        self.canvas = canvas
+        self.color = color
+        self.units = []  # The selected items and outermost groups (by tag)
+        self.selection = []  # The selected items, including the items of the selected groups
+        self.box = None  # The (x1, y1, x2, y2) box of the selection
+        self.visible = False
+        self._frame = None
+        self._handles = []
+        self._corners = None  # The four corners of the frame, clockwise from the top-left one
+        self._drag = None  # State of the handle being dragged
+
+    def select(self, units):
+        """Select items and groups (by tag), replacing the current selection, and fit the overlay around them."""
+        self.canvas.dtag(SELECTED_TAG, SELECTED_TAG)
+        self.units = list(dict.fromkeys(unit for unit in units if unit))
+        for unit in self.units:
+            self.canvas.addtag_withtag(SELECTED_TAG, unit)
+        self.selection = list(self.canvas.find_withtag(SELECTED_TAG)) if self.units else []
+        self.refresh()
+
+    def select_enclosed(self, x1, y1, x2, y2):
+        """
+        Select the items and the outermost groups enclosed in a rectangle, but those of the hidden and locked layers.
+        The items are tagged with a single Tk call, and the groups are found in the group tree without looking at
+        their items.
+        """
+        x1, x2 = sorted((x1, x2))
+        y1, y2 = sorted((y1, y2))
+        self.canvas.dtag(SELECTED_TAG, SELECTED_TAG)
+        layers = self.canvas.layers
+        with layers.locked_hidden():  # Tk leaves out the hidden items, and so the locked layers
+            self.canvas.addtag_enclosed(SELECTED_TAG, x1, y1, x2, y2)
+        self.canvas.dtag("highlight", SELECTED_TAG)  # Leave out the overlay and the selection rectangle
+        groups = self.canvas.groups
+        if groups:
+            self.canvas.dtag(GROUPED_TAG, SELECTED_TAG)  # Grouped items are only selected with their whole group
+        self.units = list(self.canvas.find_withtag(SELECTED_TAG))
+        if groups:
+            enclosed_groups = [tag for tag in groups.find_enclosed(x1, y1, x2, y2) if layers.pickable(tag)]
+            for tag in enclosed_groups:
+                self.canvas.addtag_withtag(SELECTED_TAG, tag)
+            self.units.extend(enclosed_groups)
+            self.selection = list(self.canvas.find_withtag(SELECTED_TAG))
+        else:
+            self.selection = list(self.units)
+        self.refresh()
+
+    def select_tagged(self, units, items):
+        """
+        Select items that already have the SELECTED_TAG (created with it after the selection was cleared), and the
+        items and groups they make up, without a Tk call per item or group.
+        """
+        self.units = list(units)
+        self.selection = list(items)
+        self.refresh()
+
+    def clear(self):
+        """Empty the selection."""
+        self.select([])
+
+    def refresh(self):
+        """Fit the overlay to the current boxes of the selected items and groups, or hide it if there are none."""
+        self.box = self._units_box() if self.units else None
+        if self.box is None:
+            self.hide()
+            return
+        x1, y1, x2, y2 = self.box
+        self._place([(x1, y1), (x2, y1), (x2, y2), (x1, y2)])
+
+    def hide(self):
+        if self.visible:
+            self.canvas.itemconfigure(OVERLAY_TAG, state="hidden")
+            self.visible = False
+
+    def translate(self, dx, dy):
+        """Follow the selection moved by (dx, dy)."""
+        if self.box is not None:
+            x1, y1, x2, y2 = self.box
+            self.box = (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+            self._place([(x + dx, y + dy) for x, y in self._corners])
+
+    def handle_at(self, x, y):
+        """Get the index of the handle under a point, or None."""
+        if not self.visible:
+            return None
+        for index, (handle_x, handle_y) in enumerate(self.handle_positions()):
+            if abs(x - handle_x) <= GRAB_DISTANCE and abs(y - handle_y) <= GRAB_DISTANCE:
+                return index
+        return None
+
+    def start_drag(self, x, y):
+        """
+        Start dragging the handle under a point, if any.
+
+        Returns:
+            bool: Whether a handle was grabbed.
+        """
+        handle = self.handle_at(x, y)
+        if handle is None:
+            return False
+        x1, y1, x2, y2 = self.box
+        self._drag = {"handle": handle, "box": self.box, "scale": (1.0, 1.0), "angle": 0.0,
+                      "center": ((x1 + x2) / 2, (y1 + y2) / 2)}
+        center_x, center_y = self._drag["center"]
+        self._drag["start_angle"] = math.atan2(y - center_y, x - center_x)
+        return True
+
+    def drag(self, x, y):
+        """Resize the selection, or rotate the frame, while a handle is dragged."""
+        drag = self._drag
+        if drag is None:
+            return
+        if drag["handle"] == ROTATE_HANDLE:
+            # The frame follows the pointer, and the items are rotated once on release
+            center_x, center_y = drag["center"]
+            drag["angle"] = math.atan2(y - center_y, x - center_x) - drag["start_angle"]
+            x1, y1, x2, y2 = drag["box"]
+            self._place([_rotate(point, drag["center"], drag["angle"])
+                         for point in ((x1, y1), (x2, y1), (x2, y2), (x1, y2))])
+            return
+
+        # The side (or corner) opposite to the handle stays in place
+        fraction_x, fraction_y = RESIZE_HANDLES[drag["handle"]]
+        x1, y1, x2, y2 = drag["box"]
+        new_x1, new_y1, new_x2, new_y2 = x1, y1, x2, y2
+        if fraction_x == 0:
+            new_x1 = min(x, x2 - MIN_SIZE)
+        elif fraction_x == 1:
+            new_x2 = max(x, x1 + MIN_SIZE)
+        if fraction_y == 0:
+            new_y1 = min(y, y2 - MIN_SIZE)
+        elif fraction_y == 1:
+            new_y2 = max(y, y1 + MIN_SIZE)
+        scale = ((new_x2 - new_x1) / (x2 - x1), (new_y2 - new_y1) / (y2 - y1))
+        origin = (x2 if fraction_x == 0 else x1, y2 if fraction_y == 0 else y1)
+
+        # Scale the selection from its previous size in one call
+        previous = drag["scale"]
+        self.canvas.scale(SELECTED_TAG, origin[0], origin[1], scale[0] / previous[0], scale[1] / previous[1])
+        drag["scale"], drag["origin"] = scale, origin
+        self.box = (new_x1, new_y1, new_x2, new_y2)
+        self._place([(new_x1, new_y1), (new_x2, new_y1), (new_x2, new_y2), (new_x1, new_y2)])
+
+    def end_drag(self):
+        """Apply the rotation or record the resize of the selection in the history, and fit the overlay again."""
+        drag, self._drag = self._drag, None
+        if drag is None:
+            return
+        if drag["handle"] == ROTATE_HANDLE:
+            if drag["angle"]:
+                from transforms import rotation_matrix  # Imported on first use, like NumPy, to keep the startup fast
+
+                self.transform(rotation_matrix(drag["angle"], drag["center"]))
+                return
+        elif drag["scale"] != (1.0, 1.0):
+            self.canvas.history.record_scale(self.selection, drag["origin"][0], drag["origin"][1], *drag["scale"])
+        self.refresh()
+
+    def transform(self, matrix):
+        """Apply an affine transform to the selected items, keeping them selected (see transforms.transform_items)."""
+        from transforms import transform_items
+
+        replaced = transform_items(self.canvas, self.selection, matrix)
+        if replaced:  # The polygons replacing rectangles and ovals have their tags, including SELECTED_TAG
+            self.units = [replaced.get(unit, unit) for unit in self.units]
+            self.selection = [replaced.get(item, item) for item in self.selection]
+        self.refresh()
+
+    def _units_box(self):
+        """Get the box of the selected items (from the bounding box cache) and groups (from the group tree)."""
+        items = [unit for unit in self.units if not isinstance(unit, str)]
+        if self.canvas.bboxes.missing(items) > BOX_QUERY_LIMIT or len(self.units) - len(items) > BOX_QUERY_LIMIT:
+            return self.canvas.bbox(SELECTED_TAG) or None  # After the selection changed as a whole
+        boxes = [self.canvas.groups.box(unit) for unit in self.units if isinstance(unit, str)]
+        if items:
+            boxes.append(self.canvas.bboxes.union(items))
+        boxes = [box for box in boxes if box]
+        if not boxes:
+            return None
+        x1s, y1s, x2s, y2s = zip(*boxes)
+        return min(x1s), min(y1s), max(x2s), max(y2s)
+
+    def handle_positions(self, corners=None):
+        """Get the centers of the resize handles and of the rotate handle of a frame (the current one by default)."""
+        corners = corners or self._corners
+        (x0, y0), (x1, y1), _, (x3, y3) = corners
+        positions = [(x0 + (x1 - x0) * fraction_x + (x3 - x0) * fraction_y,
+                      y0 + (y1 - y0) * fraction_x + (y3 - y0) * fraction_y)
+                     for fraction_x, fraction_y in RESIZE_HANDLES]
+
+        # The rotate handle is above the middle of the top side
+        up_x, up_y = x0 - x3, y0 - y3
+        length = math.hypot(up_x, up_y) or 1
+        top_x, top_y = positions[1]
+        positions.append((top_x + up_x / length * ROTATE_HANDLE_OFFSET, top_y + up_y / length * ROTATE_HANDLE_OFFSET))
+        return positions
+
+    def _place(self, corners):
+        """Update the frame and the handles in place, and show them."""
+        self._ensure_items()
+        self._corners = corners
+        self.canvas.coords(self._frame, *[value for corner in corners for value in corner])
+        half = HANDLE_SIZE / 2
+        for handle, (x, y) in zip(self._handles, self.handle_positions(corners)):
+            self.canvas.coords(handle, x - half, y - half, x + half, y + half)
+        if not self.visible:
+            self.canvas.itemconfigure(OVERLAY_TAG, state="normal")
+            self.canvas.tag_raise(OVERLAY_TAG)
+            self.visible = True
+
+    def _ensure_items(self):
+        """Create the overlay items, the first time or after they were deleted with the rest of the drawing."""
+        if self._frame is not None and self.canvas.type(self._frame):
+            return
+        tags = ("highlight", OVERLAY_TAG)
+        self._frame = self.canvas.create_polygon(0, 0, 0, 0, 0, 0, outline=self.color, fill="", dash=(3, 3),
+                                                 tags=tags, state="hidden")
+        self._handles = [self.canvas.create_rectangle(0, 0, 0, 0, outline=self.color, fill="white", tags=tags,
+                                                      state="hidden") for _ in RESIZE_HANDLES]
+        self._handles.append(self.canvas.create_oval(0, 0, 0, 0, outline=self.color, fill="white", tags=tags,
+                                                     state="hidden"))
+        self.visible = False
+
+
+def _rotate(point, center, angle):
+    """Rotate a point around a center by an angle in radians (clockwise on the screen)."""
+    cos, sin = math.cos(angle), math.sin(angle)
+    x, y = point[0] - center[0], point[1] - center[1]
+    return center[0] + x * cos - y * sin, center[1] + x * sin + y * cos
+
@@ -1,6 +1,9 @@
 import tkinter as tk
 import math
 
+PREVIEW_TAG = "preview"  # Tag of the temporary items shown while a shape is being drawn
+RUBBER_BAND_DASH = (4, 2)
+
 
 class ShapeDrawer:
     """
@@ -21,6 +24,16 @@ class ShapeDrawer:
         self.current_shape_item = None
         self.selected_points = []  # List to store selected points for polygon drawing
         self.point_selection_mode = False  # Flag to indicate point selection mode
+        self._polygon_preview = None  # Line through the polygon points selected so far
+        self._rubber_band = None  # Segment between the last polygon point and the mouse pointer
+
+        # Drawing method of every shape, by tool name
+        self._shape_methods = {
+            "Line": self._draw_line,
+            "Square": self._draw_rectangle,
+            "Triangle": self._draw_triangle,
+            "Oval": self._draw_oval,
+        }
 
     def draw(self, event, start_x, start_y):
         """
@@ -31,19 +44,14 @@ class ShapeDrawer:
             start_x (int): X-coordinate of the starting point.
             start_y (int): Y-coordinate of the starting point.
         """
-        selected_shape = self.toolbar.get_selected_tool()
-        color = self.toolbar.get_color()
-        line_width = int(self.toolbar.get_line_width().replace("px", "")) or 1
+        state = self.toolbar.state
+        selected_shape = state.tool
+        event = self.canvas.snapping.snap_event(event, exclude=(self.current_shape_item,))
 
         # Determine the shape to draw based on the selected tool
-        if selected_shape == "Line":
-            self._draw_line(event, start_x, start_y, color, line_width)
-        elif selected_shape == "Square":
-            self._draw_rectangle(event, start_x, start_y, color, line_width)
-        elif selected_shape == "Triangle":
-            self._draw_triangle(event, start_x, start_y, color, line_width)
-        elif selected_shape == "Oval":
-            self._draw_oval(event, start_x, start_y, color, line_width)
+        shape_method = self._shape_methods.get(selected_shape)
+        if shape_method:
+            shape_method(event, start_x, start_y, state.color, state.line_width)
         elif selected_shape == "Start polygon":
             self.start_polygon(event, start_x, start_y)
         elif selected_shape == "Close Polygon":
@@ -51,22 +59,23 @@ class ShapeDrawer:
 
     def _draw_line(self, event, start_x, start_y, color, line_width):
         """Draw a straight line."""
-        self._delete_previous_shape()
-        self.current_shape_item = self.canvas.create_line(start_x, start_y, event.x, event.y, fill=color,
-                                                          width=line_width)
+        if self.current_shape_item:
+            self.canvas.coords(self.current_shape_item, start_x, start_y, event.x, event.y)
+        else:
+            self.current_shape_item = self.canvas.create_line(start_x, start_y, event.x, event.y, fill=color,
+                                                              width=line_width)
 
     def _draw_rectangle(self, event, start_x, start_y, color, line_width):
         """Draw a square."""
-        self._delete_previous_shape()
-
         x1, y1 = start_x, start_y
         x2, y2 = event.x, event.y
-        self.current_shape_item = self.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=line_width)
+        if self.current_shape_item:
+            self.canvas.coords(self.current_shape_item, x1, y1, x2, y2)
+        else:
+            self.current_shape_item = self.canvas.create_rectangle(x1, y1, x2, y2, outline=color, width=line_width)
 
     def _draw_triangle(self, event, start_x, start_y, color, line_width):
         """Draw a triangle."""
-        self._delete_previous_shape()
-
         x1, y1 = start_x, start_y
         x2, y2 = event.x, event.y
 
@@ -75,55 +84,73 @@ class ShapeDrawer:
         x3 = x1 + length * math.cos(angle - math.pi / 3)
         y3 = y1 + length * math.sin(angle - math.pi / 3)
 
-        self.current_shape_item = self.canvas.create_polygon(x1, y1, x2, y2, x3, y3, outline=color, width=line_width,
-                                                             fill='')
+        if self.current_shape_item:
+            self.canvas.coords(self.current_shape_item, x1, y1, x2, y2, x3, y3)
+        else:
+            self.current_shape_item = self.canvas.create_polygon(x1, y1, x2, y2, x3, y3, outline=color,
+                                                                 width=line_width, fill='')
 
     def _draw_oval(self, event, start_x, start_y, color, line_width):
         """Draw an oval (circle)."""
-        self._delete_previous_shape()
-
         x1, y1 = start_x, start_y
         x2, y2 = event.x, event.y
-        self.current_shape_item = self.canvas.create_oval(x1, y1, x2, y2, outline=color, width=line_width)
+        if self.current_shape_item:
+            self.canvas.coords(self.current_shape_item, x1, y1, x2, y2)
+        else:
+            self.current_shape_item = self.canvas.create_oval(x1, y1, x2, y2, outline=color, width=line_width)
 
     def start_polygon(self, event, start_x, start_y):
-        """Start drawing a polygon."""
+        """Start drawing a polygon, or add a point to the polygon being drawn."""
         if not self.point_selection_mode:
             self.clear_selection()  # Clear previous selection if not in point selection mode
             self.point_selection_mode = True
 
-        x, y = event.x, event.y
+        x, y = self.canvas.snapping.snap(event.x, event.y)  # The preview items are never snapped to
         self.selected_points.append((x, y))
+        points = [coord for point in self.selected_points for coord in point]
+
+        # The sides drawn so far are one preview line, updated in place as points are added
+        if self._polygon_preview:
+            self.canvas.coords(self._polygon_preview, *points)
+        elif len(self.selected_points) > 1:
+            self._polygon_preview = self.canvas.create_line(*points, fill=self.toolbar.state.color,
+                                                            tags=PREVIEW_TAG)
+        self.update_rubber_band(event)
+
+    def update_rubber_band(self, event):
+        """Move the rubber-band segment between the last polygon point and the mouse pointer."""
+        if not self.point_selection_mode:
+            return
 
-        if len(self.selected_points) > 1:
-            prev_point = self.selected_points[-2]
-            self.canvas.create_line(prev_point[0], prev_point[1], x, y, fill=self.toolbar.get_color())
+        last_x, last_y = self.selected_points[-1]
+        x, y = self.canvas.snapping.snap(event.x, event.y)
+        if self._rubber_band:
+            self.canvas.coords(self._rubber_band, last_x, last_y, x, y)
+        else:
+            self._rubber_band = self.canvas.create_line(last_x, last_y, x, y,
+                                                        fill=self.toolbar.state.color, dash=RUBBER_BAND_DASH,
+                                                        tags=PREVIEW_TAG)
 
     def close_polygon(self, event):
-        """Close the polygon by connecting a line between the last point and the first point."""
+        """Close the polygon and replace its preview with a single polygon item."""
 
         if len(self.selected_points) >= 2:
-            first_point = self.selected_points[0]
-            last_point = self.selected_points[-1]
-            self.canvas.create_line(last_point[0], last_point[1], first_point[0], first_point[1],
-                                    fill=self.toolbar.get_color())
+            points = [coord for point in self.selected_points for coord in point]
+            state = self.toolbar.state
+            polygon = self.canvas.create_polygon(*points, outline=state.color, width=state.line_width, fill='')
+            self.canvas.history.record_create([polygon])
 
             self.clear_selection()
 
     def clear_selection(self):
         """Clear the previous selection."""
 
-        for point in self.selected_points:
-            x, y = point
-            self.canvas.delete("point_" + str(x) + "_" + str(y))
+        for item in (self._polygon_preview, self._rubber_band):
+            if item:
+                self.canvas.delete(item)
+        self._polygon_preview = None
+        self._rubber_band = None
 
         self.selected_points.clear()
 
         self.point_selection_mode = False
-
-    def _delete_previous_shape(self):
-        """Delete the previous shape."""
-
-        if self.current_shape_item:
-            self.canvas.delete(self.current_shape_item)
-            self.current_shape_item = None
@@ -0,0 +1,269 @@
+import copy
+import math
+
+from history_manager import CACHE_TAG, IGNORED_TAGS
+
+SNAP_DISTANCE = 8  # Distance in pixels within which a point snaps to a vertex or a midpoint
+DEFAULT_GRID_SPACING = 20  # Distance in document units (pixels without zoom) between the lines of the snapping grid
+CELL_SIZE = SNAP_DISTANCE  # Side of the cells of the spatial hash, so a query without zoom looks at 3x3 cells
+
+
+def snap_points(item_type, coords):
+    """
+    Get the points of an item that other points snap to: the vertices and the midpoints of the sides of lines and
+    polygons, the corners and the midpoints of the sides of rectangles, the center and the ends of the axes of ovals,
+    and the anchor of text boxes and pictures.
+
+    Parameters:
+        item_type (str): The type of the canvas item.
+        coords (list): The flat coordinates of the item.
+
+    Returns:
+        list: The (x, y) snap points.
+    """
+    if item_type in ("line", "polygon"):
+        vertices = list(zip(coords[::2], coords[1::2]))
+        sides = zip(vertices, vertices[1:] + vertices[:1]) if item_type == "polygon" and len(vertices) > 2 \
+            else zip(vertices, vertices[1:])
+        return vertices + [((x1 + x2) / 2, (y1 + y2) / 2) for (x1, y1), (x2, y2) in sides]
+    if item_type in ("rectangle", "oval") and len(coords) == 4:
+        x1, y1, x2, y2 = coords
+        middle_x, middle_y = (x1 + x2) / 2, (y1 + y2) / 2
+        points = [(middle_x, y1), (x2, middle_y), (middle_x, y2), (x1, middle_y)]
+        return points + ([(x1, y1), (x2, y1), (x2, y2), (x1, y2)] if item_type == "rectangle"
+                         else [(middle_x, middle_y)])
+    if len(coords) >= 2:
+        return [(coords[0], coords[1])]
+    return []
+
+
+class SnapIndex:
+    """
+    Spatial hash of the snap points of the canvas items.
+
+    The points are kept in square cells of CELL_SIZE document units, so the nearest point to the pointer is found by
+    looking at the cells around it, whatever the number of points. The points are in document coordinates, so
+    zooming and panning the view leave the index as it is. The index is updated incrementally: moved items shift
+    their points, and created or changed items are only marked, then read from Tk on the next query.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the SnapIndex with all the items of the canvas.
+
+        Parameters:
+            canvas (tk.Canvas): The canvas of the items.
+        """
+        self.canvas = canvas
+        self._points = {}  # Item -> its snap points
+        self._cells = {}  # (column, row) -> {item: its snap points in the cell}
+        self._dirty = set(canvas.find_all())  # Items to read from Tk before the next query
+
+    def __len__(self):
+        """Get the number of indexed snap points."""
+        self.sync()
+        return sum(map(len, self._points.values()))
+
+    def mark(self, items):
+        """Mark created or changed items to be read again on the next query."""
+        self._dirty.update(items)
+
+    def translate(self, items, dx, dy):
+        """Shift the snap points of moved items."""
+        for item in items:
+            points = self._points.get(item)
+            if points is not None:
+                self._remove(item)
+                self._add(item, [(x + dx, y + dy) for x, y in points])
+
+    def clear(self):
+        self._points.clear()
+        self._cells.clear()
+        self._dirty.clear()
+
+    def remove(self, items):
+        for item in items:
+            self._remove(item)
+            self._dirty.discard(item)
+
+    def sync(self):
+        """Read the marked items from Tk, leaving out helper items (IGNORED_TAGS), layer bitmaps and hidden items."""
+        canvas = self.canvas
+        dirty, self._dirty = self._dirty, set()
+        for item in dirty:
+            self._remove(item)
+            item_type = canvas.type(item)
+            if not item_type or any(tag in IGNORED_TAGS or tag == CACHE_TAG for tag in canvas.gettags(item)) \
+                    or canvas.itemcget(item, "state") == "hidden":
+                continue
+            points = snap_points(item_type, canvas.viewport.to_document(canvas.coords(item)))
+            if points:
+                self._add(item, points)
+
+    def nearest(self, x, y, distance=SNAP_DISTANCE, exclude=(), items=None):
+        """
+        Get the snap point nearest to a point, in document coordinates.
+
+        Parameters:
+            x (float): X coordinate of the point.
+            y (float): Y coordinate of the point.
+            distance (float): Largest distance of the snap point.
+            exclude (collection): Items whose points are left out (like the item being drawn).
+            items (collection): Only look at the points of these items, or None for all the items.
+
+        Returns:
+            tuple: The (x, y) snap point, or None if there is none within the distance.
+        """
+        if self._dirty:
+            self.sync()
+        best, best_distance = None, distance * distance
+        reach = math.ceil(distance / CELL_SIZE)
+        column, row = int(x // CELL_SIZE), int(y // CELL_SIZE)
+        cells = self._cells
+        for cell_column in range(column - reach, column + reach + 1):
+            for cell_row in range(row - reach, row + reach + 1):
+                cell = cells.get((cell_column, cell_row))
+                if not cell:
+                    continue
+                for item, points in cell.items():
+                    if item in exclude or (items is not None and item not in items):
+                        continue
+                    for point_x, point_y in points:
+                        squared = (point_x - x) ** 2 + (point_y - y) ** 2
+                        if squared <= best_distance:
+                            best, best_distance = (point_x, point_y), squared
+        return best
+
+    def _add(self, item, points):
+        self._points[item] = points
+        cells = self._cells
+        for point in points:
+            key = (int(point[0] // CELL_SIZE), int(point[1] // CELL_SIZE))
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = {item: [point]}
+            elif item in cell:
+                cell[item].append(point)
+            else:
+                cell[item] = [point]
+
+    def _remove(self, item):
+        points = self._points.pop(item, None)
+        if points is None:
+            return
+        cells = self._cells
+        for key in {(int(x // CELL_SIZE), int(y // CELL_SIZE)) for x, y in points}:
+            cell = cells.get(key)
+            if cell is not None:
+                cell.pop(item, None)
+                if not cell:
+                    del cells[key]
+
+
+class Snapping:
+    """
+    Optional snapping of the points placed by the drawing tools to a grid, and to the vertices and midpoints of the
+    objects on the canvas.
+
+    The index of the snap points is only built while snapping to objects is on, and the drawing canvas keeps it in
+    sync through the hooks below (which do nothing while it is off).
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the Snapping.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the snapped points.
+        """
+        self.canvas = canvas
+        self.grid_spacing = DEFAULT_GRID_SPACING
+        self.to_grid = False
+        self.index = None  # SnapIndex of the objects, while snapping to objects is on
+
+    @property
+    def enabled(self):
+        return self.to_grid or self.index is not None
+
+    @property
+    def to_objects(self):
+        return self.index is not None
+
+    @to_objects.setter
+    def to_objects(self, value):
+        if value and self.index is None:
+            self.index = SnapIndex(self.canvas)
+        elif not value:
+            self.index = None
+
+    def snap(self, x, y, exclude=()):
+        """
+        Snap a point to the nearest vertex or midpoint of an object within SNAP_DISTANCE pixels, or else to the grid
+        (whose spacing is in document units, so it zooms with the drawing).
+
+        Parameters:
+            x (float): X coordinate of the point on the screen.
+            y (float): Y coordinate of the point on the screen.
+            exclude (collection): Items the point can't snap to (like the item being drawn).
+
+        Returns:
+            tuple: The snapped (x, y) point on the screen.
+        """
+        viewport = self.canvas.viewport
+        document_x, document_y = viewport.to_document([x, y])
+        if self.index is not None:
+            point = self.index.nearest(document_x, document_y, SNAP_DISTANCE / viewport.zoom, exclude=exclude)
+            if point is not None:
+                return tuple(viewport.to_screen(point))
+        if self.to_grid:
+            spacing = self.grid_spacing
+            return tuple(viewport.to_screen([round(document_x / spacing) * spacing,
+                                             round(document_y / spacing) * spacing]))
+        return x, y
+
+    def snap_event(self, event, exclude=()):
+        """Get a copy of a mouse event with its point snapped (or the event itself if snapping is off)."""
+        if not self.enabled:
+            return event
+        snapped = copy.copy(event)
+        snapped.x, snapped.y = self.snap(event.x, event.y, exclude)
+        return snapped
+
+    def nearest_vertex(self, x, y, items):
+        """Get the snap point of some items nearest to a screen point, within SNAP_DISTANCE pixels, or None."""
+        if self.index is None:
+            return None
+        viewport = self.canvas.viewport
+        point = self.index.nearest(*viewport.to_document([x, y]), SNAP_DISTANCE / viewport.zoom, items=set(items))
+        return None if point is None else tuple(viewport.to_screen(point))
+
+    # Hooks called by the drawing canvas when items change
+    def created(self, items):
+        if self.index is not None:
+            self.index.mark(items)
+
+    def changed(self, tag_or_id):
+        if self.index is not None and tag_or_id not in IGNORED_TAGS:
+            self.index.mark(self._resolve(tag_or_id))
+
+    def moved(self, tag_or_id, dx, dy):
+        if self.index is not None and tag_or_id not in IGNORED_TAGS:
+            zoom = self.canvas.viewport.zoom
+            self.index.translate(self._resolve(tag_or_id), dx / zoom, dy / zoom)
+
+    def deleting(self, tags_or_ids):
+        """Forget the points of items about to be deleted."""
+        if self.index is None:
+            return
+        if "all" in tags_or_ids:
+            self.index.clear()
+            return
+        for tag_or_id in tags_or_ids:
+            self.index.remove(self._resolve(tag_or_id))
+
+    def _resolve(self, tag_or_id):
+        if isinstance(tag_or_id, int):
+            return (tag_or_id,)
+        if isinstance(tag_or_id, str) and tag_or_id.isdigit():
+            return (int(tag_or_id),)
+        return self.canvas.find_withtag(tag_or_id)
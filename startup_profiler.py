@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Collects the durations of the startup phases (imports and initialization) and prints a timing report.
+
+    When disabled, phases are not timed and nothing is printed.
+    """
+
+    def __init__(self, enabled=False, start_time=None):
+        """
+        Initialize the StartupProfiler.
+
+        Parameters:
+            enabled (bool): Whether the startup phases are timed.
+            start_time (float): time.perf_counter() value at process start, defaults to now.
+        """
+        self.enabled = enabled
+        self._start_time = start_time if start_time is not None else time.perf_counter()
+        self._phases = []  # (name, duration in seconds) in startup order
+
+    @contextmanager
+    def phase(self, name):
+        """Time the code inside the block as a startup phase."""
+        if not self.enabled:
+            yield
+            return
+
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._phases.append((name, time.perf_counter() - phase_start))
+
+    def report(self, label="first frame"):
+        """Print the duration of every phase and the total time since process start."""
+        if not self.enabled:
+            return
+
+        total = time.perf_counter() - self._start_time
+        print("Startup timing report:")
+        for name, duration in self._phases:
+            print(f"  {name:<32} {duration * 1000:8.1f} ms")
+        other = total - sum(duration for _, duration in self._phases)
+        print(f"  {'other':<32} {other * 1000:8.1f} ms")
+        print(f"  {'time to ' + label:<32} {total * 1000:8.1f} ms")
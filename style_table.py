@@ -0,0 +1,299 @@
+"""
+Shared palette and style tables of the drawings: the colors and line widths of the objects stored once, and referred
+to by index.
+
+Drawing files are written compact: the colors are listed once in a "palette", the (fill, outline, width) triples of
+the shapes once in "styles", and every shape refers to its style by index ("style") and every text box to its colors
+by palette index. A gradient fill of a thousand strips then writes each of its colors once instead of a quoted hex
+string per strip. Files are expanded back to the inline form (every object with its own "color", "outline" and
+"width") when read, so the rest of the application, the renderer and the tools only deal with the inline form; files
+written before the tables existed are read unchanged.
+
+On the canvas, the StyleTable keeps the styles of the shapes as tags, so all the shapes of a style are restyled at
+once.
+"""
+from history_manager import CACHE_TAG, IGNORED_TAGS
+
+STYLE_TAG_PREFIX = "style:"  # Prefix of the tag of each style (every shape on the canvas has the tag of its style)
+STYLE_KEYS = ("color", "outline", "width")  # Keys of the shapes of a drawing file replaced by their style
+PALETTE_KEYS = ("text_color", "text_bg_color", "frame_color")  # Keys of the text boxes replaced by a palette index
+STYLE_OPTIONS = ("fill", "outline", "width")  # Item options of the styles on the canvas
+SHAPE_DEFAULTS = {  # Tk defaults of the style options of the shapes
+    "line": {"fill": "black", "width": "1.0"},
+    "rectangle": {"fill": "", "outline": "black", "width": "1.0"},
+    "oval": {"fill": "", "outline": "black", "width": "1.0"},
+    "polygon": {"fill": "black", "outline": "", "width": "1.0"},
+}
+
+
+def _width(value):
+    """Get a line width as Tk reports it (2 and "2" are "2.0")."""
+    try:
+        return str(float(value))
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def compact_drawing(drawing_data):
+    """
+    Get the compact form of drawing data, as written to drawing files.
+
+    Parameters:
+        drawing_data (dict): The drawing data, as returned by DrawingCanvas.get_drawing_data.
+
+    Returns:
+        dict: The drawing data with a "palette" of its colors and a table of the "styles" of its shapes, and objects
+              referring to them by index. The tables come first, so files can be read as a stream.
+    """
+    if "palette" in drawing_data:
+        return drawing_data  # Already compact
+    palette, colors = [], {}
+    styles, style_indexes = [], {}
+
+    def color_index(color):
+        if color is None:
+            return None
+        index = colors.get(color)
+        if index is None:
+            index = colors[color] = len(palette)
+            palette.append(color)
+        return index
+
+    objects = []
+    for obj in drawing_data.get("objects", []):
+        if obj.get("type") in SHAPE_DEFAULTS:
+            style = (color_index(obj.get("color")), color_index(obj.get("outline")), obj.get("width"))
+            index = style_indexes.get(style)
+            if index is None:
+                index = style_indexes[style] = len(styles)
+                styles.append(list(style))
+            obj = {key: value for key, value in obj.items() if key not in STYLE_KEYS}
+            obj["style"] = index
+        elif obj.get("type") == "text_box":
+            obj = dict(obj)
+            for key in PALETTE_KEYS:
+                if key in obj:
+                    obj[key] = color_index(obj[key])
+        objects.append(obj)
+    compact = {"palette": palette, "styles": styles}
+    compact.update(drawing_data)
+    compact["objects"] = objects
+    return compact
+
+
+def expand_object(obj, palette, styles):
+    """
+    Get the inline form of an object of a compact drawing file.
+
+    Parameters:
+        obj (dict): The object data, referring to its style or colors by index.
+        palette (list): The colors of the file.
+        styles (list): The styles of the file, as [fill index, outline index, width].
+
+    Returns:
+        dict: The object data with its own colors and width.
+    """
+    try:
+        if "style" in obj:
+            fill, outline, width = styles[obj["style"]]
+            expanded = {key: value for key, value in obj.items() if key != "style"}
+            for key, value in (("color", None if fill is None else palette[fill]),
+                               ("outline", None if outline is None else palette[outline]), ("width", width)):
+                if value is not None:
+                    expanded[key] = value
+            return expanded
+        if obj.get("type") == "text_box":
+            return {key: palette[value] if key in PALETTE_KEYS and value is not None else value
+                    for key, value in obj.items()}
+    except (IndexError, TypeError, ValueError):
+        raise ValueError("invalid drawing file: object refers to a missing style or color") from None
+    return obj
+
+
+def expand_drawing(drawing_data):
+    """
+    Get the inline form of drawing data read from a file (drawing data without a palette is returned as it is).
+
+    Raises:
+        ValueError: If an object refers to a style or a color missing from the tables.
+    """
+    if "palette" not in drawing_data:
+        return drawing_data
+    palette, styles = drawing_data["palette"], drawing_data.get("styles", [])
+    expanded = {key: value for key, value in drawing_data.items() if key not in ("palette", "styles")}
+    expanded["objects"] = [expand_object(obj, palette, styles) for obj in drawing_data.get("objects", [])]
+    return expanded
+
+
+class StyleTable:
+    """
+    The styles of the shapes on the canvas: their fill, outline and width, stored once with a palette of the colors.
+
+    Like the layers, the membership is kept by Tk itself: every shape has the tag of its style, given when it's
+    created and changed when its options are, so restyling all the shapes of a style is one change of the table and a
+    single itemconfigure of its tag. The table only grows while the application runs, so the styles recorded by the
+    undo history stay valid.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the StyleTable.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the shapes.
+        """
+        self.canvas = canvas
+        self.palette = []  # Colors of the styles
+        self._colors = {}  # Color -> its index in the palette
+        self._styles = []  # Style index -> (fill, outline or None for lines, width), the colors as palette indexes
+        self._indexes = {}  # (fill, outline, width) -> index of the style new shapes with these options get
+
+    def __len__(self):
+        return len(self._styles)
+
+    def get(self, index):
+        """Get the options of a style, as given to itemconfigure."""
+        fill, outline, width = self._key_of(index)
+        options = {"fill": fill, "width": width}
+        if outline is not None:
+            options["outline"] = outline
+        return options
+
+    def style_of(self, item):
+        """Get the index of the style of an item, or None if it isn't a shape."""
+        for tag in self.canvas.gettags(item):
+            if tag.startswith(STYLE_TAG_PREFIX):
+                return int(tag[len(STYLE_TAG_PREFIX):])
+        return None
+
+    def _color_index(self, color):
+        index = self._colors.get(color)
+        if index is None:
+            index = self._colors[color] = len(self.palette)
+            self.palette.append(color)
+        return index
+
+    @staticmethod
+    def _key(item_type, options):
+        """Get the (fill, outline, width) of a shape created with options (outline None for lines)."""
+        defaults = SHAPE_DEFAULTS[item_type]
+        outline = None if item_type == "line" else options.get("outline", defaults["outline"])
+        return options.get("fill", defaults["fill"]), outline, _width(options.get("width", defaults["width"]))
+
+    def _key_of(self, index):
+        """Get the (fill, outline, width) of a style."""
+        fill, outline, width = self._styles[index]
+        return self.palette[fill], None if outline is None else self.palette[outline], width
+
+    def _intern(self, key):
+        """Get the index of the style with the given (fill, outline, width), added to the table if needed."""
+        index = self._indexes.get(key)
+        if index is None:
+            fill, outline, width = key
+            index = self._indexes[key] = len(self._styles)
+            self._styles.append((self._color_index(fill), None if outline is None else self._color_index(outline),
+                                 width))
+        return index
+
+    def tags_for(self, item_type, options, tags):
+        """
+        Get the tags of a new item with the tag of its style (shapes only).
+
+        Parameters:
+            item_type (str): The type of the item.
+            options (dict): The options the item is created with (only the style options are looked at).
+            tags: The tags the item is created with (a tag, a list or tuple of tags, or None), maybe with the tag of
+                  a style already, kept if the style still has the options of the item.
+
+        Returns:
+            The tags to create the item with.
+        """
+        if item_type not in SHAPE_DEFAULTS:
+            return tags
+        if isinstance(tags, str):
+            tags = self.canvas.tk.splitlist(tags)
+        tags = tuple(tags or ())
+        key = self._key(item_type, options)
+        for position, tag in enumerate(tags):
+            if tag in IGNORED_TAGS or tag == CACHE_TAG:
+                return tags  # Helper items have no style
+            if tag.startswith(STYLE_TAG_PREFIX):
+                index = int(tag[len(STYLE_TAG_PREFIX):])
+                if index < len(self._styles) and self._key_of(index) == key:
+                    return tags
+                return tags[:position] + tags[position + 1:] + (STYLE_TAG_PREFIX + str(self._intern(key)),)
+        return tags + (STYLE_TAG_PREFIX + str(self._intern(key)),)
+
+    def configured(self, tag_or_id, options):
+        """
+        Give the shapes whose fill, outline or width were just changed the tag of their new style.
+
+        Parameters:
+            tag_or_id: The tag or ID of the configured items (nothing is done for the tag of a style, which
+                       set_style keeps in sync itself).
+            options (dict): The options that were changed.
+        """
+        if not any(name in options for name in STYLE_OPTIONS) or str(tag_or_id).startswith(STYLE_TAG_PREFIX):
+            return
+        canvas = self.canvas
+        for item in canvas.find_withtag(tag_or_id):
+            item_type = canvas.type(item)
+            if item_type not in SHAPE_DEFAULTS:
+                continue
+            tags = canvas.gettags(item)
+            style_options = {name: canvas.itemcget(item, name) for name in SHAPE_DEFAULTS[item_type]}
+            new_tags = self.tags_for(item_type, style_options, tags)
+            if new_tags != tags:
+                for tag in set(tags) - set(new_tags):
+                    canvas.dtag(item, tag)
+                for tag in set(new_tags) - set(tags):
+                    canvas.addtag_withtag(tag, item)
+
+    def set_style(self, index, options):
+        """
+        Change the options of a style and of all the shapes with that style, on the canvas and culled.
+
+        Parameters:
+            index (int): The index of the style.
+            options (dict): The new fill, outline or width (the outline of a line style is left out).
+        """
+        fill, outline, width = key = self._key_of(index)
+        options = {name: _width(value) if name == "width" else value for name, value in options.items()
+                   if name != "outline" or outline is not None}  # Line styles have no outline
+        new_key = (options.get("fill", fill), outline if outline is None else options.get("outline", outline),
+                   _width(options.get("width", width)))
+        if new_key == key:
+            return
+        tag = STYLE_TAG_PREFIX + str(index)
+
+        # The culled objects are matched before the table changes: by their tag, or by their options for those
+        # that never had a style yet (they get the first style with their options once created again)
+        def restyled(item_type, item_options):
+            tags = item_options.get("tags") or ()
+            if isinstance(tags, str):
+                tags = self.canvas.tk.splitlist(tags)
+            if any(other.startswith(STYLE_TAG_PREFIX) for other in tags):
+                return tag in tags
+            return self._indexes.get(self._key(item_type, item_options)) == index
+
+        self.canvas.viewport.configure_culled(restyled, options, tag)
+        if self._indexes.get(key) == index:
+            del self._indexes[key]
+        self._indexes.setdefault(new_key, index)
+        self._styles[index] = (self._color_index(new_key[0]),
+                               None if outline is None else self._color_index(new_key[1]), new_key[2])
+        self.canvas.itemconfigure(tag, **options)
+
+    def restyle(self, index, changes):
+        """
+        Change the options of a style and of all the shapes with that style, as one step of the undo history.
+
+        Parameters:
+            index (int): The index of the style.
+            changes (dict): The new fill, outline or width.
+        """
+        before = self.get(index)
+        before = {name: before[name] for name in changes if name in before}
+        after = {name: changes[name] for name in before}
+        self.set_style(index, after)
+        self.canvas.history.record_style(index, before, after)
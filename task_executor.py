@@ -0,0 +1,221 @@
+import queue
+import threading
+import tkinter as tk
+
+DEFAULT_WORKERS = 2  # Worker threads (and worker processes) of the executor
+POLL_MS = 20  # Interval at which finished tasks and progress reports are handed over to the Tk main loop
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task to stop it once it was cancelled."""
+
+
+class Task:
+    """
+    A unit of work running in the background.
+
+    The work function receives the task as its first argument (thread tasks only), and uses it to report progress and
+    to check whether it was cancelled. Tk widgets must never be touched from the work function.
+    """
+
+    def __init__(self, executor, name):
+        self.executor = executor
+        self.name = name
+        self.fraction = 0.0  # Progress of the task, from 0 to 1
+        self.message = ""
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Cancel the task. Its result is dropped, and it stops at its next check_cancelled call."""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check_cancelled(self):
+        """Stop the work function if the task was cancelled (called from the worker)."""
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def progress(self, fraction, message=""):
+        """Report the progress of the task (called from the worker)."""
+        self.executor._results.put((self, "progress", (fraction, message)))
+
+
+class TaskExecutor:
+    """
+    Runs expensive work off the Tk main loop, in a thread pool (or a process pool for picklable work functions).
+
+    The callbacks of a task (on_done, on_error and on_progress) always run on the Tk main loop: the workers put their
+    results in a queue, which is drained with after() while tasks are running.
+    """
+
+    def __init__(self, master, max_workers=DEFAULT_WORKERS):
+        """
+        Initialize the TaskExecutor.
+
+        Parameters:
+            master (tk.Misc): The widget whose main loop runs the callbacks.
+            max_workers (int): The number of worker threads (and worker processes).
+        """
+        self.master = master
+        self.max_workers = max_workers
+        self.tasks = []  # Running tasks, in submission order
+        self.listeners = []  # Called with the task whenever a task starts, progresses or finishes
+        self._results = queue.SimpleQueue()
+        self._callbacks = {}  # Task -> (on_done, on_error, on_progress)
+        self._threads = None  # Worker pools, created on first use
+        self._processes = None
+        self._drain_job = None
+
+    def submit(self, name, func, *args, on_done=None, on_error=None, on_progress=None, processes=False):
+        """
+        Run a work function in the background.
+
+        Parameters:
+            name (str): The name of the task, shown to the user.
+            func (callable): The work function. In a thread it's called with the task and args, in a process with
+                the args only (it must be picklable).
+            on_done (callable): Called with the result of the work function.
+            on_error (callable): Called with the exception raised by the work function. By default the error is
+                reported like any other Tk callback exception.
+            on_progress (callable): Called with the task whenever it reports progress.
+            processes (bool): Run the work function in a worker process instead of a thread.
+
+        Returns:
+            Task: The submitted task.
+        """
+        task = Task(self, name)
+        self._callbacks[task] = (on_done, on_error, on_progress)
+        if processes:
+            task.future = self._process_pool().submit(func, *args)
+        else:
+            task.future = self._thread_pool().submit(self._run, task, func, args)
+        task.future.add_done_callback(lambda future: self._results.put((task, "finished", future)))
+        self.tasks.append(task)
+        self._notify(task)
+        self._schedule_drain()
+        return task
+
+    @staticmethod
+    def _run(task, func, args):
+        task.check_cancelled()
+        return func(task, *args)
+
+    def cancel_all(self):
+        """Cancel every running task."""
+        for task in list(self.tasks):
+            task.cancel()
+
+    def shutdown(self):
+        """Cancel the running tasks and stop the workers."""
+        self.cancel_all()
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = self._processes = None
+
+    def _thread_pool(self):
+        if self._threads is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._threads = ThreadPoolExecutor(self.max_workers, thread_name_prefix="task")
+        return self._threads
+
+    def _process_pool(self):
+        if self._processes is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._processes = ProcessPoolExecutor(self.max_workers)
+        return self._processes
+
+    def _schedule_drain(self):
+        if self._drain_job is None:
+            self._drain_job = self.master.after(POLL_MS, self._drain)
+
+    def _drain(self):
+        """Hand the progress reports and the results of the workers over to their callbacks."""
+        self._drain_job = None
+        while True:
+            try:
+                task, kind, payload = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "progress":
+                self._progress(task, *payload)
+            else:
+                self._finish(task, payload)
+        if self.tasks:
+            self._schedule_drain()
+
+    def _progress(self, task, fraction, message):
+        if task not in self._callbacks or task.cancelled:
+            return
+        task.fraction, task.message = fraction, message
+        on_progress = self._callbacks[task][2]
+        if on_progress is not None:
+            on_progress(task)
+        self._notify(task)
+
+    def _finish(self, task, future):
+        on_done, on_error, _ = self._callbacks.pop(task)
+        self.tasks.remove(task)
+        try:
+            if task.cancelled or future.cancelled():
+                return  # The result of a cancelled task is dropped
+            error = future.exception()
+            if error is None:
+                if on_done is not None:
+                    on_done(future.result())
+            elif isinstance(error, TaskCancelled):
+                pass
+            elif on_error is not None:
+                on_error(error)
+            else:
+                self.master._root().report_callback_exception(type(error), error, error.__traceback__)
+        finally:
+            self._notify(task)
+
+    def _notify(self, task):
+        for listener in self.listeners:
+            listener(task)
+
+
+class TaskStatusBar(tk.Frame):
+    """
+    Shows the progress of the running tasks at the bottom of the window, with a button to cancel them.
+
+    The bar is only packed while tasks are running.
+    """
+
+    def __init__(self, master, executor):
+        """
+        Initialize the TaskStatusBar.
+
+        Parameters:
+            master (tk.Tk): The main Tkinter root window.
+            executor (TaskExecutor): The executor whose tasks are shown.
+        """
+        super().__init__(master, bd=1, relief=tk.SUNKEN)
+        self.executor = executor
+        self._status = tk.StringVar(self)
+        self._shown = False
+        tk.Label(self, textvariable=self._status, anchor=tk.W).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(self, text="Cancel", command=executor.cancel_all).pack(side=tk.RIGHT)
+        executor.listeners.append(self.update_status)
+
+    def update_status(self, task=None):
+        """Show the running tasks, or hide the bar when none is left."""
+        tasks = self.executor.tasks
+        if not tasks:
+            if self._shown:
+                self.pack_forget()
+                self._shown = False
+            return
+        self._status.set("   ".join(("%s... %d%% %s" % (task.name, task.fraction * 100, task.message)).strip()
+                                    for task in tasks))
+        if not self._shown:
+            self.pack(side=tk.BOTTOM, fill=tk.X)
+            self._shown = True
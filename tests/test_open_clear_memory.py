@@ -0,0 +1,29 @@
+"""Memory check of the open/clear lifecycle of the canvas, on the headless canvas model (python -m pytest tests)."""
+import pytest
+
+from benchmarks.__main__ import BASE_SCENE, OPEN_CLEAR_CYCLES, _measure_open_clear
+from benchmarks.harness import EventDriver, build_app
+from benchmarks.scenes import SceneBuilder
+
+# Largest growth in bytes of the resident memory over the cycles, from the baseline taken after a warm-up cycle (a
+# leak-free lifecycle doesn't grow it at all)
+RSS_LIMIT = 2 * 1024 * 1024
+
+
+def test_open_clear_cycles_keep_resident_memory_flat(tmp_path):
+    app = build_app()
+    scene = SceneBuilder(EventDriver(app), seed=0)
+    scene.add_pen_strokes(BASE_SCENE["pen_strokes"])
+    scene.add_shapes(BASE_SCENE["shapes"])
+    scene.add_gradient_fills(BASE_SCENE["gradient_fills"])
+    scene.add_text_boxes(BASE_SCENE["text_boxes"])
+    scene.add_images(BASE_SCENE["images"], str(tmp_path))
+    drawing_data = app.canvas.get_drawing_data()
+
+    result = _measure_open_clear(app.canvas, drawing_data, rss_limit=RSS_LIMIT)
+    assert result["cycles"] == OPEN_CLEAR_CYCLES
+    assert result["registered_objects"] == 0
+    assert result["canvas_children"] == 0
+    if result["rss_growth_bytes"] is None:
+        pytest.skip("the resident memory can't be read on this platform")
+    assert result["rss_within_limit"], f"resident memory grew by {result['rss_growth_bytes']} bytes"
@@ -0,0 +1,117 @@
+"""Tests of the render server through a local HTTP client (python -m pytest tests)."""
+import http.client
+import json
+import threading
+
+import pytest
+
+import render_server
+from render_server import RenderServer, RenderService
+
+DRAWING = {"objects": [{"type": "rectangle", "coords": [10, 10, 60, 40], "width": "2.0", "color": "red",
+                        "outline": "black"}]}
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    from PIL import Image
+
+    directory = tmp_path / "pictures"
+    directory.mkdir()
+    Image.new("RGB", (4, 4), "blue").save(directory / "blue.png")
+    (tmp_path / "secret.png").write_bytes(b"secret")
+    return directory
+
+
+@pytest.fixture
+def server(image_dir):
+    service = RenderService(workers=2, processes=False, max_pixels=1000 * 1000, image_dir=str(image_dir))
+    server = RenderServer(port=0, service=service)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, drawing, query="format=png"):
+    """POST a drawing to the server, and get the response status, headers and body."""
+    connection = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        body = drawing if isinstance(drawing, bytes) else json.dumps(drawing).encode("utf-8")
+        connection.request("POST", "/render?" + query, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def test_render_is_cached(server):
+    status, headers, png = post(server, DRAWING)
+    assert status == 200
+    assert headers["Content-Type"] == "image/png" and png.startswith(b"\x89PNG")
+    assert headers["X-Cache"] == "MISS"
+
+    status, headers, cached = post(server, DRAWING)
+    assert status == 200 and headers["X-Cache"] == "HIT" and cached == png
+    assert server.service.stats()["rendered"] == 1
+
+    status, headers, _ = post(server, DRAWING, "format=svg")
+    assert status == 200 and headers["X-Cache"] == "MISS"
+
+
+def test_pictures_in_the_image_directory(server):
+    drawing = dict(DRAWING, images=[{"path": "blue.png", "coords": [0, 0]}])
+    status, _, svg = post(server, drawing, "format=svg")
+    assert status == 200
+    assert b"data:image/png;base64," in svg
+
+
+@pytest.mark.parametrize("path", ["/etc/hostname", "../secret.png", "pictures/../../secret.png"])
+def test_picture_paths_outside_the_image_directory_are_rejected(server, path):
+    drawing = dict(DRAWING, images=[{"path": path, "coords": [0, 0]}])
+    status, _, body = post(server, drawing, "format=svg")
+    assert status == 400
+    assert "outside the image directory" in json.loads(body)["error"]
+
+
+def test_pictures_are_rejected_without_an_image_directory():
+    service = RenderService(workers=1, processes=False)
+    try:
+        with pytest.raises(render_server.RenderError) as error:
+            service.render(json.dumps(dict(DRAWING, images=[{"path": "/etc/hostname", "coords": [0, 0]}])).encode(),
+                           "svg")
+        assert error.value.status == 400
+    finally:
+        service.close()
+
+
+def test_size_limit(server):
+    status, _, body = post(server, DRAWING, "format=png&width=30000&height=30000")
+    assert status == 413
+    assert "too large" in json.loads(body)["error"]
+
+    huge = {"objects": [{"type": "line", "coords": [0, 0, 40000, 40000], "width": "1.0", "color": "black"}]}
+    status, _, _ = post(server, huge)
+    assert status == 413
+
+    status, _, _ = post(server, DRAWING, "format=png&width=20&height=20")  # Nothing was sent to the workers
+    assert status == 200
+    assert server.service.stats()["rendered"] == 1
+
+
+def test_invalid_requests(server):
+    assert post(server, b"not json")[0] == 400
+    assert post(server, [1, 2])[0] == 400
+    assert post(server, DRAWING, "format=gif")[0] == 400
+    assert post(server, DRAWING, "format=png&width=-5")[0] == 400
+
+
+def test_rendering_errors_are_answered_with_500(server, monkeypatch):
+    def fail(*args):
+        raise MemoryError()
+
+    monkeypatch.setattr(render_server, "_render_request", fail)
+    status, _, body = post(server, DRAWING)
+    assert status == 500
+    assert "MemoryError" in json.loads(body)["error"]
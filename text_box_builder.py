@@ -1,5 +1,7 @@
 import tkinter as tk
 
+from shape_drawer import PREVIEW_TAG
+
 DEFAULT_FONT_SIZE = 10
 
 
@@ -24,7 +26,6 @@ class TextBoxBuilder:
         self._text_box = None
         self._start_x = None
         self._start_y = None
-        self.text_boxes = []
 
         # Bind font size and font type changes to update text
         self.toolbar.font_size.trace_add('write', self._update_font_settings)
@@ -38,11 +39,12 @@ class TextBoxBuilder:
 
     def adjust_size(self, event):
         """Adjust the size of the text box as the user drags the mouse."""
-        if self._text_box:
-            self.canvas.delete(self._text_box)
-
         x, y = event.x, event.y
-        self._text_box = self.canvas.create_rectangle(self._start_x, self._start_y, x, y, outline="black", dash=(2, 2))
+        if self._text_box:
+            self.canvas.coords(self._text_box, self._start_x, self._start_y, x, y)
+        else:
+            self._text_box = self.canvas.create_rectangle(self._start_x, self._start_y, x, y, outline="black",
+                                                          dash=(2, 2), tags=PREVIEW_TAG)
 
     def finish_building(self, event):
         """Finish building the text box."""
@@ -84,7 +86,8 @@ class TextBoxBuilder:
             "text_height": text_height
         }
 
-        self.get_text_boxes.append(text_attributes)
+        self.canvas.registry.register(text_window, "text_box", text_attributes)
+        self.canvas.history.record_create([text_window])
 
     def get_text_content(self):
         """Get the content of the text widget."""
@@ -132,6 +135,17 @@ class TextBoxBuilder:
         if self._text:
             self._text.delete(1.0, tk.END)
 
+    def forget(self, released):
+        """Forget the text box being edited if its widgets were released with the items removed from the canvas."""
+        if any(attributes.get("text_obj") is self._text for attributes in released):
+            self._text = None
+            self._text_frame = None
+
+    @property
+    def text_boxes(self):
+        """Get the attributes of the text boxes on the canvas."""
+        return self.canvas.registry.records("text_box")
+
     @property
     def get_text_boxes(self):
         """Get the list of text box IDs."""
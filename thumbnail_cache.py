@@ -0,0 +1,215 @@
+"""
+Index of the recent and browsed drawing files, with their thumbnails, in a small SQLite file.
+
+Nothing here touches Tk: the thumbnails are rendered by drawing_renderer in worker processes (update_thumbnails runs
+as a background task), and stored as PNG with the modification time and size of their file, so a thumbnail is
+rendered again only once its file changed. Listing a folder of drawings that was browsed before is then one query.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+DEFAULT_INDEX_FILE = os.path.join(os.path.expanduser("~"), ".cache", "vector_drawing_app", "thumbnails.sqlite")
+THUMBNAIL_SIZE = (160, 120)  # Largest size of the thumbnails, in pixels
+RENDER_LIMIT = 2048  # Largest side of the rendered drawing a thumbnail is made from (larger drawings are cropped)
+RECENT_FILES = 50  # Number of recent files listed
+DRAWING_EXTENSION = ".json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    objects INTEGER,
+    thumbnail BLOB,
+    error TEXT,
+    opened REAL
+);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+CREATE INDEX IF NOT EXISTS files_opened ON files (opened);
+"""
+
+
+def render_thumbnail(path):
+    """
+    Render the thumbnail of a drawing file (in a worker process).
+
+    Parameters:
+        path (str): Path of the drawing file.
+
+    Returns:
+        dict: The path, modification time and size of the file, its number of objects, and the PNG thumbnail, or
+              the error that prevented rendering it.
+    """
+    import io
+    import json
+    from drawing_renderer import drawing_size, render_image
+
+    stat = os.stat(path)
+    entry = {"path": path, "mtime": stat.st_mtime, "size": stat.st_size, "objects": None, "thumbnail": None,
+             "error": None}
+    try:
+        with open(path, "r") as file:
+            drawing_data = json.load(file)
+        entry["objects"] = len(drawing_data.get("objects", [])) + len(drawing_data.get("images", []))
+        width, height = drawing_size(drawing_data)
+        image = render_image(drawing_data, min(width, RENDER_LIMIT), min(height, RENDER_LIMIT))
+        image.thumbnail(THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        image.save(output, format="PNG")
+        entry["thumbnail"] = output.getvalue()
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        entry["error"] = str(e) or type(e).__name__
+    return entry
+
+
+def list_drawings(folder):
+    """
+    List the drawing files of a folder.
+
+    Returns:
+        list: (path, modification time, size) of every drawing file, sorted by name.
+    """
+    files = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(DRAWING_EXTENSION) and entry.is_file():
+                stat = entry.stat()
+                files.append((os.path.abspath(entry.path), stat.st_mtime, stat.st_size))
+    files.sort(key=lambda file: os.path.basename(file[0]).lower())
+    return files
+
+
+def file_state(path):
+    """Get the (path, modification time, size) of a file, or None if it doesn't exist anymore."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return os.path.abspath(path), stat.st_mtime, stat.st_size
+
+
+class ThumbnailIndex:
+    """
+    The SQLite index of the drawing files: their thumbnails, and when they were last opened or saved.
+
+    Every method opens its own connection, so the index can be updated by a background task while the Tk main loop
+    reads it.
+    """
+
+    def __init__(self, filename=DEFAULT_INDEX_FILE):
+        """
+        Initialize the ThumbnailIndex, creating its file if needed.
+
+        Parameters:
+            filename (str): Path of the SQLite file.
+        """
+        self.filename = filename
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection to the index, committed (or rolled back on errors) and closed once done."""
+        db = sqlite3.connect(self.filename, timeout=10)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def lookup(self, files):
+        """
+        Get the indexed thumbnails of files that are still up to date.
+
+        Parameters:
+            files (list): (path, modification time, size) of the files, as returned by list_drawings.
+
+        Returns:
+            dict: Path -> (number of objects, PNG thumbnail or None, error or None) of the up to date files.
+        """
+        wanted = {path: (mtime, size) for path, mtime, size in files}
+        folders = {os.path.dirname(path) for path in wanted}
+        found = {}
+        with self._connect() as db:
+            for folder in folders:
+                rows = db.execute("SELECT path, mtime, size, objects, thumbnail, error FROM files WHERE folder = ?",
+                                  (folder,))
+                for path, mtime, size, objects, thumbnail, error in rows:
+                    if wanted.get(path) == (mtime, size):
+                        found[path] = (objects, thumbnail, error)
+        return found
+
+    def stale(self, files):
+        """Get the paths of the files whose thumbnail is missing or out of date."""
+        fresh = self.lookup(files)
+        return [path for path, _, _ in files if path not in fresh]
+
+    def store(self, entry):
+        """Store the thumbnail of a file, as returned by render_thumbnail (keeping when it was last opened)."""
+        with self._connect() as db:
+            db.execute("INSERT INTO files (path, folder, mtime, size, objects, thumbnail, error) "
+                       "VALUES (:path, :folder, :mtime, :size, :objects, :thumbnail, :error) "
+                       "ON CONFLICT (path) DO UPDATE SET mtime = excluded.mtime, size = excluded.size, "
+                       "objects = excluded.objects, thumbnail = excluded.thumbnail, error = excluded.error",
+                       dict(entry, folder=os.path.dirname(entry["path"])))
+
+    def touch(self, path):
+        """Record that a file was just opened or saved, so it's listed first among the recent files."""
+        path = os.path.abspath(path)
+        with self._connect() as db:
+            # A file not indexed yet gets an impossible modification time, so its thumbnail is rendered
+            db.execute("INSERT INTO files (path, folder, mtime, size, opened) VALUES (?, ?, -1, -1, ?) "
+                       "ON CONFLICT (path) DO UPDATE SET opened = excluded.opened",
+                       (path, os.path.dirname(path), time.time()))
+
+    def recent(self, limit=RECENT_FILES):
+        """
+        Get the files opened or saved last, that still exist.
+
+        Returns:
+            list: (path, modification time, size) of the files, the last opened first.
+        """
+        with self._connect() as db:
+            paths = [path for path, in db.execute(
+                "SELECT path FROM files WHERE opened IS NOT NULL ORDER BY opened DESC LIMIT ?", (limit,))]
+        return [state for state in map(file_state, paths) if state is not None]
+
+
+def update_thumbnails(task, index, paths, workers=None):
+    """
+    Render the thumbnails of drawing files in worker processes and store them in the index, in a background task.
+
+    Parameters:
+        task (Task): The background task, used to report progress and to stop once cancelled.
+        index (ThumbnailIndex): The index the thumbnails are stored in.
+        paths (list): Paths of the drawing files.
+        workers (int): Number of worker processes (one per processor by default).
+
+    Returns:
+        int: The number of thumbnails rendered.
+    """
+    from concurrent import futures
+
+    if not paths:
+        return 0
+    with futures.ProcessPoolExecutor(workers) as pool:
+        pending = [pool.submit(render_thumbnail, path) for path in paths]
+        try:
+            for done, future in enumerate(futures.as_completed(pending), 1):
+                task.check_cancelled()
+                try:
+                    entry = future.result()
+                except OSError:
+                    continue  # The file was deleted since it was listed
+                index.store(entry)
+                task.progress(done / len(pending), os.path.basename(entry["path"]))
+        finally:
+            for future in pending:
+                future.cancel()
+    return len(pending)
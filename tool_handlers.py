@@ -0,0 +1,302 @@
+import tkinter as tk
+
+
+class ToolHandler:
+    """
+    Base class for the handlers of the drawing tools.
+
+    A handler reacts to the press, motion and release mouse events of one tool. The drawing canvas looks the handler
+    up in its dispatch table once per press, so the event path doesn't compare tool names.
+    """
+
+    keeps_highlight = False  # Whether the selection overlay stays on the canvas when the tool is pressed
+
+    def __init__(self, canvas):
+        """
+        Initialize the handler.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas the tool draws on.
+        """
+        self.canvas = canvas
+        self.state = canvas.toolbar.state
+
+    def press(self, event):
+        """Handle the mouse button press."""
+
+    def motion(self, event):
+        """Handle the mouse motion while the button is pressed."""
+
+    def release(self, event):
+        """Handle the mouse button release."""
+
+
+class PenHandler(ToolHandler):
+    """Free drawing with the pen tool."""
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._prev_x = None
+        self._prev_y = None
+        self._stroke_items = []  # Items of the current stroke
+
+    def press(self, event):
+        self._prev_x, self._prev_y = event.x, event.y
+        self._stroke_items = []
+
+    def motion(self, event):
+        # Draw a line from previous point to current point
+        self._stroke_items.append(self.canvas.create_line(self._prev_x, self._prev_y, event.x, event.y,
+                                                          fill=self.state.color, width=self.state.line_width,
+                                                          capstyle=tk.ROUND, smooth=True))
+
+        # Update the starting point for the next line segment
+        self._prev_x, self._prev_y = event.x, event.y
+
+    def release(self, event):
+        self.canvas.history.record_create(self._stroke_items)  # The whole stroke is undone in one step
+        self._stroke_items = []
+
+
+class EraserHandler(ToolHandler):
+    """Erasing with the eraser tool."""
+
+    ERASER_COLOR = "white"
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._stroke_items = []  # Items of the current stroke
+
+    def press(self, event):
+        self._stroke_items = []
+
+    def motion(self, event):
+        x1, y1 = (event.x - 1), (event.y - 1)
+        x2, y2 = (event.x + 1), (event.y + 1)
+        self._stroke_items.append(self.canvas.create_rectangle(x1, y1, x2, y2, fill=self.ERASER_COLOR,
+                                                               outline=self.ERASER_COLOR,
+                                                               width=self.state.line_width))
+
+    def release(self, event):
+        self.canvas.history.record_create(self._stroke_items)  # The whole stroke is undone in one step
+        self._stroke_items = []
+
+
+class ShapeHandler(ToolHandler):
+    """Drawing of the line, square, triangle and oval shapes."""
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._start_x = None
+        self._start_y = None
+
+    def press(self, event):
+        self._start_x, self._start_y = self.canvas.snapping.snap(event.x, event.y)
+        self.canvas.shape_drawer.draw(event, self._start_x, self._start_y)
+
+    def motion(self, event):
+        self.canvas.shape_drawer.draw(event, self._start_x, self._start_y)
+
+    def release(self, event):
+        shape_drawer = self.canvas.shape_drawer
+        self.canvas.history.record_create([shape_drawer.current_shape_item])
+        shape_drawer.current_shape_item = None  # Reset current shape item
+
+
+class PolygonHandler(ToolHandler):
+    """Adding points to a polygon."""
+
+    def press(self, event):
+        self.canvas.shape_drawer.start_polygon(event, event.x, event.y)
+
+    def motion(self, event):
+        self.canvas.shape_drawer.update_rubber_band(event)
+
+
+class ClosePolygonHandler(ToolHandler):
+    """Closing the polygon being drawn."""
+
+    def press(self, event):
+        self.canvas.shape_drawer.close_polygon(event)
+
+
+class TextHandler(ToolHandler):
+    """Building a text box."""
+
+    def press(self, event):
+        self.canvas.text_box_builder.start_building(event)
+
+    def motion(self, event):
+        self.canvas.text_box_builder.adjust_size(event)
+
+    def release(self, event):
+        self.canvas.text_box_builder.finish_building(event)
+
+
+class MoveHandler(ToolHandler):
+    """Dragging a single object."""
+
+    def press(self, event):
+        self.canvas.operation.select_object(event)
+
+    def motion(self, event):
+        self.canvas.operation.move_object(event)
+
+    def release(self, event):
+        self.canvas.operation.release_object()
+
+
+class DeleteHandler(ToolHandler):
+    """Deleting the clicked object."""
+
+    def press(self, event):
+        self.canvas.operation.select_object(event)
+        self.canvas.operation.delete_object()
+
+    def release(self, event):
+        self.canvas.operation.release_object()
+
+
+class ForwardHandler(ToolHandler):
+    """Bringing the clicked object to the front."""
+
+    def press(self, event):
+        self.canvas.operation.select_object(event)
+        self.canvas.operation.move_forward()
+
+
+class BackwardHandler(ToolHandler):
+    """Sending the clicked object to the back."""
+
+    def press(self, event):
+        self.canvas.operation.select_object(event)
+        self.canvas.operation.move_backward()
+
+
+class FillHandler(ToolHandler):
+    """Filling the clicked shape with a color."""
+
+    def press(self, event):
+        self.canvas.fill_tool.fill_shape(event)
+
+
+class BucketFillHandler(ToolHandler):
+    """Filling the closed region around the clicked point with a color."""
+
+    def press(self, event):
+        self.canvas.fill_tool.bucket_fill(event)
+
+
+class GradualFillHandler(ToolHandler):
+    """Filling the clicked shape with a gradient."""
+
+    def press(self, event):
+        self.canvas.fill_tool.shapes_gradual_fill(event)
+
+
+class SelectionHandler(ToolHandler):
+    """
+    Base class of the selection tools: a press on a handle of the selection overlay resizes or rotates the selection,
+    and any other press is handled by the tool.
+    """
+
+    keeps_highlight = True
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self._dragging_handle = False
+
+    def press(self, event):
+        self._dragging_handle = self.canvas.select_tool.overlay.start_drag(event.x, event.y)
+        if not self._dragging_handle:
+            self.press_tool(event)
+
+    def motion(self, event):
+        if self._dragging_handle:
+            self.canvas.select_tool.overlay.drag(event.x, event.y)
+        else:
+            self.motion_tool(event)
+
+    def release(self, event):
+        if self._dragging_handle:
+            self.canvas.select_tool.overlay.end_drag()
+            self._dragging_handle = False
+        else:
+            self.release_tool(event)
+
+    def press_tool(self, event):
+        """Handle a mouse button press away from the handles."""
+
+    def motion_tool(self, event):
+        """Handle the mouse motion while the button is pressed away from the handles."""
+
+    def release_tool(self, event):
+        """Handle the mouse button release after a press away from the handles."""
+
+
+class SelectHandler(SelectionHandler):
+    """Selecting a single object and applying the toolbar color and thickness to it."""
+
+    def press_tool(self, event):
+        self.canvas.select_tool.select_object(event)
+        self.canvas.select_tool.activate_features()
+
+
+class MarqueeHandler(SelectionHandler):
+    """Selecting several objects with a selection rectangle."""
+
+    def press_tool(self, event):
+        self.canvas.select_tool.start_selection(event)
+
+    def motion_tool(self, event):
+        self.canvas.select_tool.update_selection(event)
+
+    def release_tool(self, event):
+        self.canvas.select_tool.end_selection(event)
+
+
+class MoveObjectsHandler(SelectionHandler):
+    """Dragging the objects selected with the selection rectangle."""
+
+    def motion_tool(self, event):
+        self.canvas.select_tool.move_square_objects(event)
+
+    def release_tool(self, event):
+        self.canvas.select_tool.end_move(event)
+
+
+# Handler class of every tool, by the tool name the toolbar selects
+TOOL_HANDLERS = {
+    "Pen": PenHandler,
+    "Eraser": EraserHandler,
+    "Line": ShapeHandler,
+    "Square": ShapeHandler,
+    "Triangle": ShapeHandler,
+    "Oval": ShapeHandler,
+    "Start polygon": PolygonHandler,
+    "Close Polygon": ClosePolygonHandler,
+    "Text": TextHandler,
+    "Move": MoveHandler,
+    "Delete": DeleteHandler,
+    "Forward": ForwardHandler,
+    "Backward": BackwardHandler,
+    "Fill": FillHandler,
+    "Bucket fill": BucketFillHandler,
+    "Gradual fill": GradualFillHandler,
+    "Select": SelectHandler,
+    "select objects": MarqueeHandler,
+    "Move objects": MoveObjectsHandler,
+}
+
+
+def build_tool_handlers(canvas):
+    """
+    Create the dispatch table of the drawing canvas.
+
+    Parameters:
+        canvas (DrawingCanvas): The canvas the tools draw on.
+
+    Returns:
+        dict: A handler instance for every tool name.
+    """
+    return {tool: handler_class(canvas) for tool, handler_class in TOOL_HANDLERS.items()}
@@ -1,5 +1,6 @@
+import os
 import tkinter as tk
-from tkinter import ttk, colorchooser
+from tkinter import ttk
 
 DEFAULT_COLOR = "black"
 THICKNESS_OPTIONS = ["1px", "3px", "5px", "8px", "10px", "12px"]
@@ -7,23 +8,45 @@ TOOL_OPTIONS = ["Basic_tools", "Operation", "Thickness", "Shapes", "Text", "Colo
 SHAPES_BY_IMAGES = {"Line": "line_image.png", "Square": "square_image.png", "Triangle": "triangle_image.png",
                     "Oval": "oval_image.png"}
 SELECT_IMAGE = "square_select.png"
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
 SIZE_FRONT_OPTIONS = ["10", "12", "14", "16", "18", "20"]
 TYPE_FRONT_OPTION = ["Arial", "David", "Times New Roman", "Courier New"]
 STYLE_FRONT_OPTION = ["", "bold", "italic", "underline"]
 
 
+class ToolbarState:
+    """
+    Cached values of the toolbar.
+
+    The toolbar pushes every change into this object (Tk variables through traces), so the drawing code can read the
+    current tool, colors and line width on every mouse event without any Tcl call.
+
+    Attributes:
+        tool (str): The currently selected tool.
+        color (str): Current drawing color.
+        fill_color (str): Current fill color.
+        gradual_colors (tuple): First and second colors for gradual fill.
+        text_color (str): Current text color.
+        line_width (int): Current line width in pixels.
+    """
+
+    def __init__(self):
+        self.tool = ""
+        self.color = DEFAULT_COLOR
+        self.fill_color = DEFAULT_COLOR
+        self.gradual_colors = (DEFAULT_COLOR, DEFAULT_COLOR)
+        self.text_color = DEFAULT_COLOR
+        self.line_width = 1
+
+
 class Toolbar(ttk.Frame):
     """
     Toolbar class represents a set of tools for a drawing application.
 
     Attributes:
         _drawing_canvas (tk.Canvas): Reference to the canvas widget.
+        state (ToolbarState): Cached toolbar values (tool, colors and line width).
         _selected_tool (tk.StringVar): Keeps track of the currently selected tool.
-        _color (str): Current drawing color.
-        _fill_color (str): Current fill color.
-        _color1 (str): First color for gradual fill.
-        _color2 (str): Second color for gradual fill.
-        _text_color (str): Current text color.
         _line_width (tk.StringVar): Current line width.
         font_size (tk.StringVar): Current font size for text.
         font_type (tk.StringVar): Current font type for text.
@@ -35,13 +58,12 @@ class Toolbar(ttk.Frame):
         """
         super().__init__(master)
         self._drawing_canvas = canvas
+        self.state = ToolbarState()
         self._selected_tool = tk.StringVar()
-        self._color = DEFAULT_COLOR
-        self._fill_color = DEFAULT_COLOR
-        self._color1 = DEFAULT_COLOR
-        self._color2 = DEFAULT_COLOR
-        self._text_color = DEFAULT_COLOR
         self._line_width = tk.StringVar()
+        self._selected_tool.trace_add('write', self._update_selected_tool)
+        self._line_width.trace_add('write', self._update_line_width)
+        self._icons = {}  # Icon images by file name, loaded once by _load_icons
         self.font_size = tk.StringVar(value="10")
         self.font_type = tk.StringVar(value="Arial")
         self.font_style = tk.StringVar(value="")
@@ -51,6 +73,8 @@ class Toolbar(ttk.Frame):
         """
         Set up the toolbar by creating and arranging tool buttons.
         """
+        self._load_icons()
+
         toolbar_frame = ttk.Frame(self.master)
         toolbar_frame.pack(side=tk.TOP, fill=tk.X)
 
@@ -85,6 +109,13 @@ class Toolbar(ttk.Frame):
                 self.clear_button = ttk.Button(toolbar_frame, text="Clear Canvas")
                 self.clear_button.pack(side=tk.TOP, padx=5, pady=5)
 
+    def _load_icons(self):
+        """
+        Load all the toolbar icons in one step, before the buttons that show them are created.
+        """
+        for image_file in [*SHAPES_BY_IMAGES.values(), SELECT_IMAGE]:
+            self._icons[image_file] = tk.PhotoImage(file=os.path.join(IMAGES_DIR, image_file))
+
     def _create_basic_tools(self, toolbar_frame):
         # pen and eraser tools
         pen_frame = ttk.Frame(toolbar_frame)
@@ -102,6 +133,8 @@ class Toolbar(ttk.Frame):
 
         # fill tool
         ttk.Button(pen_frame, text="Fill", command=self._choose_fill_color).pack(side=tk.TOP)
+        ttk.Button(pen_frame, text="Bucket fill", command=lambda: self._choose_fill_color("Bucket fill")).pack(
+            side=tk.TOP)
         ttk.Button(pen_frame, text="Gradual fill", command=self._choose_colores_for_gradual_fill).pack(side=tk.TOP)
 
     def _choose_colores_for_gradual_fill(self):
@@ -112,25 +145,29 @@ class Toolbar(ttk.Frame):
 
         # Open color selection dialogs
         # for color 1
-        selected_color1 = tk.colorchooser.askcolor(title="Select first color")[0]
+        from tkinter import colorchooser
+
+        selected_color1 = colorchooser.askcolor(title="Select first color")[0]
         if selected_color1:
-            self._color1 = selected_color1
+            self.state.gradual_colors = (selected_color1, self.state.gradual_colors[1])
 
         # for color 2
-        selected_color2 = tk.colorchooser.askcolor(title="Select second color")[0]
+        selected_color2 = colorchooser.askcolor(title="Select second color")[0]
         if selected_color2:
-            self._color2 = selected_color2
+            self.state.gradual_colors = (self.state.gradual_colors[0], selected_color2)
 
-    def _choose_fill_color(self):
+    def _choose_fill_color(self, tool="Fill"):
         """
-        Activate the fill tool and choose a color for filling.
+        Activate a fill tool (the fill tool by default) and choose a color for filling.
         """
-        self._select_tool("Fill")
+        self._select_tool(tool)
 
         # Open color selection dialog for fill color
-        fill_color = tk.colorchooser.askcolor(title="Select color")[1]
+        from tkinter import colorchooser
+
+        fill_color = colorchooser.askcolor(title="Select color")[1]
         if fill_color:
-            self._fill_color = fill_color
+            self.state.fill_color = fill_color
 
     def _create_object_operation(self, toolbar_frame):
         """
@@ -186,7 +223,7 @@ class Toolbar(ttk.Frame):
 
         # Create buttons for different shapes
         for shape, image_file in SHAPES_BY_IMAGES.items():
-            shape_image = tk.PhotoImage(file=image_file)
+            shape_image = self._icons[image_file]
             button = ttk.Button(shape_buttons_frame, image=shape_image,
                                 command=lambda s=shape: self._select_tool(s))
             button.image = shape_image
@@ -248,9 +285,11 @@ class Toolbar(ttk.Frame):
         Opens a color selection dialog to choose the text color.
         """
         # Open color selection dialog for fill color
+        from tkinter import colorchooser
+
         text_color = colorchooser.askcolor()[1]
         if text_color:
-            self._text_color = text_color
+            self.state.text_color = text_color
 
     def _update_font_size(self, size):
         """
@@ -296,7 +335,7 @@ class Toolbar(ttk.Frame):
         select_buttons_frame.pack(side=tk.TOP)
 
         # Button for selecting multiple objects
-        shape_image = tk.PhotoImage(file=SELECT_IMAGE)
+        shape_image = self._icons[SELECT_IMAGE]
         button = ttk.Button(select_buttons_frame, image=shape_image,
                             command=lambda: self._select_tool("select objects"))
         button.image = shape_image
@@ -319,10 +358,12 @@ class Toolbar(ttk.Frame):
         """
         Opens a color selection dialog to choose the color.
         """
+        from tkinter import colorchooser
+
         color = colorchooser.askcolor()[1]
 
         if color:
-            self._color = color
+            self.state.color = color
             if self._drawing_canvas and self._drawing_canvas.text_box_builder:
                 self._drawing_canvas.text_box_builder.set_text_color(color)
 
@@ -332,41 +373,54 @@ class Toolbar(ttk.Frame):
         """
         self._selected_tool.set(tool)
 
+    def _update_selected_tool(self, *args):
+        """
+        Push the selected tool into the cached state.
+        """
+        self.state.tool = self._selected_tool.get()
+
+    def _update_line_width(self, *args):
+        """
+        Push the selected line width into the cached state.
+        """
+        line_width_str = self._line_width.get().replace("px", "")
+        self.state.line_width = int(line_width_str) if line_width_str else 1  # Use default thickness if empty
+
     def get_selected_tool(self):
         """
         Get the currently selected tool.
         """
-        return self._selected_tool.get()
+        return self.state.tool
 
     def get_color(self):
         """
         Get the currently selected color.
         """
-        return self._color
+        return self.state.color
 
     def get_gradual_colors(self):
         """
         Get the selected gradual fill colors.
         """
-        return self._color1, self._color2
+        return self.state.gradual_colors
 
     def get_fill_color(self):
         """
         Get the currently selected fill color.
         """
-        return self._fill_color
+        return self.state.fill_color
 
     def get_text_color(self):
         """
         Get the currently selected text color.
         """
-        return self._text_color
+        return self.state.text_color
 
     def get_line_width(self):
         """
         Get the currently selected line width.
         """
-        return self._line_width.get()
+        return "%dpx" % self.state.line_width
 
     def get_font_size(self):
         """
@@ -386,6 +440,40 @@ class Toolbar(ttk.Frame):
         """
         return self.font_style.get()
 
+    def get_state(self):
+        """
+        Get everything selected in the toolbar that the drawing tools read.
+
+        Returns:
+            dict: The tool, colors, line width and font settings (JSON serializable).
+        """
+        state = self.state
+        return {"tool": state.tool, "color": state.color, "fill_color": state.fill_color,
+                "gradual_colors": list(state.gradual_colors), "text_color": state.text_color,
+                "line_width": state.line_width, "font_size": self.get_font_size(),
+                "font_type": self.get_font_type(), "font_style": self.get_font_style()}
+
+    def set_state(self, values):
+        """
+        Select the settings of a state returned by get_state (missing ones are left unchanged).
+
+        Parameters:
+            values (dict): The settings to select.
+        """
+        state = self.state
+        if "tool" in values:
+            self._select_tool(values["tool"])
+        if "line_width" in values:
+            self._line_width.set("%dpx" % values["line_width"])
+        for name in ("color", "fill_color", "text_color"):
+            if name in values:
+                setattr(state, name, values[name])
+        if "gradual_colors" in values:
+            state.gradual_colors = tuple(values["gradual_colors"])
+        for name in ("font_size", "font_type", "font_style"):
+            if name in values:
+                getattr(self, name).set(values[name])
+
     @staticmethod
     def _add_separator(toolbar_frame):
         """
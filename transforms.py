@@ -0,0 +1,179 @@
+import math
+
+import numpy as np
+
+# Options copied from a rectangle or an oval to the polygon replacing it when it can't stay axis-aligned
+POLYGON_OPTIONS = ("fill", "outline", "width", "dash", "stipple", "outlinestipple", "state")
+_MIN_OVAL_POINTS = 16  # Fewest points of the polygon replacing a transformed oval
+_MAX_OVAL_POINTS = 256  # Most points of the polygon replacing a transformed oval
+_OVAL_POINT_SPACING = 4  # Approximate distance in pixels between the points of the polygon replacing an oval
+_RUN_TAG_PREFIX = "replacing:"  # Temporary tag of the new items put in place of a run of old items
+
+
+def translation_matrix(dx, dy):
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+
+
+def around(matrix, center):
+    """Get the matrix applying a transform around a center instead of around the origin."""
+    x, y = center
+    return translation_matrix(x, y) @ matrix @ translation_matrix(-x, -y)
+
+
+def scale_matrix(x_scale, y_scale, center=(0, 0)):
+    return around(np.array([[x_scale, 0.0, 0.0], [0.0, y_scale, 0.0], [0.0, 0.0, 1.0]]), center)
+
+
+def rotation_matrix(angle, center=(0, 0)):
+    """Get the matrix of a rotation by an angle in radians (clockwise on the screen, where y points down)."""
+    cos, sin = math.cos(angle), math.sin(angle)
+    return around(np.array([[cos, -sin, 0.0], [sin, cos, 0.0], [0.0, 0.0, 1.0]]), center)
+
+
+def skew_matrix(x_skew, y_skew, center=(0, 0)):
+    """Get the matrix of a skew: x moves by x_skew * y and y moves by y_skew * x (x_skew and y_skew are tangents)."""
+    return around(np.array([[1.0, x_skew, 0.0], [y_skew, 1.0, 0.0], [0.0, 0.0, 1.0]]), center)
+
+
+def transform_points(points, matrix):
+    """Apply a 3x3 affine matrix to an (N, 2) array of points."""
+    return points @ matrix[:2, :2].T + matrix[:2, 2]
+
+
+def transform_points_batch(points, matrices):
+    """Apply K 3x3 affine matrices to an (N, 2) array of points, giving a (K, N, 2) array."""
+    return points @ matrices[:, :2, :2].transpose(0, 2, 1) + matrices[:, None, :2, 2]
+
+
+def polygon_coords(item_type, coords):
+    """Get the flat coordinates of the polygon replacing a rectangle or an oval that can't stay axis-aligned."""
+    x1, y1, x2, y2 = coords
+    return [x1, y1, x2, y1, x2, y2, x1, y2] if item_type == "rectangle" else _oval_points(x1, y1, x2, y2)
+
+
+def _oval_points(x1, y1, x2, y2):
+    """Get the points of a polygon approximating the oval inscribed in a box, as a flat list."""
+    radius_x, radius_y = abs(x2 - x1) / 2, abs(y2 - y1) / 2
+    perimeter = 2 * math.pi * math.sqrt((radius_x ** 2 + radius_y ** 2) / 2)
+    count = min(max(int(perimeter / _OVAL_POINT_SPACING), _MIN_OVAL_POINTS), _MAX_OVAL_POINTS)
+    angles = np.linspace(0, 2 * math.pi, count, endpoint=False)
+    points = np.empty((count, 2))
+    points[:, 0] = (x1 + x2) / 2 + radius_x * np.cos(angles)
+    points[:, 1] = (y1 + y2) / 2 + radius_y * np.sin(angles)
+    return points.ravel().tolist()
+
+
+def transform_items(canvas, items, matrix):
+    """
+    Apply an affine transform to canvas items, and record it in the undo history as one step.
+
+    The coordinates of all the items are transformed in a single NumPy batch, and written back with a single Tcl
+    script. Lines and polygons transform all their points. Rectangles and ovals keep their type while the transform
+    keeps them axis-aligned (translation and scaling), and are replaced by polygons otherwise (rotation and skew),
+    created in one batch.
+    Text boxes and pictures can't be transformed by Tk, so only their anchor point is.
+
+    Parameters:
+        canvas (DrawingCanvas): The canvas of the items.
+        items (list): Ids of the items.
+        matrix (numpy.ndarray): The 3x3 affine matrix, in canvas coordinates.
+
+    Returns:
+        dict: The id of the polygon replacing every replaced rectangle or oval.
+    """
+    axis_aligned = matrix[0, 1] == 0 and matrix[1, 0] == 0
+    before = {}  # Item -> coordinates before the transform, for the transformed items
+    flat = []  # Coordinates of all the points to transform: the transformed items first, then the replaced ones
+    counts = []  # Number of coordinates of every transformed item
+    boxes = []  # Axis-aligned rectangles and ovals among the transformed items
+    replaced = []  # (item, coordinates of its polygon) of the rectangles and ovals replaced by polygons
+    for item in items:
+        coords = canvas.coords(item)
+        if not coords:
+            continue
+        item_type = canvas.type(item)
+        if item_type in ("rectangle", "oval"):
+            if not axis_aligned:
+                replaced.append((item, polygon_coords(item_type, coords)))
+                continue
+            boxes.append(item)
+        before[item] = coords
+        counts.append(len(coords))
+        flat.extend(coords)
+    kept_length = len(flat)
+    for _, polygon in replaced:
+        flat.extend(polygon)
+    if not flat:
+        return {}
+
+    # Transform every point at once
+    points = transform_points(np.array(flat, dtype=float).reshape(-1, 2), matrix).ravel().tolist()
+
+    after = {}
+    start = 0
+    for item, count in zip(before, counts):
+        after[item] = points[start:start + count]
+        start += count
+    for item in boxes:  # Corners of axis-aligned rectangles and ovals, back in (left, top, right, bottom) order
+        x1, y1, x2, y2 = after[item]
+        after[item] = [min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)]
+
+    history = canvas.history
+    new_ids = {}
+    with history.group():
+        canvas.set_coords_batch(after)
+        history.record_coords(before, after)
+
+        # Rectangles and ovals that aren't axis-aligned anymore become polygons, at their place in the drawing order:
+        # the polygons are created in one batch, and recorded as one deletion and one creation
+        if replaced:
+            old_items = [item for item, _ in replaced]
+            history.record_delete(old_items)
+            polygons = []
+            start = kept_length
+            for item, polygon_points in replaced:
+                options = {option: canvas.itemcget(item, option) for option in POLYGON_OPTIONS}
+                options["tags"] = [tag for tag in canvas.gettags(item) if tag != "current"]  # Groups, selection...
+                polygons.append(("polygon", points[start:start + len(polygon_points)], options))
+                start += len(polygon_points)
+            created = _create_in_place(canvas, old_items, polygons)
+            canvas.remove_items(old_items)
+            history.record_create(created)
+            new_ids = dict(zip(old_items, created))
+    return new_ids
+
+
+def _create_in_place(canvas, old_items, new_items):
+    """
+    Create items in one batch, each right above an old item in the drawing order, with one raise per run of old items
+    next to each other in the drawing order (instead of one per item).
+
+    Parameters:
+        canvas (DrawingCanvas): The canvas of the items.
+        old_items (list): Ids of the old items.
+        new_items (list): (type, canvas coordinates, options) of the item created above every old item.
+
+    Returns:
+        list: The ids of the created items, in the order of old_items.
+    """
+    position = {item: index for index, item in enumerate(canvas.find_all())}
+    order = sorted(range(len(old_items)), key=lambda index: position[old_items[index]])
+    runs = []  # [tag, last old item] of every run of old items next to each other in the drawing order
+    batch = []
+    for index in order:
+        old_item = old_items[index]
+        if not runs or position[old_item] != position[runs[-1][1]] + 1:
+            runs.append([f"{_RUN_TAG_PREFIX}{len(runs)}", None])
+        runs[-1][1] = old_item
+        item_type, coords, options = new_items[index]
+        batch.append((item_type, coords, dict(options, tags=list(options.get("tags") or ()) + [runs[-1][0]])))
+
+    # The new items of a run are created in drawing order on top of the canvas, so raising them above the last old
+    # item of their run puts them in place
+    created = [None] * len(old_items)
+    for index, item in zip(order, canvas.create_items_batch(batch, screen=True)):
+        created[index] = item
+    for tag, last_item in runs:
+        canvas.tag_raise(tag, last_item)
+        canvas.dtag(tag)
+    return created
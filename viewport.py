@@ -0,0 +1,833 @@
+import bisect
+import heapq
+
+from group_tree import GROUPED_TAG
+from history_manager import IGNORED_TAGS, SELECTED_TAG
+from performance_profiler import OVERLAY_POSITION, OVERLAY_TAG
+from style_table import SHAPE_DEFAULTS
+
+ZOOM_STEP = 1.25  # Zoom factor of one mouse wheel notch
+MIN_ZOOM = 0.02
+MAX_ZOOM = 50.0
+CULL_MIN_OBJECTS = 20000  # Drawings with fewer objects keep all of them on the Tk canvas
+CULL_MARGIN = 0.5  # Part of the view size kept on the canvas on every side of the view, so panning rarely culls
+CULL_CELL_SIZE = 512  # Side in document units of the cells of the spatial hash of the culled objects
+LOD_ZOOM = 0.5  # Zoom under which the strokes are drawn with fewer points
+LOD_TOLERANCE = 1.5  # Distance in pixels under which the points of a stroke are merged, zoomed out
+LOD_MIN_POINTS = 8  # Strokes with fewer points are always drawn in full
+SETTLE_DELAY_MS = 150  # Delay after the last zoom or pan event before culling and the level of detail are updated
+DEFAULT_VIEW_SIZE = (378, 265)  # Size of a Tk canvas that isn't mapped yet and has no configured size
+_CULLED_TYPES = ("line", "rectangle", "oval", "polygon")  # Pictures and text boxes always stay on the canvas
+_MAX_ENTRY_CELLS = 64  # Culled objects spanning more cells are kept in a list looked at by every query
+_MAX_LOWERED = 8  # Most created items put in place one by one (below the next item) instead of raising the ones above
+
+
+class _Culled:
+    """An object taken off the Tk canvas, with the data to create it again."""
+
+    __slots__ = ("key", "box", "data")
+
+    def __init__(self, key, box, data):
+        self.key = key  # Place in the drawing order
+        self.box = box  # (x1, y1, x2, y2) in document coordinates
+        self.data = data  # The object data, as saved (loaded objects) or as captured by the history
+
+
+class Viewport:
+    """
+    Zoom and pan of the canvas, as a view transform between document and screen coordinates.
+
+    The Tk items are in screen coordinates: zooming and panning are a single Tk scale or move of all the items, and
+    the tools keep working with the event coordinates. Whatever leaves the canvas (saved drawings, the undo history,
+    the clipboard, the snap points) is mapped back to document coordinates, so it doesn't depend on the view.
+
+    In large drawings (CULL_MIN_OBJECTS objects or more) only the objects around the view are Tk items. The others are
+    culled: they are kept as data in a spatial hash, and created again when the view comes near them or when the
+    history refers to them. Culled objects keep their place in the drawing order through order keys, which are
+    reconciled with the Tk stacking order whenever the two are merged. Zoomed out, strokes with many points are drawn
+    with fewer points, and their full coordinates are kept here for everything that reads them.
+    """
+
+    def __init__(self, canvas):
+        """
+        Initialize the Viewport.
+
+        Parameters:
+            canvas (DrawingCanvas): The canvas of the view.
+        """
+        self.canvas = canvas
+        self.zoom = 1.0
+        self.x = 0.0  # Document point at the top-left corner of the canvas
+        self.y = 0.0
+        self.culled = {}  # Id -> _Culled object
+        self._cells = {}  # (column, row) -> ids of the culled objects in the cell (some may be back on the canvas)
+        self._large = []  # Ids of the culled objects spanning too many cells
+        self._keys = {}  # Item on the canvas -> its order key
+        self._low = 0.0  # Bounds of the order keys
+        self._high = 0.0
+        self._next_id = -1  # Ids of the objects culled before they were ever created are negative
+        self._region = None  # The document box of the objects kept on the canvas, or None for all of them
+        self._detail = {}  # Stroke drawn with fewer points -> its full coordinates, in document coordinates
+        self._pristine = {}  # Item created again from a culled object and unchanged since -> the culled object
+        self._pan = None  # Last pointer position while panning
+        self._settle_job = None
+
+    @property
+    def identity(self):
+        return self.zoom == 1 and self.x == 0 and self.y == 0
+
+    @property
+    def culling(self):
+        """Whether objects are culled (or would be, for those far from the view)."""
+        return self._region is not None or bool(self.culled)
+
+    # Coordinates
+    def to_document(self, coords):
+        """Map flat screen coordinates to document coordinates."""
+        coords = list(coords)
+        if not self.identity:
+            zoom, x, y = self.zoom, self.x, self.y
+            coords[0::2] = [value / zoom + x for value in coords[0::2]]
+            coords[1::2] = [value / zoom + y for value in coords[1::2]]
+        return coords
+
+    def to_screen(self, coords):
+        """Map flat document coordinates to screen coordinates."""
+        coords = list(coords)
+        if not self.identity:
+            zoom, x, y = self.zoom, self.x, self.y
+            coords[0::2] = [(value - x) * zoom for value in coords[0::2]]
+            coords[1::2] = [(value - y) * zoom for value in coords[1::2]]
+        return coords
+
+    def view_box(self):
+        """Get the document box shown by the canvas."""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:  # Not mapped yet
+            width = int(float(self.canvas.cget("width") or DEFAULT_VIEW_SIZE[0]))
+            height = int(float(self.canvas.cget("height") or DEFAULT_VIEW_SIZE[1]))
+        return self.x, self.y, self.x + width / self.zoom, self.y + height / self.zoom
+
+    # Zoom and pan
+    def wheel(self, event):
+        """Zoom in or out around the pointer by one mouse wheel notch."""
+        zoom_in = event.num == 4 or event.delta > 0
+        self.zoom_at(ZOOM_STEP if zoom_in else 1 / ZOOM_STEP, event.x, event.y)
+
+    def start_pan(self, event):
+        self._pan = (event.x, event.y)
+
+    def pan(self, event):
+        """Follow the pointer while panning."""
+        if self._pan is not None:
+            self.pan_by(event.x - self._pan[0], event.y - self._pan[1])
+            self._pan = (event.x, event.y)
+
+    def end_pan(self, event):
+        self._pan = None
+
+    def zoom_in(self):
+        """Zoom in by one step around the center of the view."""
+        self._zoom_center(ZOOM_STEP)
+
+    def zoom_out(self):
+        self._zoom_center(1 / ZOOM_STEP)
+
+    def _zoom_center(self, factor):
+        x1, y1, x2, y2 = self.view_box()
+        self.zoom_at(factor, (x2 - x1) * self.zoom / 2, (y2 - y1) * self.zoom / 2)
+
+    def zoom_at(self, factor, x, y):
+        """
+        Zoom the view by a factor, keeping the document point under a screen point in place.
+
+        Parameters:
+            factor (float): Zoom factor (more than 1 zooms in).
+            x (float): X coordinate of the screen point.
+            y (float): Y coordinate of the screen point.
+        """
+        zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        factor = zoom / self.zoom
+        if factor == 1:
+            return
+        self.x += x / self.zoom - x / zoom
+        self.y += y / self.zoom - y / zoom
+        self.zoom = zoom
+        self._apply("scale", x, y, factor, factor)
+        if not self._covers_view():
+            self.cull()  # Zoomed out past the objects on the canvas
+        self._schedule_settle()
+
+    def pan_by(self, dx, dy):
+        """Pan the view by (dx, dy) pixels."""
+        if not dx and not dy:
+            return
+        self.x -= dx / self.zoom
+        self.y -= dy / self.zoom
+        self._apply("move", dx, dy)
+        if not self._covers_view():
+            self.cull()  # Panned past the objects on the canvas
+        self._schedule_settle()
+
+    def reset(self):
+        """Go back to the default view (no zoom, no pan)."""
+        if not self.identity:
+            self.zoom_at(1 / self.zoom, 0, 0)
+            self.pan_by(self.x, self.y)
+            self.zoom, self.x, self.y = 1.0, 0.0, 0.0  # Without the rounding errors
+
+    def set_view(self, zoom, x, y):
+        """Show the document from the point (x, y) at the top-left corner of the canvas, at a zoom."""
+        self.zoom_at(zoom / self.zoom, 0, 0)
+        self.pan_by((self.x - x) * self.zoom, (self.y - y) * self.zoom)
+
+    def settle(self):
+        """Cull the objects and update the level of detail for the current view, once zooming or panning stopped."""
+        self._settle_job = None
+        self.cull()
+        self.update_detail()
+
+    def _apply(self, command, *args):
+        """Scale or move all the items at once, and update what depends on their screen coordinates."""
+        canvas = self.canvas
+        canvas.tk.call(canvas._w, command, "all", *args)  # The document doesn't change: the hooks are skipped
+        canvas.layers.view_changed(zoomed=command == "scale")
+        canvas.offscreen.view_changed(command, *args)
+        if canvas.find_withtag(OVERLAY_TAG):
+            canvas.coords(OVERLAY_TAG, *OVERLAY_POSITION)  # The performance overlay stays in place
+        canvas.bboxes.clear()
+        canvas.groups.invalidate_all()
+        overlay = canvas.select_tool.overlay
+        if overlay.units:
+            visible = overlay.visible
+            overlay.refresh()
+            if not visible:
+                overlay.hide()
+
+    def _schedule_settle(self):
+        if self._settle_job is not None:
+            self.canvas.after_cancel(self._settle_job)
+        self._settle_job = self.canvas.after(SETTLE_DELAY_MS, self.settle)
+
+    def _covers_view(self):
+        if self._region is None:
+            return True
+        x1, y1, x2, y2 = self.view_box()
+        region_x1, region_y1, region_x2, region_y2 = self._region
+        return region_x1 <= x1 and region_y1 <= y1 and x2 <= region_x2 and y2 <= region_y2
+
+    # Culling
+    def cull(self):
+        """
+        Keep on the Tk canvas only the objects around the view: the others are culled, and the culled objects now
+        around the view are created again. Grouped and selected objects, pictures and text boxes are never culled.
+        """
+        canvas = self.canvas
+        order = self._reconcile()
+        region = self._update_region(len(order) + len(self.culled))
+        if region is not None:
+            with canvas.layers.live(hidden=True):  # Tk doesn't find the hidden items
+                inside = set(canvas.find_overlapping(*self.to_screen(region)))
+            pinned = set(canvas.find_withtag(GROUPED_TAG)).union(canvas.find_withtag(SELECTED_TAG))
+            self._cull_items([item for item in order if item not in inside and item not in pinned])
+        self.uncull(self._query(region), order=[item for item in order if item in self._keys])
+
+    def culls(self, count):
+        """Whether the drawing is culled, or will be once count objects are added."""
+        return self.culling or count + len(self._keys) >= CULL_MIN_OBJECTS
+
+    def _update_region(self, count):
+        """Get the document box of the objects to keep on the canvas for a number of objects (None for all)."""
+        region = None
+        if count >= CULL_MIN_OBJECTS:
+            x1, y1, x2, y2 = self.view_box()
+            margin_x, margin_y = (x2 - x1) * CULL_MARGIN, (y2 - y1) * CULL_MARGIN
+            region = (x1 - margin_x, y1 - margin_y, x2 + margin_x, y2 + margin_y)
+        self._region = region
+        return region
+
+    def uncull(self, ids, order=None):
+        """
+        Create culled objects on the canvas again, at their place in the drawing order.
+
+        Parameters:
+            ids (collection): Ids of the objects (ids that aren't culled are left out).
+            order (list): The items on the canvas in drawing order, if just reconciled.
+
+        Returns:
+            dict: The id of the created item of every object.
+        """
+        entries = sorted(((self.culled.pop(item), item) for item in set(ids) if item in self.culled),
+                         key=lambda entry: entry[0].key)
+        if not entries:
+            return {}
+        if order is None:
+            order = self._reconcile()
+        # All the objects are created by create_items_batch (in chunks, in time slices), and remembered until they
+        # change, so they can be culled again without reading them from Tk
+        items = self.canvas.create_items_batch([_batch_item(entry.data) for entry, _ in entries])
+        created = {}
+        for (entry, old), item in zip(entries, items):
+            self._keys[item] = entry.key
+            self._pristine[item] = entry
+            created[old] = item
+            self.canvas.history.alias(old, item)
+        self._stack(items, order)
+        self.simplify(created.values())
+        return created
+
+    def discard(self, ids):
+        """
+        Forget the culled objects among objects removed from the drawing.
+
+        Returns:
+            list: The other ids, of the items on the canvas.
+        """
+        culled = self.culled
+        if not culled:
+            return ids
+        return [item for item in ids if culled.pop(item, None) is None]
+
+    def clear(self):
+        """Forget the culled objects, once the drawing was cleared."""
+        self.culled.clear()
+        self._cells.clear()
+        self._large.clear()
+        self._region = None
+
+    def capture(self, ids):
+        """
+        Get the snapshots of culled objects, like HistoryManager.capture, without creating them again.
+
+        Returns:
+            list: The snapshots, in drawing order, with their order key.
+        """
+        entries = sorted(((self.culled[item], item) for item in set(ids) if item in self.culled),
+                         key=lambda entry: entry[0].key)
+        return [{"id": item, "below": None, "key": entry.key, "data": entry.data} for entry, item in entries]
+
+    def keys(self):
+        """Reconcile the order keys with the drawing order, and get the key of every item on the canvas."""
+        self._reconcile()
+        return self._keys
+
+    def culled_data(self):
+        """Get the (order key, saved data, tags) of the culled objects, in drawing order."""
+        return [(entry.key, _saved_data(entry.data), _data_tags(entry.data))
+                for entry in sorted(self.culled.values(), key=lambda entry: entry.key)]
+
+    def find_culled(self, tag):
+        """Get the ids of the culled objects with a tag (like the tag of a layer)."""
+        return [item for item, entry in self.culled.items() if tag in _data_tags(entry.data)]
+
+    def set_culled_state(self, tag, state):
+        """Set the state of the culled objects with a tag, for when they are created again (like hiding a layer)."""
+        for entry in self.culled.values():
+            if tag in _data_tags(entry.data) and entry.data.get("options", {}).get("state", "") != state:
+                # The data may be shared with the history, so it's replaced instead of changed
+                item_type, coords, options = _batch_item(entry.data)
+                options = dict(options, state=state)
+                if not state:
+                    del options["state"]
+                entry.data = {"type": item_type, "coords": coords, "options": options}
+
+    def configure_culled(self, select, options, tag=None):
+        """
+        Change the options of culled objects, for when they are created again (like restyling a style).
+
+        Parameters:
+            select (callable): Called with the (type, options) of every culled object, whether it's changed.
+            options (dict): The new options.
+            tag (str): A tag the changed objects get, if they don't have it yet.
+        """
+        for entry in self.culled.values():
+            item_type, coords, item_options = _batch_item(entry.data)
+            if select(item_type, item_options):
+                # The data may be shared with the history, so it's replaced instead of changed
+                item_options = dict(item_options, **options)
+                tags = list(_data_tags(entry.data))
+                if tag is not None and tag not in tags:
+                    item_options["tags"] = tags + [tag]
+                entry.data = {"type": item_type, "coords": coords, "options": item_options}
+
+    def reorder(self, ranks):
+        """
+        Give new order keys to all the objects, sorted by the rank of their layer (keeping their order in each
+        layer), for when the layers are reordered while objects are culled.
+
+        Parameters:
+            ranks (dict): Layer tag -> its rank, bottom to top.
+        """
+        order = self._reconcile()
+        if not self.culled:
+            return  # The order keys of the items on the canvas follow the drawing order once reconciled
+        canvas = self.canvas
+        rank_of = {item: rank for tag, rank in ranks.items() for item in canvas.find_withtag(tag)}
+        objects = [(rank_of.get(item, 0), self._keys[item], item) for item in order]
+        objects.extend((next((ranks[tag] for tag in _data_tags(entry.data) if tag in ranks), 0), entry.key, item)
+                       for item, entry in self.culled.items())
+        objects.sort(key=lambda obj: obj[:2])
+        for key, (_, _, item) in enumerate(objects):
+            if item in self.culled:
+                self.culled[item].key = key
+            else:
+                self._keys[item] = key
+        self._low, self._high = 0, len(objects)
+
+    def load(self, objects, pinned=()):
+        """
+        Create the objects of a drawing file, culling those far from the view in a large drawing.
+
+        Parameters:
+            objects (list): The object data of the file, in drawing order.
+            pinned (collection): Positions of the objects that must be created (the grouped ones).
+
+        Returns:
+            list: The id of every object (negative for the culled ones), or None for the skipped ones.
+        """
+        order = self._reconcile()
+        region = self._update_region(len(objects) + len(order) + len(self.culled))
+        base = self._high + 1
+        return self._create([(base + position, obj, position not in pinned) for position, obj in enumerate(objects)],
+                            region, order)
+
+    def restore(self, snapshots):
+        """
+        Recreate the items captured by the history at their place in the drawing order, culling those far from the
+        view (used instead of recreating them all while objects are culled).
+
+        Returns:
+            list: The ids of the objects (negative for the culled ones).
+        """
+        order = self._reconcile()
+        region = self._update_region(len(snapshots) + len(order) + len(self.culled))
+        objects = []
+        batch_keys = {}  # Snapshot id -> its key
+        for snapshot in snapshots:
+            data = snapshot["data"]
+            key = snapshot.get("key")
+            if key is None:  # Captured before anything was culled
+                key = self._key_above(snapshot["below"], batch_keys)
+            batch_keys[snapshot["id"]] = key
+            objects.append((key, data, GROUPED_TAG not in data.get("options", {}).get("tags", ())))
+        return self._create(objects, region, order)
+
+    def _create(self, objects, region, order):
+        """
+        Create objects at the place of their order keys in the drawing order, culling those far from the view.
+
+        Parameters:
+            objects (list): The (order key, data, whether it may be culled) of every object.
+            region (tuple): The document box of the objects to keep on the canvas, or None for all of them.
+            order (list): The items on the canvas in drawing order, just reconciled.
+
+        Returns:
+            list: The id of every object (negative for the culled ones), or None for the skipped ones.
+        """
+        ids = []
+        batch = []  # (index in ids, object) of the canvas items, all created by one create_items_batch
+        created = []
+        for key, data, cullable in objects:
+            self._low, self._high = min(self._low, key), max(self._high, key)
+            box = _data_box(data)
+            if box is None:  # Pictures and text boxes
+                item = self.canvas.create_object(data)
+                if item:
+                    self._keys[item] = key
+                    created.append(item)
+            elif cullable and region is not None and not _overlaps(box, region):
+                item = self._add_culled(key, box, data)
+            else:
+                batch.append((len(ids), _Culled(key, box, data)))
+                item = None
+            ids.append(item)
+
+        batch.sort(key=lambda entry: entry[1].key)
+        items = self.canvas.create_items_batch([_batch_item(entry.data) for _, entry in batch])
+        for (index, entry), item in zip(batch, items):
+            ids[index] = item
+            self._keys[item] = entry.key
+            self._pristine[item] = entry
+        created.extend(items)
+        self._stack(created, order)
+        self.simplify(created)
+        return ids
+
+    def _add_culled(self, key, box, data):
+        item = self._next_id
+        self._next_id -= 1
+        self._index(item, _Culled(key, box, data))
+        return item
+
+    def _cull_items(self, items):
+        """Take items off the canvas, keeping their data."""
+        canvas = self.canvas
+        history = canvas.history
+        culled = {}
+        for item in items:
+            entry = self._pristine.pop(item, None)
+            if entry is not None:  # Unchanged since it was created again
+                entry.key = self._keys[item]
+                culled[item] = entry
+                continue
+            if canvas.type(item) not in _CULLED_TYPES:
+                continue
+            box = canvas.bbox(item)
+            data = history.capture_item(item)
+            if box and data is not None:
+                culled[item] = _Culled(self._keys[item], tuple(self.to_document(box)), data)
+        canvas.remove_items(list(culled))
+        for item, entry in culled.items():
+            self._index(item, entry)
+
+    def _index(self, item, entry):
+        """Add a culled object to the spatial hash."""
+        self.culled[item] = entry
+        x1, y1, x2, y2 = entry.box
+        columns = range(int(x1 // CULL_CELL_SIZE), int(x2 // CULL_CELL_SIZE) + 1)
+        rows = range(int(y1 // CULL_CELL_SIZE), int(y2 // CULL_CELL_SIZE) + 1)
+        if len(columns) * len(rows) > _MAX_ENTRY_CELLS:
+            self._large.append(item)
+            return
+        cells = self._cells
+        for column in columns:
+            for row in rows:
+                cell = cells.get((column, row))
+                if cell is None:
+                    cells[(column, row)] = [item]
+                else:
+                    cell.append(item)
+
+    def _query(self, region):
+        """Get the culled objects overlapping a document box (all of them for None)."""
+        culled = self.culled
+        if region is None:
+            self._cells.clear()
+            self._large.clear()
+            return list(culled)
+        x1, y1, x2, y2 = region
+        columns = range(int(x1 // CULL_CELL_SIZE), int(x2 // CULL_CELL_SIZE) + 1)
+        rows = range(int(y1 // CULL_CELL_SIZE), int(y2 // CULL_CELL_SIZE) + 1)
+        cells = self._cells
+        if len(columns) * len(rows) > len(cells):
+            keys = [key for key in cells if key[0] in columns and key[1] in rows]
+        else:
+            keys = [(column, row) for column in columns for row in rows if (column, row) in cells]
+
+        found = set()
+        for key in keys:
+            cell = [item for item in cells[key] if item in culled]  # Leave out the objects back on the canvas
+            if cell:
+                cells[key] = cell
+                found.update(item for item in cell if _overlaps(culled[item].box, region))
+            else:
+                del cells[key]
+        self._large = [item for item in self._large if item in culled]
+        found.update(item for item in self._large if _overlaps(culled[item].box, region))
+        return found
+
+    # Drawing order
+    def _reconcile(self):
+        """
+        Give an order key to the items on the canvas that have none or whose key doesn't match their place anymore
+        (created, raised or lowered since), keeping the keys of the longest run of items still in order.
+
+        Returns:
+            list: The items on the canvas (but the helper items), in drawing order.
+        """
+        canvas = self.canvas
+        ignored = {item for tag in IGNORED_TAGS for item in canvas.find_withtag(tag)}
+        items = [item for item in canvas.find_all() if item not in ignored]
+        keys = self._keys
+        values = [keys.get(item) for item in items]
+        if None not in values and all(first < second for first, second in zip(values, values[1:])):
+            return items
+
+        kept = _longest_increasing(values)
+        start = None  # Start of the run of items to key
+        for index in range(len(items) + 1):
+            if index < len(items) and index not in kept:
+                if start is None:
+                    start = index
+                continue
+            if start is not None:
+                lower = values[start - 1] if start > 0 else None
+                upper = values[index] if index < len(items) else None
+                if not self._key_run(items[start:index], lower, upper):
+                    self._renumber(items)
+                    return items
+                start = None
+        return items
+
+    def _key_run(self, run, lower, upper):
+        """Key a run of items between two keys (or below or above all the keys), or return False if it can't fit."""
+        keys = self._keys
+        count = len(run)
+        if lower is None and upper is None:
+            lower = self._high
+        if upper is None:  # Above everything, the culled objects included (like new items)
+            lower = max(lower, self._high)
+            for offset, item in enumerate(run, 1):
+                keys[item] = lower + offset
+            self._high = lower + count
+        elif lower is None:  # Below everything (like items sent backward)
+            self._low = min(upper, self._low) - count
+            for offset, item in enumerate(run):
+                keys[item] = self._low + offset
+        else:
+            step = (upper - lower) / (count + 1)
+            if step <= abs(upper) * 1e-12:
+                return False
+            for offset, item in enumerate(run, 1):
+                keys[item] = lower + step * offset
+        return True
+
+    def _renumber(self, items):
+        """Give integer keys again to all the objects, the culled ones included, in drawing order."""
+        keys = self._keys
+        lost = [item for item in items if item not in keys]
+        visible = [(keys[item], item) for item in items if item in keys]
+        ordered = heapq.merge(sorted(visible), sorted((entry.key, item) for item, entry in self.culled.items()))
+        for key, (_, item) in enumerate(ordered):
+            if item in self.culled:
+                self.culled[item].key = key
+            else:
+                keys[item] = key
+        self._low, self._high = 0, len(visible) + len(self.culled)
+        for item in lost:
+            self._high += 1
+            keys[item] = self._high
+        self._reconcile()
+
+    def _key_above(self, below, batch_keys):
+        """Get an order key just above an item (or under all the keys for None), which may be restored with it."""
+        if below in batch_keys:
+            key = batch_keys[below]
+            return key + 1e-6 * max(1.0, abs(key))
+        below = self.canvas.history.resolve(below, uncull=False) if below else None
+        if below in self.culled:
+            key = self.culled[below].key
+        elif below in self._keys:
+            key = self._keys[below]
+        else:
+            self._low -= 1
+            return self._low
+        return key + 1e-6 * max(1.0, abs(key))
+
+    def _stack(self, created, order):
+        """
+        Put items just created (on top of the canvas, in creation order) at the place of their order keys among the
+        items in order, with as few Tk calls as possible.
+        """
+        if not created:
+            return
+        keys = self._keys
+        canvas = self.canvas
+        created_set = set(created)
+        order = [item for item in order if item not in created_set and item in keys]
+        created_order = sorted(created, key=keys.get)
+        merged = list(heapq.merge(order, created_order, key=keys.get))
+        first = next((index for index, (item, merged_item) in enumerate(zip(order + list(created), merged))
+                      if item != merged_item), len(merged))
+        if len(merged) - first <= len(created) or len(created) > _MAX_LOWERED:
+            # Raise everything from the first item out of place up, in order
+            script = [f"{canvas._w} raise {item}" for item in merged[first:]]
+        else:
+            # Lower every created item under the first item above it, and raise the others to the top in order
+            order_keys = [keys[item] for item in order]
+            script, top = [], []
+            for item in created_order:
+                index = bisect.bisect(order_keys, keys[item])
+                if index < len(order):
+                    script.append(f"{canvas._w} lower {item} {order[index]}")
+                else:
+                    top.append(f"{canvas._w} raise {item}")
+            script.extend(top)
+        if script:
+            canvas.tk.eval("\n".join(script))
+        for tag in IGNORED_TAGS:
+            canvas.tag_raise(tag)  # Keep the helper items above the drawing
+
+    # Level of detail
+    def update_detail(self):
+        """Draw the strokes with fewer points zoomed out, or in full again zoomed in."""
+        if self.zoom >= LOD_ZOOM:
+            self.restore_detail(list(self._detail))
+        else:
+            self.simplify([item for item in self.canvas.find_all() if self.canvas.type(item) == "line"])
+
+    def simplify(self, items):
+        """Draw the strokes among items with fewer points, if zoomed out, keeping their full coordinates."""
+        if self.zoom >= LOD_ZOOM:
+            return
+        canvas = self.canvas
+        tolerance = LOD_TOLERANCE
+        script = []
+        for item in items:
+            if canvas.type(item) != "line":
+                continue
+            coords = canvas.coords(item)  # In full, even if drawn with fewer points already
+            if len(coords) < 2 * LOD_MIN_POINTS:
+                continue
+            reduced = _decimate(coords, tolerance)
+            if len(reduced) < len(coords):
+                self._detail[item] = self.to_document(coords)
+                script.append(f"{canvas._w} coords {item} {' '.join(map(repr, reduced))}")
+            elif item in self._detail:
+                script.append(f"{canvas._w} coords {item} {' '.join(map(repr, coords))}")
+                del self._detail[item]
+        if script:
+            canvas.tk.eval("\n".join(script))
+            canvas.bboxes.clear()
+
+    def restore_detail(self, tag_or_id):
+        """Draw strokes in full again before they are changed by Tk (tag_or_id is a tag, an id or a list of ids)."""
+        if not self._detail:
+            return
+        canvas = self.canvas
+        items = tag_or_id if isinstance(tag_or_id, list) else _resolve(canvas, tag_or_id)
+        script = [f"{canvas._w} coords {item} {' '.join(map(repr, self.to_screen(self._detail.pop(item))))}"
+                  for item in items if item in self._detail]
+        if script:
+            canvas.tk.eval("\n".join(script))
+
+    def full_coords(self, tag_or_id):
+        """Get the full screen coordinates of a stroke drawn with fewer points, or None."""
+        if isinstance(tag_or_id, str) and tag_or_id.isdigit():
+            tag_or_id = int(tag_or_id)
+        coords = self._detail.get(tag_or_id) if isinstance(tag_or_id, int) else None
+        return None if coords is None else self.to_screen(coords)
+
+    # Hooks called by the drawing canvas when items change
+    def moved(self, tag_or_id, dx, dy):
+        if not self._detail and not self._pristine:
+            return
+        dx, dy = dx / self.zoom, dy / self.zoom
+        for item in _resolve(self.canvas, tag_or_id):
+            self._pristine.pop(item, None)
+            coords = self._detail.get(item)
+            if coords is not None:
+                coords[0::2] = [value + dx for value in coords[0::2]]
+                coords[1::2] = [value + dy for value in coords[1::2]]
+
+    def changed(self, items):
+        """Forget the full coordinates of strokes whose coordinates were set, and other changed items."""
+        if self._detail or self._pristine:
+            for item in items:
+                self._detail.pop(item, None)
+                self._pristine.pop(item, None)
+
+    def configured(self, tag_or_id):
+        if self._pristine and tag_or_id not in IGNORED_TAGS:
+            self.changed(_resolve(self.canvas, tag_or_id))
+
+    def scaling(self, tag_or_id):
+        """Draw strokes in full again before Tk scales them."""
+        self.restore_detail(tag_or_id)
+        self.configured(tag_or_id)
+
+    def deleting(self, tags_or_ids):
+        if "all" in tags_or_ids:
+            self._keys.clear()
+            self._detail.clear()
+            self._pristine.clear()
+            return
+        for tag_or_id in tags_or_ids:
+            for item in _resolve(self.canvas, tag_or_id):
+                self._keys.pop(item, None)
+                self._detail.pop(item, None)
+                self._pristine.pop(item, None)
+
+
+def _resolve(canvas, tag_or_id):
+    if isinstance(tag_or_id, int):
+        return (tag_or_id,)
+    if isinstance(tag_or_id, str) and tag_or_id.isdigit():
+        return (int(tag_or_id),)
+    return canvas.find_withtag(tag_or_id)
+
+
+def _overlaps(box, region):
+    return box[0] <= region[2] and box[2] >= region[0] and box[1] <= region[3] and box[3] >= region[1]
+
+
+def _data_box(data):
+    """Get the document box of the data of an object that can be culled, or None for other objects."""
+    coords = data.get("coords")
+    if data.get("type") not in _CULLED_TYPES or not coords or len(coords) < 2:
+        return None
+    try:
+        half_width = float(data.get("options", data).get("width") or 1) / 2
+    except (TypeError, ValueError):
+        half_width = 0.5
+    xs, ys = coords[0::2], coords[1::2]
+    return min(xs) - half_width, min(ys) - half_width, max(xs) + half_width, max(ys) + half_width
+
+
+def _batch_item(data):
+    """Get the (type, coordinates, options) of the data of a culled object, for DrawingCanvas.create_items_batch."""
+    if "options" in data:
+        return data["type"], data["coords"], data["options"]
+    options = {"fill": data.get("color"), "width": data.get("width"),  # Like DrawingCanvas.create_object
+               "tags": data.get("tags")}  # The tag of the layer of a loaded object
+    if data["type"] != "line":
+        options["outline"] = data.get("outline")
+    return data["type"], data["coords"], {name: value for name, value in options.items() if value is not None}
+
+
+def _saved_data(data):
+    """Get the data of a culled object as saved in drawing files (see DrawingCanvas.serialize_item)."""
+    if "options" not in data:  # Loaded from a drawing file
+        if "tags" in data:
+            data = dict(data)
+            del data["tags"]
+        return data
+    options = data["options"]
+    defaults = SHAPE_DEFAULTS[data["type"]]  # The saved options left out of the captured data are the defaults
+    saved = {"type": data["type"], "coords": data["coords"], "width": options.get("width", defaults["width"]),
+             "color": options.get("fill", defaults["fill"])}
+    if data["type"] != "line":
+        saved["outline"] = options.get("outline", defaults["outline"])
+    return saved
+
+
+def _data_tags(data):
+    """Get the tags of the data of a culled object."""
+    return data.get("options", data).get("tags") or ()
+
+
+def _decimate(coords, tolerance):
+    """Drop the points of a polyline closer than a tolerance to the previous point kept (the ends are kept)."""
+    squared = tolerance * tolerance
+    last_x, last_y = coords[0], coords[1]
+    reduced = [last_x, last_y]
+    for index in range(2, len(coords) - 2, 2):
+        x, y = coords[index], coords[index + 1]
+        if (x - last_x) ** 2 + (y - last_y) ** 2 >= squared:
+            reduced.extend((x, y))
+            last_x, last_y = x, y
+    reduced.extend(coords[-2:])
+    return reduced
+
+
+def _longest_increasing(values):
+    """Get the indexes of a longest strictly increasing subsequence of values, leaving the None values out."""
+    tails, tail_indexes = [], []
+    previous = {}
+    for index, value in enumerate(values):
+        if value is None:
+            continue
+        position = bisect.bisect_left(tails, value)
+        previous[index] = tail_indexes[position - 1] if position else None
+        if position == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[position] = value
+            tail_indexes[position] = index
+    kept = set()
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        kept.add(index)
+        index = previous[index]
+    return kept